@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+基于 asyncio streams 的文件传输客户端
+与 FileTransferClient 使用相同的协议（直连或经 ProxyRequest/ProxyResponse 代理连接、
+上传、上传文件夹、下载、列表），但所有操作都是协程：一个事件循环即可驱动多条连接上的
+成百上千个并发传输，发送端每写一块数据都 await drain()，由TCP背压控制内存占用。
+
+命令行脚本和GUI仍然使用阻塞的 FileTransferClient
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from file_transfer_client import (DOWNLOAD_PART_SUFFIX, LIST_PAGE_SIZE, ListEntry, ProxyRequest, ProxyResponse,
+                                  parse_list_line, scan_folder)
+from transfer_engine import SENDFILE_SLICE
+from transfer_progress import format_rate, get_console_bus
+
+# StreamReader 的缓冲上限：读缓冲超过两倍该值时暂停从socket读取
+STREAM_LIMIT = 1024 * 1024
+# 下载时每次从 StreamReader 取出的最大字节数
+ASYNC_RECV_CHUNK = 1024 * 1024
+# 建立连接和等待单条响应的超时（秒）
+ASYNC_TIMEOUT = 30
+# 上传/下载多个文件时默认打开的连接数
+ASYNC_CONNECTIONS = 8
+
+PROXY_RESPONSE_SIZE = 102
+
+
+class AsyncFileTransferClient:
+    """一个实例对应一条连接；同一连接上的命令由锁串行化，可以放心地从多个任务并发调用"""
+
+    def __init__(self, host='localhost', port=8080, proxy_host=None, proxy_port=None,
+                 progress_bus=None, timeout=ASYNC_TIMEOUT, quiet=False):
+        self.host = host
+        self.port = port
+        self.proxy_host = proxy_host
+        self.proxy_port = proxy_port
+        self.using_proxy = proxy_host is not None and proxy_port is not None
+        self.timeout = timeout
+        # quiet 时不打印每个文件的提示（并行传输由调用方汇总输出）
+        self.quiet = quiet
+        self.progress_bus = progress_bus or get_console_bus()
+        self.reader = None
+        self.writer = None
+        self.connected = False
+        self._lock = asyncio.Lock()
+
+    def _log(self, message):
+        if not self.quiet:
+            print(message)
+
+    def _clone(self):
+        """创建一个连接参数相同的新客户端（用于并行连接）"""
+        return AsyncFileTransferClient(self.host, self.port, self.proxy_host, self.proxy_port,
+                                       progress_bus=self.progress_bus, timeout=self.timeout, quiet=True)
+
+    async def __aenter__(self):
+        if not await self.connect():
+            raise ConnectionError(f"无法连接到服务器 {self.host}:{self.port}")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+    async def connect(self):
+        """连接到服务器（直接连接或通过代理）"""
+        try:
+            if self.using_proxy:
+                address = (self.proxy_host, self.proxy_port)
+            else:
+                address = (self.host, self.port)
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(*address, limit=STREAM_LIMIT), self.timeout)
+
+            if self.using_proxy:
+                self.writer.write(ProxyRequest(self.host, self.port).pack())
+                await self.writer.drain()
+                response = ProxyResponse(await self._read_exactly(PROXY_RESPONSE_SIZE))
+                if not response.is_success():
+                    self._log(f"❌ 代理连接失败 (状态码: {response.status}): {response.msg}")
+                    await self.disconnect()
+                    return False
+
+            self.connected = True
+            via = f" (代理 {self.proxy_host}:{self.proxy_port})" if self.using_proxy else ""
+            self._log(f"✅ 成功连接到服务器 {self.host}:{self.port}{via}")
+            return True
+
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            self._log(f"❌ 连接失败: {e}")
+            await self.disconnect()
+            return False
+
+    async def disconnect(self):
+        """断开连接"""
+        self.connected = False
+        if self.writer is not None:
+            writer, self.writer, self.reader = self.writer, None, None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _wait(self, awaitable):
+        """等待一次读取，超时时给出可读的错误信息"""
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"等待服务器响应超时 ({self.timeout}s)") from None
+
+    async def _read_line(self):
+        """读取一行响应（不含行尾）"""
+        line = await self._wait(self.reader.readline())
+        if not line:
+            raise ConnectionError("连接已关闭")
+        return line.rstrip(b"\r\n")
+
+    async def _read_exactly(self, length):
+        return await self._wait(self.reader.readexactly(length))
+
+    async def _command(self, command):
+        """发送一条命令并读取一行响应"""
+        self.writer.write(command.encode('utf-8'))
+        await self.writer.drain()
+        return (await self._read_line()).decode('utf-8', errors='replace')
+
+    async def upload_file(self, local_file_path, server_filename=None, on_progress=None):
+        """上传单个文件；server_filename 默认为本地文件名
+
+        on_progress 为空时在进度总线上登记一个独立的传输，否则以累计字节数回调
+        """
+        if not self.connected:
+            self._log("❌ 未连接到服务器")
+            return False
+
+        server_filename = server_filename or os.path.basename(local_file_path)
+        try:
+            file_size = os.path.getsize(local_file_path)
+            async with self._lock:
+                response = await self._command(f"FILE:UPLOAD:{server_filename}:{file_size}")
+                if response != "READY":
+                    self._log(f"❌ 服务器不准备接收文件: {response}")
+                    return False
+
+                with open(local_file_path, 'rb') as file:
+                    if on_progress is None:
+                        with self.progress_bus.start(f"上传 {server_filename}", file_size) as progress:
+                            await self._send_file(file, file_size, progress.update)
+                    else:
+                        await self._send_file(file, file_size, on_progress)
+
+                response = await self._read_line()
+
+            if not response.startswith(b"SUCCESS"):
+                self._log(f"❌ 服务器错误: {response.decode('utf-8', errors='replace')}")
+                return False
+            if on_progress is None:
+                self._log(f"✅ 文件上传成功: {server_filename}")
+            return True
+
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            self._log(f"❌ 上传文件失败: {e}")
+            await self.disconnect()
+            return False
+
+    async def _send_file(self, file, file_size, on_progress):
+        """发送恰好 file_size 字节的文件数据
+
+        loop.sendfile 在普通TCP连接上走内核 sendfile 零拷贝，不支持时自动退回读文件+写入并等待drain；
+        分片发送以便汇报进度
+        """
+        loop = asyncio.get_running_loop()
+        transport = self.writer.transport
+        sent = 0
+        while sent < file_size:
+            count = min(SENDFILE_SLICE, file_size - sent)
+            n = await loop.sendfile(transport, file, sent, count)
+            if n <= 0:
+                raise IOError(f"文件在发送过程中被截断: 期望{file_size}字节，仅发送{sent}字节")
+            sent += n
+            on_progress(sent)
+        return sent
+
+    async def download_file(self, filename, local_dir="./downloads", on_progress=None):
+        """从服务器下载文件；数据先写入 .part 文件，完成后改名"""
+        if not self.connected:
+            self._log("❌ 未连接到服务器")
+            return False
+
+        local_file_path = os.path.join(local_dir, filename)
+        part_path = local_file_path + DOWNLOAD_PART_SUFFIX
+        try:
+            os.makedirs(os.path.dirname(local_file_path) or ".", exist_ok=True)
+            async with self._lock:
+                response = await self._command(f"FILE:DOWNLOAD:{filename}")
+                if not response.startswith("FILE_INFO:"):
+                    self._log(f"❌ 下载失败: {response}")
+                    return False
+                file_size = int(response.split(':')[1])
+
+                self.writer.write(b"READY")
+                await self.writer.drain()
+
+                with open(part_path, 'wb') as file:
+                    if on_progress is None:
+                        with self.progress_bus.start(f"下载 {filename}", file_size) as progress:
+                            await self._recv_file(file, file_size, progress.update)
+                    else:
+                        await self._recv_file(file, file_size, on_progress)
+
+            os.replace(part_path, local_file_path)
+            if on_progress is None:
+                self._log(f"✅ 文件下载成功: {local_file_path}")
+            return True
+
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            self._log(f"❌ 下载文件失败: {e}")
+            await self.disconnect()
+            return False
+
+    async def _recv_file(self, file, file_size, on_progress):
+        """从连接读取恰好 file_size 字节写入文件
+
+        StreamReader 缓冲满时会暂停读socket，写盘慢于网络时服务器端自然被TCP窗口限速
+        """
+        received = 0
+        while received < file_size:
+            data = await self._wait(self.reader.read(min(ASYNC_RECV_CHUNK, file_size - received)))
+            if not data:
+                raise ConnectionError(f"连接提前关闭: 期望{file_size}字节，仅收到{received}字节")
+            file.write(data)
+            received += len(data)
+            on_progress(received)
+        return received
+
+    async def list_page(self, prefix="", pattern="", limit=LIST_PAGE_SIZE, cursor="", recursive=True):
+        """获取一页文件列表，返回 ([ListEntry], 下一页游标)；游标为 None 表示已是最后一页"""
+        mode = "R" if recursive else "D"
+        entries = []
+        next_cursor = None
+        async with self._lock:
+            self.writer.write(f"FILE:LIST:{limit}:{mode}:{prefix}:{pattern}:{cursor}".encode('utf-8'))
+            await self.writer.drain()
+            header = await self._read_line()
+            legacy = header.startswith(b"FILE_LIST:")
+            if not legacy and not header.startswith(b"FILE_PAGE:"):
+                raise IOError(f"获取文件列表失败: {header.decode('utf-8', errors='replace')}")
+            while True:
+                line = await self._read_line()
+                if line == b"END_LIST":
+                    break
+                item = parse_list_line(line, legacy) if line else None
+                if isinstance(item, ListEntry):
+                    entries.append(item)
+                elif item is not None:
+                    next_cursor = item
+        return entries, next_cursor
+
+    async def iter_listing(self, prefix="", pattern="", recursive=True, page_size=LIST_PAGE_SIZE):
+        """按页惰性获取文件列表，逐个产出 ListEntry（async for）"""
+        cursor = ""
+        while True:
+            entries, cursor = await self.list_page(prefix, pattern, page_size, cursor, recursive)
+            for entry in entries:
+                yield entry
+            if cursor is None:
+                return
+
+    async def list_files(self):
+        """列出服务器上的文件"""
+        if not self.connected:
+            self._log("❌ 未连接到服务器")
+            return False
+
+        try:
+            print("📂 服务器文件列表:")
+            file_count = 0
+            async for entry in self.iter_listing():
+                print(f"  📄 {entry.path} ({entry.size} bytes)")
+                file_count += 1
+            print(f"总共 {file_count} 个文件")
+            return True
+
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            self._log(f"❌ 列出文件失败: {e}")
+            return False
+
+    async def upload_folder(self, folder_path, connections=ASYNC_CONNECTIONS):
+        """上传整个文件夹：本连接加上 connections-1 条新连接并行上传，大文件优先调度
+
+        与阻塞客户端不同，这里不询问确认，由调用方决定。返回 (成功数, [失败的服务器文件名])
+        """
+        if not os.path.isdir(folder_path):
+            raise FileNotFoundError(f"文件夹不存在: {folder_path}")
+
+        folder_name, files_to_upload, total_size = scan_folder(folder_path)
+        self._log(f"📊 发现 {len(files_to_upload)} 个文件，总大小: {total_size} bytes")
+        successful, failed = await self.upload_files(
+            [(local_path, server_filename) for local_path, server_filename, _ in files_to_upload],
+            connections, name=f"上传 {folder_name}")
+        self._log(f"✅ 文件夹上传完成: 成功 {successful} 个，失败 {len(failed)} 个")
+        return successful, failed
+
+    async def upload_files(self, files, connections=ASYNC_CONNECTIONS, name=None):
+        """并行上传多个文件，files 为 [(本地路径, 服务器文件名)]，大文件优先调度
+
+        返回 (成功数, [失败的服务器文件名])
+        """
+        sized = sorted(((os.path.getsize(local_path), server_filename, local_path)
+                        for local_path, server_filename in files), reverse=True)
+        jobs = [(server_filename, local_path) for _, server_filename, local_path in sized]
+        total_size = sum(size for size, _, _ in sized)
+
+        async def upload(client, job, on_progress):
+            server_filename, local_path = job
+            return await client.upload_file(local_path, server_filename, on_progress)
+
+        return await self._run_parallel(name or f"上传 {len(jobs)} 个文件", total_size, jobs, upload, connections)
+
+    async def stat_file(self, filename):
+        """查询服务器上文件的大小，文件不存在时返回None"""
+        async with self._lock:
+            response = await self._command(f"FILE:STAT:{filename}")
+        if not response.startswith("FILE_STAT:"):
+            return None
+        return int(response.split(':')[1])
+
+    async def download_files(self, filenames, local_dir="./downloads", connections=ASYNC_CONNECTIONS):
+        """并行下载多个文件，大文件优先调度，返回 (成功数, [失败的文件名])"""
+        sizes = [await self.stat_file(filename) for filename in filenames]
+        failed = [filename for filename, size in zip(filenames, sizes) if size is None]
+        for filename in failed:
+            self._log(f"❌ 文件不存在: {filename}")
+        found = sorted(((size, filename) for filename, size in zip(filenames, sizes) if size is not None),
+                       reverse=True)
+        jobs = [(filename, None) for _, filename in found]
+
+        async def download(client, job, on_progress):
+            return await client.download_file(job[0], local_dir, on_progress)
+
+        successful, download_failed = await self._run_parallel(
+            f"下载 {len(jobs)} 个文件", sum(size for size, _ in found), jobs, download, connections)
+        return successful, failed + download_failed
+
+    async def _run_parallel(self, name, total_size, jobs, transfer, connections):
+        """在最多 connections 条连接上并发执行 jobs，每条连接一个任务从共享队列取作业
+
+        出错的连接被丢弃，其余作业由剩余连接继续完成
+        """
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        failed = []
+        successful = 0
+        bytes_done = 0
+
+        connections = max(1, min(connections, len(jobs)))
+        clients = [self] + [self._clone() for _ in range(connections - 1)]
+        results = await asyncio.gather(*(client.connect() for client in clients[1:]))
+        clients = [self] + [client for client, ok in zip(clients[1:], results) if ok]
+
+        started = time.monotonic()
+        with self.progress_bus.start(name, total_size) as progress:
+            async def worker(client):
+                nonlocal successful, bytes_done
+                while client.connected:
+                    try:
+                        job = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    last = 0
+
+                    def on_progress(done):
+                        nonlocal last, bytes_done
+                        bytes_done += done - last
+                        last = done
+                        progress.update(bytes_done)
+
+                    if await transfer(client, job, on_progress):
+                        successful += 1
+                    else:
+                        failed.append(job[0])
+
+            await asyncio.gather(*(worker(client) for client in clients if client.connected))
+
+        # 所有连接都断开时剩下的作业没人处理
+        while not queue.empty():
+            failed.append(queue.get_nowait()[0])
+        for client in clients[1:]:
+            await client.disconnect()
+
+        seconds = max(time.monotonic() - started, 1e-6)
+        self._log(f"📊 {len(clients)} 条连接, {successful} 个文件, {bytes_done} bytes, "
+                  f"{format_rate(bytes_done / seconds)}")
+        for filename in failed:
+            self._log(f"  ❌ 失败: {filename}")
+        return successful, failed
+
+
+def print_usage():
+    """显示使用说明"""
+    print("使用方法:")
+    print("  python async_file_transfer_client.py <up|down|ls> [参数...] [-j N] [--host 主机] [--port 端口]")
+    print("                                       [--proxy 代理主机:代理端口]")
+    print("")
+    print("示例:")
+    print("  python async_file_transfer_client.py up ./documents -j 16")
+    print("  python async_file_transfer_client.py up a.bin b.bin c.bin")
+    print("  python async_file_transfer_client.py down a.bin b.bin -j 4")
+    print("  python async_file_transfer_client.py ls --proxy 127.0.0.1:1080")
+
+
+async def run(action, targets, host, port, proxy_host, proxy_port, connections):
+    async with AsyncFileTransferClient(host, port, proxy_host, proxy_port) as client:
+        if action in ('ls', 'list', 'l'):
+            return await client.list_files()
+
+        if action in ('down', 'download', 'd'):
+            _, failed = await client.download_files(targets, connections=connections)
+            return not failed
+
+        failed = []
+        files = []
+        for target in targets:
+            if os.path.isdir(target):
+                _, folder_failed = await client.upload_folder(target, connections)
+                failed.extend(folder_failed)
+            else:
+                files.append((target, os.path.basename(target)))
+        if files:
+            _, file_failed = await client.upload_files(files, connections)
+            failed.extend(file_failed)
+        return not failed
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ('-h', '--help', 'help'):
+        print_usage()
+        return 0
+
+    action = args.pop(0)
+    host, port = 'localhost', 8080
+    proxy_host = proxy_port = None
+    connections = ASYNC_CONNECTIONS
+    targets = []
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg == '-j':
+                connections = int(args.pop(0))
+            elif arg == '--host':
+                host = args.pop(0)
+            elif arg == '--port':
+                port = int(args.pop(0))
+            elif arg == '--proxy':
+                proxy_host, _, proxy_port = args.pop(0).rpartition(':')
+                proxy_port = int(proxy_port)
+            else:
+                targets.append(arg)
+    except (IndexError, ValueError):
+        print_usage()
+        return 1
+
+    if action not in ('up', 'upload', 'u', 'down', 'download', 'd', 'ls', 'list', 'l'):
+        print(f"❌ 未知操作: {action}")
+        print_usage()
+        return 1
+    if action not in ('ls', 'list', 'l') and not targets:
+        print_usage()
+        return 1
+
+    try:
+        ok = asyncio.run(run(action, targets, host, port, proxy_host, proxy_port, connections))
+    except ConnectionError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
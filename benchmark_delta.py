@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+增量上传基准测试
+生成一个旧文件，随机改写其中一定比例的数据得到新文件，
+统计增量上传在线路上的字节数（签名 + 增量操作）与完整上传的比值以及扫描速度
+"""
+
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from transfer_delta import (BlockSignatures, DeltaEncoder, apply_delta, choose_block_size,
+                            DELTA_OP, SIGNATURE_ENTRY, np)
+
+
+def make_files(directory, size, changed_ratio, regions):
+    """写出旧文件和改动后的新文件，返回两个路径"""
+    old_path = os.path.join(directory, "old.bin")
+    new_path = os.path.join(directory, "new.bin")
+    chunk = 8 * 1024 * 1024
+    with open(old_path, 'wb') as old, open(new_path, 'wb') as new:
+        written = 0
+        while written < size:
+            data = os.urandom(min(chunk, size - written))
+            old.write(data)
+            new.write(data)
+            written += len(data)
+
+    # 把改动分散到若干个区域
+    region_size = max(1, int(size * changed_ratio / regions))
+    with open(new_path, 'r+b') as new:
+        for _ in range(regions):
+            offset = random.randrange(max(size - region_size, 1))
+            new.seek(offset)
+            new.write(os.urandom(region_size))
+    return old_path, new_path
+
+
+def main():
+    print("🚀 增量上传基准测试")
+    print("=" * 40)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print("使用方法:")
+        print("  python benchmark_delta.py [文件大小MB] [改动百分比] [改动区域数]")
+        return
+
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    changed_percent = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    regions = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    size = size_mb * 1024 * 1024
+    block_size = choose_block_size(size)
+
+    print(f"📊 文件大小: {size_mb} MB, 改动: {changed_percent}% ({regions} 处), 块大小: {block_size}")
+    print(f"📊 滚动校验和: {'numpy向量化' if np is not None else '纯Python逐字节'}\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        old_path, new_path = make_files(directory, size, changed_percent / 100, regions)
+
+        start = time.perf_counter()
+        with open(old_path, 'rb') as old:
+            signatures = BlockSignatures.from_file(old, block_size)
+        signature_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ops = []
+        wire_bytes = len(signatures) * SIGNATURE_ENTRY.size
+        with open(new_path, 'rb') as new:
+            encoder = DeltaEncoder(new, signatures)
+            for op in encoder:
+                if op[0] == 'literal':
+                    op = ('literal', bytes(op[1]))
+                    wire_bytes += len(op[1])
+                wire_bytes += DELTA_OP.size
+                ops.append(op)
+        wire_bytes += DELTA_OP.size + len(encoder.digest)
+        scan_seconds = time.perf_counter() - start
+
+        # 按增量操作重建并校验
+        rebuilt_path = os.path.join(directory, "rebuilt.bin")
+        with open(old_path, 'rb') as basis, open(rebuilt_path, 'wb') as output:
+            apply_delta(basis, ops, block_size, output)
+        with open(rebuilt_path, 'rb') as rebuilt:
+            verified = hashlib.sha256(rebuilt.read()).digest() == encoder.digest
+
+    mb = size / (1024 * 1024)
+    print(f"{'签名生成':<12}{mb / signature_seconds:>10.1f} MB/s")
+    print(f"{'差异扫描':<12}{mb / scan_seconds:>10.1f} MB/s")
+    print(f"{'字面数据':<12}{encoder.literal_bytes:>14} bytes")
+    print(f"{'复用数据':<12}{encoder.copied_bytes:>14} bytes")
+    print(f"{'线上字节':<12}{wire_bytes:>14} bytes ({wire_bytes / size * 100:.2f}% of 完整上传, "
+          f"减少 {size / max(wire_bytes, 1):.0f} 倍)")
+    print(f"{'重建校验':<12}{'✅ 通过' if verified else '❌ 失败':>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+下载路径基准测试
+对比旧的 recv(8192) + write 循环与新的 recv_into 复用缓冲区路径：
+统计每次系统调用收到的字节数、每MB分配的缓冲区对象数以及吞吐量
+"""
+
+import os
+import sys
+import socket
+import tempfile
+import threading
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from transfer_engine import recv_file_data, RECV_BUFFER_SIZE
+
+
+class CountingSocket:
+    """包装socket，统计recv类系统调用次数和新分配的bytes对象数"""
+    def __init__(self, sock):
+        self.sock = sock
+        self.recv_calls = 0
+        self.allocations = 0
+
+    def recv(self, bufsize):
+        self.recv_calls += 1
+        data = self.sock.recv(bufsize)
+        self.allocations += 1  # 每次recv都返回一个新的bytes对象
+        return data
+
+    def recv_into(self, buffer, nbytes=0):
+        self.recv_calls += 1
+        return self.sock.recv_into(buffer, nbytes)
+
+
+def legacy_receive(sock, file, file_size):
+    """旧实现：每8KB一次recv，返回新bytes后写入文件"""
+    bytes_received = 0
+    while bytes_received < file_size:
+        data = sock.recv(min(8192, file_size - bytes_received))
+        if not data:
+            break
+        file.write(data)
+        bytes_received += len(data)
+    return bytes_received
+
+
+def sender(sock, total):
+    """发送端线程：持续发送total字节"""
+    chunk = memoryview(bytes(1024 * 1024))
+    sent = 0
+    while sent < total:
+        n = min(len(chunk), total - sent)
+        sock.sendall(chunk[:n])
+        sent += n
+    sock.close()
+
+
+def run_case(name, receive, total, buffer_size):
+    """运行一次接收测试并返回统计结果"""
+    send_sock, recv_sock = socket.socketpair()
+    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    counting = CountingSocket(recv_sock)
+    thread = threading.Thread(target=sender, args=(send_sock, total), daemon=True)
+
+    with tempfile.TemporaryFile() as file:
+        thread.start()
+        start = time.perf_counter()
+        if receive is None:
+            buffer = bytearray(buffer_size)
+            counting.allocations += 1  # 整个下载只分配这一次
+            received = recv_file_data(counting, file, total, buffer=buffer)
+        else:
+            received = receive(counting, file, total)
+        elapsed = time.perf_counter() - start
+    thread.join()
+    recv_sock.close()
+
+    mb = total / (1024 * 1024)
+    return {
+        'name': name,
+        'bytes': received,
+        'seconds': elapsed,
+        'mb_per_s': mb / elapsed if elapsed else 0.0,
+        'syscalls': counting.recv_calls,
+        'bytes_per_syscall': received / max(counting.recv_calls, 1),
+        'allocations_per_mb': counting.allocations / mb,
+    }
+
+
+def main():
+    print("🚀 下载路径基准测试")
+    print("=" * 40)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print("使用方法:")
+        print("  python benchmark_download.py [数据量MB] [缓冲区MB]")
+        return
+
+    total_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    buffer_mb = int(sys.argv[2]) if len(sys.argv) > 2 else RECV_BUFFER_SIZE // (1024 * 1024)
+    total = total_mb * 1024 * 1024
+
+    print(f"📊 数据量: {total_mb} MB, 新路径缓冲区: {buffer_mb} MB\n")
+
+    results = [
+        run_case("旧: recv(8192)+write", legacy_receive, total, 0),
+        run_case("新: recv_into+pwrite", None, total, buffer_mb * 1024 * 1024),
+    ]
+
+    print(f"{'路径':<24}{'MB/s':>10}{'系统调用':>12}{'字节/调用':>14}{'分配/MB':>10}")
+    for r in results:
+        print(f"{r['name']:<24}{r['mb_per_s']:>10.1f}{r['syscalls']:>12}"
+              f"{r['bytes_per_syscall']:>14.0f}{r['allocations_per_mb']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
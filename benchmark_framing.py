@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+分帧协议基准测试
+1. 本地解析：FrameDecoder 从一块连续数据中逐帧切出消息的速度
+2. 对运行中的服务器：逐条一问一答查询 FILE:STAT 与分帧后流水线批量查询的耗时对比
+"""
+
+import os
+import sys
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from file_transfer_client import FileTransferClient
+from wire_protocol import FrameDecoder, encode_frame
+
+
+def bench_decoder(count):
+    """把count条消息编码后分成64KB的段喂给解码器，统计每秒解析的消息数"""
+    stream = b''.join(encode_frame(f"FILE:STAT:folder/file_{i}.txt") for i in range(count))
+    decoder = FrameDecoder()
+    parsed = 0
+    started = time.perf_counter()
+    for offset in range(0, len(stream), 64 * 1024):
+        decoder.feed(stream[offset:offset + 64 * 1024])
+        while decoder.next_frame() is not None:
+            parsed += 1
+    seconds = time.perf_counter() - started
+    assert parsed == count
+    return count / seconds
+
+
+def bench_stat(client, names):
+    """逐条查询与流水线查询的耗时（秒）"""
+    started = time.perf_counter()
+    sequential = [client.stat_file(name) for name in names]
+    sequential_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pipelined = client.stat_files(names)
+    pipelined_seconds = time.perf_counter() - started
+    assert sequential == pipelined
+    return sequential_seconds, pipelined_seconds
+
+
+def main():
+    print("🚀 分帧协议基准测试")
+    print("=" * 40)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print("使用方法:")
+        print("  python benchmark_framing.py [查询次数] [主机] [端口]")
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    host = sys.argv[2] if len(sys.argv) > 2 else 'localhost'
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else 8080
+
+    rate = bench_decoder(count * 50)
+    print(f"📊 FrameDecoder: {rate / 1e6:.2f} M 条消息/秒")
+
+    client = FileTransferClient(host, port)
+    if not client.connect():
+        print("❌ 无法连接到服务器，跳过往返测试")
+        return
+    try:
+        if not client.channel.framed:
+            print("⚠️ 服务器不支持分帧协议，流水线查询退化为逐条查询")
+        names = [f"benchmark_missing_{i}.txt" for i in range(count)]
+        sequential, pipelined = bench_stat(client, names)
+        print(f"📊 {count} 次 FILE:STAT: 逐条 {sequential * 1000:.1f} ms "
+              f"({sequential / count * 1e6:.1f} µs/次)，流水线 {pipelined * 1000:.1f} ms "
+              f"({pipelined / count * 1e6:.1f} µs/次)，提升 {sequential / max(pipelined, 1e-9):.1f}x")
+    finally:
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+带宽限制基准测试（本地socketpair，不需要服务器）
+1. 精度：单个传输在限速下实际达到的速率与设定值的偏差
+2. 公平：high / normal / low 三个传输同时进行时各自分到的带宽比例（期望 4:2:1）
+3. 开销：未限速和限速（令牌充足）时每个分片调用 acquire 的耗时
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from transfer_limiter import BandwidthLimiter, PRIORITY_WEIGHTS
+from transfer_progress import format_rate
+
+
+def drain(sock):
+    """在后台线程中读空socket，模拟对端"""
+    buffer = bytearray(1024 * 1024)
+    while sock.recv_into(buffer):
+        pass
+
+
+def run_senders(limiter, priorities, seconds):
+    """每个优先级一个发送线程，各自经一对socketpair持续发送seconds秒，返回各线程发送的字节数"""
+    stop = threading.Event()
+    chunk = bytes(256 * 1024)
+    sent = [0] * len(priorities)
+    threads = []
+
+    def sender(index, priority, sock):
+        with limiter.lease(priority) as lease:
+            while not stop.is_set():
+                lease.sendall(sock, chunk)
+                sent[index] += len(chunk)
+        sock.shutdown(socket.SHUT_WR)
+
+    for index, priority in enumerate(priorities):
+        local, remote = socket.socketpair()
+        threads.append(threading.Thread(target=drain, args=(remote,), daemon=True))
+        threads.append(threading.Thread(target=sender, args=(index, priority, local), daemon=True))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sent
+
+
+def bench_accuracy(rate, seconds):
+    limiter = BandwidthLimiter('基准', rate)
+    started = time.perf_counter()
+    sent = run_senders(limiter, ['normal'], seconds)[0]
+    elapsed = time.perf_counter() - started
+    achieved = sent / elapsed
+    print(f"📊 精度: 限速 {format_rate(rate)}, 实际 {format_rate(achieved)}, "
+          f"偏差 {(achieved / rate - 1) * 100:+.2f}%")
+
+
+def bench_fairness(rate, seconds):
+    limiter = BandwidthLimiter('基准', rate)
+    priorities = list(PRIORITY_WEIGHTS)
+    started = time.perf_counter()
+    sent = run_senders(limiter, priorities, seconds)
+    elapsed = time.perf_counter() - started
+    total = sum(sent)
+    weights = sum(PRIORITY_WEIGHTS.values())
+    print(f"📊 公平: 合计 {format_rate(total / elapsed)}（限速 {format_rate(rate)}）")
+    for priority, count in zip(priorities, sent):
+        print(f"  {priority:>6}: {format_rate(count / elapsed)}, 占 {count / total * 100:.1f}% "
+              f"(期望 {PRIORITY_WEIGHTS[priority] / weights * 100:.1f}%)")
+
+
+def bench_overhead(count):
+    # 限速远高于实际速度时令牌总是充足，测得的是排队和记账本身的开销
+    for label, rate in (("未限速", None), ("限速（令牌充足）", 1e15)):
+        limiter = BandwidthLimiter('基准', rate)
+        with limiter.lease() as lease:
+            started = time.perf_counter()
+            for _ in range(count):
+                lease.acquire(64 * 1024)
+            seconds = time.perf_counter() - started
+        print(f"📊 {label}: 每次 acquire {seconds / count * 1e9:.0f} ns")
+
+
+def main():
+    print("🚀 带宽限制基准测试")
+    print("=" * 40)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print("使用方法:")
+        print("  python benchmark_limiter.py [限速MB/s] [每项秒数]")
+        return
+
+    rate = float(sys.argv[1]) * 1024 * 1024 if len(sys.argv) > 1 else 50 * 1024 * 1024
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+
+    bench_overhead(1000000)
+    bench_accuracy(rate, seconds)
+    bench_fairness(rate, seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+GUI日志区基准测试（需要图形界面）
+在真实的Tk窗口中由后台线程连续写入大量日志，统计全部显示完的耗时和主循环的最大停顿，
+以及控件最终保留的行数
+"""
+
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+from tkinter import scrolledtext
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from log_pane import LogPane, LOG_MAX_LINES
+
+
+def bench(lines, max_lines):
+    root = tk.Tk()
+    widget = scrolledtext.ScrolledText(root, height=20, width=80)
+    widget.pack(fill=tk.BOTH, expand=True)
+    pane = LogPane(root, widget, max_lines=max_lines)
+    state = {'last': time.perf_counter(), 'max_gap': 0.0}
+
+    def producer():
+        for i in range(lines):
+            pane.log(f"📤 上传文件 {i}/{lines}: folder/file_{i}.txt", 'info' if i % 10 else 'success')
+
+    def tick():
+        # 主循环每10ms应当被调度一次，两次之间的最长间隔就是界面最长的无响应时间
+        now = time.perf_counter()
+        state['max_gap'] = max(state['max_gap'], now - state['last'])
+        state['last'] = now
+        if thread.is_alive() or pane._pending:
+            root.after(10, tick)
+            return
+        elapsed = now - started
+        shown = int(widget.index('end-1c').split('.')[0]) - 1
+        print(f"📊 {lines} 条日志: 全部显示用时 {elapsed:.2f} 秒, 主循环最大停顿 "
+              f"{state['max_gap'] * 1000:.1f} ms, 控件保留 {shown} 行")
+        pane.close()
+        root.destroy()
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    root.after(10, tick)
+    root.mainloop()
+
+
+def main():
+    print("🚀 GUI日志区基准测试")
+    print("=" * 40)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print("使用方法:")
+        print("  python benchmark_log_pane.py [日志条数] [保留行数]")
+        return
+
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    max_lines = int(sys.argv[2]) if len(sys.argv) > 2 else LOG_MAX_LINES
+    bench(lines, max_lines)
+
+
+if __name__ == "__main__":
+    main()
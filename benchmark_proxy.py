@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+代理开销基准测试
+在本进程内启动 vrc_proxy.VrcProxy（splice零拷贝和缓冲区复用两种转发方式），对运行中的服务器对比
+直接连接与经代理连接的：建连耗时、一问一答的往返时间、上传和下载吞吐
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from file_transfer_client import FileTransferClient
+from transfer_progress import ProgressBus
+from vrc_proxy import VrcProxy, splice_supported
+
+BENCH_FILENAME = "benchmark_proxy.bin"
+
+
+def make_client(host, port, proxy):
+    """创建客户端；进度事件发到一个没有订阅者的总线上，不输出到终端"""
+    proxy_host, proxy_port = proxy.address if proxy else (None, None)
+    return FileTransferClient(host, port, proxy_host, proxy_port, progress_bus=ProgressBus())
+
+
+def bench_connect(host, port, proxy, count):
+    """平均建连耗时（毫秒）：TCP连接，经代理时加上代理握手"""
+    total = 0.0
+    for _ in range(count):
+        client = make_client(host, port, proxy)
+        started = time.perf_counter()
+        connected = client.connect()
+        total += time.perf_counter() - started
+        client.disconnect()
+        if not connected:
+            raise ConnectionError("连接失败")
+    return total / count * 1000
+
+
+def bench_round_trip(host, port, proxy, count):
+    """一问一答的平均往返时间（微秒）"""
+    client = make_client(host, port, proxy)
+    if not client.connect():
+        raise ConnectionError("连接失败")
+    try:
+        started = time.perf_counter()
+        for _ in range(count):
+            client.stat_file(BENCH_FILENAME)
+        return (time.perf_counter() - started) / count * 1e6
+    finally:
+        client.disconnect()
+
+
+def bench_transfer(host, port, proxy, local_path, download_dir):
+    """上传和下载吞吐（MB/s）"""
+    size = os.path.getsize(local_path)
+    client = make_client(host, port, proxy)
+    if not client.connect():
+        raise ConnectionError("连接失败")
+    try:
+        started = time.perf_counter()
+        if not client._upload_single_file(local_path, BENCH_FILENAME, size):
+            raise IOError("上传失败")
+        upload = size / (time.perf_counter() - started) / 1e6
+
+        started = time.perf_counter()
+        if not client.download_file(BENCH_FILENAME, download_dir):
+            raise IOError("下载失败")
+        download = size / (time.perf_counter() - started) / 1e6
+    finally:
+        client.disconnect()
+    return upload, download
+
+
+def main():
+    print("🚀 代理开销基准测试")
+    print("=" * 40)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print("使用方法:")
+        print("  python benchmark_proxy.py [数据量MB] [主机] [端口]")
+        return
+
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    host = sys.argv[2] if len(sys.argv) > 2 else '127.0.0.1'
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else 8080
+
+    proxies = [("直接连接", None)]
+    if splice_supported():
+        proxies.append(("代理 (splice)", VrcProxy('127.0.0.1', 0, use_splice=True).start()))
+    proxies.append(("代理 (缓冲区)", VrcProxy('127.0.0.1', 0, use_splice=False).start()))
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        local_path = os.path.join(temp_dir, BENCH_FILENAME)
+        with open(local_path, 'wb') as file:
+            block = os.urandom(1024 * 1024)
+            for _ in range(size_mb):
+                file.write(block)
+        download_dir = os.path.join(temp_dir, "downloads")
+
+        print(f"📊 数据量: {size_mb} MB, 服务器: {host}:{port}\n")
+        for name, proxy in proxies:
+            # 客户端的连接和传输提示不输出
+            with contextlib.redirect_stdout(io.StringIO()):
+                connect_ms = bench_connect(host, port, proxy, 50)
+                rtt_us = bench_round_trip(host, port, proxy, 2000)
+                upload, download = bench_transfer(host, port, proxy, local_path, download_dir)
+            results.append((name, connect_ms, rtt_us, upload, download))
+
+    for _, proxy in proxies:
+        if proxy is not None:
+            proxy.stop()
+
+    print(f"{'连接方式':<16}{'建连ms':>10}{'往返µs':>10}{'上传MB/s':>12}{'下载MB/s':>12}")
+    for name, connect_ms, rtt_us, upload, download in results:
+        print(f"{name:<16}{connect_ms:>10.2f}{rtt_us:>10.1f}{upload:>12.1f}{download:>12.1f}")
+
+    _, base_connect, base_rtt, base_upload, base_download = results[0]
+    print("\n📊 代理带来的开销（相对直接连接）:")
+    for name, connect_ms, rtt_us, upload, download in results[1:]:
+        print(f"  {name}: 建连 +{connect_ms - base_connect:.2f} ms, 每次往返 +{rtt_us - base_rtt:.1f} µs, "
+              f"上传吞吐 {upload / base_upload * 100:.0f}%, 下载吞吐 {download / base_download * 100:.0f}%")
+    for _, proxy in proxies:
+        if proxy is not None:
+            text, _ = proxy.stats.summary()
+            print(f"  {text}")
+
+
+if __name__ == "__main__":
+    main()
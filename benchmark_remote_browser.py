@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+服务器文件浏览器索引基准测试（不需要服务器和图形界面）
+生成一份有多层文件夹的模拟文件列表，统计下载对话框各步骤的耗时：
+1. 建立索引（服务器按目录遍历顺序返回的列表，以及完全乱序的列表）
+2. 文件夹树第一层、文件夹范围
+3. 过滤（包含文字、通配符）和按大小排序
+4. 渲染一屏（40行）的文字
+"""
+
+import os
+import random
+import sys
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from remote_browser import RemoteIndex
+
+
+def make_listing(count, seed=1):
+    """按目录遍历顺序生成 count 个文件：目录依次出现，同一目录内的文件顺序随机"""
+    rng = random.Random(seed)
+    paths = []
+    for top in range(100):
+        for sub in range(50):
+            directory = [f"project_{top:02d}/module_{sub:02d}/file_{rng.randrange(10 ** 8):08d}.{ext}"
+                         for ext in rng.choices(('txt', 'log', 'dat', 'png'), k=count // 5000)]
+            rng.shuffle(directory)
+            paths.extend(directory)
+    sizes = [rng.randrange(10 ** 7) for _ in paths]
+    return paths, sizes
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    print(f"  {label}: {(time.perf_counter() - started) * 1000:.1f} ms")
+    return result
+
+
+def bench(count):
+    paths, sizes = make_listing(count)
+    print(f"📊 {len(paths)} 个文件")
+
+    index = timed("建立索引（目录遍历顺序）", RemoteIndex, list(paths), list(sizes))
+    shuffled = list(zip(paths, sizes))
+    random.Random(2).shuffle(shuffled)
+    timed("建立索引（完全乱序）", RemoteIndex, [path for path, _ in shuffled], [size for _, size in shuffled])
+
+    folders = timed("文件夹树第一层", index.subfolders, "")
+    lo, hi = timed("文件夹范围 project_42/", index.folder_range, "project_42/")
+    print(f"    第一层 {len(folders)} 个文件夹, project_42/ 有 {hi - lo} 个文件")
+
+    for pattern in ("1234", "*.png", "project_4?/*/file_1*"):
+        rows = timed(f"过滤 {pattern!r}", index.filter, pattern, 0, len(index))
+        print(f"    匹配 {len(rows)} 个")
+    rows = timed("过滤 'log'（project_42/ 内）", index.filter, "log", lo, hi, "project_42/")
+    print(f"    匹配 {len(rows)} 个")
+
+    timed("按大小排序（全部，第一次）", index.sort, range(len(index)), 'size')
+    timed("按大小排序（全部，之后）", index.sort, range(len(index)), 'size', True)
+    timed("按大小排序（project_42/）", index.sort, range(lo, hi), 'size')
+
+    started = time.perf_counter()
+    for offset in range(0, len(index), len(index) // 100):
+        lines = [f"📄 {index.paths[row]} ({index.sizes[row]} bytes)" for row in range(offset, offset + 40)
+                 if row < len(index)]
+    print(f"  渲染一屏文字: {(time.perf_counter() - started) * 1000 / 100:.3f} ms（{len(lines)} 行）")
+
+
+def main():
+    print("🚀 服务器文件浏览器索引基准测试")
+    print("=" * 40)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print("使用方法:")
+        print("  python benchmark_remote_browser.py [文件数]")
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    bench(count)
+
+
+if __name__ == "__main__":
+    main()
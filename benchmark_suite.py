@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+可复现的吞吐和延迟基准测试套件
+自动启动本地服务器和vrc代理，生成固定种子的测试数据集，分别经直接连接、代理和Unix域套接字测量：
+- 单个大文件的上传、下载吞吐（默认1GB和10GB）
+- 大量小文件（默认10万个）和混合目录树的上传吞吐与每秒文件数
+- FILE:LIST 首页延迟（p50/p95）和完整列表耗时
+- 每GB数据客户端、服务器（以及代理）消耗的CPU时间，服务器和客户端的峰值内存
+结果写入JSON文件；--compare 与上一次的结果逐项对比，便于发现性能回退
+"""
+
+import contextlib
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from file_transfer_client import FileTransferClient, UNIX_SOCKET_PREFIX, scan_folder
+from transfer_progress import ProgressBus
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 默认数据集：单个大文件（MB）、小文件数量；--quick 使用小得多的数据集快速跑一遍
+SINGLE_SIZES_MB = [1024, 10240]
+SMALL_FILE_COUNT = 100000
+QUICK_SINGLE_SIZES_MB = [64]
+QUICK_SMALL_FILE_COUNT = 2000
+
+# 小文件大小范围、每个子目录的文件数
+SMALL_FILE_MIN = 1024
+SMALL_FILE_MAX = 8 * 1024
+SMALL_FILES_PER_DIR = 1000
+
+# 混合目录树：若干大文件、中等文件和小文件
+MIXED_LARGE = (4, 64 * 1024 * 1024)
+MIXED_MEDIUM = (200, 1024 * 1024)
+MIXED_SMALL = (2000, 4 * 1024)
+
+# 数据集内容由固定种子生成，每次运行完全相同
+DATASET_SEED = 20240601
+GENERATE_BLOCK = 1024 * 1024
+
+# 并行上传混合目录树使用的连接数，FILE:LIST 首页延迟的采样次数
+MIXED_CONNECTIONS = 4
+LIST_SAMPLES = 20
+
+# 等待服务器和代理启动的超时
+STARTUP_TIMEOUT = 10
+
+PATHS = ('direct', 'proxy', 'unix')
+
+SERVER_CANDIDATES = [
+    os.path.join('build', 'bin', 'SocketServer'),
+    os.path.join('build', 'bin', 'Release', 'SocketServer.exe'),
+    os.path.join('build', 'bin', 'SocketServer.exe'),
+    os.path.join('bin', 'SocketServer'),
+]
+
+
+def unix_sockets_supported():
+    return hasattr(socket, 'AF_UNIX') and os.name != 'nt'
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"进程已退出，返回码 {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"等待端口 {port} 超时")
+
+
+class ProcessMonitor:
+    """读取子进程的CPU时间和峰值内存（Linux /proc），其他平台返回None
+
+    服务器以多个工作进程运行时（file_transfer_server.py --workers），统计包含其直接子进程
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self._ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+    def _pids(self):
+        try:
+            with open(f'/proc/{self.pid}/task/{self.pid}/children') as file:
+                return [self.pid] + [int(pid) for pid in file.read().split()]
+        except (OSError, ValueError):
+            return [self.pid]
+
+    def cpu_seconds(self):
+        total = 0.0
+        for pid in self._pids():
+            try:
+                with open(f'/proc/{pid}/stat') as file:
+                    # 进程名可能含空格，从最后一个右括号之后开始按字段切分
+                    fields = file.read().rpartition(')')[2].split()
+                total += (int(fields[11]) + int(fields[12])) / self._ticks
+            except (OSError, IndexError, ValueError):
+                if pid == self.pid:
+                    return None
+        return total
+
+    def peak_rss_mb(self):
+        total = None
+        for pid in self._pids():
+            try:
+                with open(f'/proc/{pid}/status') as file:
+                    for line in file:
+                        if line.startswith('VmHWM:'):
+                            total = (total or 0) + int(line.split()[1]) / 1024
+                            break
+            except (OSError, ValueError):
+                pass
+        return total
+
+    def reset_peak(self):
+        """让峰值内存从当前值重新统计，每个测试项单独记录自己的峰值"""
+        for pid in self._pids():
+            try:
+                with open(f'/proc/{pid}/clear_refs', 'w') as file:
+                    file.write('5')
+            except OSError:
+                pass
+
+
+def client_peak_rss_mb():
+    """本进程启动以来的峰值内存（不能重置）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class LocalServer:
+    """在临时工作目录中启动服务器子进程，同时监听TCP端口和Unix域套接字
+
+    binary 可以是编译好的 SocketServer，也可以是Python参考服务器 file_transfer_server.py（可指定工作进程数）
+    """
+
+    def __init__(self, binary, work_dir, workers=1):
+        self.binary = binary
+        self.work_dir = work_dir
+        self.workers = workers
+        self.upload_dir = os.path.join(work_dir, 'uploads')
+        self.port = None
+        self.unix_path = None
+        self.process = None
+        self.monitor = None
+
+    def start(self):
+        self.port = free_port()
+        command = [self.binary, str(self.port), self.upload_dir]
+        if self.binary.endswith('.py'):
+            command = [sys.executable] + command + ['--workers', str(self.workers)]
+        if unix_sockets_supported():
+            self.unix_path = os.path.join(self.work_dir, 'server.sock')
+            command += ['--unix', self.unix_path]
+        self._log = open(os.path.join(self.work_dir, 'server.log'), 'wb')
+        self.process = subprocess.Popen(command, cwd=self.work_dir, stdout=self._log, stderr=subprocess.STDOUT)
+        wait_for_port(self.port, self.process)
+        self.monitor = ProcessMonitor(self.process.pid)
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self._log.close()
+            self.process = None
+
+
+class LocalProxy:
+    """vrc_proxy.py 子进程，与基准测试进程分开统计CPU"""
+
+    def __init__(self):
+        self.port = None
+        self.process = None
+        self.monitor = None
+
+    def start(self):
+        self.port = free_port()
+        self.process = subprocess.Popen([sys.executable, os.path.join(SCRIPT_DIR, 'vrc_proxy.py'), str(self.port)],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_for_port(self.port, self.process)
+        self.monitor = ProcessMonitor(self.process.pid)
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+
+def write_random_file(path, size, rng):
+    """写入由rng生成的内容；文件已存在且大小相同时直接复用"""
+    if os.path.isfile(path) and os.path.getsize(path) == size:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        remaining = size
+        while remaining:
+            n = min(GENERATE_BLOCK, remaining)
+            file.write(rng.randbytes(n))
+            remaining -= n
+
+
+def generate_datasets(data_dir, single_sizes_mb, small_count):
+    """生成（或复用）数据集，返回各数据集的路径"""
+    rng = random.Random(DATASET_SEED)
+    singles = {}
+    for size_mb in single_sizes_mb:
+        path = os.path.join(data_dir, f'single_{size_mb}MB.bin')
+        print(f"📦 准备 {size_mb} MB 单文件...")
+        write_random_file(path, size_mb * 1024 * 1024, rng)
+        singles[size_mb] = path
+
+    print(f"📦 准备 {small_count} 个小文件...")
+    small_dir = os.path.join(data_dir, 'small')
+    for i in range(small_count):
+        path = os.path.join(small_dir, f'd{i // SMALL_FILES_PER_DIR:03d}', f'f{i:06d}.bin')
+        write_random_file(path, rng.randint(SMALL_FILE_MIN, SMALL_FILE_MAX), rng)
+
+    print("📦 准备混合目录树...")
+    mixed_dir = os.path.join(data_dir, 'mixed')
+    for kind, (count, size) in (('large', MIXED_LARGE), ('medium', MIXED_MEDIUM), ('small', MIXED_SMALL)):
+        for i in range(count):
+            write_random_file(os.path.join(mixed_dir, kind, f'{kind}_{i:05d}.bin'), size, rng)
+
+    return {'single': singles, 'small': small_dir, 'mixed': mixed_dir}
+
+
+class BenchmarkRunner:
+    def __init__(self, server, proxy, work_dir):
+        self.server = server
+        self.proxy = proxy
+        self.work_dir = work_dir
+        self.results = []
+
+    def make_client(self, path):
+        """按测量路径创建客户端；关闭增量和去重，每次都传输完整数据"""
+        host, port, proxy_host, proxy_port = '127.0.0.1', self.server.port, None, None
+        if path == 'proxy':
+            proxy_host, proxy_port = '127.0.0.1', self.proxy.port
+        elif path == 'unix':
+            host = UNIX_SOCKET_PREFIX + self.server.unix_path
+        client = FileTransferClient(host, port, proxy_host, proxy_port, progress_bus=ProgressBus(),
+                                    delta_threshold=0, dedup_threshold=0)
+        if not client.connect():
+            raise ConnectionError(f"{path}: 无法连接到服务器")
+        return client
+
+    def measure(self, path, case, operation, total_bytes=0, files=0):
+        """运行一个测试项，记录耗时、吞吐、CPU和峰值内存；operation 返回的字典并入结果"""
+        monitors = {'server': self.server.monitor}
+        if path == 'proxy':
+            monitors['proxy'] = self.proxy.monitor
+        for monitor in monitors.values():
+            monitor.reset_peak()
+        cpu_before = {name: monitor.cpu_seconds() for name, monitor in monitors.items()}
+        client_cpu_before = time.process_time()
+
+        started = time.perf_counter()
+        # 客户端的逐文件提示不输出，避免终端输出本身成为瓶颈
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            extra = operation() or {}
+        seconds = time.perf_counter() - started
+
+        gigabytes = total_bytes / (1024 ** 3)
+        record = {
+            'path': path,
+            'case': case,
+            'seconds': round(seconds, 4),
+            'bytes': total_bytes,
+            'files': files,
+            'mb_per_s': round(total_bytes / seconds / 1e6, 2) if total_bytes else None,
+            'files_per_s': round(files / seconds, 1) if files > 1 else None,
+            'client_cpu_s_per_gb': round((time.process_time() - client_cpu_before) / gigabytes, 3)
+            if gigabytes else None,
+        }
+        for name, monitor in monitors.items():
+            after = monitor.cpu_seconds()
+            used = after - cpu_before[name] if after is not None and cpu_before[name] is not None else None
+            record[f'{name}_cpu_s_per_gb'] = round(used / gigabytes, 3) if used is not None and gigabytes else None
+            record[f'{name}_peak_rss_mb'] = monitor.peak_rss_mb()
+        record['client_peak_rss_mb'] = client_peak_rss_mb()
+        record.update(extra)
+        self.results.append(record)
+        print(format_record(record))
+        return record
+
+    def run_path(self, path, datasets):
+        download_dir = os.path.join(self.work_dir, 'downloads')
+        client = self.make_client(path)
+        try:
+            for size_mb, local_path in datasets['single'].items():
+                size = os.path.getsize(local_path)
+                server_name = f'bench_single_{size_mb}MB.bin'
+
+                # 单文件传输同时记录自适应选定的分片和缓冲区参数，便于解释吞吐的变化
+                def upload(local_path=local_path, server_name=server_name, size=size):
+                    if not client._upload_single_file(local_path, server_name, size):
+                        raise IOError(f"上传失败: {server_name}")
+                    return {'tuning': client.tuner.snapshot()}
+
+                def download(server_name=server_name):
+                    if not client.download_file(server_name, download_dir):
+                        raise IOError(f"下载失败: {server_name}")
+                    return {'tuning': client.tuner.snapshot()}
+
+                self.measure(path, f'single_{size_mb}MB_upload', upload, size, 1)
+                self.measure(path, f'single_{size_mb}MB_download', download, size, 1)
+                os.remove(os.path.join(download_dir, server_name))
+
+            for name, connections in (('small', 1), ('mixed', MIXED_CONNECTIONS)):
+                _, files, total = scan_folder(datasets[name])
+
+                def upload_tree(files=files, connections=connections):
+                    _, failed = client._upload_files(files, connections)
+                    if failed:
+                        raise IOError(f"{len(failed)} 个文件上传失败")
+
+                self.measure(path, f'{name}_tree_upload', upload_tree, total, len(files))
+
+            def list_first_page():
+                samples = []
+                for _ in range(LIST_SAMPLES):
+                    started = time.perf_counter()
+                    client.list_page(prefix='small/', limit=1000)
+                    samples.append((time.perf_counter() - started) * 1000)
+                samples.sort()
+                return {'p50_ms': round(samples[len(samples) // 2], 3),
+                        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3)}
+
+            def list_all():
+                return {'entries': sum(1 for _ in client.iter_listing())}
+
+            self.measure(path, 'list_first_page', list_first_page)
+            self.measure(path, 'list_full', list_all)
+        finally:
+            client.disconnect()
+
+
+def format_record(record):
+    parts = [f"  {record['path']:<7}{record['case']:<26}{record['seconds']:>9.2f}s"]
+    if record['mb_per_s'] is not None:
+        parts.append(f"{record['mb_per_s']:>9.1f} MB/s")
+    if record['files_per_s'] is not None:
+        parts.append(f"{record['files_per_s']:>9.0f} 文件/s")
+    if 'p50_ms' in record:
+        parts.append(f"p50 {record['p50_ms']:.2f} ms, p95 {record['p95_ms']:.2f} ms")
+    if 'entries' in record:
+        parts.append(f"{record['entries']} 条")
+    if record.get('server_cpu_s_per_gb') is not None:
+        parts.append(f"服务器CPU {record['server_cpu_s_per_gb']:.2f} s/GB")
+    return "  ".join(parts)
+
+
+def compare_results(previous_path, results):
+    """与上一次的结果对比：吞吐类指标越大越好，延迟和CPU越小越好"""
+    with open(previous_path, encoding='utf-8') as file:
+        previous = {(r['path'], r['case']): r for r in json.load(file)['results']}
+    higher_better = ('mb_per_s', 'files_per_s')
+    lower_better = ('seconds', 'p50_ms', 'p95_ms', 'server_cpu_s_per_gb', 'client_cpu_s_per_gb')
+    print(f"\n📊 与 {previous_path} 对比:")
+    for record in results:
+        old = previous.get((record['path'], record['case']))
+        if old is None:
+            continue
+        changes = []
+        for key in higher_better + lower_better:
+            if record.get(key) is None or not old.get(key):
+                continue
+            change = (record[key] - old[key]) / old[key] * 100
+            worse = change < 0 if key in higher_better else change > 0
+            marker = '🔻' if worse and abs(change) >= 5 else ''
+            changes.append(f"{key} {change:+.1f}%{marker}")
+        if changes:
+            print(f"  {record['path']:<7}{record['case']:<26}" + ", ".join(changes))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_server():
+    for candidate in SERVER_CANDIDATES:
+        path = os.path.join(SCRIPT_DIR, candidate)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def print_usage():
+    print("使用方法:")
+    print("  python benchmark_suite.py [--quick] [--server 服务器程序] [--out 结果.json] [--compare 上次结果.json]")
+    print("                            [--paths direct,proxy,unix] [--sizes 1024,10240] [--small 100000]")
+    print("                            [--data 数据集目录] [--workers 进程数]")
+    print("")
+    print("  --quick    使用小数据集（64MB单文件、2000个小文件）快速运行")
+    print("  --data     数据集目录，多次运行复用同一份数据（默认每次在临时目录中生成）")
+    print("  --server   也可以指定Python参考服务器 file_transfer_server.py，--workers 为其工作进程数")
+
+
+def main():
+    print("🚀 文件传输基准测试套件")
+    print("=" * 40)
+
+    args = sys.argv[1:]
+    server_binary = find_server()
+    out_path = 'benchmark_results.json'
+    compare_path = None
+    data_dir = None
+    paths = list(PATHS)
+    sizes = SINGLE_SIZES_MB
+    small_count = SMALL_FILE_COUNT
+    workers = 1
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg in ('-h', '--help'):
+                print_usage()
+                return 0
+            elif arg == '--quick':
+                sizes, small_count = QUICK_SINGLE_SIZES_MB, QUICK_SMALL_FILE_COUNT
+            elif arg == '--server':
+                server_binary = args.pop(0)
+            elif arg == '--out':
+                out_path = args.pop(0)
+            elif arg == '--compare':
+                compare_path = args.pop(0)
+            elif arg == '--data':
+                data_dir = args.pop(0)
+            elif arg == '--paths':
+                paths = [path for path in args.pop(0).split(',') if path]
+            elif arg == '--sizes':
+                sizes = [int(size) for size in args.pop(0).split(',') if size]
+            elif arg == '--small':
+                small_count = int(args.pop(0))
+            elif arg == '--workers':
+                workers = int(args.pop(0))
+            else:
+                raise ValueError(arg)
+    except (IndexError, ValueError):
+        print_usage()
+        return 1
+
+    if not server_binary or not os.path.isfile(server_binary):
+        print("❌ 找不到服务器程序，请先编译或用 --server 指定")
+        return 1
+    unknown = [path for path in paths if path not in PATHS]
+    if unknown:
+        print(f"❌ 未知的测量路径: {', '.join(unknown)}")
+        return 1
+    if 'unix' in paths and not unix_sockets_supported():
+        print("⚠️ 当前平台不支持Unix域套接字，跳过 unix 路径")
+        paths.remove('unix')
+
+    with tempfile.TemporaryDirectory(prefix='ftbench') as work_dir:
+        datasets = generate_datasets(data_dir or os.path.join(work_dir, 'data'), sizes, small_count)
+        server = LocalServer(os.path.abspath(server_binary), work_dir, workers)
+        proxy = LocalProxy()
+        try:
+            server.start()
+            if 'proxy' in paths:
+                proxy.start()
+            runner = BenchmarkRunner(server, proxy, work_dir)
+            for path in paths:
+                print(f"\n🔗 测量路径: {path}")
+                runner.run_path(path, datasets)
+        finally:
+            proxy.stop()
+            server.stop()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'server': os.path.basename(server_binary),
+            'server_workers': workers if server_binary.endswith('.py') else None,
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'single_sizes_mb': sizes,
+            'small_files': small_count,
+            'paths': paths,
+        },
+        'results': runner.results,
+    }
+    with open(out_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已写入 {out_path}")
+
+    if compare_path:
+        compare_results(compare_path, runner.results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -37,11 +37,17 @@ echo # 源文件
 echo set^(SOURCES
 echo     src/main.cpp
 echo     src/socket_server.cpp
+echo     src/hash_utils.cpp
+echo     src/compression_utils.cpp
+echo     src/mux_session.cpp
 echo ^)
 echo.
 echo # 头文件
 echo set^(HEADERS
 echo     include/socket_server.h
+echo     include/hash_utils.h
+echo     include/compression_utils.h
+echo     include/mux_session.h
 echo ^)
 echo.
 echo # 创建可执行文件
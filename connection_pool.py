@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+连接池
+每条新连接都要付出TCP建连的往返，经代理时还要再等一次代理握手（ProxyRequest / ProxyResponse）。
+连接池按 (目标, 代理) 缓存已经连好的客户端，并行任务租用后归还，下一批任务直接复用：
+- prewarm 提前建好若干条连接，后台线程定期检查空闲连接并补足数量
+- 租出前检查连接是否还活着，已断开或空闲太久的连接直接丢弃并换一条新的
+- 命中率、建连耗时和代理握手耗时记录在 metrics 中
+"""
+
+import contextlib
+import select
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 每个 (目标, 代理) 最多保留的空闲连接数
+MAX_IDLE_PER_KEY = 16
+
+# 空闲超过该时间的连接不再使用（代理和中间设备可能已经悄悄断开）
+IDLE_TIMEOUT = 120.0
+
+# 后台检查空闲连接的间隔
+HEALTH_CHECK_INTERVAL = 15.0
+
+# 复用连接时从模板客户端同步的传输选项（连接本身的状态不变）
+CLIENT_OPTIONS = ('recv_buffer_size', 'progress_bus', 'bundle_threshold', 'resume_threshold',
+                  'delta_threshold', 'compression', 'dedup_threshold', 'priority')
+
+
+def pool_key(client):
+    """连接池的键：目标、代理，以及是否启用分帧（分帧状态属于连接，不能混用）"""
+    return (client.host, client.port, client.proxy_host, client.proxy_port, client.framing)
+
+
+def connection_idle(client):
+    """空闲连接是否还能使用：socket可读说明对端已关闭或有多余数据，都不能再复用"""
+    if not client.connected or client.socket is None or client.channel is None:
+        return False
+    if client.channel.pending_bytes():
+        return False
+    try:
+        readable, _, _ = select.select([client.socket], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+class PoolMetrics:
+    """连接池统计"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0      # 因断开、出错或空闲超时被丢弃的连接
+        self.connects = 0
+        self.connect_failures = 0
+        self.connect_seconds = 0.0
+        self.handshakes = 0
+        self.handshake_seconds = 0.0
+
+    @property
+    def hit_rate(self):
+        leases = self.hits + self.misses
+        return self.hits / leases if leases else 0.0
+
+    def record_connect(self, client):
+        if not client.connected:
+            self.connect_failures += 1
+            return
+        self.connects += 1
+        self.connect_seconds += client.connect_seconds or 0.0
+        if client.handshake_seconds is not None:
+            self.handshakes += 1
+            self.handshake_seconds += client.handshake_seconds
+
+    def summary(self):
+        connect_ms = self.connect_seconds / self.connects * 1000 if self.connects else 0.0
+        text = (f"📊 连接池: 租用 {self.hits + self.misses} 次, 命中率 {self.hit_rate * 100:.1f}%, "
+                f"新建连接 {self.connects} 条 (平均建连 {connect_ms:.2f} ms)")
+        if self.handshakes:
+            text += f", 平均代理握手 {self.handshake_seconds / self.handshakes * 1000:.2f} ms"
+        if self.discarded or self.connect_failures:
+            text += f", 丢弃 {self.discarded} 条, 建连失败 {self.connect_failures} 次"
+        return text
+
+
+class ConnectionPool:
+    """按 (目标, 代理) 缓存已连接的 FileTransferClient
+
+    acquire / release 或 lease 上下文管理器租用连接；模板客户端只提供连接参数和传输选项，
+    缺少空闲连接时用 template._clone(mux=False) 新建独立的TCP连接。出错的连接归还时传 reusable=False，由连接池关闭
+    """
+
+    def __init__(self, max_idle=MAX_IDLE_PER_KEY, idle_timeout=IDLE_TIMEOUT,
+                 health_check_interval=HEALTH_CHECK_INTERVAL):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.metrics = PoolMetrics()
+        self._lock = threading.Lock()
+        self._idle = {}       # 键 -> deque[(客户端, 归还时间)]
+        self._warm = {}       # 键 -> (模板客户端, 保持的空闲连接数)
+        self._closed = False
+        self._wake = threading.Event()
+        self._maintainer = None
+
+    def acquire(self, template):
+        """租用一条连接，优先复用空闲连接；无法建立连接时返回None"""
+        key = pool_key(template)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                entry = idle.pop() if idle else None
+            if entry is None:
+                break
+            client, released = entry
+            if time.monotonic() - released <= self.idle_timeout and connection_idle(client):
+                with self._lock:
+                    self.metrics.hits += 1
+                self._apply_options(client, template)
+                return client
+            self._discard(client)
+
+        with self._lock:
+            self.metrics.misses += 1
+        return self._connect(template)
+
+    def release(self, client, reusable=True):
+        """归还连接；出错或已断开的连接直接关闭"""
+        if client is None:
+            return
+        reusable = reusable and connection_idle(client)
+        key = pool_key(client)
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            keep = reusable and not self._closed and len(idle) < self.max_idle
+            if keep:
+                idle.append((client, time.monotonic()))
+        if not keep:
+            # 池已满时多余的连接正常关闭，不计入丢弃
+            self._discard(client, counted=not reusable)
+
+    @contextlib.contextmanager
+    def lease(self, template):
+        """with pool.lease(template) as client: ...，出现异常时连接不再放回池中"""
+        client = self.acquire(template)
+        if client is None:
+            raise ConnectionError(f"无法连接到 {template.host}:{template.port}")
+        try:
+            yield client
+        except BaseException:
+            self.release(client, reusable=False)
+            raise
+        self.release(client)
+
+    def prewarm(self, template, count):
+        """并行建好 count 条空闲连接，之后后台线程保持这个数量"""
+        key = pool_key(template)
+        with self._lock:
+            self._warm[key] = (template, count)
+        self._fill(key, template, count)
+        self._start_maintainer()
+
+    def health_check(self):
+        """检查所有空闲连接，丢弃已断开或空闲超时的，并为预热过的目标补足连接"""
+        now = time.monotonic()
+        with self._lock:
+            entries = [(key, entry) for key, idle in self._idle.items() for entry in idle]
+            self._idle = {key: deque() for key in self._idle}
+        alive = []
+        for key, (client, released) in entries:
+            if now - released <= self.idle_timeout and connection_idle(client):
+                alive.append((key, (client, released)))
+            else:
+                self._discard(client)
+        with self._lock:
+            for key, entry in alive:
+                self._idle.setdefault(key, deque()).append(entry)
+            warm = list(self._warm.items())
+        for key, (template, count) in warm:
+            self._fill(key, template, count)
+
+    def close(self):
+        """关闭所有空闲连接并停止后台检查；已租出的连接归还时直接关闭"""
+        with self._lock:
+            self._closed = True
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+            self._warm.clear()
+        self._wake.set()
+        if self._maintainer is not None:
+            self._maintainer.join()
+            self._maintainer = None
+        for client, _ in entries:
+            client.disconnect()
+
+    def idle_count(self, template=None):
+        with self._lock:
+            if template is None:
+                return sum(len(idle) for idle in self._idle.values())
+            return len(self._idle.get(pool_key(template), ()))
+
+    def _connect(self, template):
+        # 池中的连接用于大量数据传输，总是独立的TCP连接：多路复用通道的数据要经过中转线程，
+        # 用不上 sendfile / recv_into，多个通道还共用同一条连接的带宽
+        client = template._clone(mux=False)
+        client.connect()
+        with self._lock:
+            self.metrics.record_connect(client)
+        return client if client.connected else None
+
+    def _fill(self, key, template, count):
+        # 建连主要是等待网络往返，多条连接并行建立
+        with self._lock:
+            missing = min(count, self.max_idle) - len(self._idle.get(key, ()))
+        if missing <= 0:
+            return
+        with ThreadPoolExecutor(max_workers=missing, thread_name_prefix='pool-connect') as executor:
+            clients = list(executor.map(lambda _: self._connect(template), range(missing)))
+        for client in clients:
+            if client is not None:
+                self.release(client)
+
+    def _discard(self, client, counted=True):
+        if counted:
+            with self._lock:
+                self.metrics.discarded += 1
+        client.disconnect()
+
+    def _apply_options(self, client, template):
+        for name in CLIENT_OPTIONS:
+            setattr(client, name, getattr(template, name))
+
+    def _start_maintainer(self):
+        with self._lock:
+            if self._maintainer is not None or self._closed:
+                return
+            self._maintainer = threading.Thread(target=self._maintain, name='pool-health', daemon=True)
+        self._maintainer.start()
+
+    def _maintain(self):
+        while not self._wake.wait(self.health_check_interval):
+            self.health_check()
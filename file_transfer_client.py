@@ -11,6 +11,20 @@ import time
 import struct
 from pathlib import Path
 
+from sync_manifest import SyncManifest, content_hash, content_hashes
+from transfer_compression import CODECS, file_looks_incompressible, recv_compressed, send_compressed
+from transfer_dedup import DEDUP_BATCH, file_digest, hash_files, pack_query
+from transfer_delta import (BlockSignatures, DeltaEncoder, choose_block_size,
+                            DELTA_OP, OP_COPY, OP_END, OP_LITERAL, SIGNATURE_ENTRY)
+from transfer_engine import send_file_data, recv_file_data, RECV_BUFFER_SIZE
+from transfer_journal import TransferJournal
+from transfer_limiter import (DEFAULT_PRIORITY, PRIORITY_WEIGHTS, download_limiter, limiter_for,
+                              parse_rate, upload_limiter)
+from transfer_progress import ProgressBus, ConsoleProgressPrinter, get_console_bus, format_rate
+from transfer_tuning import TransportTuner
+from connection_pool import ConnectionPool
+from wire_protocol import MessageChannel
+
 # 代理相关常量
 VRC_PROXY_STATUS_OK = 0
 VRC_PROXY_STATUS_CONNECT_ERR = 1
@@ -44,37 +58,222 @@ class ProxyResponse:
     def is_success(self):
         return self.status == VRC_PROXY_STATUS_OK
 
+class ListEntry:
+    """文件列表中的一个条目；单层列表中的子目录带有汇总的文件数和总大小"""
+    __slots__ = ('path', 'size', 'is_dir', 'file_count')
+    
+    def __init__(self, path, size, is_dir=False, file_count=0):
+        self.path = path
+        self.size = size
+        self.is_dir = is_dir
+        self.file_count = file_count
+    
+    @property
+    def name(self):
+        return self.path.rsplit('/', 1)[-1]
+
+def scan_folder(folder_path, stats=None):
+    """扫描文件夹，返回 (文件夹名, [(本地路径, 服务器文件名, 大小)], 总大小)
+
+    提供 stats 字典时，同时记录每个文件的 {服务器文件名: (mtime_ns, inode)}
+    """
+    folder_name = os.path.basename(os.path.abspath(folder_path))
+    files_to_upload = []
+    total_size = 0
+    
+    # 用 os.scandir 逐层遍历：服务器文件名由目录前缀拼接（统一使用正斜杠），
+    # 大小取自目录项自带的stat，避免对每个文件再做 relpath / getsize
+    stack = [(folder_path, f"{folder_name}/")]
+    while stack:
+        directory, prefix = stack.pop()
+        subdirs = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append((entry.path, f"{prefix}{entry.name}/"))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    server_filename = prefix + entry.name
+                    files_to_upload.append((entry.path, server_filename, stat.st_size))
+                    total_size += stat.st_size
+                    if stats is not None:
+                        stats[server_filename] = (stat.st_mtime_ns, stat.st_ino)
+        stack.extend(reversed(subdirs))
+    
+    return folder_name, files_to_upload, total_size
+
+def parse_list_line(line, legacy=False):
+    """解析列表响应中的一行：文件/目录行返回 ListEntry，NEXT 行返回下一页游标，其他行返回 None"""
+    if legacy:
+        # 旧服务器不支持分页，返回的是完整列表
+        name, _, size = line.rpartition(b":")
+        return ListEntry(name.decode('utf-8', errors='replace'), int(size))
+    if line.startswith(b"F:"):
+        # 文件名中可能含有冒号，大小总在最后一个冒号之后
+        name, _, size = line[2:].rpartition(b":")
+        return ListEntry(name.decode('utf-8', errors='replace'), int(size))
+    if line.startswith(b"D:"):
+        name, file_count, size = line[2:].rsplit(b":", 2)
+        return ListEntry(name.decode('utf-8', errors='replace'), int(size),
+                         is_dir=True, file_count=int(file_count))
+    if line.startswith(b"NEXT:"):
+        return line[5:].decode('utf-8', errors='replace')
+    return None
+
+def _parse_stat(response):
+    """解析 FILE_STAT:<大小>[:<修改时间纳秒>]，返回 (大小, 修改时间)；文件不存在时返回None，旧服务器不返回修改时间"""
+    if not response.startswith("FILE_STAT:"):
+        return None
+    fields = response.strip().split(':')
+    return int(fields[1]), int(fields[2]) if len(fields) > 2 else None
+
+# 打包上传：小于阈值的文件合并进一条 FILE:BUNDLE 命令
+BUNDLE_THRESHOLD = 64 * 1024
+BUNDLE_MAX_FILES = 4096
+BUNDLE_MAX_BYTES = 64 * 1024 * 1024
+BUNDLE_SEND_BUFFER = 1024 * 1024
+BUNDLE_ENTRY_HEADER = struct.Struct('<HQ')
+# 打包时读取小文件用的标志（Windows上需要 O_BINARY，否则按文本模式读取）
+BUNDLE_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_BINARY', 0)
+
+# 分段下载：默认每段大小与单个区间的最大重试次数
+SEGMENT_SIZE = 64 * 1024 * 1024
+SEGMENT_RETRIES = 3
+
+# 断点续传：不小于该大小的文件上传时可续传；下载中的文件使用 .part 后缀
+RESUME_THRESHOLD = 4 * 1024 * 1024
+JOURNAL_SAVE_BYTES = 16 * 1024 * 1024
+DOWNLOAD_PART_SUFFIX = '.part'
+
+# 文件列表接收缓冲区大小与分页列表的默认每页条数
+LIST_BUFFER_SIZE = 64 * 1024
+LIST_PAGE_SIZE = 1000
+
+# 流水线发送时一批最多的命令数：回复积压在socket缓冲区里，不能无限多
+PIPELINE_DEPTH = 256
+
+# 不小于该大小的文件上传前先按内容哈希询问服务器是否已有相同内容，0表示禁用
+DEDUP_THRESHOLD = 64 * 1024
+
+# 小于该大小的文件不值得压缩（帧头和压缩的开销占比太大）
+COMPRESS_MIN_SIZE = 64 * 1024
+
+# 增量上传：不小于该大小且服务器上已有同名文件时只发送差异
+DELTA_THRESHOLD = 16 * 1024 * 1024
+
+# 主机写成 unix:/path/to/socket 时连接服务器的Unix域套接字（服务器用 --unix 启动）
+UNIX_SOCKET_PREFIX = 'unix:'
+
 class FileTransferClient:
-    def __init__(self, host='localhost', port=8080, proxy_host=None, proxy_port=None):
+    def __init__(self, host='localhost', port=8080, proxy_host=None, proxy_port=None,
+                 recv_buffer_size=RECV_BUFFER_SIZE, progress_bus=None, bundle_threshold=BUNDLE_THRESHOLD,
+                 resume_threshold=RESUME_THRESHOLD, delta_threshold=DELTA_THRESHOLD, compression=None,
+                 dedup_threshold=DEDUP_THRESHOLD, framing=True, mux_session=None, pool=None, tuner=None,
+                 priority=DEFAULT_PRIORITY):
         self.host = host
         self.port = port
         self.proxy_host = proxy_host
         self.proxy_port = proxy_port
         self.socket = None
+        # 控制消息收发（分帧或旧文本协议），连接建立后创建
+        self.channel = None
         self.connected = False
         self.using_proxy = proxy_host is not None and proxy_port is not None
+        self.recv_buffer_size = recv_buffer_size
+        self._recv_buffer = None
+        # 进度事件总线，未指定时使用共享的命令行总线
+        self.progress_bus = progress_bus or get_console_bus()
+        # 小于该大小的文件在上传文件夹时自动打包，0表示禁用
+        self.bundle_threshold = bundle_threshold
+        # 不小于该大小的单个文件上传时启用断点续传
+        self.resume_threshold = resume_threshold
+        # 不小于该大小的单个文件上传时先尝试增量上传，0表示禁用
+        self.delta_threshold = delta_threshold
+        # 传输压缩算法（'zlib' 或 'lzma'），None表示不压缩；服务器不支持时自动不压缩
+        self.compression = compression
+        self._server_codecs = None
+        # 不小于该大小的文件上传前先做去重预检，0表示禁用
+        self.dedup_threshold = dedup_threshold
+        # 服务器支持时控制消息使用分帧协议，否则退回文本协议
+        self.framing = framing
+        # 多路复用会话（transfer_mux.MuxSession），设置后在会话上打开通道代替新建TCP连接
+        self.mux_session = mux_session
+        # 连接池（connection_pool.ConnectionPool），设置后并行任务从池中租用连接，用完归还
+        self.pool = pool
+        # 最近一次建连的TCP连接耗时和代理握手耗时（秒），未经代理时握手耗时为None
+        self.connect_seconds = None
+        self.handshake_seconds = None
+        # 传输参数自适应（transfer_tuning.TransportTuner）：分片大小、内核缓冲区、TCP_NODELAY / TCP_CORK
+        self.tuner = tuner or TransportTuner()
+        # 传输优先级（transfer_limiter.PRIORITY_WEIGHTS），限速时同方向的传输按优先级权重分享带宽
+        self.priority = priority
+    
+    def _lease(self, direction):
+        """为一次传输在进程共享的限速器上租用令牌（'send' 上传，'recv' 下载）"""
+        return limiter_for(direction).lease(self.priority)
+    
+    @property
+    def unix_path(self):
+        """主机写成 unix:<路径> 时通过Unix域套接字直接连接本机服务器，返回路径，否则返回None"""
+        if self.host.startswith(UNIX_SOCKET_PREFIX):
+            return self.host[len(UNIX_SOCKET_PREFIX):]
+        return None
+    
+    @property
+    def recv_buffer(self):
+        """下载使用的接收缓冲区，首次使用时分配，之后在所有下载间复用"""
+        if self._recv_buffer is None or len(self._recv_buffer) != self.recv_buffer_size:
+            self._recv_buffer = bytearray(self.recv_buffer_size)
+        return self._recv_buffer
         
     def connect(self):
         """连接到服务器（直接连接或通过代理）"""
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.settimeout(30)  # 设置30秒超时，避免无限等待
-            
-            if self.using_proxy:
-                return self._connect_via_proxy()
+            self._server_codecs = None
+            self.connect_seconds = None
+            self.handshake_seconds = None
+            if self.mux_session is not None:
+                connected = self._connect_channel()
             else:
-                return self._connect_direct()
+                family = socket.AF_UNIX if self.unix_path else socket.AF_INET
+                self.socket = socket.socket(family, socket.SOCK_STREAM)
+                self.socket.settimeout(30)  # 设置30秒超时，避免无限等待
+                
+                if self.using_proxy:
+                    connected = self._connect_via_proxy()
+                else:
+                    connected = self._connect_direct()
+            
+            self.channel = MessageChannel(self.socket)
+            if connected:
+                self.tuner.configure(self.socket)
+            if connected and self.framing:
+                self._query_capabilities()
+            return connected
                 
         except Exception as e:
             print(f"❌ 连接失败: {e}")
             return False
     
+    def _connect_channel(self):
+        """在多路复用会话上打开一个通道，之后的用法与独立连接相同"""
+        try:
+            self.socket = self.mux_session.open_channel()
+            self.socket.settimeout(30)
+            self.connected = True
+            return True
+        except Exception as e:
+            print(f"❌ 打开复用通道失败: {e}")
+            return False
+    
     def _connect_direct(self):
         """直接连接到服务器"""
         try:
-            self.socket.connect((self.host, self.port))
+            started = time.perf_counter()
+            self.socket.connect(self.unix_path or (self.host, self.port))
+            self.connect_seconds = time.perf_counter() - started
             self.connected = True
-            print(f"✅ 成功直接连接到服务器 {self.host}:{self.port}")
+            print(f"✅ 成功直接连接到服务器 {self.unix_path or f'{self.host}:{self.port}'}")
             return True
         except Exception as e:
             print(f"❌ 直接连接失败: {e}")
@@ -85,7 +284,9 @@ class FileTransferClient:
         try:
             # 1. 连接到代理服务器
             print(f"🔄 正在连接到代理服务器 {self.proxy_host}:{self.proxy_port}")
+            started = time.perf_counter()
             self.socket.connect((self.proxy_host, self.proxy_port))
+            self.connect_seconds = time.perf_counter() - started
             
             # 2. 发送代理请求
             proxy_request = ProxyRequest(self.host, self.port)
@@ -96,6 +297,7 @@ class FileTransferClient:
             
             # 3. 接收代理响应
             response_data = self.socket.recv(102)  # ProxyResponse大小固定为102字节
+            self.handshake_seconds = time.perf_counter() - started - self.connect_seconds
             if len(response_data) != 102:
                 print(f"❌ 代理响应长度错误: 期望102字节，收到{len(response_data)}字节")
                 return False
@@ -134,16 +336,16 @@ class FileTransferClient:
             return False
         
         try:
-            self.socket.send(message.encode('utf-8'))
-            response = self.socket.recv(4096).decode('utf-8')
+            self.channel.send_message(message)
+            response = self.channel.recv_message(4096)
             print(f"📨 服务器回复:\n{response}")
             return True
         except Exception as e:
             print(f"❌ 发送消息失败: {e}")
             return False
     
-    def upload_file(self, local_file_path):
-        """上传文件到服务器"""
+    def upload_file(self, local_file_path, server_filename=None):
+        """上传文件到服务器，server_filename 为空时使用本地文件名"""
         if not self.connected:
             print("❌ 未连接到服务器")
             return False
@@ -159,51 +361,280 @@ class FileTransferClient:
         try:
             # 获取文件信息
             file_size = os.path.getsize(local_file_path)
-            filename = os.path.basename(local_file_path)
+            filename = server_filename or os.path.basename(local_file_path)
             
             print(f"📤 开始上传文件: {filename} ({file_size} bytes)")
             
-            # 发送上传命令
-            upload_command = f"FILE:UPLOAD:{filename}:{file_size}"
-            self.socket.send(upload_command.encode('utf-8'))
+            # 服务器上已有相同内容的文件（任意文件名）时由服务器本地复制，不发送数据
+            if self.dedup_threshold and file_size >= self.dedup_threshold:
+                hits = self._query_dedup([(file_digest(local_file_path), file_size, filename)])
+                if hits and hits[0]:
+                    print(f"♻️ 服务器已有相同内容，已在服务器端复制: {filename} (发送 0 bytes 文件数据)")
+                    return True
+            
+            # 服务器上已有同名文件时只发送差异部分
+            if self.delta_threshold and file_size >= self.delta_threshold:
+                result = self._upload_delta(local_file_path, filename, file_size)
+                if result is not None:
+                    return result
+            
+            # 大文件走断点续传：先问服务器已有多少字节，只发送缺失的部分
+            journal = None
+            offset = 0
+            if file_size >= self.resume_threshold:
+                journal, offset = self._prepare_resumable_upload(local_file_path, filename, file_size)
+            
+            # 发送上传命令（启用压缩且文件值得压缩时使用压缩帧）
+            codec = self._upload_codec(local_file_path, file_size, offset)
+            if codec is not None:
+                upload_command = f"FILE:ZUPLOAD:{filename}:{file_size}:{codec}"
+                if journal is not None:
+                    upload_command += f":{offset}"
+            elif journal is not None:
+                upload_command = f"FILE:RESUME:{filename}:{file_size}:{offset}"
+            else:
+                upload_command = f"FILE:UPLOAD:{filename}:{file_size}"
+            self.channel.send_message(upload_command)
             
             # 等待服务器确认
-            response = self.socket.recv(1024).decode('utf-8')
+            response = self.channel.recv_message()
             if "READY" not in response:
                 print(f"❌ 服务器不准备接收文件: {response}")
                 return False
             
-            # 发送文件数据
-            with open(local_file_path, 'rb') as file:
-                bytes_sent = 0
-                buffer_size = 8192
-                
-                while bytes_sent < file_size:
-                    data = file.read(buffer_size)
-                    if not data:
-                        break
-                    
-                    self.socket.send(data)
-                    bytes_sent += len(data)
-                    
-                    # 显示进度
-                    progress = (bytes_sent / file_size) * 100
-                    print(f"📊 上传进度: {progress:.1f}% ({bytes_sent}/{file_size} bytes)", end='\r')
+            if offset:
+                print(f"🔁 断点续传: 服务器已有 {offset} bytes，只发送剩余 {file_size - offset} bytes")
+            
+            # 发送文件数据（零拷贝sendfile，必要时回退到大缓冲区循环；压缩时在工作线程上压缩）
+            stats = None
+            with self.progress_bus.start(f"上传 {filename}", file_size) as progress, \
+                    open(local_file_path, 'rb') as file:
+                progress.update(offset)
+                if journal is not None:
+                    on_progress = self._journal_progress(journal, progress, offset)
+                else:
+                    on_progress = progress.update
+                with self._lease('send') as lease:
+                    if codec is not None:
+                        stats = send_compressed(self.socket, file, file_size - offset, codec, offset=offset,
+                                                on_progress=on_progress, lease=lease)
+                    else:
+                        send_file_data(self.socket, file, file_size - offset, offset=offset,
+                                       on_progress=on_progress, tuner=self.tuner, lease=lease)
             
             print(f"\n✅ 文件上传成功: {filename}")
+            if stats is not None:
+                print(stats.summary())
+            else:
+                print(self.tuner.summary())
             
             # 接收最终确认
-            final_response = self.socket.recv(1024).decode('utf-8')
+            final_response = self.channel.recv_message()
             print(f"📨 服务器确认: {final_response.strip()}")
             
+            if journal is not None and "SUCCESS" in final_response:
+                journal.discard()
+            
             return True
             
         except Exception as e:
             print(f"❌ 上传文件失败: {e}")
             return False
     
-    def upload_folder(self, folder_path):
-        """上传整个文件夹到服务器"""
+    def _upload_delta(self, local_file_path, server_filename, file_size):
+        """增量上传：按服务器旧文件的分块签名只发送块引用和变化的数据
+
+        服务器上没有旧文件、不支持增量上传或增量结果校验失败时返回None，由调用方改用普通上传
+        """
+        block_size = choose_block_size(file_size)
+        signatures = self._fetch_signatures(server_filename, block_size)
+        if signatures is None:
+            return None
+        
+        print(f"🔍 服务器已有旧版本 ({signatures.file_size} bytes, {len(signatures)} 个 {block_size} 字节的块)，计算差异...")
+        self.channel.send_message(f"FILE:DELTA:{server_filename}:{file_size}:{block_size}")
+        response = self.channel.recv_message()
+        if "READY" not in response:
+            print(f"⚠️ 服务器不准备接收增量数据，改用完整上传: {response}")
+            return None
+        
+        buffer = bytearray()
+        sent = 0
+        with self.progress_bus.start(f"增量上传 {server_filename}", file_size) as progress, \
+                open(local_file_path, 'rb') as file, self._lease('send') as lease:
+            encoder = DeltaEncoder(file, signatures)
+            for op in encoder:
+                if op[0] == 'copy':
+                    buffer += DELTA_OP.pack(OP_COPY, op[1], op[2])
+                else:
+                    buffer += DELTA_OP.pack(OP_LITERAL, len(op[1]), 0)
+                    buffer += op[1]
+                if len(buffer) >= BUNDLE_SEND_BUFFER:
+                    lease.sendall(self.socket, buffer)
+                    sent += len(buffer)
+                    buffer.clear()
+                progress.update(encoder.literal_bytes + encoder.copied_bytes)
+            buffer += DELTA_OP.pack(OP_END, 0, 0)
+            buffer += encoder.digest
+            lease.sendall(self.socket, buffer)
+            sent += len(buffer)
+        
+        final_response = self.channel.recv_message()
+        print(f"\n📨 服务器确认: {final_response.strip()}")
+        if "SUCCESS" not in final_response:
+            # 服务器已读完全部增量数据再校验，连接仍然同步，可以直接重新完整上传
+            print("⚠️ 增量上传校验失败，改用完整上传")
+            return None
+        
+        print(f"✅ 增量上传成功: {server_filename} (发送 {sent} bytes，为完整文件的 "
+              f"{sent / max(file_size, 1) * 100:.2f}%；复用 {encoder.copied_bytes} bytes)")
+        return True
+    
+    def _fetch_signatures(self, server_filename, block_size):
+        """获取服务器上旧文件的分块签名，文件不存在或服务器不支持时返回None"""
+        self.channel.send_message(f"FILE:SIGNATURES:{server_filename}:{block_size}")
+        
+        data = bytearray()
+        while b"\n" not in data:
+            chunk = self.channel.recv_chunk()
+            if not chunk:
+                raise ConnectionError("连接已关闭")
+            data += chunk
+        header, _, payload = bytes(data).partition(b"\n")
+        header = header.decode('utf-8', errors='replace')
+        if not header.startswith("SIGNATURES:"):
+            return None
+        
+        _, basis_size, count = header.split(':')
+        expected = int(count) * SIGNATURE_ENTRY.size
+        payload = bytearray(payload)
+        while len(payload) < expected:
+            chunk = self.channel.recv_chunk(min(expected - len(payload), 1024 * 1024))
+            if not chunk:
+                raise ConnectionError("连接已关闭")
+            payload += chunk
+        return BlockSignatures.parse(block_size, int(basis_size), payload)
+    
+    def _query_partial(self, server_filename):
+        """查询服务器上未完成上传已保存的字节数，服务器不支持续传时返回None"""
+        self.channel.send_message(f"FILE:PARTIAL:{server_filename}")
+        response = self.channel.recv_message()
+        if not response.startswith("PARTIAL:"):
+            return None
+        return int(response.split(':')[1].strip())
+    
+    def _prepare_resumable_upload(self, local_file_path, server_filename, file_size):
+        """准备续传上传，返回 (续传日志, 续传偏移)；服务器不支持续传时返回 (None, 0)
+
+        只有本地文件的大小和修改时间与日志记录一致时才信任已传输的部分，
+        偏移取服务器实际保存的字节数与日志记录两者中的较小值
+        """
+        server_bytes = self._query_partial(server_filename)
+        if server_bytes is None:
+            return None, 0
+        
+        mtime_ns = os.stat(local_file_path).st_mtime_ns
+        journal = TransferJournal.open('upload', f"{self.host}:{self.port}", server_filename, local_file_path)
+        if journal.matches(file_size, mtime_ns):
+            offset = min(server_bytes, journal.contiguous_bytes())
+        else:
+            journal.reset(file_size, mtime_ns)
+            offset = 0
+        journal.save()
+        return journal, offset
+    
+    def _journal_progress(self, journal, progress, base):
+        """生成进度回调：更新进度，并每隔 JOURNAL_SAVE_BYTES 把 [0, 当前位置) 写入续传日志"""
+        saved = [base]
+        
+        def on_progress(done):
+            position = base + done
+            progress.update(position)
+            if position - saved[0] >= JOURNAL_SAVE_BYTES:
+                journal.add_range(0, position)
+                journal.save()
+                saved[0] = position
+        
+        return on_progress
+    
+    def _negotiated_codec(self):
+        """返回本次连接可用的压缩算法：客户端未启用压缩或服务器不支持该算法时返回None
+
+        服务器支持的算法在每个连接上只查询一次；不认识 FILE:CAPS 的旧服务器视为不支持压缩
+        """
+        if self.compression not in CODECS:
+            return None
+        if self._server_codecs is None:
+            self._query_capabilities()
+            if self.compression not in self._server_codecs:
+                print(f"⚠️ 服务器不支持 {self.compression} 压缩，将不压缩传输")
+        return self.compression if self.compression in self._server_codecs else None
+    
+    def _query_capabilities(self):
+        """查询服务器能力（FILE:CAPS）：支持的压缩算法，以及是否支持分帧协议
+
+        不认识 FILE:CAPS 的旧服务器视为都不支持；服务器支持分帧且客户端启用时，之后的控制消息都按帧收发
+        """
+        started = time.perf_counter()
+        self.channel.send_message("FILE:CAPS")
+        response = self.channel.recv_message().strip()
+        self.tuner.note_round_trip(time.perf_counter() - started)
+        codecs = set()
+        framed = False
+        if response.startswith("CAPS:"):
+            for field in response[len("CAPS:"):].split(';'):
+                key, _, value = field.partition('=')
+                if key == 'compress':
+                    codecs.update(codec for codec in value.split(',') if codec)
+                elif key == 'frame':
+                    framed = value == '1'
+        self._server_codecs = codecs
+        self.channel.framed = framed and self.framing
+    
+    def _upload_codec(self, local_file_path, file_size, offset=0):
+        """决定上传某个文件时使用的压缩算法；小文件和抽样判断为已压缩格式的文件不压缩"""
+        if file_size - offset < COMPRESS_MIN_SIZE:
+            return None
+        codec = self._negotiated_codec()
+        if codec is None:
+            return None
+        if file_looks_incompressible(local_file_path, offset):
+            return None
+        return codec
+    
+    def _clone(self, mux=True):
+        """创建一个连接参数相同的新客户端（用于并行连接）
+
+        mux=False 时不使用多路复用会话，新客户端连接时建立独立的TCP连接
+        """
+        return FileTransferClient(self.host, self.port, self.proxy_host, self.proxy_port,
+                                  recv_buffer_size=self.recv_buffer_size, progress_bus=self.progress_bus,
+                                  bundle_threshold=self.bundle_threshold, resume_threshold=self.resume_threshold,
+                                  delta_threshold=self.delta_threshold, compression=self.compression,
+                                  dedup_threshold=self.dedup_threshold, framing=self.framing,
+                                  mux_session=self.mux_session if mux else None, pool=self.pool,
+                                  tuner=self.tuner.copy(),
+                                  priority=self.priority)
+    
+    def _open_worker(self):
+        """为并行任务准备一条连接：设置了连接池时从池中租用，否则新建；无法连接时返回None"""
+        if self.pool is not None:
+            return self.pool.acquire(self)
+        client = self._clone()
+        return client if client.connect() else None
+    
+    def _close_worker(self, client, reusable=True):
+        """并行任务结束：出错的连接（协议状态未知）关闭，其余归还连接池"""
+        if self.pool is not None:
+            self.pool.release(client, reusable)
+        else:
+            client.disconnect()
+    
+    def upload_folder(self, folder_path, connections=1):
+        """上传整个文件夹到服务器
+
+        connections > 1 时打开多条连接并行上传，大文件优先调度
+        """
         if not self.connected:
             print("❌ 未连接到服务器")
             return False
@@ -213,27 +644,10 @@ class FileTransferClient:
             return False
         
         try:
-            # 获取文件夹名称
+            # 获取文件夹名称并收集所有文件
             folder_name = os.path.basename(os.path.abspath(folder_path))
-            
-            # 收集所有文件
-            files_to_upload = []
-            total_size = 0
-            
             print(f"📁 正在扫描文件夹: {folder_name}")
-            
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    # 计算相对路径以保持目录结构
-                    relative_path = os.path.relpath(file_path, folder_path)
-                    # 使用正斜杠作为路径分隔符（跨平台兼容）
-                    relative_path = relative_path.replace('\\', '/')
-                    server_filename = f"{folder_name}/{relative_path}"
-                    
-                    file_size = os.path.getsize(file_path)
-                    files_to_upload.append((file_path, server_filename, file_size))
-                    total_size += file_size
+            folder_name, files_to_upload, total_size = scan_folder(folder_path)
             
             if not files_to_upload:
                 print(f"❌ 文件夹为空: {folder_path}")
@@ -251,65 +665,413 @@ class FileTransferClient:
                 print("\n❌ 用户取消上传")
                 return False
             
-            # 上传所有文件
-            successful_uploads = 0
-            failed_uploads = 0
+            successful_uploads, failed_files = self._upload_files(files_to_upload, connections)
+            self._print_folder_summary(successful_uploads, failed_files)
+            return not failed_files
             
+        except Exception as e:
+            print(f"❌ 上传文件夹失败: {e}")
+            return False
+    
+    def sync_folder(self, folder_path, connections=1):
+        """增量同步文件夹：只上传相对上次同步新增或内容变化的文件
+
+        同步状态保存在本地清单数据库中（见 sync_manifest.py），
+        stat结果（大小、修改时间、inode）与清单一致的文件不读取内容
+        """
+        if not self.connected:
+            print("❌ 未连接到服务器")
+            return False
+        
+        if not os.path.isdir(folder_path):
+            print(f"❌ 文件夹不存在: {folder_path}")
+            return False
+        
+        try:
+            print(f"📁 正在扫描文件夹: {os.path.basename(os.path.abspath(folder_path))}")
+            scan_start = time.time()
+            stats = {}
+            folder_name, files, _ = scan_folder(folder_path, stats)
+            
+            with SyncManifest.open(f"{self.host}:{self.port}", folder_path) as manifest:
+                known = manifest.load()
+                changed = []
+                touched = []
+                hashes = {}
+                for local_path, server_filename, file_size in files:
+                    mtime_ns, inode = stats[server_filename]
+                    entry = known.pop(server_filename, None)
+                    if entry is not None and entry.size == file_size:
+                        if entry.mtime_ns == mtime_ns and entry.inode == inode:
+                            continue
+                        # stat变了但大小相同：比较内容哈希，内容未变时只更新清单
+                        file_hash = content_hash(local_path)
+                        if file_hash == entry.hash:
+                            touched.append((server_filename, file_size, mtime_ns, inode, file_hash))
+                            continue
+                        hashes[server_filename] = file_hash
+                    changed.append((local_path, server_filename, file_size))
+                
+                # 清单中剩下的是本地已删除的文件（服务器上的副本保持不变）
+                if known:
+                    manifest.remove(known)
+                if touched:
+                    manifest.record(touched)
+                
+                changed_size = sum(item[2] for item in changed)
+                print(f"📊 扫描 {len(files)} 个文件用时 {time.time() - scan_start:.2f}s: "
+                      f"{len(changed)} 个新增或修改 ({changed_size} bytes)，"
+                      f"{len(files) - len(changed)} 个未变化，{len(known)} 个已删除")
+                
+                if not changed:
+                    print(f"✅ 文件夹 '{folder_name}' 已是最新")
+                    return True
+                
+                try:
+                    response = input(f"确认同步 {len(changed)} 个文件吗? (y/N): ").strip().lower()
+                    if response not in ['y', 'yes', '是']:
+                        print("❌ 用户取消同步")
+                        return False
+                except (EOFError, KeyboardInterrupt):
+                    print("\n❌ 用户取消同步")
+                    return False
+                
+                # 新增和大小变化的文件在上传前并行算好哈希，上传后不再重新读取；
+                # 哈希与扫描得到的stat都是上传前的状态，上传期间被修改的文件下次同步时仍会被发现
+                unhashed = [item for item in changed if item[1] not in hashes]
+                for (_, server_filename, _), file_hash in zip(
+                        unhashed, content_hashes([item[0] for item in unhashed])):
+                    hashes[server_filename] = file_hash
+                
+                successful_uploads, failed_files = self._upload_files(changed, connections)
+                
+                # 只把上传成功的文件写入清单，失败的文件下次同步时会重试
+                failed = set(failed_files)
+                rows = []
+                for _, server_filename, file_size in changed:
+                    if server_filename in failed:
+                        continue
+                    mtime_ns, inode = stats[server_filename]
+                    rows.append((server_filename, file_size, mtime_ns, inode, hashes[server_filename]))
+                manifest.record(rows)
+            
+            self._print_folder_summary(successful_uploads, failed_files, "文件夹同步完成")
+            return not failed_files
+            
+        except Exception as e:
+            print(f"❌ 同步文件夹失败: {e}")
+            return False
+    
+    def _upload_files(self, files_to_upload, connections=1):
+        """上传文件列表（小文件打包，其余并行或逐个上传），返回 (成功数, 失败文件名列表)"""
+        successful_uploads = 0
+        failed_files = []
+        
+        # 先批量询问服务器哪些文件的内容已经存在，这些文件由服务器本地复制
+        if self.dedup_threshold:
+            files_to_upload, deduped = self._dedup_files(files_to_upload)
+            successful_uploads += deduped
+        
+        # 小文件打包成流式归档上传，省掉逐个文件的握手往返
+        if self.bundle_threshold:
+            files_to_upload, bundled_ok, bundled_failed = self._upload_small_files_bundled(files_to_upload)
+            successful_uploads += bundled_ok
+            failed_files.extend(bundled_failed)
+        
+        if connections > 1 and files_to_upload:
+            parallel_ok, parallel_failed = self._upload_files_parallel(
+                files_to_upload, sum(item[2] for item in files_to_upload), connections)
+            successful_uploads += parallel_ok
+            failed_files.extend(parallel_failed)
+        else:
+            # 逐个上传剩余文件
             for i, (local_path, server_filename, file_size) in enumerate(files_to_upload, 1):
                 print(f"\n📤 上传文件 {i}/{len(files_to_upload)}: {server_filename}")
                 
                 if self._upload_single_file(local_path, server_filename, file_size):
                     successful_uploads += 1
                 else:
-                    failed_uploads += 1
+                    failed_files.append(server_filename)
                     print(f"❌ 文件上传失败: {server_filename}")
+        
+        return successful_uploads, failed_files
+    
+    def _dedup_files(self, files_to_upload):
+        """对不小于 dedup_threshold 的文件做去重预检，返回 (仍需上传的文件, 服务器端复制的文件数)"""
+        candidates = [item for item in files_to_upload if item[2] >= self.dedup_threshold]
+        if not candidates:
+            return files_to_upload, 0
+        
+        start = time.perf_counter()
+        digests = hash_files([item[0] for item in candidates])
+        entries = [(digest, file_size, server_filename)
+                   for (local_path, server_filename, file_size), digest in zip(candidates, digests)
+                   if digest is not None]
+        hits = self._query_dedup(entries)
+        if hits is None:
+            return files_to_upload, 0
+        
+        deduped = {entry[2] for entry, hit in zip(entries, hits) if hit}
+        saved = sum(entry[1] for entry, hit in zip(entries, hits) if hit)
+        print(f"♻️ 去重预检: {len(entries)} 个文件哈希用时 {time.perf_counter() - start:.2f}s，"
+              f"{len(deduped)} 个已在服务器端复制，省去 {saved} bytes 传输")
+        if not deduped:
+            return files_to_upload, 0
+        return [item for item in files_to_upload if item[1] not in deduped], len(deduped)
+    
+    def _query_dedup(self, entries):
+        """发送去重查询，entries 为 [(SHA-256, 大小, 服务器文件名)]
+
+        服务器找到相同内容时直接复制到目标文件名。返回与entries对应的 [是否命中]，
+        每 DEDUP_BATCH 个条目一次往返；服务器不支持去重时返回None
+        """
+        hits = []
+        for start in range(0, len(entries), DEDUP_BATCH):
+            batch = entries[start:start + DEDUP_BATCH]
+            self.channel.send_message(f"FILE:DEDUP:{len(batch)}")
+            response = self.channel.recv_message()
+            if "READY" not in response:
+                return None
+            self.socket.sendall(pack_query(batch))
             
-            # 显示上传结果
-            print(f"\n📊 文件夹上传完成:")
-            print(f"  ✅ 成功: {successful_uploads} 个文件")
-            if failed_uploads > 0:
-                print(f"  ❌ 失败: {failed_uploads} 个文件")
-            
-            return failed_uploads == 0
+            # 回复: DEDUP_RESULT:<条目数>:<命中数>，下一行每个条目一个字符（H命中 / M未命中）
+            reply = self._recv_until(b"\nEND_DEDUP\n").decode('utf-8', errors='replace')
+            header, flags = reply.split('\n')[:2]
+            if not header.startswith("DEDUP_RESULT:") or len(flags) != len(batch):
+                raise IOError(f"去重查询回复格式错误: {header}")
+            hits.extend(flag == 'H' for flag in flags)
+        return hits
+    
+    def _print_folder_summary(self, successful_uploads, failed_files, title="文件夹上传完成"):
+        """显示文件夹上传结果"""
+        print(f"\n📊 {title}:")
+        print(f"  ✅ 成功: {successful_uploads} 个文件")
+        if failed_files:
+            print(f"  ❌ 失败: {len(failed_files)} 个文件")
+            for server_filename in failed_files:
+                print(f"     - {server_filename}")
+    
+    def _upload_small_files_bundled(self, files_to_upload):
+        """把小于 bundle_threshold 的文件分批打包上传
+
+        返回 (剩余需要逐个上传的文件, 成功数, 失败文件名列表)；
+        服务器不支持打包命令时所有文件原样返回，由调用方逐个上传
+        """
+        small = [item for item in files_to_upload if item[2] < self.bundle_threshold]
+        if len(small) < 2:
+            return files_to_upload, 0, []
+        
+        print(f"📦 打包上传 {len(small)} 个小文件 (< {self.bundle_threshold} bytes)")
+        successful_uploads = 0
+        failed_files = []
+        uploaded = set()
+        
+        with self.progress_bus.start(f"打包上传 {len(small)} 个小文件", sum(item[2] for item in small)) as progress:
+            batch = []
+            batch_bytes = 0
+            for item in small + [None]:
+                if item is not None:
+                    batch.append(item)
+                    batch_bytes += item[2]
+                    if len(batch) < BUNDLE_MAX_FILES and batch_bytes < BUNDLE_MAX_BYTES:
+                        continue
+                if not batch:
+                    break
+                
+                results = self._upload_bundle(batch, progress)
+                if results is None:
+                    if not uploaded:
+                        print("⚠️ 服务器不支持打包上传，改为逐个上传")
+                        return files_to_upload, 0, []
+                    raise IOError("打包上传中途失败")
+                
+                for local_path, server_filename, file_size in batch:
+                    uploaded.add(server_filename)
+                    if results.get(server_filename):
+                        successful_uploads += 1
+                    else:
+                        failed_files.append(server_filename)
+                batch = []
+                batch_bytes = 0
+        
+        remaining = [item for item in files_to_upload if item[1] not in uploaded]
+        return remaining, successful_uploads, failed_files
+    
+    def _upload_bundle(self, entries, progress=None):
+        """用一条 FILE:BUNDLE 命令上传一批文件
+
+        每个文件前是一个小端序头部 (路径长度u16, 数据长度u64) 和UTF-8路径，
+        以路径长度为0的头部结束。返回 {服务器文件名: 是否成功}，服务器拒绝时返回None
+        """
+        total_size = sum(item[2] for item in entries)
+        self.channel.send_message(f"FILE:BUNDLE:{len(entries)}:{total_size}")
+        
+        response = self.channel.recv_message()
+        if "READY" not in response:
+            return None
+        
+        results = {}
+        buffer = bytearray()
+        with self._lease('send') as lease:
+            for local_path, server_filename, file_size in entries:
+                # 小文件一次 os.read 读完，不为每个文件创建缓冲文件对象
+                try:
+                    fd = os.open(local_path, BUNDLE_OPEN_FLAGS)
+                    try:
+                        data = os.read(fd, file_size)
+                    finally:
+                        os.close(fd)
+                except OSError as e:
+                    print(f"  ❌ 读取失败: {server_filename} ({e})")
+                    results[server_filename] = False
+                    continue
+                
+                name = server_filename.encode('utf-8')
+                buffer += BUNDLE_ENTRY_HEADER.pack(len(name), len(data))
+                buffer += name
+                buffer += data
+                if len(buffer) >= BUNDLE_SEND_BUFFER:
+                    lease.sendall(self.socket, buffer)
+                    if progress:
+                        progress.add(len(buffer))
+                    buffer.clear()
             
-        except Exception as e:
-            print(f"❌ 上传文件夹失败: {e}")
-            return False
+            buffer += BUNDLE_ENTRY_HEADER.pack(0, 0)
+            lease.sendall(self.socket, buffer)
+            if progress:
+                progress.add(len(buffer))
+        
+        # 接收逐个文件的结果表: BUNDLE_RESULT:<成功>:<失败> / OK:<路径> / ERR:<路径> / END_BUNDLE
+        table = self._recv_until(b"END_BUNDLE\n").decode('utf-8', errors='replace')
+        for line in table.split('\n'):
+            status, _, name = line.partition(':')
+            if status in ('OK', 'ERR') and name:
+                results[name] = status == 'OK'
+        return results
+    
+    def _recv_until(self, marker):
+        """持续接收直到出现marker，返回包含marker在内的全部数据"""
+        data = bytearray()
+        while not data.endswith(marker):
+            chunk = self.channel.recv_chunk()
+            if not chunk:
+                raise ConnectionError("连接已关闭")
+            data += chunk
+        return bytes(data)
+    
+    def _upload_files_parallel(self, files_to_upload, total_size, connections):
+        """用多条连接并行上传文件列表，返回 (成功数, 失败文件名列表)"""
+        # 大文件优先：避免最后剩下一个大文件拖慢整体完成时间（按大小升序排列，从末尾取）
+        pending = sorted(files_to_upload, key=lambda item: item[2])
+        pending_lock = threading.Lock()
+        progress_lock = threading.Lock()
+        failed_files = []
+        worker_stats = []
+        
+        connections = min(connections, len(pending))
+        print(f"🔗 使用 {connections} 个并行连接上传")
+        
+        def next_file():
+            with pending_lock:
+                return pending.pop() if pending else None
+        
+        def worker(index, progress):
+            stats = {'index': index, 'files': 0, 'bytes': 0, 'seconds': 0.0, 'connected': False}
+            worker_stats.append(stats)
+            client = self._open_worker()
+            if client is None:
+                return
+            stats['connected'] = True
+            reusable = True
+            start = time.perf_counter()
+            try:
+                while True:
+                    item = next_file()
+                    if item is None:
+                        break
+                    local_path, server_filename, file_size = item
+                    last = [0]
+                    
+                    def on_progress(sent, last=last):
+                        with progress_lock:
+                            progress.add(sent - last[0])
+                        last[0] = sent
+                    
+                    if client._upload_single_file(local_path, server_filename, file_size, on_progress=on_progress):
+                        stats['files'] += 1
+                        stats['bytes'] += file_size
+                    else:
+                        reusable = False
+                        with pending_lock:
+                            failed_files.append(server_filename)
+                        # 连接已断开时不再从这条连接领取文件
+                        if not client.connected:
+                            break
+            finally:
+                stats['seconds'] = time.perf_counter() - start
+                self._close_worker(client, reusable)
+        
+        start = time.perf_counter()
+        with self.progress_bus.start(f"并行上传 ({connections} 连接)", total_size) as progress:
+            threads = [threading.Thread(target=worker, args=(i + 1, progress), daemon=True)
+                       for i in range(connections)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        
+        # 所有连接都失败时剩余文件计为失败
+        failed_files.extend(item[1] for item in pending)
+        successful_uploads = len(files_to_upload) - len(failed_files)
+        uploaded_bytes = sum(stats['bytes'] for stats in worker_stats)
+        
+        # 显示各连接统计
+        print(f"\n🔗 并行上传用时 {elapsed:.2f}s, 总吞吐 {format_rate(uploaded_bytes / elapsed if elapsed else 0)}:")
+        for stats in sorted(worker_stats, key=lambda item: item['index']):
+            if not stats['connected']:
+                print(f"  🔗 连接{stats['index']}: 连接失败")
+                continue
+            rate = stats['bytes'] / stats['seconds'] if stats['seconds'] else 0
+            print(f"  🔗 连接{stats['index']}: {stats['files']} 个文件, {stats['bytes']} bytes, {format_rate(rate)}")
+        
+        return successful_uploads, failed_files
     
-    def _upload_single_file(self, local_file_path, server_filename, file_size):
-        """上传单个文件（内部使用）"""
+    def _upload_single_file(self, local_file_path, server_filename, file_size, on_progress=None):
+        """上传单个文件（内部使用）
+
+        on_progress 为空时在进度总线上登记一个独立的传输；
+        并行上传时由调用方传入汇总回调，此时不逐个打印完成信息
+        """
         try:
             # 发送上传命令
-            upload_command = f"FILE:UPLOAD:{server_filename}:{file_size}"
-            self.socket.send(upload_command.encode('utf-8'))
+            codec = self._upload_codec(local_file_path, file_size)
+            if codec is not None:
+                upload_command = f"FILE:ZUPLOAD:{server_filename}:{file_size}:{codec}"
+            else:
+                upload_command = f"FILE:UPLOAD:{server_filename}:{file_size}"
+            self.channel.send_message(upload_command)
             
             # 等待服务器确认
-            response = self.socket.recv(1024).decode('utf-8')
+            response = self.channel.recv_message()
             if "READY" not in response:
                 print(f"❌ 服务器不准备接收文件: {response}")
                 return False
             
-            # 发送文件数据
-            with open(local_file_path, 'rb') as file:
-                bytes_sent = 0
-                buffer_size = 8192
+            # 发送文件数据（零拷贝sendfile，必要时回退到大缓冲区循环）
+            if on_progress is None:
+                with self.progress_bus.start(server_filename, file_size) as progress, \
+                        open(local_file_path, 'rb') as file:
+                    stats = self._send_file_body(file, file_size, codec, progress.update)
                 
-                while bytes_sent < file_size:
-                    data = file.read(buffer_size)
-                    if not data:
-                        break
-                    
-                    self.socket.send(data)
-                    bytes_sent += len(data)
-                    
-                    # 显示进度
-                    progress = (bytes_sent / file_size) * 100
-                    print(f"  📊 进度: {progress:.1f}% ({bytes_sent}/{file_size} bytes)", end='\r')
-            
-            print(f"  ✅ 完成: {server_filename}")
+                print(f"\n  ✅ 完成: {server_filename}")
+                print(stats.summary() if stats is not None else self.tuner.summary())
+            else:
+                with open(local_file_path, 'rb') as file:
+                    self._send_file_body(file, file_size, codec, on_progress)
             
             # 接收最终确认
-            final_response = self.socket.recv(1024).decode('utf-8')
+            final_response = self.channel.recv_message()
             if "SUCCESS" not in final_response:
                 print(f"  ❌ 服务器错误: {final_response.strip()}")
                 return False
@@ -318,8 +1080,18 @@ class FileTransferClient:
             
         except Exception as e:
             print(f"  ❌ 上传失败: {e}")
+            if isinstance(e, OSError):
+                self.connected = False
             return False
     
+    def _send_file_body(self, file, file_size, codec, on_progress):
+        """发送整个文件的数据，压缩时返回压缩统计"""
+        with self._lease('send') as lease:
+            if codec is not None:
+                return send_compressed(self.socket, file, file_size, codec, on_progress=on_progress, lease=lease)
+            send_file_data(self.socket, file, file_size, on_progress=on_progress, tuner=self.tuner, lease=lease)
+        return None
+    
     def download_file(self, filename, local_dir="./downloads"):
         """从服务器下载文件"""
         if not self.connected:
@@ -332,12 +1104,40 @@ class FileTransferClient:
             
             print(f"📥 开始下载文件: {filename}")
             
-            # 发送下载命令
-            download_command = f"FILE:DOWNLOAD:{filename}"
-            self.socket.send(download_command.encode('utf-8'))
+            # 数据先写入 .part 文件；已有 .part 且续传日志记录的文件大小和修改时间与服务器一致时从其末尾继续
+            local_file_path = os.path.join(local_dir, filename)
+            os.makedirs(os.path.dirname(local_file_path) or '.', exist_ok=True)
+            part_path = local_file_path + DOWNLOAD_PART_SUFFIX
+            journal = TransferJournal.open('download', f"{self.host}:{self.port}", filename, local_file_path)
+            offset = 0
+            remote = None
+            if os.path.exists(part_path) and journal.size is not None:
+                remote = self.stat_file_info(filename)
+                part_size = os.path.getsize(part_path)
+                if remote is not None and journal.matches(*remote) and part_size <= remote[0]:
+                    offset = part_size
+            
+            # 发送下载命令（是否值得压缩由服务器对文件抽样决定）
+            codec = self._negotiated_codec()
+            if codec is not None:
+                download_command = f"FILE:ZDOWNLOAD:{filename}:{codec}"
+                if offset:
+                    download_command += f":{offset}:{journal.size - offset}"
+            elif offset:
+                download_command = f"FILE:DOWNLOAD_RANGE:{filename}:{offset}:{journal.size - offset}"
+            else:
+                download_command = f"FILE:DOWNLOAD:{filename}"
+            if remote is None and self.channel.framed:
+                # 续传日志要记录服务器文件的修改时间；分帧协议下与下载命令一起发出，不多一次往返
+                self.channel.send_messages([f"FILE:STAT:{filename}", download_command])
+                remote = _parse_stat(self.channel.recv_message())
+            else:
+                if remote is None:
+                    remote = self.stat_file_info(filename)
+                self.channel.send_message(download_command)
             
             # 接收文件信息
-            response = self.socket.recv(1024).decode('utf-8')
+            response = self.channel.recv_message()
             
             if response.startswith("ERROR"):
                 print(f"❌ 下载失败: {response}")
@@ -347,86 +1147,338 @@ class FileTransferClient:
                 print(f"❌ 意外的服务器响应: {response}")
                 return False
             
-            # 解析文件大小
-            file_size = int(response.split(':')[1].strip())
+            # 解析文件大小（续传时为剩余部分的大小）
+            remaining = int(response.split(':')[1].strip())
+            file_size = offset + remaining
             print(f"📋 文件大小: {file_size} bytes")
+            if offset:
+                print(f"🔁 断点续传: 本地已有 {offset} bytes，只接收剩余 {remaining} bytes")
+            else:
+                # 查询之后文件又被替换时不记录修改时间，下次续传时会因不一致而重新下载
+                journal.reset(file_size, remote[1] if remote is not None and remote[0] == file_size else None)
+                journal.save()
             
             # 发送准备确认
-            self.socket.send("READY".encode('utf-8'))
+            self.channel.send_message("READY")
             
             # 接收文件数据
-            local_file_path = os.path.join(local_dir, filename)
-            bytes_received = 0
+            stats = None
+            with self.progress_bus.start(f"下载 {filename}", file_size) as progress, \
+                    open(part_path, 'r+b' if offset else 'wb') as file, self._lease('recv') as lease:
+                progress.update(offset)
+                on_progress = self._journal_progress(journal, progress, offset)
+                if codec is not None:
+                    stats = recv_compressed(self.channel, file, remaining, codec, offset=offset,
+                                            on_progress=on_progress, lease=lease)
+                else:
+                    recv_file_data(self.channel, file, remaining, offset=offset, on_progress=on_progress,
+                                   buffer=self.recv_buffer, tuner=self.tuner, lease=lease)
             
-            with open(local_file_path, 'wb') as file:
-                while bytes_received < file_size:
-                    remaining = file_size - bytes_received
-                    buffer_size = min(8192, remaining)
-                    
-                    data = self.socket.recv(buffer_size)
-                    if not data:
-                        break
-                    
-                    file.write(data)
-                    bytes_received += len(data)
-                    
-                    # 显示进度
-                    progress = (bytes_received / file_size) * 100
-                    print(f"📊 下载进度: {progress:.1f}% ({bytes_received}/{file_size} bytes)", end='\r')
+            os.replace(part_path, local_file_path)
+            journal.discard()
             
             print(f"\n✅ 文件下载成功: {local_file_path}")
+            print(stats.summary() if stats is not None else self.tuner.summary())
             return True
             
         except Exception as e:
             print(f"❌ 下载文件失败: {e}")
             return False
     
-    def list_files(self):
-        """列出服务器上的文件"""
+    def stat_file(self, filename):
+        """查询服务器上文件的大小，文件不存在时返回None"""
+        info = self.stat_file_info(filename)
+        return info[0] if info is not None else None
+    
+    def stat_file_info(self, filename):
+        """查询服务器上文件的 (大小, 修改时间纳秒)，文件不存在时返回None；旧服务器不返回修改时间时为None"""
+        self.channel.send_message(f"FILE:STAT:{filename}")
+        return _parse_stat(self.channel.recv_message())
+    
+    def stat_files(self, filenames):
+        """查询多个文件的大小，返回与 filenames 对应的列表（不存在的文件为None）
+
+        分帧协议下所有 FILE:STAT 命令一次发出再依次读取回复，只需一次往返；文本协议下逐个查询
+        """
+        if not self.channel.framed:
+            return [self.stat_file(filename) for filename in filenames]
+        sizes = []
+        for start in range(0, len(filenames), PIPELINE_DEPTH):
+            batch = filenames[start:start + PIPELINE_DEPTH]
+            self.channel.send_messages([f"FILE:STAT:{filename}" for filename in batch])
+            for _ in batch:
+                info = _parse_stat(self.channel.recv_message())
+                sizes.append(info[0] if info is not None else None)
+        return sizes
+    
+    def _download_range(self, filename, file, offset, length, on_progress=None):
+        """下载文件的 [offset, offset+length) 区间，写入本地文件的相同位置，返回收到的字节数"""
+        self.channel.send_message(f"FILE:DOWNLOAD_RANGE:{filename}:{offset}:{length}")
+        
+        response = self.channel.recv_message()
+        if not response.startswith("FILE_INFO:"):
+            raise IOError(f"区间下载失败: {response.strip()}")
+        range_size = int(response.split(':')[1].strip())
+        
+        self.channel.send_message("READY")
+        with self._lease('recv') as lease:
+            return recv_file_data(self.channel, file, range_size, offset=offset, on_progress=on_progress,
+                                  buffer=self.recv_buffer, tuner=self.tuner, lease=lease)
+    
+    def download_file_segmented(self, filename, local_dir="./downloads", connections=4,
+                                segment_size=SEGMENT_SIZE):
+        """把一个大文件切成多个区间，用多条连接并行下载到预分配的本地文件中"""
         if not self.connected:
             print("❌ 未连接到服务器")
             return False
         
         try:
-            # 发送列表命令
-            self.socket.send("FILE:LIST".encode('utf-8'))
+            remote = self.stat_file_info(filename)
+            if remote is None:
+                print(f"❌ 下载失败: 服务器上不存在 {filename}")
+                return False
+            file_size, mtime_ns = remote
             
-            # 接收文件列表
-            response = self.socket.recv(4096).decode('utf-8')
+            local_file_path = os.path.join(local_dir, filename)
+            part_path = local_file_path + DOWNLOAD_PART_SUFFIX
+            os.makedirs(os.path.dirname(local_file_path) or '.', exist_ok=True)
             
-            if response.startswith("FILE_LIST:"):
-                print("📂 服务器文件列表:")
-                lines = response.split('\n')
-                file_count = 0
-                
-                for line in lines[1:]:  # 跳过第一行 "FILE_LIST:"
-                    if line.strip() == "END_LIST":
-                        break
-                    if line.strip():
-                        parts = line.split(':')
-                        if len(parts) >= 2:
-                            filename = parts[0]
-                            file_size = parts[1]
-                            print(f"  📄 {filename} ({file_size} bytes)")
-                            file_count += 1
-                
-                print(f"总共 {file_count} 个文件")
+            # 续传日志记录已完成的区间；服务器文件的大小或修改时间变化、.part 丢失时重新开始
+            # （预分配的 .part 中间有空洞，因此与普通下载使用不同的日志）
+            journal = TransferJournal.open('segmented', f"{self.host}:{self.port}", filename, local_file_path)
+            if journal.matches(file_size, mtime_ns) and os.path.exists(part_path):
+                missing = journal.missing_ranges(file_size)
+                if journal.completed_bytes():
+                    print(f"🔁 断点续传: 本地已有 {journal.completed_bytes()} bytes")
             else:
-                print(f"❌ 获取文件列表失败: {response}")
+                journal.reset(file_size, mtime_ns)
+                journal.save()
+                missing = [(0, file_size)]
+                # 预分配本地文件，各段直接写入自己的位置
+                with open(part_path, 'wb') as file:
+                    file.truncate(file_size)
+                    if hasattr(os, 'posix_fallocate') and file_size:
+                        try:
+                            os.posix_fallocate(file.fileno(), 0, file_size)
+                        except OSError:
+                            pass
+            
+            segments = [(offset, min(segment_size, end - offset))
+                        for start, end in missing
+                        for offset in range(start, end, segment_size)]
+            connections = max(1, min(connections, len(segments)))
+            print(f"📥 分段下载文件: {filename} ({file_size} bytes, {len(segments)} 段, {connections} 个连接)")
+            
+            pending = list(reversed(segments))
+            attempts = {}
+            pending_lock = threading.Lock()
+            progress_lock = threading.Lock()
+            failed_segments = []
+            
+            def worker(progress):
+                client = self._open_worker()
+                if client is None:
+                    return
+                try:
+                    # 每个连接使用自己的文件句柄，无pwrite的平台上seek+write也互不干扰
+                    with open(part_path, 'r+b') as file:
+                        while client is not None:
+                            with pending_lock:
+                                if not pending:
+                                    break
+                                offset, length = pending.pop()
+                            last = [0]
+                            
+                            def on_progress(received, last=last):
+                                with progress_lock:
+                                    progress.add(received - last[0])
+                                last[0] = received
+                            
+                            try:
+                                received = client._download_range(filename, file, offset, length, on_progress)
+                                if received != length:
+                                    raise IOError(f"区间长度不符: 期望{length}字节，收到{received}字节")
+                                with pending_lock:
+                                    journal.add_range(offset, offset + length)
+                                    journal.save()
+                            except Exception as e:
+                                # 失败的区间放回队列重试（自己或其他连接）
+                                with progress_lock:
+                                    progress.add(-last[0])
+                                with pending_lock:
+                                    attempts[offset] = attempts.get(offset, 0) + 1
+                                    if attempts[offset] < SEGMENT_RETRIES:
+                                        pending.append((offset, length))
+                                    else:
+                                        failed_segments.append((offset, length))
+                                print(f"\n⚠️ 区间 {offset}+{length} 下载失败: {e}")
+                                # 连接本身已不可用，换一条新连接继续；重连失败时退出，剩下的区间由
+                                # 其他连接完成，全部退出后仍未完成的计入失败
+                                self._close_worker(client, reusable=False)
+                                client = self._open_worker()
+                finally:
+                    if client is not None:
+                        self._close_worker(client)
+            
+            with self.progress_bus.start(f"分段下载 {filename}", file_size) as progress:
+                progress.update(file_size - sum(length for _, length in segments))
+                threads = [threading.Thread(target=worker, args=(progress,), daemon=True)
+                           for _ in range(connections)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            
+            # 所有连接都已退出（重连失败）时队列中剩下的区间不会再有人下载
+            failed_segments.extend(pending)
+            pending.clear()
+            if failed_segments:
+                print(f"\n❌ 分段下载失败: {len(failed_segments)} 个区间未完成")
+                return False
+            
+            # 最终校验文件大小
+            actual_size = os.path.getsize(part_path)
+            if actual_size != file_size:
+                print(f"\n❌ 文件大小校验失败: 期望{file_size}字节，实际{actual_size}字节")
+                return False
+            
+            os.replace(part_path, local_file_path)
+            journal.discard()
             
+            print(f"\n✅ 文件下载成功: {local_file_path}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ 分段下载失败: {e}")
+            return False
+    
+    def list_files(self):
+        """列出服务器上的文件"""
+        if not self.connected:
+            print("❌ 未连接到服务器")
+            return False
+        
+        try:
+            print("📂 服务器文件列表:")
+            file_count = 0
+            for filename, file_size in self.iter_files():
+                print(f"  📄 {filename} ({file_size} bytes)")
+                file_count += 1
+            
+            print(f"总共 {file_count} 个文件")
             return True
             
         except Exception as e:
             print(f"❌ 列出文件失败: {e}")
             return False
+    
+    def iter_files(self):
+        """流式获取服务器文件列表，逐个产出 (文件名, 大小)
+
+        数据用固定大小的缓冲区 recv_into 接收并增量解析，内存占用与文件数量无关。
+        调用方提前停止迭代时会读完剩余的列表，保证连接上的下一条命令不受影响
+        """
+        lines = self._iter_list_lines("FILE:LIST")
+        header = next(lines)
+        if not header.startswith(b"FILE_LIST:"):
+            lines.close()
+            raise IOError(f"获取文件列表失败: {header.decode('utf-8', errors='replace')}")
+        try:
+            for line in lines:
+                # 文件名中可能含有冒号，大小总在最后一个冒号之后
+                name, _, size = line.rpartition(b":")
+                yield name.decode('utf-8', errors='replace'), int(size)
+        finally:
+            lines.close()
+    
+    def list_page(self, prefix="", pattern="", limit=LIST_PAGE_SIZE, cursor="", recursive=True):
+        """获取一页文件列表，返回 (条目列表, 下一页光标)，光标为None表示已经列完
+
+        prefix:    路径前缀，如 "docs/" 只列出 docs 目录，"docs/rep" 只列出以 rep 开头的条目
+        pattern:   文件名通配符（支持 * 和 ?），如 "*.log"
+        recursive: False 时只列出一层，子目录以汇总条目（文件数、总大小）返回
+        """
+        mode = "R" if recursive else "D"
+        command = f"FILE:LIST:{limit}:{mode}:{prefix}:{pattern}:{cursor}"
+        
+        entries = []
+        next_cursor = None
+        lines = self._iter_list_lines(command)
+        header = next(lines)
+        legacy = header.startswith(b"FILE_LIST:")
+        if not legacy and not header.startswith(b"FILE_PAGE:"):
+            lines.close()
+            raise IOError(f"获取文件列表失败: {header.decode('utf-8', errors='replace')}")
+        
+        for line in lines:
+            item = parse_list_line(line, legacy)
+            if isinstance(item, ListEntry):
+                entries.append(item)
+            elif item is not None:
+                next_cursor = item
+        return entries, next_cursor
+    
+    def iter_listing(self, prefix="", pattern="", recursive=True, page_size=LIST_PAGE_SIZE):
+        """按页惰性获取文件列表，逐个产出 ListEntry，只有用到下一页时才请求"""
+        cursor = ""
+        while True:
+            entries, cursor = self.list_page(prefix, pattern, page_size, cursor, recursive)
+            yield from entries
+            if cursor is None:
+                return
+    
+    def _iter_list_lines(self, command):
+        """发送列表命令，逐行产出响应（第一行是头部，不含 END_LIST）"""
+        self.channel.send_message(command)
+        
+        pending = bytearray()  # 尚未解析的数据（最多一个不完整的行加一段新收到的数据）
+        finished = False
+        try:
+            while not finished:
+                chunk = self.channel.recv_chunk(LIST_BUFFER_SIZE)
+                if not chunk:
+                    raise ConnectionError("连接已关闭")
+                pending += chunk
+                
+                start = 0
+                while True:
+                    end = pending.find(b"\n", start)
+                    if end < 0:
+                        break
+                    line = bytes(pending[start:end].rstrip(b"\r"))
+                    start = end + 1
+                    if line == b"END_LIST":
+                        finished = True
+                        break
+                    if line:
+                        yield line
+                del pending[:start]
+        except GeneratorExit:
+            # 提前停止迭代：读完剩余列表，不让残留数据混进下一条命令的响应
+            if not finished:
+                tail = bytes(pending[-16:])
+                while not (tail.endswith(b"END_LIST\n") or tail.endswith(b"END_LIST\r\n")):
+                    chunk = self.channel.recv_chunk(LIST_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    tail = (tail + chunk)[-16:]
+            raise
+
 
 def print_help():
     """显示帮助信息"""
     print("\n📋 可用命令:")
     print("文件操作:")
     print("  📤 up <路径>         - 上传文件或文件夹 (别名: upload, u)")
+    print("  📤 up -j N <文件夹>  - 使用N个并行连接上传文件夹")
+    print("  🔄 sync <文件夹>     - 增量同步文件夹，只上传新增或修改的文件 (别名: s)")
     print("  📥 down <文件>       - 下载文件 (别名: download, d)")
+    print("  📥 down -j N <文件>  - 使用N个并行连接分段下载大文件")
     print("  📂 ls               - 列出文件 (别名: list, l)")
+    print("  🗜️ zip <算法>        - 传输压缩: zlib、lzma 或 off (别名: z)")
+    print("  🔗 pool             - 并行连接池统计 (命中率、建连和代理握手耗时)")
+    print("  🚦 limit [up|down] <速率|off> - 带宽限制，如 10M、512K；不带参数时查看当前限速")
+    print("  🚦 prio <优先级>     - 之后传输的优先级: high、normal 或 low (限速时按 4:2:1 分享带宽)")
     print("")
     print("其他命令:")
     print("  💬 hello            - 服务器问候")
@@ -437,6 +1489,10 @@ def print_help():
     print("💡 提示:")
     print("  - 上传文件: up myfile.txt")
     print("  - 上传文件夹: up ./documents (保持目录结构)")
+    print("  - 并行上传文件夹: up -j 4 ./documents")
+    print("  - 再次上传修改过的文件夹: sync ./documents")
+    print("  - 慢速链路上传日志/CSV: zip zlib 后再 up，lzma 压缩率更高但更慢")
+    print("  - 不占满共享代理的上行带宽: limit up 5M 后再 prio low、up ./documents")
     print("  - 输入其他文本将直接发送给服务器")
     print("=" * 50)
 
@@ -486,7 +1542,13 @@ def main():
         print(f"🎯 目标服务器: {host}:{port}")
         print("🔗 将直接连接到服务器")
     
-    client = FileTransferClient(host, port, proxy_host, proxy_port)
+    # 进度总线：传输线程只累加计数，由总线按固定频率合并后刷新到终端
+    progress_bus = ProgressBus(interval=0.2)
+    progress_bus.subscribe(ConsoleProgressPrinter())
+    
+    # 连接池：多次 -j 并行传输之间复用已建立的连接（经代理时省去代理握手）
+    pool = ConnectionPool()
+    client = FileTransferClient(host, port, proxy_host, proxy_port, progress_bus=progress_bus, pool=pool)
     
     if not client.connect():
         print("\n💡 提示: 使用 --help 查看使用说明")
@@ -521,8 +1583,30 @@ def main():
                     print("💡 用法: up <文件路径或文件夹路径>")
                     print("📝 例如: up test.txt 或 up ./documents")
                 else:
-                    file_path = ' '.join(parts[1:])  # 支持带空格的文件名
-                    client.upload_file(file_path)
+                    args = parts[1:]
+                    connections = 1
+                    # 可选的并行连接数: up -j 4 <文件夹>
+                    if len(args) >= 3 and args[0] == '-j' and args[1].isdigit():
+                        connections = max(int(args[1]), 1)
+                        args = args[2:]
+                    file_path = ' '.join(args)  # 支持带空格的文件名
+                    if connections > 1 and os.path.isdir(file_path):
+                        client.upload_folder(file_path, connections=connections)
+                    else:
+                        client.upload_file(file_path)
+                    
+            # 增量同步文件夹
+            elif command in ['sync', 's']:
+                if len(parts) < 2:
+                    print("❌ 请指定要同步的文件夹")
+                    print("💡 用法: sync [-j N] <文件夹路径>")
+                else:
+                    args = parts[1:]
+                    connections = 1
+                    if len(args) >= 3 and args[0] == '-j' and args[1].isdigit():
+                        connections = max(int(args[1]), 1)
+                        args = args[2:]
+                    client.sync_folder(' '.join(args), connections=connections)
                     
             # 下载命令 (支持多种别名)
             elif command in ['download', 'down', 'd']:
@@ -531,8 +1615,65 @@ def main():
                     print("💡 用法: down <文件名>")
                     print("📝 例如: down test.txt")
                 else:
-                    filename = parts[1]
-                    client.download_file(filename)
+                    args = parts[1:]
+                    connections = 1
+                    # 可选的并行连接数: down -j 4 <文件名>
+                    if len(args) >= 3 and args[0] == '-j' and args[1].isdigit():
+                        connections = max(int(args[1]), 1)
+                        args = args[2:]
+                    filename = args[0]
+                    if connections > 1:
+                        client.download_file_segmented(filename, connections=connections)
+                    else:
+                        client.download_file(filename)
+                    
+            # 传输压缩设置
+            elif command in ['zip', 'z']:
+                if len(parts) < 2:
+                    print(f"🗜️ 当前传输压缩: {client.compression or 'off'}")
+                    print(f"💡 用法: zip <{'|'.join(CODECS)}|off>")
+                elif parts[1].lower() in CODECS:
+                    client.compression = parts[1].lower()
+                    print(f"✅ 已启用 {client.compression} 传输压缩（已压缩格式的文件自动跳过）")
+                elif parts[1].lower() in ['off', 'none']:
+                    client.compression = None
+                    print("✅ 已关闭传输压缩")
+                else:
+                    print(f"❌ 不支持的压缩算法: {parts[1]}")
+                    
+            elif command == 'limit':
+                # limit [up|down] <速率|off>：不写方向时同时设置上传和下载
+                args = parts[1:]
+                limiters = [upload_limiter, download_limiter]
+                if args and args[0].lower() in ['up', 'down']:
+                    limiters = [upload_limiter if args.pop(0).lower() == 'up' else download_limiter]
+                if args:
+                    try:
+                        rate = parse_rate(args[0])
+                    except ValueError as e:
+                        print(f"❌ {e}")
+                        continue
+                    for limiter in limiters:
+                        limiter.set_rate(rate)
+                for limiter in limiters:
+                    print(limiter.summary())
+                if not args:
+                    print("💡 用法: limit [up|down] <速率|off>，如 limit up 10M")
+                    
+            elif command in ['prio', 'priority']:
+                if len(parts) < 2:
+                    print(f"🚦 当前传输优先级: {client.priority}")
+                    print(f"💡 用法: prio <{'|'.join(PRIORITY_WEIGHTS)}>")
+                elif parts[1].lower() in PRIORITY_WEIGHTS:
+                    client.priority = parts[1].lower()
+                    print(f"✅ 之后的传输使用 {client.priority} 优先级（限速时按权重 "
+                          f"{PRIORITY_WEIGHTS[client.priority]} 分享带宽）")
+                else:
+                    print(f"❌ 未知的优先级: {parts[1]}")
+                    
+            elif command == 'pool':
+                print(pool.metrics.summary())
+                print(f"🔗 空闲连接: {pool.idle_count()} 条")
                     
             # 列表命令 (支持多种别名)
             elif command in ['list', 'ls', 'l']:
@@ -548,7 +1689,9 @@ def main():
                 if len(parts) == 1 and len(command) > 1:
                     similar_commands = {
                         'upload': ['up', 'u'],
+                        'sync': ['s'],
                         'download': ['down', 'd'], 
+                        'zip': ['z'],
                         'list': ['ls', 'l'],
                         'help': ['h', '?'],
                         'quit': ['q', 'exit']
@@ -575,6 +1718,7 @@ def main():
         print("\n👋 输入结束，正在退出...")
     finally:
         client.disconnect()
+        pool.close()
 
 if __name__ == "__main__":
     main()
@@ -7,22 +7,46 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
 import threading
+import contextlib
 import os
 import json
 from pathlib import Path
+from connection_pool import ConnectionPool
 from file_transfer_client import FileTransferClient
+from log_pane import LogPane
+from remote_browser import RemoteBrowser
+from transfer_compression import CODECS
+from transfer_limiter import (DEFAULT_PRIORITY, PRIORITY_WEIGHTS, download_limiter, format_limit, parse_rate,
+                              upload_limiter)
+from transfer_progress import ProgressBus, ProgressEvent, format_rate, format_eta
+from transfer_mux import MuxSession
+from transfer_queue import (CANCELLED, DEFAULT_WORKERS, DONE, DOWNLOAD, FAILED, MAX_WORKERS, PAUSED, PENDING,
+                            POLICIES, POLICY_SJF, RUNNING, TransferQueue)
 
+# 传输队列列表的刷新间隔（毫秒）
+QUEUE_REFRESH_MS = 500
 
 class FileTransferGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("📁 文件传输客户端")
-        self.root.geometry("700x600")
+        self.root.geometry("760x800")
         
         self.client = None
+        # 多路复用会话：服务器支持时所有操作共用一条TCP连接，每个操作一个通道
+        self.mux_session = None
+        # 传输队列：上传、下载都作为任务加入队列，由若干工作线程各自从连接池租用连接执行
+        self.pool = None
+        self.queue = None
+        self.queue_refresh_id = None
+        self.queue_busy = False
         self.connected = False
         self.config_file = Path.home() / ".file_transfer_config.json"
         
+        # 进度总线：传输线程只累加计数，每秒最多推送10次到界面
+        self.progress_bus = ProgressBus(interval=0.1)
+        self.progress_bus.subscribe(self.on_progress_event)
+        
         self.create_widgets()
         self.load_config()  # 启动时加载配置
         
@@ -61,6 +85,47 @@ class FileTransferGUI:
         self.proxy_port_entry = ttk.Entry(config_frame, width=10, state=tk.DISABLED)
         self.proxy_port_entry.grid(row=1, column=3, sticky=tk.W, padx=5, pady=2)
         
+        # 传输压缩（慢速链路上传输文本数据时启用）
+        ttk.Label(config_frame, text="传输压缩:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        self.compression_var = tk.StringVar(value="off")
+        self.compression_combo = ttk.Combobox(
+            config_frame,
+            textvariable=self.compression_var,
+            values=("off",) + CODECS,
+            width=8,
+            state="readonly"
+        )
+        self.compression_combo.grid(row=2, column=1, sticky=tk.W, padx=5, pady=2)
+        self.compression_combo.bind("<<ComboboxSelected>>", self.on_compression_changed)
+        
+        # 带宽限制（进程内所有连接共享）和之后传输的优先级，传输进行中修改也立即生效
+        ttk.Label(config_frame, text="优先级:").grid(row=2, column=2, sticky=tk.W, pady=2)
+        self.priority_var = tk.StringVar(value=DEFAULT_PRIORITY)
+        self.priority_combo = ttk.Combobox(
+            config_frame,
+            textvariable=self.priority_var,
+            values=tuple(PRIORITY_WEIGHTS),
+            width=8,
+            state="readonly"
+        )
+        self.priority_combo.grid(row=2, column=3, sticky=tk.W, padx=5, pady=2)
+        self.priority_combo.bind("<<ComboboxSelected>>", self.on_priority_changed)
+        
+        ttk.Label(config_frame, text="上传限速:").grid(row=3, column=0, sticky=tk.W, pady=2)
+        self.upload_limit_entry = ttk.Entry(config_frame, width=10)
+        self.upload_limit_entry.insert(0, "off")
+        self.upload_limit_entry.grid(row=3, column=1, sticky=tk.W, padx=5, pady=2)
+        
+        ttk.Label(config_frame, text="下载限速:").grid(row=3, column=2, sticky=tk.W, pady=2)
+        self.download_limit_entry = ttk.Entry(config_frame, width=10)
+        self.download_limit_entry.insert(0, "off")
+        self.download_limit_entry.grid(row=3, column=3, sticky=tk.W, padx=5, pady=2)
+        
+        self.limit_btn = ttk.Button(config_frame, text="🚦 应用限速", command=self.apply_limits)
+        self.limit_btn.grid(row=3, column=4, padx=10, pady=2)
+        self.upload_limit_entry.bind("<Return>", self.apply_limits)
+        self.download_limit_entry.bind("<Return>", self.apply_limits)
+        
         # 连接按钮
         self.connect_btn = ttk.Button(
             config_frame, 
@@ -120,6 +185,56 @@ class FileTransferGUI:
         )
         self.clear_btn.pack(side=tk.RIGHT, padx=5)
         
+        # 传输队列区域
+        queue_frame = ttk.LabelFrame(operations_frame, text="📋 传输队列", padding="5")
+        queue_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        queue_btn_frame = ttk.Frame(queue_frame)
+        queue_btn_frame.pack(fill=tk.X)
+        
+        ttk.Button(queue_btn_frame, text="⏸️ 暂停", command=lambda: self.control_jobs('pause')).pack(side=tk.LEFT, padx=2)
+        ttk.Button(queue_btn_frame, text="▶️ 继续/重试", command=lambda: self.control_jobs('resume')).pack(side=tk.LEFT, padx=2)
+        ttk.Button(queue_btn_frame, text="⏹️ 取消", command=lambda: self.control_jobs('cancel')).pack(side=tk.LEFT, padx=2)
+        ttk.Button(queue_btn_frame, text="🧹 清除已结束", command=self.clear_finished_jobs).pack(side=tk.LEFT, padx=2)
+        
+        # 调度策略和并行连接数，修改后立即生效
+        self.policy_var = tk.StringVar(value=POLICY_SJF)
+        policy_combo = ttk.Combobox(queue_btn_frame, textvariable=self.policy_var, values=POLICIES,
+                                    width=5, state="readonly")
+        policy_combo.pack(side=tk.RIGHT, padx=2)
+        policy_combo.bind("<<ComboboxSelected>>", self.on_queue_settings_changed)
+        ttk.Label(queue_btn_frame, text="调度:").pack(side=tk.RIGHT)
+        
+        self.workers_var = tk.IntVar(value=DEFAULT_WORKERS)
+        ttk.Spinbox(queue_btn_frame, from_=1, to=MAX_WORKERS, textvariable=self.workers_var, width=4,
+                    command=self.on_queue_settings_changed).pack(side=tk.RIGHT, padx=(2, 10))
+        ttk.Label(queue_btn_frame, text="并行连接:").pack(side=tk.RIGHT)
+        
+        tree_frame = ttk.Frame(queue_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        
+        self.queue_tree = ttk.Treeview(
+            tree_frame,
+            columns=("kind", "size", "progress", "state"),
+            height=6,
+            selectmode="extended"
+        )
+        self.queue_tree.heading("#0", text="文件")
+        self.queue_tree.heading("kind", text="类型")
+        self.queue_tree.heading("size", text="大小")
+        self.queue_tree.heading("progress", text="进度")
+        self.queue_tree.heading("state", text="状态")
+        self.queue_tree.column("#0", width=300)
+        self.queue_tree.column("kind", width=50, anchor=tk.CENTER)
+        self.queue_tree.column("size", width=100, anchor=tk.E)
+        self.queue_tree.column("progress", width=70, anchor=tk.E)
+        self.queue_tree.column("state", width=100, anchor=tk.CENTER)
+        
+        queue_scrollbar = ttk.Scrollbar(tree_frame, command=self.queue_tree.yview)
+        queue_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.queue_tree.config(yscrollcommand=queue_scrollbar.set)
+        self.queue_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
         # 进度条区域
         progress_frame = ttk.Frame(operations_frame)
         progress_frame.pack(fill=tk.X, pady=5)
@@ -140,7 +255,7 @@ class FileTransferGUI:
         
         self.log_text = scrolledtext.ScrolledText(
             operations_frame, 
-            height=20, 
+            height=10, 
             width=80,
             wrap=tk.WORD,
             font=("Consolas", 9)
@@ -153,6 +268,10 @@ class FileTransferGUI:
         self.log_text.tag_config("info", foreground="blue")
         self.log_text.tag_config("warning", foreground="orange")
         
+        # 日志先进入缓冲队列，主循环定时批量写入并限制行数；配置了 log_file 时完整日志另写入滚动文件
+        self.log_pane = LogPane(self.root, self.log_text)
+        self.log_file = None
+        
     def toggle_proxy(self):
         """切换代理设置的启用状态"""
         if self.use_proxy_var.get():
@@ -162,18 +281,57 @@ class FileTransferGUI:
             self.proxy_host_entry.config(state=tk.DISABLED)
             self.proxy_port_entry.config(state=tk.DISABLED)
             
+    def selected_compression(self):
+        """界面上选择的压缩算法，off时返回None"""
+        codec = self.compression_var.get()
+        return codec if codec in CODECS else None
+    
+    def on_compression_changed(self, event=None):
+        """已连接时立即对之后的传输生效"""
+        if self.client:
+            self.client.compression = self.selected_compression()
+        self.log(f"🗜️ 传输压缩: {self.compression_var.get()}", "info")
+    
+    def on_priority_changed(self, event=None):
+        """之后开始的传输使用新的优先级"""
+        if self.client:
+            self.client.priority = self.priority_var.get()
+        self.log(f"🚦 传输优先级: {self.priority_var.get()}", "info")
+    
+    def apply_limits(self, event=None):
+        """把输入框中的限速应用到共享限速器（如 10M、512K，off 表示不限速），进行中的传输立即按新速率继续"""
+        try:
+            upload_rate = parse_rate(self.upload_limit_entry.get())
+            download_rate = parse_rate(self.download_limit_entry.get())
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        upload_limiter.set_rate(upload_rate)
+        download_limiter.set_rate(download_rate)
+        self.log(f"🚦 上传限速: {format_limit(upload_rate)}, 下载限速: {format_limit(download_rate)}", "info")
+    
     def log(self, message, tag=None):
-        """在日志区域添加消息"""
-        self.log_text.insert(tk.END, message + "\n", tag)
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """在日志区域添加消息（可以在任意线程中调用，由主循环批量显示）"""
+        self.log_pane.log(message, tag)
         
     def clear_log(self):
         """清空日志"""
-        self.log_text.delete(1.0, tk.END)
+        self.log_pane.clear()
+    
+    def on_progress_event(self, event):
+        """进度总线订阅者（在后台线程中调用），转交给Tk主循环"""
+        self.root.after(0, self.update_progress, event)
     
     def update_progress(self, value, text=""):
-        """更新进度条"""
+        """更新进度条，value 可以是百分比，也可以是进度总线推送的 ProgressEvent"""
+        if isinstance(value, ProgressEvent):
+            event = value
+            value = event.percent
+            if event.finished:
+                text = f"{event.name} 完成 (平均 {format_rate(event.done / event.elapsed if event.elapsed else 0)})"
+            else:
+                text = (f"{event.name} ({value:.1f}% - {event.done}/{event.total} bytes) "
+                        f"{format_rate(event.ewma_bps)} 剩余 {format_eta(event.eta)}")
         self.progress_bar['value'] = value
         if text:
             self.progress_label.config(text=text)
@@ -213,6 +371,26 @@ class FileTransferGUI:
                         self.proxy_port_entry.delete(0, tk.END)
                         self.proxy_port_entry.insert(0, str(config['proxy_port']))
                 
+                if config.get('compression') in CODECS:
+                    self.compression_var.set(config['compression'])
+                
+                if config.get('log_max_lines'):
+                    self.log_pane.set_max_lines(config['log_max_lines'])
+                
+                if config.get('log_file'):
+                    self.log_file = config['log_file']
+                    self.log_pane.spill_to(self.log_file)
+                
+                if config.get('priority') in PRIORITY_WEIGHTS:
+                    self.priority_var.set(config['priority'])
+                
+                if 'upload_limit' in config or 'download_limit' in config:
+                    self.upload_limit_entry.delete(0, tk.END)
+                    self.upload_limit_entry.insert(0, config.get('upload_limit', 'off'))
+                    self.download_limit_entry.delete(0, tk.END)
+                    self.download_limit_entry.insert(0, config.get('download_limit', 'off'))
+                    self.apply_limits()
+                
                 self.log("✅ 已加载上次的连接配置", "success")
                 
         except Exception as e:
@@ -225,8 +403,15 @@ class FileTransferGUI:
             config = {
                 'host': self.host_entry.get().strip(),
                 'port': int(self.port_entry.get().strip()),
-                'use_proxy': self.use_proxy_var.get()
+                'use_proxy': self.use_proxy_var.get(),
+                'compression': self.compression_var.get(),
+                'priority': self.priority_var.get(),
+                'upload_limit': self.upload_limit_entry.get().strip(),
+                'download_limit': self.download_limit_entry.get().strip(),
+                'log_max_lines': self.log_pane.max_lines
             }
+            if self.log_file:
+                config['log_file'] = self.log_file
             
             if self.use_proxy_var.get():
                 config['proxy_host'] = self.proxy_host_entry.get().strip()
@@ -271,11 +456,23 @@ class FileTransferGUI:
             
             # 在后台线程中连接
             def connect_thread():
-                self.client = FileTransferClient(host, port, proxy_host, proxy_port)
+                # 旧服务器不支持多路复用时，每个操作各自建立一条连接
+                mux_session = MuxSession(host, port, proxy_host, proxy_port)
+                if not mux_session.connect():
+                    mux_session = None
+                self.mux_session = mux_session
+                self.client = FileTransferClient(host, port, proxy_host, proxy_port,
+                                                 progress_bus=self.progress_bus,
+                                                 compression=self.selected_compression(),
+                                                 mux_session=mux_session,
+                                                 priority=self.priority_var.get())
                 if self.client.connect():
                     self.connected = True
                     self.root.after(0, self.on_connected)
                 else:
+                    if mux_session:
+                        mux_session.close()
+                        self.mux_session = None
                     self.root.after(0, self.on_connect_failed)
             
             threading.Thread(target=connect_thread, daemon=True).start()
@@ -301,6 +498,13 @@ class FileTransferGUI:
         self.proxy_host_entry.config(state=tk.DISABLED)
         self.proxy_port_entry.config(state=tk.DISABLED)
         
+        # 传输队列：任务从连接池租用独立的TCP连接，self.client 只提供连接参数和传输选项；
+        # 多路复用会话只用于列表、浏览等交互操作（operation_client）
+        self.pool = ConnectionPool()
+        self.queue = TransferQueue(self.pool, self.client, workers=self.workers_var.get(),
+                                   policy=self.policy_var.get(), on_event=self.on_job_event)
+        self.refresh_queue()
+        
         # 启用操作按钮
         self.upload_file_btn.config(state=tk.NORMAL)
         self.upload_folder_btn.config(state=tk.NORMAL)
@@ -314,8 +518,22 @@ class FileTransferGUI:
         
     def disconnect(self):
         """断开连接"""
+        if self.queue:
+            # 运行中的任务被中断；同一文件之后再加入队列时从续传日志继续
+            self.queue.close()
+            self.queue = None
+            if self.queue_refresh_id is not None:
+                self.root.after_cancel(self.queue_refresh_id)
+                self.queue_refresh_id = None
+            self.queue_tree.delete(*self.queue_tree.get_children())
+        if self.pool:
+            self.pool.close()
+            self.pool = None
         if self.client:
             self.client.disconnect()
+        if self.mux_session:
+            self.mux_session.close()
+            self.mux_session = None
         
         self.connected = False
         self.log("🔌 已断开连接", "info")
@@ -334,63 +552,29 @@ class FileTransferGUI:
         self.list_btn.config(state=tk.DISABLED)
         self.download_btn.config(state=tk.DISABLED)
         
+    @contextlib.contextmanager
+    def operation_client(self):
+        """为一次后台操作准备独立的客户端，操作之间可以同时进行而不会读到彼此的数据
+
+        启用多路复用时在共享连接上打开一个新通道，否则新建一条连接；操作结束后关闭
+        """
+        client = self.client._clone()
+        if not client.connect():
+            raise ConnectionError("无法建立新的连接")
+        try:
+            yield client
+        finally:
+            client.disconnect()
+        
     def upload_file(self):
-        """上传文件"""
-        file_path = filedialog.askopenfilename(title="选择要上传的文件")
-        if file_path:
-            filename = os.path.basename(file_path)
-            self.log(f"📤 准备上传文件: {filename}", "info")
-            self.reset_progress()
-            
-            def upload_thread():
-                try:
-                    file_size = os.path.getsize(file_path)
-                    self.root.after(0, lambda: self.update_progress(0, f"上传: {filename} (0%)"))
-                    
-                    # 发送上传命令
-                    upload_command = f"FILE:UPLOAD:{filename}:{file_size}"
-                    self.client.socket.send(upload_command.encode('utf-8'))
-                    
-                    # 等待服务器确认
-                    response = self.client.socket.recv(1024).decode('utf-8')
-                    if "READY" not in response:
-                        self.root.after(0, lambda: self.log(f"❌ 服务器不准备接收文件: {response}", "error"))
-                        self.root.after(0, self.reset_progress)
-                        return
-                    
-                    # 发送文件数据
-                    with open(file_path, 'rb') as file:
-                        bytes_sent = 0
-                        buffer_size = 8192
-                        
-                        while bytes_sent < file_size:
-                            data = file.read(buffer_size)
-                            if not data:
-                                break
-                            
-                            self.client.socket.send(data)
-                            bytes_sent += len(data)
-                            
-                            # 更新进度条
-                            progress = (bytes_sent / file_size) * 100
-                            self.root.after(0, lambda p=progress, s=bytes_sent, t=file_size: 
-                                          self.update_progress(p, f"上传: {filename} ({p:.1f}% - {s}/{t} bytes)"))
-                    
-                    # 接收最终确认
-                    final_response = self.client.socket.recv(1024).decode('utf-8')
-                    
-                    self.root.after(0, lambda: self.log(f"✅ 文件上传成功: {filename}", "success"))
-                    self.root.after(0, lambda: self.log(f"📨 服务器确认: {final_response.strip()}"))
-                    self.root.after(0, lambda: self.update_progress(100, f"完成: {filename}"))
-                    
-                except Exception as e:
-                    self.root.after(0, lambda: self.log(f"❌ 上传文件失败: {e}", "error"))
-                    self.root.after(0, self.reset_progress)
-            
-            threading.Thread(target=upload_thread, daemon=True).start()
+        """选择一个或多个文件加入传输队列"""
+        file_paths = filedialog.askopenfilenames(title="选择要上传的文件")
+        for file_path in file_paths:
+            job = self.queue.add_upload(file_path)
+            self.log(f"📤 加入队列: {job.remote_name} ({job.size} bytes)", "info")
             
     def upload_folder(self):
-        """上传文件夹"""
+        """文件夹中的每个文件作为一个任务加入传输队列"""
         folder_path = filedialog.askdirectory(title="选择要上传的文件夹")
         if folder_path:
             folder_name = os.path.basename(os.path.abspath(folder_path))
@@ -400,93 +584,89 @@ class FileTransferGUI:
             )
             
             if result:
-                self.log(f"📁 准备上传文件夹: {folder_name}", "info")
-                self.reset_progress()
-                
-                def upload_thread():
-                    try:
-                        # 收集所有文件
-                        files_to_upload = []
-                        total_size = 0
-                        
-                        for root, dirs, files in os.walk(folder_path):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                relative_path = os.path.relpath(file_path, folder_path)
-                                relative_path = relative_path.replace('\\', '/')
-                                server_filename = f"{folder_name}/{relative_path}"
-                                
-                                file_size = os.path.getsize(file_path)
-                                files_to_upload.append((file_path, server_filename, file_size))
-                                total_size += file_size
-                        
-                        if not files_to_upload:
-                            self.root.after(0, lambda: self.log(f"❌ 文件夹为空: {folder_path}", "error"))
-                            self.root.after(0, self.reset_progress)
-                            return
-                        
-                        self.root.after(0, lambda: self.log(f"📊 发现 {len(files_to_upload)} 个文件，总大小: {total_size} bytes", "info"))
-                        
-                        # 上传所有文件
-                        successful_uploads = 0
-                        failed_uploads = 0
-                        uploaded_size = 0
-                        
-                        for i, (local_path, server_filename, file_size) in enumerate(files_to_upload, 1):
-                            self.root.after(0, lambda idx=i, total=len(files_to_upload), name=server_filename:
-                                          self.log(f"📤 上传文件 {idx}/{total}: {name}", "info"))
-                            
-                            # 发送上传命令
-                            upload_command = f"FILE:UPLOAD:{server_filename}:{file_size}"
-                            self.client.socket.send(upload_command.encode('utf-8'))
-                            
-                            # 等待服务器确认
-                            response = self.client.socket.recv(1024).decode('utf-8')
-                            if "READY" not in response:
-                                failed_uploads += 1
-                                continue
-                            
-                            # 发送文件数据
-                            with open(local_path, 'rb') as file:
-                                bytes_sent = 0
-                                buffer_size = 8192
-                                
-                                while bytes_sent < file_size:
-                                    data = file.read(buffer_size)
-                                    if not data:
-                                        break
-                                    
-                                    self.client.socket.send(data)
-                                    bytes_sent += len(data)
-                                    
-                                    # 更新总进度
-                                    current_total = uploaded_size + bytes_sent
-                                    progress = (current_total / total_size) * 100
-                                    self.root.after(0, lambda p=progress, idx=i, total=len(files_to_upload):
-                                                  self.update_progress(p, f"上传文件夹: {idx}/{total} ({p:.1f}%)"))
-                            
-                            uploaded_size += file_size
-                            
-                            # 接收确认
-                            final_response = self.client.socket.recv(1024).decode('utf-8')
-                            if "SUCCESS" in final_response:
-                                successful_uploads += 1
-                            else:
-                                failed_uploads += 1
-                        
-                        # 显示结果
-                        self.root.after(0, lambda: self.log(f"\n📊 文件夹上传完成:", "success"))
-                        self.root.after(0, lambda s=successful_uploads: self.log(f"  ✅ 成功: {s} 个文件", "success"))
-                        if failed_uploads > 0:
-                            self.root.after(0, lambda f=failed_uploads: self.log(f"  ❌ 失败: {f} 个文件", "error"))
-                        
-                        self.root.after(0, lambda: self.update_progress(100, "文件夹上传完成"))
-                        
-                    except Exception as e:
-                        self.root.after(0, lambda: self.log(f"❌ 上传文件夹失败: {e}", "error"))
-                        self.root.after(0, self.reset_progress)
-                
-                threading.Thread(target=upload_thread, daemon=True).start()
+                try:
+                    jobs = self.queue.add_folder(folder_path)
+                except OSError as e:
+                    self.log(f"❌ 扫描文件夹失败: {e}", "error")
+                    return
+                if not jobs:
+                    self.log(f"❌ 文件夹为空: {folder_path}", "error")
+                    return
+                total_size = sum(job.size for job in jobs)
+                self.log(f"📁 文件夹 {folder_name}: {len(jobs)} 个文件 ({total_size} bytes) 已加入队列", "info")
+    
+    def on_job_event(self, job):
+        """传输队列的任务状态变化（在工作线程中调用），结束的任务记录到日志"""
+        kind = '下载' if job.kind == DOWNLOAD else '上传'
+        if job.state == DONE:
+            self.log(f"✅ {kind}完成: {job.remote_name}", "success")
+        elif job.state == FAILED:
+            self.log(f"❌ {kind}失败: {job.remote_name} ({job.error})", "error")
+    
+    def refresh_queue(self):
+        """定时刷新任务列表、总进度和合计吞吐"""
+        self.queue_refresh_id = None
+        if self.queue is None:
+            return
+        jobs = self.queue.jobs()
+        present = set()
+        for job in jobs:
+            iid = str(job.id)
+            present.add(iid)
+            state = f"{job.state_label}: {job.error}" if job.state == FAILED else job.state_label
+            values = ('下载' if job.kind == DOWNLOAD else '上传', job.size, f"{job.percent:.1f}%", state)
+            if not self.queue_tree.exists(iid):
+                self.queue_tree.insert("", tk.END, iid=iid, text=job.remote_name, values=values)
+            elif self.queue_tree.item(iid, 'values') != tuple(str(value) for value in values):
+                self.queue_tree.item(iid, values=values)
+        for iid in self.queue_tree.get_children():
+            if iid not in present:
+                self.queue_tree.delete(iid)
+        
+        counts = self.queue.counts()
+        busy = counts[RUNNING] or counts[PENDING]
+        if busy:
+            active = [job for job in jobs if job.state not in (FAILED, CANCELLED)]
+            total = sum(job.size for job in active)
+            done = sum(job.done for job in active)
+            self.update_progress(done / total * 100 if total else 0,
+                                 f"队列: 运行中 {counts[RUNNING]}, 等待 {counts[PENDING]}, 完成 {counts[DONE]}, "
+                                 f"失败 {counts[FAILED]} - 合计 {format_rate(self.queue.throughput())}")
+        elif self.queue_busy:
+            self.update_progress(100, f"队列空闲: 完成 {counts[DONE]}, 失败 {counts[FAILED]}, "
+                                      f"暂停 {counts[PAUSED]}, 取消 {counts[CANCELLED]}")
+        self.queue_busy = busy
+        self.queue_refresh_id = self.root.after(QUEUE_REFRESH_MS, self.refresh_queue)
+    
+    def control_jobs(self, action):
+        """对选中的任务执行 pause / resume / cancel"""
+        if self.queue is None:
+            return
+        ids = {int(iid) for iid in self.queue_tree.selection()}
+        jobs = [job for job in self.queue.jobs() if job.id in ids]
+        if not jobs:
+            messagebox.showwarning("提示", "请先在传输队列中选择任务")
+            return
+        for job in jobs:
+            getattr(self.queue, action)(job)
+    
+    def clear_finished_jobs(self):
+        """从列表中移除已完成、失败和已取消的任务"""
+        if self.queue is not None:
+            for job in self.queue.clear_finished():
+                if self.queue_tree.exists(str(job.id)):
+                    self.queue_tree.delete(str(job.id))
+    
+    def on_queue_settings_changed(self, event=None):
+        """调度策略和并行连接数立即生效"""
+        if self.queue is None:
+            return
+        try:
+            self.queue.set_workers(self.workers_var.get())
+        except (tk.TclError, ValueError):
+            return
+        self.queue.set_policy(self.policy_var.get())
+        self.log(f"📋 传输队列: {self.queue.workers} 条并行连接, 调度 {self.queue.policy}", "info")
                 
     def list_files(self):
         """列出服务器文件"""
@@ -494,237 +674,34 @@ class FileTransferGUI:
         
         def list_thread():
             try:
-                # 发送列表命令
-                self.client.socket.send("FILE:LIST".encode('utf-8'))
-                
-                # 接收文件列表 - 使用更大的缓冲区并循环接收
-                response_data = b''
-                while True:
-                    try:
-                        chunk = self.client.socket.recv(8192)
-                        if not chunk:
-                            break
-                        response_data += chunk
-                        # 检查是否接收完整
-                        if b'END_LIST\n' in response_data or b'END_LIST\r\n' in response_data:
-                            break
-                    except:
-                        break
-                
-                # 使用容错解码
-                response = response_data.decode('utf-8', errors='replace')
-                
-                if response.startswith("FILE_LIST:"):
-                    output = "📜 服务器文件列表:\n"
-                    output += "=" * 50 + "\n"
-                    
-                    lines = response.split('\n')
+                with self.operation_client() as client:
+                    # 边接收边解析，逐行交给日志区，由主循环批量显示
+                    self.log("📜 服务器文件列表:\n" + "=" * 50, "info")
                     file_count = 0
-                    
-                    for line in lines[1:]:  # 跳过第一行 "FILE_LIST:"
-                        if line.strip() == "END_LIST":
-                            break
-                        if line.strip():
-                            parts = line.split(':')
-                            if len(parts) >= 2:
-                                filename = parts[0]
-                                file_size = parts[1]
-                                output += f"📄 {filename} ({file_size} bytes)\n"
-                                file_count += 1
-                    
-                    output += "=" * 50 + "\n"
-                    output += f"总共 {file_count} 个文件"
-                else:
-                    output = "❌ 获取文件列表失败"
+                    for filename, file_size in client.iter_files():
+                        self.log(f"📄 {filename} ({file_size} bytes)", "info")
+                        file_count += 1
                 
-                self.root.after(0, lambda: self.log(output, "info"))
+                    self.log("=" * 50, "info")
+                    self.log(f"总共 {file_count} 个文件", "info")
                 
             except Exception as e:
-                self.root.after(0, lambda: self.log(f"❌ 列出文件失败: {e}", "error"))
+                self.log(f"❌ 列出文件失败: {e}", "error")
         
         threading.Thread(target=list_thread, daemon=True).start()
         
     def download_file(self):
-        """下载文件"""
-        # 先获取服务器文件列表
-        self.log("📋 正在获取服务器文件列表...", "info")
-        
-        try:
-            # 发送列表命令
-            self.client.socket.send("FILE:LIST".encode('utf-8'))
-            
-            # 接收文件列表 - 使用更大的缓冲区并循环接收
-            response_data = b''
-            while True:
-                try:
-                    chunk = self.client.socket.recv(8192)
-                    if not chunk:
-                        break
-                    response_data += chunk
-                    # 检查是否接收完整（包含 END_LIST\n）
-                    if b'END_LIST\n' in response_data or b'END_LIST\r\n' in response_data:
-                        break
-                except:
-                    break
-            
-            # 使用容错解码
-            response = response_data.decode('utf-8', errors='replace')
-            
-            if not response.startswith("FILE_LIST:"):
-                messagebox.showerror("错误", "无法获取文件列表")
-                return
-            
-            # 解析文件列表
-            files = []
-            lines = response.split('\n')
-            for line in lines[1:]:  # 跳过第一行 "FILE_LIST:"
-                if line.strip() == "END_LIST":
-                    break
-                if line.strip():
-                    parts = line.split(':')
-                    if len(parts) >= 2:
-                        filename = parts[0]
-                        file_size = parts[1]
-                        files.append(f"{filename} ({file_size} bytes)")
-            
-            if not files:
-                messagebox.showinfo("提示", "服务器上没有文件")
-                return
-            
-            # 创建文件选择对话框
-            selection_window = tk.Toplevel(self.root)
-            selection_window.title("选择要下载的文件")
-            selection_window.geometry("600x450")
-            selection_window.transient(self.root)
-            selection_window.grab_set()
-            
-            # 标题
-            ttk.Label(selection_window, text="请选择要下载的文件:", font=("Arial", 10, "bold")).pack(pady=10)
-            
-            # 文件列表框
-            list_frame = ttk.Frame(selection_window)
-            list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-            
-            scrollbar = ttk.Scrollbar(list_frame)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-            
-            listbox = tk.Listbox(
-                list_frame,
-                yscrollcommand=scrollbar.set,
-                font=("Consolas", 9),
-                selectmode=tk.SINGLE
-            )
-            listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            scrollbar.config(command=listbox.yview)
-            
-            # 填充文件列表
-            for file in files:
-                listbox.insert(tk.END, file)
-            
-            # 按钮区域
-            btn_frame = ttk.Frame(selection_window)
-            btn_frame.pack(fill=tk.X, padx=10, pady=10)
-            
-            selected_file = [None]  # 使用列表来存储选择结果
-            
-            def on_download():
-                selection = listbox.curselection()
-                if not selection:
-                    messagebox.showwarning("提示", "请先选择一个文件")
-                    return
-                
-                # 提取文件名（去掉大小信息）
-                selected_text = listbox.get(selection[0])
-                filename = selected_text.split(' (')[0]
-                selected_file[0] = filename
-                selection_window.destroy()
-            
-            def on_cancel():
-                selection_window.destroy()
-            
-            # 双击列表项也可以下载
-            def on_double_click(event):
-                on_download()
-            
-            listbox.bind("<Double-Button-1>", on_double_click)
-            
-            ttk.Button(btn_frame, text="📥 下载", command=on_download).pack(side=tk.LEFT, padx=5)
-            ttk.Button(btn_frame, text="❌ 取消", command=on_cancel).pack(side=tk.LEFT, padx=5)
-            
-            # 等待窗口关闭
-            self.root.wait_window(selection_window)
-            
-            # 如果用户选择了文件，开始下载
-            if selected_file[0]:
-                filename = selected_file[0]
-                save_dir = filedialog.askdirectory(title="选择保存位置")
-                
-                if save_dir:
-                    self.log(f"📥 准备下载文件: {filename}", "info")
-                    self.reset_progress()
-                    
-                    def download_thread():
-                        try:
-                            # 发送下载命令
-                            download_command = f"FILE:DOWNLOAD:{filename}"
-                            self.client.socket.send(download_command.encode('utf-8'))
-                            
-                            # 接收文件信息
-                            response = self.client.socket.recv(1024).decode('utf-8')
-                            
-                            if response.startswith("ERROR"):
-                                self.root.after(0, lambda: self.log(f"❌ 下载失败: {response}", "error"))
-                                self.root.after(0, self.reset_progress)
-                                return
-                            
-                            if not response.startswith("FILE_INFO:"):
-                                self.root.after(0, lambda: self.log(f"❌ 意外的服务器响应: {response}", "error"))
-                                self.root.after(0, self.reset_progress)
-                                return
-                            
-                            # 解析文件大小
-                            file_size = int(response.split(':')[1].strip())
-                            self.root.after(0, lambda: self.log(f"📋 文件大小: {file_size} bytes", "info"))
-                            
-                            # 发送准备确认
-                            self.client.socket.send("READY".encode('utf-8'))
-                            
-                            # 接收文件数据
-                            local_file_path = os.path.join(save_dir, os.path.basename(filename))
-                            bytes_received = 0
-                            
-                            with open(local_file_path, 'wb') as file:
-                                while bytes_received < file_size:
-                                    remaining = file_size - bytes_received
-                                    buffer_size = min(8192, remaining)
-                                    
-                                    data = self.client.socket.recv(buffer_size)
-                                    if not data:
-                                        break
-                                    
-                                    file.write(data)
-                                    bytes_received += len(data)
-                                    
-                                    # 更新进度
-                                    progress = (bytes_received / file_size) * 100
-                                    fn = os.path.basename(filename)
-                                    self.root.after(0, lambda p=progress, r=bytes_received, t=file_size, fname=fn:
-                                                  self.update_progress(p, f"下载: {fname} ({p:.1f}% - {r}/{t} bytes)"))
-                            
-                            self.root.after(0, lambda: self.log(f"✅ 文件下载成功: {local_file_path}", "success"))
-                            fn = os.path.basename(filename)
-                            self.root.after(0, lambda fname=fn: self.update_progress(100, f"下载完成: {fname}"))
-                            self.root.after(0, lambda path=local_file_path: messagebox.showinfo("成功", f"文件下载成功！\n保存到: {path}"))
-                            
-                        except Exception as e:
-                            self.root.after(0, lambda err=str(e): self.log(f"❌ 下载文件失败: {err}", "error"))
-                            self.root.after(0, self.reset_progress)
-                    
-                    threading.Thread(target=download_thread, daemon=True).start()
-                    
-        except Exception as e:
-            self.log(f"❌ 获取文件列表失败: {e}", "error")
-            messagebox.showerror("错误", f"获取文件列表失败: {e}")
+        """浏览服务器文件，选中的文件加入传输队列"""
+        # 文件选择对话框在后台取回完整列表并建立索引，列表只渲染可见的行，支持过滤、排序和文件夹树
+        selected_files = RemoteBrowser(self.root, self.operation_client, self.log).run()
+        
+        # 选中的文件加入传输队列，保存时保持服务器上的目录结构
+        if selected_files:
+            save_dir = filedialog.askdirectory(title="选择保存位置")
+            if save_dir:
+                for path, size in selected_files:
+                    self.queue.add_download(path, save_dir, size)
+                    self.log(f"📥 加入队列: {path} ({size} bytes)", "info")
 
             
     def on_closing(self):
@@ -733,8 +710,10 @@ class FileTransferGUI:
             result = messagebox.askyesno("确认退出", "当前已连接到服务器，确认退出吗？")
             if result:
                 self.disconnect()
+                self.log_pane.close()
                 self.root.destroy()
         else:
+            self.log_pane.close()
             self.root.destroy()
 
 
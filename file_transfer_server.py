@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+FILE: 协议的Python参考服务器
+与 SocketServer::handleFileCommand 使用相同的协议，不需要编译C++服务器即可运行客户端测试和基准测试：
+- 上传（UPLOAD / RESUME / PARTIAL）、打包上传（BUNDLE）、下载（DOWNLOAD / DOWNLOAD_RANGE，经 sendfile 发送）、
+  STAT、文件列表（整表和分页）、CAPS，以及分帧控制消息；其他消息原样回显
+- 基于 asyncio 的事件循环，一个进程即可服务大量并发连接
+- --workers N 启动N个进程，各自用 SO_REUSEPORT 监听同一端口，由内核在进程间分配连接，
+  可以作为C++每连接一个线程的对照基线
+压缩、增量、去重和多路复用不在参考实现的范围内：CAPS 不声明这些能力，对应命令回复错误，客户端自动退回普通传输
+"""
+
+import asyncio
+import multiprocessing
+import os
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+
+from file_transfer_client import BUNDLE_ENTRY_HEADER
+from wire_protocol import FRAME_HEADER, FRAME_MAGIC, FRAME_TEXT, MAX_MESSAGE_SIZE, ProtocolError, encode_frame
+
+# 上传过程中的临时文件后缀（断点续传、增量重建、去重复制），与C++服务器一致，文件列表中不显示
+PARTIAL_SUFFIX = '.ftpart'
+TEMPORARY_SUFFIXES = (PARTIAL_SUFFIX, '.ftdelta', '.ftdedup')
+
+# 分页列表每页最多返回的条目数
+LIST_MAX_PAGE_SIZE = 10000
+
+# 分页列表的缓存（与C++服务器相同）：目录排序后的内容在目录修改时间变化前一直有效；
+# 子目录的汇总还受深层目录变化影响，最多使用这么多秒。缓存的目录数超过上限时整个清空
+LIST_TOTALS_TTL = 10.0
+LIST_CACHE_MAX_DIRS = 4096
+
+# 整表列表每攒够这么多数据发送一次，不在内存中拼出整个列表
+LIST_CHUNK_SIZE = 64 * 1024
+
+# 旧文本协议下一次读取的最大长度（一次读到的内容就是一条命令）
+LEGACY_MESSAGE_SIZE = 64 * 1024
+
+# StreamReader 的缓冲上限，以及接收文件数据时每次取出的最大字节数
+STREAM_LIMIT = 1024 * 1024
+RECV_CHUNK = 1024 * 1024
+
+
+def is_temporary_name(name):
+    return name.endswith(TEMPORARY_SUFFIXES)
+
+
+def compile_glob(pattern):
+    """文件名通配符（只支持 * 和 ?，与C++服务器的 globMatch 一致）编译为正则表达式"""
+    translated = ''.join('.*' if c == '*' else '.' if c == '?' else re.escape(c) for c in pattern)
+    return re.compile(translated + r'\Z', re.DOTALL)
+
+
+class FileStore:
+    """服务器文件目录：路径映射和文件列表，供各连接共享"""
+
+    def __init__(self, file_dir='./uploads'):
+        self.file_dir = file_dir
+        os.makedirs(file_dir, exist_ok=True)
+        # 分页列表在线程池中执行，缓存由锁保护
+        self._cache_lock = threading.Lock()
+        self._listing_cache = {}   # 目录 -> (修改时间, [(名称, 路径, 是否目录)])
+        self._totals_cache = {}    # 目录 -> (修改时间, 计算时间, 文件数, 总大小)
+
+    def file_path(self, filename, create_parent=True):
+        # 防止路径遍历攻击，与C++服务器的 getFilePath 相同
+        safe_name = filename.replace('..', '').replace('\\', '/')
+        path = f"{self.file_dir}/{safe_name}"
+        if create_parent:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def list_chunks(self):
+        """整表列表: FILE_LIST:\\n 路径:大小 ... END_LIST\\n，按 LIST_CHUNK_SIZE 切成多段"""
+        chunks = []
+        text = ["FILE_LIST:\n"]
+        size = len(text[0])
+        for directory, subdirs, files in os.walk(self.file_dir):
+            subdirs.sort()
+            relative = os.path.relpath(directory, self.file_dir).replace(os.sep, '/')
+            prefix = '' if relative == '.' else relative + '/'
+            for name in sorted(files):
+                if is_temporary_name(name):
+                    continue
+                try:
+                    file_size = os.path.getsize(os.path.join(directory, name))
+                except OSError:
+                    continue
+                line = f"{prefix}{name}:{file_size}\n"
+                text.append(line)
+                size += len(line)
+                if size >= LIST_CHUNK_SIZE:
+                    chunks.append(''.join(text))
+                    text = []
+                    size = 0
+        text.append("END_LIST\n")
+        chunks.append(''.join(text))
+        return chunks
+
+    def list_page(self, limit, recursive, prefix, pattern, cursor):
+        """分页列表，与C++服务器的 sendFileListPage / collectListPage 相同:
+        同一目录下的条目按名称排序后深度优先遍历，光标是上一页最后一条的路径，页满时返回 NEXT 行
+        """
+        limit = max(1, min(limit, LIST_MAX_PAGE_SIZE))
+        # 前缀拆成 目录部分 + 文件名前缀: "docs/rep" 从 docs/ 开始，只看以 rep 开头的条目
+        head, slash, name_prefix = prefix.replace('\\', '/').rpartition('/')
+        base_dir = head + slash
+        cursor_parts = []
+        if cursor and cursor.startswith(base_dir):
+            cursor_parts = [part for part in cursor[len(base_dir):].split('/') if part]
+        matcher = compile_glob(pattern) if pattern else None
+
+        lines = []
+        last = [None]
+
+        def collect(directory, rel_dir, depth, cursor_active, name_prefix):
+            for name, path, is_dir in self._read_directory_sorted(directory):
+                if name_prefix and not name.startswith(name_prefix):
+                    continue
+                child_cursor = False
+                if cursor_active:
+                    target = cursor_parts[depth]
+                    if name < target:
+                        continue
+                    if name == target:
+                        if depth + 1 == len(cursor_parts):
+                            continue  # 光标指向的条目已在上一页返回
+                        child_cursor = True
+                    # 越过光标所在的分支后，后面的条目都不再受光标限制
+                    cursor_active = name == target
+
+                rel_path = rel_dir + name
+                if is_dir:
+                    if recursive:
+                        if not collect(path, rel_path + '/', depth + 1, child_cursor, ''):
+                            return False
+                        continue
+                    # 单层模式：子目录返回汇总的文件数和总大小
+                    file_count, total_bytes = self._directory_totals(path)
+                    lines.append(f"D:{rel_path}:{file_count}:{total_bytes}\n")
+                else:
+                    if matcher is not None and not matcher.match(name):
+                        continue
+                    # 目录项可能来自缓存，大小总是重新读取
+                    try:
+                        file_size = os.path.getsize(path)
+                    except OSError:
+                        file_size = 0
+                    lines.append(f"F:{rel_path}:{file_size}\n")
+
+                last[0] = rel_path
+                if len(lines) >= limit:
+                    return False
+            return True
+
+        start_dir = self.file_path(base_dir, create_parent=False)
+        complete = collect(start_dir, base_dir, 0, bool(cursor_parts), name_prefix) \
+            if os.path.isdir(start_dir) else True
+        reply = f"FILE_PAGE:{len(lines)}\n" + ''.join(lines)
+        if not complete:
+            reply += f"NEXT:{last[0]}\n"
+        return reply + "END_LIST\n"
+
+    def _read_directory_sorted(self, directory):
+        """目录的 [(名称, 路径, 是否目录)]，按名称排序；翻页时每一页都要重看，按目录修改时间缓存"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return []
+        with self._cache_lock:
+            cached = self._listing_cache.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        children = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            children.append((entry.name, entry.path, True))
+                        elif entry.is_file() and not is_temporary_name(entry.name):
+                            children.append((entry.name, entry.path, False))
+                    except OSError:
+                        continue
+        except OSError:
+            return []
+        children.sort()
+        self._store(self._listing_cache, directory, (mtime, children))
+        return children
+
+    def _directory_totals(self, directory):
+        """子目录的 (文件数, 总大小)：需要遍历整个子树，有效期内（且修改时间未变）只遍历一次"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return 0, 0
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._totals_cache.get(directory)
+        if cached is not None and cached[0] == mtime and now - cached[1] < LIST_TOTALS_TTL:
+            return cached[2], cached[3]
+
+        file_count = 0
+        total_bytes = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if is_temporary_name(name):
+                    continue
+                try:
+                    total_bytes += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+                file_count += 1
+        self._store(self._totals_cache, directory, (mtime, now, file_count, total_bytes))
+        return file_count, total_bytes
+
+    def _store(self, cache, directory, value):
+        with self._cache_lock:
+            if len(cache) >= LIST_CACHE_MAX_DIRS:
+                cache.clear()
+            cache[directory] = value
+
+
+class ClientSession:
+    """一条客户端连接：接收命令、收发文件数据
+
+    旧文本协议一次读取到的内容就是一条命令；收到以魔数开头的数据后切换为分帧协议，回复也按帧发送。
+    解析命令时多读到的数据留在 _pending 中，先于socket中的数据交给后续的读取
+    """
+
+    def __init__(self, store, reader, writer):
+        self.store = store
+        self.reader = reader
+        self.writer = writer
+        self.framed = False
+        self._pending = b''
+        self._handlers = {
+            'LIST': self._handle_list,
+            'CAPS': self._handle_caps,
+            'UPLOAD': self._handle_upload,
+            'PARTIAL': self._handle_partial,
+            'RESUME': self._handle_resume,
+            'BUNDLE': self._handle_bundle,
+            'DOWNLOAD': self._handle_download,
+            'DOWNLOAD_RANGE': self._handle_download_range,
+            'STAT': self._handle_stat,
+        }
+
+    async def run(self):
+        try:
+            while True:
+                message = await self.receive_message()
+                if message is None:
+                    break
+                if message.startswith("FILE:"):
+                    await self.handle_file_command(message)
+                else:
+                    await self.send_message("Echo: " + message)
+        except (OSError, EOFError):
+            pass  # 连接断开或协议错误
+        finally:
+            self.writer.close()
+
+    async def read_some(self, n):
+        """读取最多n字节原始数据，连接关闭时返回空"""
+        if self._pending:
+            data, self._pending = self._pending[:n], self._pending[n:]
+            return data
+        return await self.reader.read(n)
+
+    async def read_exactly(self, n):
+        if not self._pending:
+            return await self.reader.readexactly(n)
+        data = await self.read_some(n)
+        if len(data) < n:
+            data += await self.reader.readexactly(n - len(data))
+        return data
+
+    async def receive_message(self):
+        """接收一条命令，连接关闭时返回None"""
+        if not self.framed:
+            data = self._pending or await self.reader.read(LEGACY_MESSAGE_SIZE)
+            if not data:
+                return None
+            if data[0] != FRAME_MAGIC:
+                self._pending = b''
+                return data.decode('utf-8', errors='replace')
+            self._pending = data
+            self.framed = True
+
+        magic, frame_type, _, length = FRAME_HEADER.unpack(await self.read_exactly(FRAME_HEADER.size))
+        if magic != FRAME_MAGIC or frame_type != FRAME_TEXT or length > MAX_MESSAGE_SIZE:
+            raise ProtocolError("无效的消息帧")
+        payload = await self.read_exactly(length) if length else b''
+        return payload.decode('utf-8', errors='replace')
+
+    async def send_message(self, message):
+        self.writer.write(encode_frame(message) if self.framed else message.encode('utf-8'))
+        await self.writer.drain()
+
+    async def handle_file_command(self, command):
+        # 命令格式: FILE:ACTION:FILENAME[:参数...]
+        parts = command.split(':')
+        handler = self._handlers.get(parts[1]) if len(parts) >= 2 else None
+        if handler is None:
+            if len(parts) < 2:
+                await self.send_message("ERROR: Invalid file command format\n")
+            else:
+                await self.send_message("ERROR: Unknown file action\n")
+            return
+        if parts[1] not in ('LIST', 'CAPS') and len(parts) < 3:
+            await self.send_message("ERROR: Invalid file command format\n")
+            return
+        try:
+            await handler(parts)
+        except ValueError:
+            await self.send_message("ERROR: Invalid file command format\n")
+
+    async def _handle_list(self, parts):
+        loop = asyncio.get_running_loop()
+        # 遍历目录是阻塞的磁盘操作，放到线程池中执行，不耽误事件循环上的其他连接
+        if len(parts) <= 2:
+            for chunk in await loop.run_in_executor(None, self.store.list_chunks):
+                await self.send_message(chunk)
+            return
+
+        # 分页列表: FILE:LIST:<每页条数>:<R递归|D单层>:<前缀>:<通配符>:<光标>，光标可能含有冒号
+        limit = int(parts[2])
+        recursive = len(parts) <= 3 or parts[3] != 'D'
+        prefix = parts[4] if len(parts) > 4 else ''
+        pattern = parts[5] if len(parts) > 5 else ''
+        cursor = ':'.join(parts[6:])
+        reply = await loop.run_in_executor(None, self.store.list_page, limit, recursive, prefix, pattern, cursor)
+        await self.send_message(reply)
+
+    async def _handle_caps(self, parts):
+        # 只支持分帧，不声明压缩算法和多路复用
+        await self.send_message("CAPS:compress=;frame=1\n")
+
+    async def _handle_upload(self, parts):
+        if len(parts) < 4:
+            await self.send_message("ERROR: File size required for upload\n")
+            return
+        file_size = int(parts[3])
+        await self.send_message("READY\n")
+        if await self._receive_file_data(self.store.file_path(parts[2]), file_size):
+            await self.send_message("SUCCESS: File uploaded successfully\n")
+        else:
+            await self.send_message("ERROR: File upload failed\n")
+
+    async def _handle_partial(self, parts):
+        try:
+            part_size = os.path.getsize(self.store.file_path(parts[2], create_parent=False) + PARTIAL_SUFFIX)
+        except OSError:
+            part_size = 0
+        await self.send_message(f"PARTIAL:{part_size}\n")
+
+    async def _handle_resume(self, parts):
+        # FILE:RESUME:<文件名>:<总大小>:<偏移>
+        if len(parts) < 5:
+            await self.send_message("ERROR: File size and offset required for resume\n")
+            return
+        file_size = int(parts[3])
+        offset = int(parts[4])
+        path = self.store.file_path(parts[2])
+        part_path = path + PARTIAL_SUFFIX
+
+        # 续传偏移不能超过已保存的部分；已保存的部分比偏移长时截掉多余的尾部
+        try:
+            part_size = os.path.getsize(part_path)
+        except OSError:
+            part_size = 0
+        if offset > part_size or offset > file_size:
+            await self.send_message("ERROR: File upload failed\n")
+            return
+        if 0 < offset < part_size:
+            os.truncate(part_path, offset)
+
+        await self.send_message("READY\n")
+        # 连接中断时保留临时文件，下次从已收到的位置继续
+        if await self._receive_file_data(part_path, file_size - offset, offset, remove_on_failure=False):
+            os.replace(part_path, path)
+            await self.send_message("SUCCESS: File uploaded successfully\n")
+        else:
+            await self.send_message("ERROR: File upload failed\n")
+
+    async def _receive_file_data(self, path, size, offset=0, remove_on_failure=True):
+        try:
+            file = open(path, 'r+b' if offset else 'wb')
+        except OSError as e:
+            print(f"❌ 无法创建文件 {path}: {e}")
+            return False
+        with file:
+            if offset:
+                file.seek(offset)
+            remaining = size
+            while remaining:
+                data = await self.read_some(min(remaining, RECV_CHUNK))
+                if not data:
+                    break
+                file.write(data)
+                remaining -= len(data)
+        if remaining and remove_on_failure:
+            os.remove(path)
+        return not remaining
+
+    async def _handle_bundle(self, parts):
+        # FILE:BUNDLE:<文件数>:<总字节数>，随后每个文件是 头部(路径长度u16, 数据长度u64) + 路径 + 数据
+        await self.send_message("READY\n")
+        results = []
+        succeeded = 0
+        last_parent = None
+        while True:
+            name_length, data_length = BUNDLE_ENTRY_HEADER.unpack(await self.read_exactly(BUNDLE_ENTRY_HEADER.size))
+            if name_length == 0:
+                break  # 结束标记
+            filename = (await self.read_exactly(name_length)).decode('utf-8', errors='replace')
+
+            # 同一目录下的连续文件只在第一次时创建父目录
+            path = self.store.file_path(filename, create_parent=False)
+            parent = os.path.dirname(path)
+            try:
+                if parent != last_parent:
+                    os.makedirs(parent, exist_ok=True)
+                    last_parent = parent
+                file = open(path, 'wb')
+            except OSError:
+                file = None
+
+            # 无法写入时仍需读走数据，保持流同步
+            remaining = data_length
+            while remaining:
+                data = await self.read_exactly(min(remaining, RECV_CHUNK))
+                if file is not None:
+                    try:
+                        file.write(data)
+                    except OSError:
+                        file.close()
+                        file = None
+                remaining -= len(data)
+
+            if file is not None:
+                file.close()
+                succeeded += 1
+                results.append(f"OK:{filename}\n")
+            else:
+                results.append(f"ERR:{filename}\n")
+
+        failed = len(results) - succeeded
+        await self.send_message(f"BUNDLE_RESULT:{succeeded}:{failed}\n" + ''.join(results) + "END_BUNDLE\n")
+
+    async def _handle_download(self, parts):
+        if not await self._send_file(parts[2]):
+            await self.send_message("ERROR: File not found or download failed\n")
+
+    async def _handle_download_range(self, parts):
+        # FILE:DOWNLOAD_RANGE:<文件名>:<偏移>:<长度>
+        if len(parts) < 5:
+            await self.send_message("ERROR: Offset and length required for range download\n")
+            return
+        if not await self._send_file(parts[2], int(parts[3]), int(parts[4])):
+            await self.send_message("ERROR: File not found or download failed\n")
+
+    async def _send_file(self, filename, offset=0, length=None):
+        try:
+            file = open(self.store.file_path(filename, create_parent=False), 'rb')
+        except OSError:
+            return False
+        with file:
+            file_size = os.fstat(file.fileno()).st_size
+            # 区间下载：截取到文件末尾为止
+            if offset > file_size:
+                return False
+            send_size = file_size - offset if length is None else min(length, file_size - offset)
+
+            await self.send_message(f"FILE_INFO:{send_size}\n")
+            response = await self.receive_message()
+            if response is None or "READY" not in response:
+                return False
+            # 文件数据经 sendfile 从页缓存直接发送，不经过用户态缓冲区
+            if send_size:
+                await asyncio.get_running_loop().sendfile(self.writer.transport, file, offset, send_size)
+        return True
+
+    async def _handle_stat(self, parts):
+        try:
+            stat = os.stat(self.store.file_path(parts[2], create_parent=False))
+        except OSError:
+            await self.send_message("ERROR: File not found\n")
+            return
+        await self.send_message(f"FILE_STAT:{stat.st_size}:{stat.st_mtime_ns}\n")
+
+
+async def serve(store, host, port, unix_socket=None, reuse_port=False):
+    """在当前进程的事件循环上服务TCP端口（以及可选的已绑定Unix域套接字），直到进程退出"""
+    async def handle_client(reader, writer):
+        await ClientSession(store, reader, writer).run()
+
+    servers = [await asyncio.start_server(handle_client, host, port, limit=STREAM_LIMIT,
+                                          backlog=socket.SOMAXCONN, reuse_port=reuse_port)]
+    if unix_socket is not None:
+        servers.append(await asyncio.start_unix_server(handle_client, sock=unix_socket, limit=STREAM_LIMIT))
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+def run_worker(file_dir, host, port, unix_socket, reuse_port):
+    """工作进程入口：Ctrl+C 由主进程处理，工作进程随主进程一起结束"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        asyncio.run(serve(FileStore(file_dir), host, port, unix_socket, reuse_port))
+    except OSError as e:
+        print(f"❌ 工作进程 {os.getpid()} 启动失败: {e}")
+        sys.exit(1)
+
+
+def open_unix_socket(path):
+    """绑定Unix域套接字；多进程模式下由主进程创建，工作进程继承后共同accept"""
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(socket.SOMAXCONN)
+    return sock
+
+
+def print_usage():
+    print("使用方法:")
+    print("  python file_transfer_server.py [端口] [文件目录] [--unix 套接字路径] [--workers 进程数]")
+    print("")
+    print("  默认监听8080，文件存放在 ./uploads；--workers 大于1时多个进程用 SO_REUSEPORT 共享端口")
+
+
+def main():
+    print("🚀 文件传输服务器 (Python参考实现)")
+    print("=" * 40)
+
+    args = sys.argv[1:]
+    positional = []
+    unix_path = None
+    workers = 1
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg in ('-h', '--help'):
+                print_usage()
+                return 0
+            elif arg == '--unix':
+                unix_path = args.pop(0)
+            elif arg == '--workers':
+                workers = max(1, int(args.pop(0)))
+            else:
+                positional.append(arg)
+        port = int(positional[0]) if positional else 8080
+    except (IndexError, ValueError):
+        print_usage()
+        return 1
+    file_dir = positional[1] if len(positional) > 1 else './uploads'
+    host = '0.0.0.0'
+
+    if workers > 1 and (not hasattr(socket, 'SO_REUSEPORT') or not hasattr(os, 'fork')):
+        print("⚠️ 当前平台不支持 SO_REUSEPORT 多进程监听，使用单进程")
+        workers = 1
+    if unix_path and not hasattr(socket, 'AF_UNIX'):
+        print("⚠️ 当前平台不支持Unix域套接字，忽略 --unix")
+        unix_path = None
+
+    FileStore(file_dir)
+    unix_socket = open_unix_socket(unix_path) if unix_path else None
+    print(f"✅ 监听 {host}:{port}" + (f" 和 {unix_path}" if unix_path else "") +
+          f"，文件目录 {file_dir}，{workers} 个进程")
+    print(f"💡 可以用 telnet localhost {port} 测试")
+
+    # 被终止时也走正常退出流程，清理Unix域套接字文件，多进程模式下同时结束工作进程
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        if workers == 1:
+            asyncio.run(serve(FileStore(file_dir), host, port, unix_socket))
+            return 0
+
+        # 主进程只负责启动和回收工作进程：任一工作进程退出时结束全部进程
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=run_worker, args=(file_dir, host, port, unix_socket, True), daemon=True)
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        while all(process.is_alive() for process in processes):
+            processes[0].join(0.5)
+        print("❌ 工作进程意外退出")
+        return 1
+    except KeyboardInterrupt:
+        print("\n👋 正在退出...")
+        return 0
+    except OSError as e:
+        print(f"❌ 启动失败: {e}")
+        return 1
+    finally:
+        if unix_path:
+            unix_socket.close()
+            try:
+                os.unlink(unix_path)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
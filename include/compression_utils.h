@@ -0,0 +1,45 @@
+#pragma once
+
+#include <cstddef>
+#include <string>
+#include <vector>
+
+// 传输压缩：文件数据按帧独立压缩，zlib和lzma均为可选依赖（USE_ZLIB / USE_LZMA）
+// 帧格式与Python端 transfer_compression.py 保持一致
+
+namespace compression {
+    // 帧头: 类型(u8) + 线上长度(u32) + 原始长度(u32)，小端序；原始长度为0表示结束
+    const size_t FRAME_HEADER_SIZE = 9;
+    const unsigned char FRAME_RAW = 0;
+    const unsigned char FRAME_COMPRESSED = 1;
+
+    // 单帧原始数据上限
+    const size_t MAX_FRAME_SIZE = 16 * 1024 * 1024;
+
+    // 本次编译支持的压缩算法，逗号分隔（如 "zlib,lzma"），都不支持时为空
+    std::string supportedCodecs();
+    bool codecSupported(const std::string& codec);
+
+    // 服务器压缩下载时每帧的原始数据大小：lzma的字典更大，用更大的帧才能发挥压缩率
+    size_t frameSize(const std::string& codec);
+
+    // 压缩一块数据到out；压缩失败或压缩后不小于原大小的90%时返回false，调用方应按原样发送
+    bool compressBlock(const std::string& codec, const char* data, size_t length, std::vector<char>& out);
+
+    // 解压一帧到out，解压结果必须恰好是outLength字节
+    bool decompressBlock(const std::string& codec, const char* data, size_t length, char* out, size_t outLength);
+
+    // 根据文件头和快速试压判断数据是否已经是压缩格式
+    bool looksIncompressible(const char* data, size_t length);
+
+    // 按已发送帧的压缩效果决定下一帧是否尝试压缩：连续几帧压不下去时暂停尝试一段
+    class Detector {
+    public:
+        bool shouldCompress();
+        void record(bool compressed);
+
+    private:
+        size_t m_misses = 0;
+        size_t m_skip = 0;
+    };
+}
@@ -0,0 +1,37 @@
+#pragma once
+
+#include <array>
+#include <cstddef>
+#include <cstdint>
+#include <string>
+
+// 增量上传使用的校验和：SHA-256强校验 + rsync式弱滚动校验和
+// 不依赖OpenSSL等外部库，保证与Python端 hashlib.sha256 的结果一致
+
+class Sha256 {
+public:
+    static const size_t DIGEST_SIZE = 32;
+    using Digest = std::array<unsigned char, DIGEST_SIZE>;
+
+    Sha256();
+
+    void update(const void* data, size_t length);
+    Digest digest();
+
+    // 计算一段数据的SHA-256
+    static Digest hash(const void* data, size_t length);
+
+private:
+    void transform(const unsigned char* block);
+
+    uint32_t m_state[8];
+    unsigned char m_buffer[64];
+    size_t m_bufferLength;
+    uint64_t m_totalLength;
+};
+
+// 弱校验和: a = Σx[i] mod 2^16, b = Σ(L-i)·x[i] mod 2^16, 返回 a | (b << 16)
+uint32_t weakChecksum(const unsigned char* data, size_t length);
+
+// 摘要转换为十六进制字符串（用于日志）
+std::string toHex(const unsigned char* data, size_t length);
@@ -0,0 +1,102 @@
+#pragma once
+
+#include "socket_server.h"
+
+#include <condition_variable>
+#include <cstddef>
+#include <cstdint>
+#include <deque>
+#include <functional>
+#include <map>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <vector>
+
+// 多路复用会话：一条TCP连接上承载多个逻辑通道，每个通道相当于一条独立的客户端连接。
+// 每个通道背后是一对本地socket，一端交给普通的客户端处理函数，另一端由会话在通道帧和socket之间搬运数据，
+// 所以现有的命令处理代码不需要知道自己运行在复用通道上。
+// 帧格式与Python端 wire_protocol.py 保持一致
+
+namespace mux {
+    // 帧头: 类型(u8) + 标志(u8，保留为0) + 通道号(u16) + 负载长度(u32)，小端序
+    const size_t HEADER_SIZE = 8;
+    const unsigned char FRAME_OPEN = 1;    // 打开通道
+    const unsigned char FRAME_DATA = 2;    // 通道数据
+    const unsigned char FRAME_WINDOW = 3;  // 流控窗口增量，负载为u32
+    const unsigned char FRAME_CLOSE = 4;   // 发送方不再在该通道上发送数据
+
+    // 单个数据帧的负载上限：各通道按这个粒度轮流发送
+    const size_t MAX_CHUNK = 64 * 1024;
+    // 每个通道每个方向上已发送但对端尚未消费的数据上限
+    const size_t INITIAL_WINDOW = 1024 * 1024;
+    // 一个会话同时打开的通道上限
+    const size_t MAX_CHANNELS = 256;
+
+    // 从底层连接读取数据（返回值同recv）
+    using Reader = std::function<int(char*, size_t)>;
+    // 在新通道上运行的处理函数，阻塞直到通道关闭，负责关闭传入的socket
+    using Handler = std::function<void(SOCKET)>;
+
+    class Session {
+    public:
+        Session(SOCKET socket, Reader reader, Handler handler);
+
+        // 在调用线程上读取并分发帧；连接断开后关闭所有通道，等待相关线程结束后返回
+        void run();
+
+    private:
+        struct Channel {
+            uint16_t id = 0;
+            SOCKET local = INVALID_SOCKET;   // 会话一端
+            SOCKET inner = INVALID_SOCKET;   // 处理函数一端
+            std::thread handler;
+            std::thread inbound;
+            std::thread outbound;
+            int runningThreads = 3;
+
+            // 对端发来、尚未写入本地socket的数据
+            std::deque<std::vector<char>> received;
+            bool remoteClosed = false;
+            std::condition_variable receivedReady;
+
+            // 从本地socket读出、等待发送的一块数据
+            std::vector<char> chunk;
+            size_t chunkOffset = 0;
+            bool hasChunk = false;
+            bool localClosed = false;
+            bool closeSent = false;
+            std::condition_variable chunkTaken;
+
+            // 对端还能接收的字节数
+            size_t credit = INITIAL_WINDOW;
+        };
+
+        bool readExact(char* out, size_t length);
+        void openChannel(uint16_t id);
+        void reapChannels();
+        void inboundLoop(std::shared_ptr<Channel> channel);
+        void outboundLoop(std::shared_ptr<Channel> channel);
+        void writeLoop();
+        bool nextFrame(std::string& frame);
+        void threadDone(Channel& channel);
+
+        SOCKET m_socket;
+        Reader m_reader;
+        Handler m_handler;
+
+        std::mutex m_mutex;
+        std::condition_variable m_writerWake;
+        std::map<uint16_t, std::shared_ptr<Channel>> m_channels;
+        std::deque<std::string> m_control;  // 待发送的控制帧（窗口更新、关闭），优先于数据帧
+        uint16_t m_cursor = 0;              // 轮转发送：上一次发送数据的通道
+        bool m_stopping = false;
+    };
+
+    // 创建一对互相连接的本地流式socket（Windows下用回环TCP连接模拟）
+    bool createSocketPair(SOCKET pair[2]);
+
+    // 编码一个帧头
+    std::string encodeHeader(unsigned char type, uint16_t channel, uint32_t length);
+}
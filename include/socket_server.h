@@ -9,6 +9,8 @@
 #else
     #include <sys/socket.h>
     #include <netinet/in.h>
+    #include <netinet/tcp.h>
+    #include <sys/un.h>
     #include <arpa/inet.h>
     #include <unistd.h>
     #define SOCKET int
@@ -17,12 +19,22 @@
     #define closesocket close
 #endif
 
+#include <cstdint>
 #include <string>
 #include <vector>
 #include <memory>
 #include <functional>
 #include <fstream>
 #include <filesystem>
+#include <map>
+#include <chrono>
+#include <mutex>
+#include <thread>
+#include <atomic>
+#include <unordered_map>
+#include <unordered_set>
+
+#include "hash_utils.h"
 
 #ifdef USE_SPDLOG
     #include <spdlog/spdlog.h>
@@ -52,6 +64,12 @@ public:
     // 设置文件传输目录
     void setFileDirectory(const std::string& dir);
     
+    // 除TCP端口外再监听一个Unix域套接字（仅POSIX，需在start之前设置），本机客户端可绕过TCP协议栈
+    void setUnixSocketPath(const std::string& path);
+    
+    // 向客户端发送一条消息（客户端使用分帧协议时自动加帧头），供客户端消息处理函数回复使用
+    bool sendMessage(SOCKET clientSocket, const std::string& message);
+    
 #ifdef USE_SPDLOG
     // 设置日志级别
     void setLogLevel(spdlog::level::level_enum level);
@@ -63,8 +81,9 @@ private:
     void setupLogger();
     void createLogDirectory();
     void handleClient(SOCKET clientSocket);
+    bool startUnixListener();
+    void acceptUnixClients(SOCKET listenSocket);
     std::string receiveMessage(SOCKET clientSocket);
-    bool sendMessage(SOCKET clientSocket, const std::string& message);
     void logInfo(const std::string& message);
     void logError(const std::string& message);
     void logDebug(const std::string& message);
@@ -72,12 +91,74 @@ private:
     // 文件传输相关方法
     void handleFileCommand(SOCKET clientSocket, const std::string& command);
     bool handleFileUpload(SOCKET clientSocket, const std::string& filename, size_t fileSize);
-    bool handleFileDownload(SOCKET clientSocket, const std::string& filename);
+    bool handleFileDownload(SOCKET clientSocket, const std::string& filename,
+                            uint64_t offset = 0, uint64_t length = UINT64_MAX);
+    bool sendFileStat(SOCKET clientSocket, const std::string& filename);
+    
+    // 断点续传：上传数据先写入临时文件，完成后再改名
+    bool handleResumableUpload(SOCKET clientSocket, const std::string& filename,
+                               uint64_t fileSize, uint64_t offset);
+    bool sendPartialSize(SOCKET clientSocket, const std::string& filename);
     bool sendFileList(SOCKET clientSocket);
+    
+    // 分页列表：按前缀、通配符过滤，从光标处继续，可只列出一层目录
+    struct ListPageRequest {
+        size_t limit = 1000;
+        bool recursive = true;
+        std::string prefix;
+        std::string pattern;
+        std::string cursor;
+    };
+    struct ListPageState {
+        const ListPageRequest* request = nullptr;
+        std::vector<std::string> cursor;
+        std::string* out = nullptr;
+        std::string last;
+        size_t limit = 0;
+        size_t count = 0;
+    };
+    struct DirectoryChild {
+        std::string name;
+        std::filesystem::directory_entry entry;
+        bool isDir = false;
+    };
+    bool sendFileListPage(SOCKET clientSocket, const ListPageRequest& request);
+    bool collectListPage(const std::filesystem::path& dir, const std::string& relDir, size_t depth,
+                         bool cursorActive, const std::string& namePrefix, ListPageState& state);
+    std::shared_ptr<const std::vector<DirectoryChild>> readDirectorySorted(const std::filesystem::path& dir);
+    void directoryTotals(const std::filesystem::path& dir, uint64_t& fileCount, uint64_t& totalBytes);
+    std::string fileNameUtf8(const std::filesystem::path& path);
     bool createFileDirectory();
-    std::string getFilePath(const std::string& filename);
-    bool receiveFileData(SOCKET clientSocket, const std::string& filepath, size_t fileSize);
-    bool sendFileData(SOCKET clientSocket, const std::string& filepath);
+    std::string getFilePath(const std::string& filename, bool createParent = true);
+    bool receiveFileData(SOCKET clientSocket, const std::string& filepath, size_t fileSize,
+                         uint64_t offset = 0, bool removeOnFailure = true);
+    bool sendFileData(SOCKET clientSocket, const std::string& filepath,
+                      uint64_t offset = 0, uint64_t length = UINT64_MAX);
+    
+    // 增量上传：服务器发送旧文件的分块签名，客户端只发送块引用和变化的数据
+    bool sendBlockSignatures(SOCKET clientSocket, const std::string& filename, size_t blockSize);
+    bool handleDeltaUpload(SOCKET clientSocket, const std::string& filename,
+                           uint64_t fileSize, uint64_t blockSize, std::string& summary);
+    
+    // 压缩传输：能力协商，以及按帧压缩的上传/下载
+    bool sendCapabilities(SOCKET clientSocket);
+    bool handleCompressedUpload(SOCKET clientSocket, const std::string& filename, uint64_t fileSize,
+                                const std::string& codec, uint64_t offset, bool resumable, std::string& summary);
+    bool handleCompressedDownload(SOCKET clientSocket, const std::string& filename, const std::string& codec,
+                                  uint64_t offset = 0, uint64_t length = UINT64_MAX);
+    bool preparePartialFile(const std::string& partPath, uint64_t fileSize, uint64_t offset);
+    
+    // 按内容去重：客户端发送文件哈希，服务器已有相同内容时在本地复制，数据不经过网络
+    bool handleDedupQuery(SOCKET clientSocket, size_t count);
+    void buildContentIndex();
+    void noteStoredFile(const std::string& filepath);
+    void indexStoredFile(const std::filesystem::path& path);
+    std::filesystem::path findStoredContent(const Sha256::Digest& digest, uint64_t size);
+    bool copyStoredContent(const std::filesystem::path& source, const std::string& filename);
+    std::filesystem::path toFsPath(const std::string& utf8path);
+    
+    // 打包上传：一条命令内流式接收多个文件
+    bool handleBundleUpload(SOCKET clientSocket, size_t fileCount);
     
 #ifdef _WIN32
     // Windows下的UTF-8路径转换辅助函数
@@ -87,9 +168,47 @@ private:
 
     int m_port;
     SOCKET m_serverSocket;
-    bool m_running;
+    std::atomic<bool> m_running;
     ClientHandler m_clientHandler;
     std::string m_fileDirectory;
+    std::string m_unixSocketPath;
+    SOCKET m_unixSocket = INVALID_SOCKET;
+    std::thread m_unixAcceptThread;
+    
+    // 去重用的内容索引：按大小分组的已存文件，以及已算过的SHA-256（大小或修改时间变化后失效）
+    struct StoredDigest {
+        uint64_t size;
+        std::filesystem::file_time_type mtime;
+        Sha256::Digest digest;
+    };
+    // 索引在锁外建立，期间保存的文件先记在 m_pendingStored 中；更换存储目录后 m_contentGeneration 递增，
+    // 旧目录的索引建好后直接丢弃
+    struct PathHash {
+        size_t operator()(const std::filesystem::path& path) const { return std::filesystem::hash_value(path); }
+    };
+    std::mutex m_contentMutex;
+    bool m_contentIndexed = false;
+    bool m_contentBuilding = false;
+    uint64_t m_contentGeneration = 0;
+    std::unordered_map<uint64_t, std::unordered_set<std::filesystem::path, PathHash>> m_pathsBySize;
+    std::unordered_map<std::filesystem::path, uint64_t, PathHash> m_sizeByPath;
+    std::vector<std::filesystem::path> m_pendingStored;
+    std::map<std::filesystem::path, StoredDigest> m_storedDigests;
+    
+    // 分页列表的缓存：目录排序后的内容（按目录修改时间失效）和子目录汇总（另有有效期）
+    struct DirectoryListing {
+        std::filesystem::file_time_type mtime;
+        std::shared_ptr<const std::vector<DirectoryChild>> children;
+    };
+    struct DirectoryTotals {
+        std::filesystem::file_time_type mtime;
+        std::chrono::steady_clock::time_point computed;
+        uint64_t fileCount;
+        uint64_t totalBytes;
+    };
+    std::mutex m_listCacheMutex;
+    std::map<std::filesystem::path, DirectoryListing> m_listingCache;
+    std::map<std::filesystem::path, DirectoryTotals> m_totalsCache;
 
 #ifdef USE_SPDLOG
     std::shared_ptr<spdlog::logger> m_logger;
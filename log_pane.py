@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+GUI日志区
+每条日志都直接插入Text控件、滚动并刷新界面时，上传大文件夹的逐文件日志会占满Tk主循环，
+控件内容也会无限增长。LogPane 改为：
+- log() 只把消息追加到线程安全的 deque，任何线程都可以直接调用；deque 最多保留 max_lines 条，
+  积压超过上限时自动丢弃最早的消息（反正写入控件后也会马上被删掉）
+- 主循环按固定间隔批量写入控件：相邻同色的消息合并成一次插入
+- 控件最多保留 max_lines 行，超出时删除最早的行；用户向上翻看时不自动滚到底部
+- 可选把完整日志写入滚动文件（logging.handlers.RotatingFileHandler），写文件在后台线程进行
+"""
+
+import logging
+import logging.handlers
+import queue
+from collections import deque
+
+import tkinter as tk
+
+# 批量写入控件的间隔（毫秒）
+LOG_FLUSH_MS = 100
+
+# 控件最多保留的行数
+LOG_MAX_LINES = 5000
+
+# 滚动日志文件的大小和保留的旧文件个数
+LOG_FILE_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+# 颜色标签对应的文件日志级别
+TAG_LEVELS = {
+    'error': logging.ERROR,
+    'warning': logging.WARNING,
+}
+
+
+class LogPane:
+    """带批量刷新和行数上限的日志区，包装一个 tk.Text / ScrolledText 控件"""
+
+    def __init__(self, root, text, max_lines=LOG_MAX_LINES, flush_ms=LOG_FLUSH_MS):
+        self.root = root
+        self.text = text
+        self.max_lines = max_lines
+        self.flush_ms = flush_ms
+        self._pending = deque(maxlen=max_lines)
+        self._lines = 1              # 控件当前的行数（Text 末尾总有一个空行）
+        self._spill = None
+        self._listener = None
+        self._timer = self.root.after(self.flush_ms, self._flush)
+
+    def log(self, message, tag=None):
+        """追加一条日志（线程安全，不触碰控件）"""
+        self._pending.append((message, tag))
+        # 只读一次：主线程可能同时在 _stop_spill 中把它置为None
+        spill = self._spill
+        if spill is not None:
+            spill.log(TAG_LEVELS.get(tag, logging.INFO), message)
+
+    def clear(self):
+        self._pending.clear()
+        self.text.delete('1.0', tk.END)
+        self._lines = 1
+
+    def set_max_lines(self, max_lines):
+        self.max_lines = max(int(max_lines), 100)
+        self._pending = deque(self._pending, maxlen=self.max_lines)
+
+    def spill_to(self, path, max_bytes=LOG_FILE_BYTES, backups=LOG_FILE_BACKUPS):
+        """把之后的完整日志写入滚动文件 path，path 为空时停止写文件"""
+        self._stop_spill()
+        if not path:
+            return
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                       encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+        # 日志记录先进入队列，由 QueueListener 的后台线程写文件，主循环不等待磁盘
+        records = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(records, handler)
+        self._listener.start()
+        # 不经 logging.getLogger 注册：每个日志区用自己的私有 Logger，关闭后随对象一起释放
+        logger = logging.Logger(f'{__name__}.spill')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.handlers = [logging.handlers.QueueHandler(records)]
+        self._spill = logger
+
+    def close(self):
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+        self._stop_spill()
+
+    def _stop_spill(self):
+        if self._listener is not None:
+            self._spill = None
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    def _flush(self):
+        self._timer = self.root.after(self.flush_ms, self._flush)
+        count = len(self._pending)
+        if not count:
+            return
+        batch = [self._pending.popleft() for _ in range(count)]
+
+        # 相邻同色的消息合并成一段，整批用一次 insert 写入（空字符串表示不带颜色标签）
+        args = []
+        text = []
+        current = batch[0][1] or ''
+        lines = 0
+        for message, tag in batch:
+            tag = tag or ''
+            if tag != current:
+                args += ["".join(text), current]
+                text = []
+                current = tag
+            text.append(message)
+            text.append("\n")
+            lines += message.count("\n") + 1
+        args += ["".join(text), current]
+
+        at_bottom = self.text.yview()[1] >= 0.999
+        self.text.insert(tk.END, *args)
+        self._lines += lines
+        excess = self._lines - 1 - self.max_lines
+        if excess > 0:
+            self.text.delete('1.0', f'{excess + 1}.0')
+            self._lines -= excess
+        if at_bottom:
+            self.text.see(tk.END)
+
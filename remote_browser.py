@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+服务器文件浏览器（下载对话框）
+把每个条目逐个插入 Listbox 时，几十万个文件要等几分钟、占用几个GB内存，窗口才能出现。这里改为：
+- 后台线程一次取回完整列表，在内存中建立按路径排序的索引：同一文件夹下的文件在索引中是连续的一段，
+  文件夹的范围、文件数和总大小都用二分查找和前缀和直接得到
+- 过滤在所有路径拼成的一段文本上用正则搜索，不逐个比较路径；排序只对当前显示的条目重新排列
+- 列表只渲染可见的一屏（VirtualList），滚动时替换这几十行的文字，条目数量不影响界面速度
+- 左侧文件夹树按 / 分隔的路径生成，展开时才查找下一层的子文件夹
+"""
+
+import bisect
+import operator
+import re
+import threading
+import time
+from itertools import accumulate, repeat
+
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk, messagebox
+
+# 加载过程中刷新状态栏的间隔（毫秒）
+LOAD_POLL_MS = 200
+
+# 停止输入这么久之后再过滤（毫秒），连续输入只过滤一次
+FILTER_DELAY_MS = 150
+
+# 文件夹树中一个文件夹最多列出的子文件夹数，更多的用过滤查找
+TREE_MAX_CHILDREN = 1000
+
+# 鼠标滚轮每格滚动的行数
+WHEEL_ROWS = 3
+
+# 排序方式：显示文字 -> (排序键, 是否倒序)
+SORT_ORDERS = {
+    '名称 ↑': ('name', False),
+    '名称 ↓': ('name', True),
+    '大小 ↑': ('size', False),
+    '大小 ↓': ('size', True),
+}
+
+# 通配符在索引文本上匹配的字符：不跨行；匹配文件名时也不跨 /
+ANY_CHAR = r'[^\n]'
+NAME_CHAR = r'[^\n/]'
+
+# 文件夹树根节点的 iid（文件夹的 iid 是以 / 结尾的路径前缀，不会以 / 开头）
+ROOT_IID = '/'
+
+
+def prefix_end(prefix):
+    """以 prefix 开头的路径在排序后都小于返回值：最后一个字符加一"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def glob_to_regex(pattern, any_char):
+    """通配符转正则片段：* 和 ? 匹配 any_char，[abc] / [!abc] 是字符集"""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            # 连续的 * 只保留一个，避免正则回溯过多
+            if not parts or parts[-1] != any_char + '*':
+                parts.append(any_char + '*')
+        elif c == '?':
+            parts.append(any_char)
+        elif c == '[':
+            # 紧跟在 [ 后面的 ] 是字符集中的普通字符
+            close = pattern.find(']', i + 1)
+            if close < 0:
+                parts.append(re.escape(c))
+                continue
+            inner = pattern[i:close].replace('\\', '\\\\')
+            i = close + 1
+            if inner.startswith('!'):
+                parts.append(f"[^\\n{inner[1:]}]")
+            else:
+                # 开头的 ^ 在正则里表示取反，需要转义
+                parts.append(f"[\\{inner}]" if inner.startswith('^') else f"[{inner}]")
+        else:
+            parts.append(re.escape(c))
+    return ''.join(parts)
+
+
+def compile_filter(pattern):
+    """把过滤条件转成在索引文本上搜索的正则，返回 (正则, 是否只匹配文件夹内的相对路径)
+
+    普通文字：相对路径中包含即可（不区分大小写）
+    含 * ? [ 时按通配符：不含 / 时匹配文件名，含 / 时匹配完整路径。
+    索引文本中每个路径都以 "\n/" 开头，正则都以这个固定字符开头，搜索时可以直接跳到候选位置
+    """
+    if not any(c in pattern for c in '*?['):
+        return re.compile(re.escape(pattern), re.IGNORECASE), True
+    flags = re.IGNORECASE | re.MULTILINE
+    if '/' in pattern:
+        return re.compile(f"\n/{glob_to_regex(pattern, ANY_CHAR)}$", flags), False
+    body = glob_to_regex(pattern, NAME_CHAR)
+    if body.startswith(NAME_CHAR + '*') and len(body) > len(NAME_CHAR) + 1:
+        # 以 * 开头时只需要文件名的结尾匹配（其余部分不含 /，不会越过文件名）
+        return re.compile(f"{body[len(NAME_CHAR) + 1:]}$", flags), False
+    return re.compile(f"/{body}$", flags), False
+
+
+class RemoteIndex:
+    """服务器文件列表的内存索引
+
+    paths 按字符串顺序排序，sizes 与之一一对应；行号（在 paths 中的下标）是条目的唯一标识。
+    以 "docs/" 开头的路径排序后是连续的一段，文件夹的范围用二分查找得到
+    """
+
+    def __init__(self, paths, sizes):
+        if len(paths) > 1:
+            # 服务器按目录遍历顺序返回，基本有序时排序接近线性
+            order = sorted(range(len(paths)), key=paths.__getitem__)
+            pick = operator.itemgetter(*order)
+            paths = list(pick(paths))
+            sizes = list(pick(sizes))
+        self.paths = paths
+        self.sizes = sizes
+        # 大小的前缀和：任意一段的总大小 = offsets[hi] - offsets[lo]
+        self.offsets = list(accumulate(sizes, initial=0))
+        # 所有路径拼成一段文本，每个路径前加 "\n/"：starts[i] 是第 i 个路径前的换行符的位置
+        self.text = "".join(["\n/", "\n/".join(paths), "\n"]) if paths else "\n"
+        self.starts = list(accumulate(map(operator.add, map(len, paths), repeat(2)), initial=0))
+        self._size_order = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def total_size(self):
+        return self.offsets[-1]
+
+    def folder_range(self, prefix):
+        """文件夹 prefix（以 / 结尾，根目录为空字符串）下所有文件的行号范围 [lo, hi)"""
+        if not prefix:
+            return 0, len(self.paths)
+        lo = bisect.bisect_left(self.paths, prefix)
+        return lo, bisect.bisect_left(self.paths, prefix_end(prefix), lo)
+
+    def range_size(self, lo, hi):
+        return self.offsets[hi] - self.offsets[lo]
+
+    def subfolders(self, prefix, limit=TREE_MAX_CHILDREN):
+        """prefix 下一层的子文件夹，返回 [(子文件夹前缀, lo, hi)]，最多 limit 个
+
+        每找到一个子文件夹就用二分查找跳过它的全部内容，只有直接位于 prefix 下的文件需要逐个看
+        """
+        lo, hi = self.folder_range(prefix)
+        paths = self.paths
+        start = len(prefix)
+        folders = []
+        i = lo
+        while i < hi and len(folders) < limit:
+            slash = paths[i].find('/', start)
+            if slash < 0:
+                i += 1
+                continue
+            child = paths[i][:slash + 1]
+            end = bisect.bisect_left(paths, prefix_end(child), i, hi)
+            folders.append((child, i, end))
+            i = end
+        return folders
+
+    def filter(self, pattern, lo, hi, prefix=""):
+        """[lo, hi) 中匹配过滤条件的行号（按名称顺序），prefix 是这段范围所在的文件夹"""
+        if lo >= hi:
+            return []
+        regex, relative = compile_filter(pattern)
+        text = self.text
+        starts = self.starts
+        row_of = bisect.bisect_right
+        if not relative:
+            # 通配符以行尾结束，每行最多匹配一次
+            return [row_of(starts, match.start(), lo, hi) - 1
+                    for match in regex.finditer(text, starts[lo], starts[hi])]
+
+        # 包含文字时跳过 "\n/" 和文件夹前缀，只在相对路径中匹配；同一行匹配到后直接跳到下一行
+        search = regex.search
+        skip = len(prefix) + 2
+        rows = []
+        pos = starts[lo]
+        end = starts[hi]
+        while pos < end:
+            match = search(text, pos, end)
+            if match is None:
+                break
+            row = row_of(starts, match.start(), lo, hi) - 1
+            if match.start() < starts[row] + skip:
+                pos = starts[row] + skip
+                continue
+            rows.append(row)
+            pos = starts[row + 1]
+        return rows
+
+    def sort(self, rows, key, reverse=False):
+        """按名称或大小排列行号；rows 是 range（整个文件夹）或按名称顺序的列表"""
+        if key == 'size':
+            if isinstance(rows, range):
+                # 整个文件夹按大小排列时从全局的大小顺序中挑出，不必每次重新排序
+                if self._size_order is None:
+                    self._size_order = sorted(range(len(self.paths)), key=self.sizes.__getitem__)
+                lo, hi = rows.start, rows.stop
+                rows = self._size_order if (lo, hi) == (0, len(self.paths)) else \
+                    [row for row in self._size_order if lo <= row < hi]
+            else:
+                rows = sorted(rows, key=self.sizes.__getitem__)
+        return rows[::-1] if reverse else rows
+
+
+class VirtualList(ttk.Frame):
+    """只渲染可见行的列表
+
+    rows 可以有上百万项（range 或列表），Listbox 中始终只有一屏的行；render(row) 生成一行的文字。
+    选中状态按条目记录，滚动、翻页后保持；支持单击、Ctrl/Shift 多选、方向键、翻页键和 Ctrl+A
+    """
+
+    def __init__(self, parent, render, on_activate=None, on_select=None, font=("Consolas", 9)):
+        super().__init__(parent)
+        self.render = render
+        self.on_activate = on_activate
+        self.on_select = on_select
+        self.rows = range(0)
+        self.selected = set()
+        self.offset = 0              # 第一行可见行在 rows 中的位置
+        self.visible = 1             # 完整显示的行数
+        self.anchor = None           # 最近点击的位置，Shift 多选的起点
+
+        self.scrollbar = ttk.Scrollbar(self, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox = tk.Listbox(self, font=font, height=1, activestyle='none',
+                                  exportselection=False, selectmode=tk.MULTIPLE)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.row_height = tkfont.Font(font=self.listbox['font']).metrics('linespace') + 1
+
+        # 鼠标和键盘事件都自己处理，返回 "break" 阻止 Listbox 默认的选择和滚动
+        listbox = self.listbox
+        listbox.bind("<Configure>", self._on_configure)
+        listbox.bind("<Button-1>", lambda event: self._click(event, 'single'))
+        listbox.bind("<Control-Button-1>", lambda event: self._click(event, 'toggle'))
+        listbox.bind("<Shift-Button-1>", lambda event: self._click(event, 'range'))
+        listbox.bind("<Double-Button-1>", self._double_click)
+        for sequence in ("<B1-Motion>", "<ButtonRelease-1>", "<B1-Leave>", "<Button-2>", "<B2-Motion>"):
+            listbox.bind(sequence, lambda event: "break")
+        listbox.bind("<MouseWheel>", lambda event: self._scroll(-WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS))
+        listbox.bind("<Button-4>", lambda event: self._scroll(-WHEEL_ROWS))
+        listbox.bind("<Button-5>", lambda event: self._scroll(WHEEL_ROWS))
+        listbox.bind("<Up>", lambda event: self._move(-1))
+        listbox.bind("<Down>", lambda event: self._move(1))
+        listbox.bind("<Prior>", lambda event: self._move(-self.visible))
+        listbox.bind("<Next>", lambda event: self._move(self.visible))
+        listbox.bind("<Home>", lambda event: self._move(-len(self.rows)))
+        listbox.bind("<End>", lambda event: self._move(len(self.rows)))
+        listbox.bind("<Control-a>", self.select_all)
+        listbox.bind("<Return>", self._double_click)
+
+    def set_rows(self, rows):
+        """显示新的一组条目，回到顶部并清空选中"""
+        self.rows = rows
+        self.offset = 0
+        self.anchor = None
+        self.selected.clear()
+        self._render()
+        self._selection_changed()
+
+    def selection(self):
+        """选中的条目，按显示顺序"""
+        if not self.selected:
+            return []
+        return [row for row in self.rows if row in self.selected]
+
+    def select_all(self, event=None):
+        self.selected = set(self.rows)
+        self._render()
+        self._selection_changed()
+        return "break"
+
+    def yview(self, *args):
+        """滚动条回调：moveto 比例 / scroll 数量 units|pages"""
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.rows))
+        elif args[0] == 'scroll':
+            self.offset += int(args[1]) * (self.visible if args[2] == 'pages' else 1)
+        self._render()
+
+    def _render(self):
+        count = len(self.rows)
+        self.offset = max(0, min(self.offset, count - self.visible))
+        # 多渲染一行，填满最下面不完整的一行
+        shown = self.rows[self.offset:self.offset + self.visible + 1]
+        self.listbox.delete(0, tk.END)
+        if shown:
+            self.listbox.insert(0, *[self.render(row) for row in shown])
+            for position, row in enumerate(shown):
+                if row in self.selected:
+                    self.listbox.selection_set(position)
+        self.listbox.yview_moveto(0)
+        if count:
+            self.scrollbar.set(self.offset / count, min(self.offset + self.visible, count) / count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_configure(self, event):
+        # 第一次渲染后用实际的行距代替按字体估算的值
+        if self.listbox.size() > 1:
+            self.row_height = self.listbox.bbox(1)[1] - self.listbox.bbox(0)[1]
+        self.visible = max(1, event.height // max(self.row_height, 1))
+        self._render()
+
+    def _position(self, event):
+        position = self.offset + self.listbox.nearest(event.y)
+        return position if position < len(self.rows) else None
+
+    def _click(self, event, mode):
+        self.listbox.focus_set()
+        position = self._position(event)
+        if position is None:
+            return "break"
+        row = self.rows[position]
+        if mode == 'toggle':
+            if row in self.selected:
+                self.selected.discard(row)
+            else:
+                self.selected.add(row)
+        elif mode == 'range' and self.anchor is not None:
+            first, last = sorted((self.anchor, position))
+            self.selected = set(self.rows[first:last + 1])
+        else:
+            self.selected = {row}
+        if mode != 'range' or self.anchor is None:
+            self.anchor = position
+        self._render()
+        self._selection_changed()
+        return "break"
+
+    def _double_click(self, event):
+        if event.type == tk.EventType.KeyPress:
+            position = self.anchor
+        else:
+            position = self._position(event)
+        if position is not None and position < len(self.rows) and self.on_activate is not None:
+            self.on_activate(self.rows[position])
+        return "break"
+
+    def _scroll(self, rows):
+        self.offset += rows
+        self._render()
+        return "break"
+
+    def _move(self, delta):
+        """方向键和翻页键移动选中的行，并保证它可见"""
+        if not self.rows:
+            return "break"
+        position = self.anchor + delta if self.anchor is not None else self.offset
+        position = max(0, min(position, len(self.rows) - 1))
+        self.anchor = position
+        self.selected = {self.rows[position]}
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.visible:
+            self.offset = position - self.visible + 1
+        self._render()
+        self._selection_changed()
+        return "break"
+
+    def _selection_changed(self):
+        if self.on_select is not None:
+            self.on_select()
+
+
+class RemoteBrowser:
+    """下载对话框：左侧文件夹树，右侧虚拟列表，可以过滤、排序和多选
+
+    open_client: 返回客户端上下文管理器的函数（GUI的 operation_client），在后台线程中取回完整列表
+    log:         log(消息, 颜色标签)，可以在任何线程调用
+    run() 显示对话框并等待关闭，返回选中文件的 [(服务器路径, 大小)]
+    """
+
+    def __init__(self, root, open_client, log=None):
+        self.root = root
+        self.open_client = open_client
+        self.log = log or (lambda message, tag=None: None)
+        self.index = None
+        self.prefix = ""
+        self.result = []
+        self._filter_timer = None
+        self._load_timer = None
+        self._loader = None
+        self._closed = False
+        self._create_widgets()
+
+    def run(self):
+        self.reload()
+        self.root.wait_window(self.window)
+        return self.result
+
+    # ---------- 界面 ----------
+
+    def _create_widgets(self):
+        window = self.window = tk.Toplevel(self.root)
+        window.title("选择要下载的文件")
+        window.geometry("900x560")
+        window.transient(self.root)
+        window.grab_set()
+        window.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        bar = ttk.Frame(window)
+        bar.pack(fill=tk.X, padx=10, pady=(10, 0))
+        ttk.Label(bar, text="过滤:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(bar, textvariable=self.filter_var, width=30)
+        filter_entry.pack(side=tk.LEFT, padx=5)
+        self.filter_var.trace_add('write', self._schedule_filter)
+        ttk.Label(bar, text="排序:").pack(side=tk.LEFT, padx=(15, 5))
+        self.sort_var = tk.StringVar(value=next(iter(SORT_ORDERS)))
+        sort_combo = ttk.Combobox(bar, textvariable=self.sort_var, values=list(SORT_ORDERS),
+                                  state='readonly', width=8)
+        sort_combo.pack(side=tk.LEFT)
+        sort_combo.bind("<<ComboboxSelected>>", lambda event: self.refresh_view())
+        ttk.Label(window, text="输入文字按路径过滤；含 * ? [ ] 时按通配符匹配文件名（含 / 时匹配完整路径）",
+                  foreground="gray").pack(anchor=tk.W, padx=10, pady=(2, 0))
+
+        paned = ttk.PanedWindow(window, orient=tk.HORIZONTAL)
+        paned.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        tree_frame = ttk.Frame(paned)
+        self.tree = ttk.Treeview(tree_frame, show='tree', selectmode='browse')
+        tree_scroll = ttk.Scrollbar(tree_frame, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=tree_scroll.set)
+        tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree.bind("<<TreeviewOpen>>", self._on_tree_open)
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        paned.add(tree_frame, weight=1)
+
+        self.file_list = VirtualList(paned, self._render_row, on_activate=lambda row: self.download(),
+                                     on_select=self._update_status)
+        paned.add(self.file_list, weight=3)
+
+        self.status_var = tk.StringVar()
+        ttk.Label(window, textvariable=self.status_var).pack(anchor=tk.W, padx=10)
+
+        btn_frame = ttk.Frame(window)
+        btn_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(btn_frame, text="📥 下载", command=self.download).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="🔄 刷新", command=self.reload).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="❌ 取消", command=self.cancel).pack(side=tk.LEFT, padx=5)
+        filter_entry.focus_set()
+
+    def _render_row(self, row):
+        return f"📄 {self.index.paths[row][len(self.prefix):]} ({self.index.sizes[row]} bytes)"
+
+    def _folder_text(self, name, lo, hi):
+        return f"📁 {name}  ({hi - lo} 个文件, {self.index.range_size(lo, hi)} bytes)"
+
+    # ---------- 加载 ----------
+
+    def reload(self):
+        """在后台线程中取回完整的服务器文件列表并建立索引，界面定时查看进度"""
+        if self._loader is not None and self._loader.is_alive():
+            return
+        self.status_var.set("📋 正在获取服务器文件列表...")
+        self._loaded = 0
+        self._load_result = None
+        self._loader = threading.Thread(target=self._load, daemon=True)
+        self._loader.start()
+        self._load_timer = self.root.after(LOAD_POLL_MS, self._poll_load)
+
+    def _load(self):
+        """后台线程：不触碰界面，结果留给 _poll_load 取走"""
+        started = time.perf_counter()
+        paths = []
+        sizes = []
+        try:
+            with self.open_client() as client:
+                for path, size in client.iter_files():
+                    if self._closed:
+                        return
+                    paths.append(path)
+                    sizes.append(size)
+                    self._loaded += 1
+            received = time.perf_counter()
+            index = RemoteIndex(paths, sizes)
+            self._load_result = (index, received - started, time.perf_counter() - received)
+        except Exception as e:
+            self._load_result = e
+
+    def _poll_load(self):
+        self._load_timer = None
+        result = self._load_result
+        if result is None:
+            self.status_var.set(f"📋 正在获取服务器文件列表: 已收到 {self._loaded} 个文件...")
+            self._load_timer = self.root.after(LOAD_POLL_MS, self._poll_load)
+            return
+        if isinstance(result, Exception):
+            self.log(f"❌ 获取文件列表失败: {result}", "error")
+            self.status_var.set(f"获取文件列表失败: {result}")
+            return
+        self.index, receive_seconds, index_seconds = result
+        self.log(f"📋 服务器文件列表: {len(self.index)} 个文件, 接收 {receive_seconds:.2f} 秒, "
+                 f"建立索引 {index_seconds:.2f} 秒", "info")
+        self._fill_tree()
+
+    # ---------- 文件夹树 ----------
+
+    def _fill_tree(self):
+        previous = self.prefix
+        self.tree.delete(*self.tree.get_children())
+        self.tree.insert("", tk.END, iid=ROOT_IID, text=self._folder_text("/", 0, len(self.index)), open=True)
+        self.tree.insert(ROOT_IID, tk.END, iid=ROOT_IID + '…')
+        self._expand(ROOT_IID)
+        # 刷新后回到之前所在的文件夹（如果还在）
+        self.prefix = None
+        self._reveal(previous)
+
+    def _expand(self, iid):
+        """第一次展开文件夹时查找下一层的子文件夹，代替占位子节点"""
+        placeholder = iid + '…'
+        if not self.tree.exists(placeholder):
+            return
+        self.tree.delete(placeholder)
+        prefix = "" if iid == ROOT_IID else iid
+        folders = self.index.subfolders(prefix)
+        for child, lo, hi in folders:
+            self.tree.insert(iid, tk.END, iid=child, text=self._folder_text(child[len(prefix):-1], lo, hi))
+            # 占位子节点让文件夹显示展开标记
+            self.tree.insert(child, tk.END, iid=child + '…')
+        if len(folders) >= TREE_MAX_CHILDREN:
+            self.tree.insert(iid, tk.END, iid=prefix + '+',
+                             text=f"… 只列出前 {TREE_MAX_CHILDREN} 个文件夹，其余请用过滤查找")
+
+    def _on_tree_open(self, event=None):
+        iid = self.tree.focus()
+        if iid.endswith('/'):
+            self._expand(iid)
+
+    def _on_tree_select(self, event=None):
+        selection = self.tree.selection()
+        if not selection or not selection[0].endswith('/'):
+            return
+        prefix = "" if selection[0] == ROOT_IID else selection[0]
+        if prefix != self.prefix:
+            self.prefix = prefix
+            self.refresh_view()
+
+    def _reveal(self, prefix):
+        """逐层展开到文件夹 prefix 并选中它，找不到时选中根目录"""
+        iid = ROOT_IID
+        for position, c in enumerate(prefix):
+            if c != '/':
+                continue
+            if not self.tree.exists(prefix[:position + 1]):
+                break
+            iid = prefix[:position + 1]
+            self._expand(iid)
+            self.tree.item(iid, open=True)
+        self.tree.selection_set(iid)
+        self.tree.see(iid)
+        self._on_tree_select()
+
+    # ---------- 过滤和排序 ----------
+
+    def _schedule_filter(self, *args):
+        if self._filter_timer is not None:
+            self.root.after_cancel(self._filter_timer)
+        self._filter_timer = self.root.after(FILTER_DELAY_MS, self.refresh_view)
+
+    def refresh_view(self):
+        """按当前文件夹、过滤条件和排序方式重新生成列表"""
+        self._filter_timer = None
+        if self.index is None:
+            return
+        lo, hi = self.index.folder_range(self.prefix)
+        pattern = self.filter_var.get().strip()
+        rows = self.index.filter(pattern, lo, hi, self.prefix) if pattern else range(lo, hi)
+        key, reverse = SORT_ORDERS[self.sort_var.get()]
+        self.file_list.set_rows(self.index.sort(rows, key, reverse))
+
+    def _update_status(self):
+        if self.index is None:
+            return
+        lo, hi = self.index.folder_range(self.prefix)
+        text = f"/{self.prefix}: 显示 {len(self.file_list.rows)} / {hi - lo} 个文件"
+        selected = self.file_list.selected
+        if selected:
+            text += f", 选中 {len(selected)} 个 ({sum(map(self.index.sizes.__getitem__, selected))} bytes)"
+        self.status_var.set(text)
+
+    # ---------- 结果 ----------
+
+    def download(self):
+        rows = self.file_list.selection()
+        if not rows:
+            messagebox.showwarning("提示", "请先选择文件", parent=self.window)
+            return
+        self.result = [(self.index.paths[row], self.index.sizes[row]) for row in rows]
+        self.close()
+
+    def cancel(self):
+        self.result = []
+        self.close()
+
+    def close(self):
+        self._closed = True
+        for timer in (self._filter_timer, self._load_timer):
+            if timer is not None:
+                self.root.after_cancel(timer)
+        self._filter_timer = self._load_timer = None
+        self.window.destroy()
@@ -0,0 +1,200 @@
+#include "compression_utils.h"
+#include <cstdint>
+#include <cstring>
+
+#ifdef USE_ZLIB
+    #include <zlib.h>
+#endif
+#ifdef USE_LZMA
+    #include <lzma.h>
+#endif
+
+namespace {
+    const int ZLIB_LEVEL = 6;
+    const uint32_t LZMA_PRESET = 6;
+
+    // 压缩后不小于原大小的这个比例就视为压不下去
+    const double MIN_SAVING_RATIO = 0.9;
+
+    // 连续这么多帧压不下去时，接下来的若干帧不再尝试压缩
+    const size_t MISS_LIMIT = 2;
+    const size_t SKIP_BLOCKS = 32;
+
+    // 抽样试压：取几小段用最快级别压缩
+    const size_t SAMPLE_SLICES = 4;
+    const size_t SAMPLE_SLICE_SIZE = 16 * 1024;
+
+    struct Magic {
+        const char* bytes;
+        size_t length;
+    };
+
+    // 常见压缩格式的文件头
+    const Magic COMPRESSED_MAGIC[] = {
+        {"PK\x03\x04", 4},                  // zip / docx / jar / apk
+        {"\x1f\x8b", 2},                    // gzip
+        {"BZh", 3},                         // bzip2
+        {"\xfd" "7zXZ\x00", 6},             // xz
+        {"(\xb5/\xfd", 4},                  // zstd
+        {"7z\xbc\xaf\x27\x1c", 6},          // 7z
+        {"Rar!\x1a\x07", 6},                // rar
+        {"\xff\xd8\xff", 3},                // jpeg
+        {"\x89PNG\r\n\x1a\n", 8},           // png
+        {"GIF8", 4},                        // gif
+        {"OggS", 4},                        // ogg
+        {"fLaC", 4},                        // flac
+        {"ID3", 3},                         // mp3
+        {"\x1a" "E\xdf\xa3", 4},            // mkv / webm
+    };
+
+    bool worthIt(size_t compressed, size_t original) {
+        return compressed < original * MIN_SAVING_RATIO;
+    }
+}
+
+namespace compression {
+
+std::string supportedCodecs() {
+    std::string codecs;
+#ifdef USE_ZLIB
+    codecs += "zlib";
+#endif
+#ifdef USE_LZMA
+    codecs += codecs.empty() ? "lzma" : ",lzma";
+#endif
+    return codecs;
+}
+
+bool codecSupported(const std::string& codec) {
+#ifdef USE_ZLIB
+    if (codec == "zlib") {
+        return true;
+    }
+#endif
+#ifdef USE_LZMA
+    if (codec == "lzma") {
+        return true;
+    }
+#endif
+    (void)codec;
+    return false;
+}
+
+size_t frameSize(const std::string& codec) {
+    return (codec == "lzma") ? 4 * 1024 * 1024 : 1024 * 1024;
+}
+
+bool compressBlock(const std::string& codec, const char* data, size_t length, std::vector<char>& out) {
+#ifdef USE_ZLIB
+    if (codec == "zlib") {
+        uLongf outLength = compressBound(static_cast<uLong>(length));
+        out.resize(outLength);
+        if (compress2(reinterpret_cast<Bytef*>(out.data()), &outLength,
+                      reinterpret_cast<const Bytef*>(data), static_cast<uLong>(length), ZLIB_LEVEL) != Z_OK) {
+            return false;
+        }
+        out.resize(outLength);
+        return worthIt(outLength, length);
+    }
+#endif
+#ifdef USE_LZMA
+    if (codec == "lzma") {
+        // 超出原大小90%的结果没有意义，输出缓冲区只留这么大，放不下即视为压不下去
+        size_t outLength = 0;
+        out.resize(static_cast<size_t>(length * MIN_SAVING_RATIO) + 64);
+        if (lzma_easy_buffer_encode(LZMA_PRESET, LZMA_CHECK_CRC64, nullptr,
+                                    reinterpret_cast<const uint8_t*>(data), length,
+                                    reinterpret_cast<uint8_t*>(out.data()), &outLength, out.size()) != LZMA_OK) {
+            return false;
+        }
+        out.resize(outLength);
+        return worthIt(outLength, length);
+    }
+#endif
+    (void)codec;
+    (void)data;
+    (void)length;
+    (void)out;
+    return false;
+}
+
+bool decompressBlock(const std::string& codec, const char* data, size_t length, char* out, size_t outLength) {
+#ifdef USE_ZLIB
+    if (codec == "zlib") {
+        uLongf produced = static_cast<uLongf>(outLength);
+        return uncompress(reinterpret_cast<Bytef*>(out), &produced,
+                          reinterpret_cast<const Bytef*>(data), static_cast<uLong>(length)) == Z_OK &&
+               produced == outLength;
+    }
+#endif
+#ifdef USE_LZMA
+    if (codec == "lzma") {
+        uint64_t memoryLimit = UINT64_MAX;
+        size_t inPos = 0;
+        size_t outPos = 0;
+        return lzma_stream_buffer_decode(&memoryLimit, 0, nullptr,
+                                         reinterpret_cast<const uint8_t*>(data), &inPos, length,
+                                         reinterpret_cast<uint8_t*>(out), &outPos, outLength) == LZMA_OK &&
+               outPos == outLength;
+    }
+#endif
+    (void)codec;
+    (void)data;
+    (void)length;
+    (void)out;
+    (void)outLength;
+    return false;
+}
+
+bool looksIncompressible(const char* data, size_t length) {
+    if (length == 0) {
+        return true;
+    }
+    for (const Magic& magic : COMPRESSED_MAGIC) {
+        if (length >= magic.length && std::memcmp(data, magic.bytes, magic.length) == 0) {
+            return true;
+        }
+    }
+    if (length >= 8 && std::memcmp(data + 4, "ftyp", 4) == 0) {  // mp4 / mov / heic
+        return true;
+    }
+#ifdef USE_ZLIB
+    size_t slices = (length <= SAMPLE_SLICE_SIZE) ? 1 : SAMPLE_SLICES;
+    size_t sliceSize = (slices == 1) ? length : SAMPLE_SLICE_SIZE;
+    size_t step = (slices == 1) ? 0 : (length - SAMPLE_SLICE_SIZE) / (SAMPLE_SLICES - 1);
+    std::vector<unsigned char> out(compressBound(static_cast<uLong>(sliceSize)));
+    size_t raw = 0;
+    size_t compressed = 0;
+    for (size_t i = 0; i < slices; ++i) {
+        uLongf outLength = static_cast<uLongf>(out.size());
+        if (compress2(out.data(), &outLength, reinterpret_cast<const Bytef*>(data + i * step),
+                      static_cast<uLong>(sliceSize), 1) != Z_OK) {
+            return true;
+        }
+        raw += sliceSize;
+        compressed += outLength;
+    }
+    return !worthIt(compressed, raw);
+#else
+    return false;
+#endif
+}
+
+bool Detector::shouldCompress() {
+    if (m_skip > 0) {
+        --m_skip;
+        return false;
+    }
+    return true;
+}
+
+void Detector::record(bool compressed) {
+    if (compressed) {
+        m_misses = 0;
+    } else if (++m_misses >= MISS_LIMIT) {
+        m_skip = SKIP_BLOCKS;
+        m_misses = 0;
+    }
+}
+
+}
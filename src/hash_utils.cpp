@@ -0,0 +1,147 @@
+#include "hash_utils.h"
+#include <algorithm>
+#include <cstring>
+
+namespace {
+    const uint32_t ROUND_CONSTANTS[64] = {
+        0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+        0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+        0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+        0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+        0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+        0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+        0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+        0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+    };
+
+    inline uint32_t rotateRight(uint32_t value, int bits) {
+        return (value >> bits) | (value << (32 - bits));
+    }
+}
+
+Sha256::Sha256()
+    : m_state{0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19}
+    , m_buffer{}
+    , m_bufferLength(0)
+    , m_totalLength(0)
+{
+}
+
+void Sha256::update(const void* data, size_t length) {
+    const unsigned char* bytes = static_cast<const unsigned char*>(data);
+    m_totalLength += length;
+
+    // 先补满上次剩下的半个块
+    if (m_bufferLength > 0) {
+        size_t take = std::min(length, sizeof(m_buffer) - m_bufferLength);
+        std::memcpy(m_buffer + m_bufferLength, bytes, take);
+        m_bufferLength += take;
+        bytes += take;
+        length -= take;
+        if (m_bufferLength < sizeof(m_buffer)) {
+            return;
+        }
+        transform(m_buffer);
+        m_bufferLength = 0;
+    }
+
+    // 整块直接从输入处理，不经过缓冲区
+    while (length >= sizeof(m_buffer)) {
+        transform(bytes);
+        bytes += sizeof(m_buffer);
+        length -= sizeof(m_buffer);
+    }
+
+    std::memcpy(m_buffer, bytes, length);
+    m_bufferLength = length;
+}
+
+Sha256::Digest Sha256::digest() {
+    uint64_t bitLength = m_totalLength * 8;
+
+    // 填充: 0x80，补零到56字节，再加64位大端长度
+    unsigned char padding[64] = {0x80};
+    size_t padLength = (m_bufferLength < 56) ? (56 - m_bufferLength) : (120 - m_bufferLength);
+    update(padding, padLength);
+
+    unsigned char lengthBytes[8];
+    for (int i = 0; i < 8; ++i) {
+        lengthBytes[i] = static_cast<unsigned char>(bitLength >> (56 - 8 * i));
+    }
+    update(lengthBytes, sizeof(lengthBytes));
+
+    Digest result;
+    for (int i = 0; i < 8; ++i) {
+        result[i * 4] = static_cast<unsigned char>(m_state[i] >> 24);
+        result[i * 4 + 1] = static_cast<unsigned char>(m_state[i] >> 16);
+        result[i * 4 + 2] = static_cast<unsigned char>(m_state[i] >> 8);
+        result[i * 4 + 3] = static_cast<unsigned char>(m_state[i]);
+    }
+    return result;
+}
+
+Sha256::Digest Sha256::hash(const void* data, size_t length) {
+    Sha256 sha;
+    sha.update(data, length);
+    return sha.digest();
+}
+
+void Sha256::transform(const unsigned char* block) {
+    uint32_t w[64];
+    for (int i = 0; i < 16; ++i) {
+        w[i] = (static_cast<uint32_t>(block[i * 4]) << 24) |
+               (static_cast<uint32_t>(block[i * 4 + 1]) << 16) |
+               (static_cast<uint32_t>(block[i * 4 + 2]) << 8) |
+               static_cast<uint32_t>(block[i * 4 + 3]);
+    }
+    for (int i = 16; i < 64; ++i) {
+        uint32_t s0 = rotateRight(w[i - 15], 7) ^ rotateRight(w[i - 15], 18) ^ (w[i - 15] >> 3);
+        uint32_t s1 = rotateRight(w[i - 2], 17) ^ rotateRight(w[i - 2], 19) ^ (w[i - 2] >> 10);
+        w[i] = w[i - 16] + s0 + w[i - 7] + s1;
+    }
+
+    uint32_t a = m_state[0], b = m_state[1], c = m_state[2], d = m_state[3];
+    uint32_t e = m_state[4], f = m_state[5], g = m_state[6], h = m_state[7];
+
+    for (int i = 0; i < 64; ++i) {
+        uint32_t s1 = rotateRight(e, 6) ^ rotateRight(e, 11) ^ rotateRight(e, 25);
+        uint32_t choice = (e & f) ^ (~e & g);
+        uint32_t temp1 = h + s1 + choice + ROUND_CONSTANTS[i] + w[i];
+        uint32_t s0 = rotateRight(a, 2) ^ rotateRight(a, 13) ^ rotateRight(a, 22);
+        uint32_t majority = (a & b) ^ (a & c) ^ (b & c);
+        uint32_t temp2 = s0 + majority;
+
+        h = g;
+        g = f;
+        f = e;
+        e = d + temp1;
+        d = c;
+        c = b;
+        b = a;
+        a = temp1 + temp2;
+    }
+
+    m_state[0] += a; m_state[1] += b; m_state[2] += c; m_state[3] += d;
+    m_state[4] += e; m_state[5] += f; m_state[6] += g; m_state[7] += h;
+}
+
+uint32_t weakChecksum(const unsigned char* data, size_t length) {
+    uint32_t a = 0;
+    uint32_t b = 0;
+    for (size_t i = 0; i < length; ++i) {
+        a += data[i];
+        b += static_cast<uint32_t>((length - i) * data[i]);
+    }
+    return (a & 0xffff) | ((b & 0xffff) << 16);
+}
+
+std::string toHex(const unsigned char* data, size_t length) {
+    static const char digits[] = "0123456789abcdef";
+    std::string hex;
+    hex.reserve(length * 2);
+    for (size_t i = 0; i < length; ++i) {
+        hex += digits[data[i] >> 4];
+        hex += digits[data[i] & 0x0f];
+    }
+    return hex;
+}
@@ -1,6 +1,7 @@
 #include "socket_server.h"
 #include <iostream>
 #include <string>
+#include <vector>
 #include <thread>
 #include <chrono>
 
@@ -12,7 +13,7 @@
     #include <windows.h>
 #endif
 
-int main() {
+int main(int argc, char* argv[]) {
 #ifdef _WIN32
     // 设置控制台代码页为UTF-8
     SetConsoleOutputCP(CP_UTF8);
@@ -38,13 +39,35 @@ int main() {
     std::cout << "=== C++14 Socket Server Demo (basic logging) ===" << std::endl;
 #endif
     
-    // Create server instance, listen on port 8080, files stored in ./uploads
-    SocketServer server(8080, "./uploads");
+    // 命令行: SocketServer [端口] [文件目录] [--unix 套接字路径]，默认监听8080，文件存放在 ./uploads
+    int port = 8080;
+    std::string fileDir = "./uploads";
+    std::string unixSocketPath;
+    std::vector<std::string> positional;
+    for (int i = 1; i < argc; ++i) {
+        std::string arg = argv[i];
+        if (arg == "--unix" && i + 1 < argc) {
+            unixSocketPath = argv[++i];
+        } else {
+            positional.push_back(arg);
+        }
+    }
+    if (positional.size() > 0) {
+        port = std::stoi(positional[0]);
+    }
+    if (positional.size() > 1) {
+        fileDir = positional[1];
+    }
+    
+    SocketServer server(port, fileDir);
+    if (!unixSocketPath.empty()) {
+        server.setUnixSocketPath(unixSocketPath);
+    }
     
     // Set custom client handler function
-    server.setClientHandler([
+    server.setClientHandler([&server
 #ifdef USE_SPDLOG
-                            logger
+                            , logger
 #endif
                             ](SOCKET clientSocket, const std::string& message) {
 #ifdef USE_SPDLOG
@@ -61,6 +84,7 @@ int main() {
             response += "- FILE:LIST - List available files\n";
             response += "- FILE:UPLOAD:filename:size - Upload a file\n";
             response += "- FILE:DOWNLOAD:filename - Download a file\n";
+            response += "- FILE:BUNDLE:count:total - Upload many small files in one stream\n";
         } else if (message.find("time") != std::string::npos) {
             auto now = std::chrono::system_clock::now();
             auto time_t = std::chrono::system_clock::to_time_t(now);
@@ -73,11 +97,16 @@ int main() {
             response += "- quit/exit - Close connection\n";
             response += "File transfer commands:\n";
             response += "- FILE:LIST - List files on server\n";
+            response += "- FILE:LIST:limit:R|D:prefix:glob:cursor - List one page, filtered\n";
             response += "- FILE:UPLOAD:filename:size - Upload file to server\n";
             response += "- FILE:DOWNLOAD:filename - Download file from server\n";
+            response += "- FILE:BUNDLE:count:total - Upload many small files in one stream\n";
+            response += "- FILE:CAPS - Query supported compression codecs and framed messages\n";
+            response += "- FILE:DEDUP:count - Skip uploads whose content the server already stores\n";
+            response += "- FILE:ZUPLOAD:filename:size:codec / FILE:ZDOWNLOAD:filename:codec - Compressed transfer\n";
         } else if (message.find("quit") != std::string::npos || message.find("exit") != std::string::npos) {
             response = "Goodbye! Connection will be closed.\n";
-            send(clientSocket, response.c_str(), static_cast<int>(response.length()), 0);
+            server.sendMessage(clientSocket, response);
             return; // End connection
         } else {
             response = "Echo your message: " + message + "\n";
@@ -85,7 +114,7 @@ int main() {
         }
         
         // Send response
-        send(clientSocket, response.c_str(), static_cast<int>(response.length()), 0);
+        server.sendMessage(clientSocket, response);
 #ifdef USE_SPDLOG
         logger->debug("Sent response to client");
 #else
@@ -105,13 +134,13 @@ int main() {
     
 #ifdef USE_SPDLOG
     logger->info("Server is running... Press Ctrl+C to exit");
-    logger->info("You can test with: telnet localhost 8080");
+    logger->info("You can test with: telnet localhost {}", port);
     
     // Set log level to debug if needed
     // server.setLogLevel(spdlog::level::debug);
 #else
     std::cout << "[INFO] Server is running... Press Ctrl+C to exit" << std::endl;
-    std::cout << "[INFO] You can test with: telnet localhost 8080" << std::endl;
+    std::cout << "[INFO] You can test with: telnet localhost " << port << std::endl;
 #endif
     
     // Run server main loop
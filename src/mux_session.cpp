@@ -0,0 +1,343 @@
+#include "mux_session.h"
+#include <algorithm>
+
+namespace {
+    bool sendAll(SOCKET socket, const char* data, size_t length) {
+        size_t totalSent = 0;
+        while (totalSent < length) {
+            int result = send(socket, data + totalSent, static_cast<int>(length - totalSent), 0);
+            if (result == SOCKET_ERROR || result == 0) {
+                return false;
+            }
+            totalSent += result;
+        }
+        return true;
+    }
+
+    // both为true时关闭双向，否则只关闭发送方向（对端读到EOF）
+    void shutdownSocket(SOCKET socket, bool both) {
+#ifdef _WIN32
+        shutdown(socket, both ? SD_BOTH : SD_SEND);
+#else
+        shutdown(socket, both ? SHUT_RDWR : SHUT_WR);
+#endif
+    }
+
+    uint32_t readU32(const unsigned char* p) {
+        return static_cast<uint32_t>(p[0]) | (static_cast<uint32_t>(p[1]) << 8) |
+               (static_cast<uint32_t>(p[2]) << 16) | (static_cast<uint32_t>(p[3]) << 24);
+    }
+
+    void appendU32(std::string& out, uint32_t value) {
+        for (int i = 0; i < 4; ++i) {
+            out.push_back(static_cast<char>((value >> (8 * i)) & 0xff));
+        }
+    }
+}
+
+namespace mux {
+
+std::string encodeHeader(unsigned char type, uint16_t channel, uint32_t length) {
+    std::string header;
+    header.reserve(HEADER_SIZE);
+    header.push_back(static_cast<char>(type));
+    header.push_back(0);
+    header.push_back(static_cast<char>(channel & 0xff));
+    header.push_back(static_cast<char>(channel >> 8));
+    appendU32(header, length);
+    return header;
+}
+
+bool createSocketPair(SOCKET pair[2]) {
+#ifdef _WIN32
+    // Windows没有socketpair：在回环地址上临时监听一个端口，自己连自己
+    pair[0] = pair[1] = INVALID_SOCKET;
+    SOCKET listener = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP);
+    if (listener == INVALID_SOCKET) {
+        return false;
+    }
+    sockaddr_in address{};
+    address.sin_family = AF_INET;
+    address.sin_addr.s_addr = htonl(INADDR_LOOPBACK);
+    address.sin_port = 0;
+    int addressLength = sizeof(address);
+    bool ok = bind(listener, reinterpret_cast<sockaddr*>(&address), sizeof(address)) != SOCKET_ERROR &&
+              getsockname(listener, reinterpret_cast<sockaddr*>(&address), &addressLength) != SOCKET_ERROR &&
+              listen(listener, 1) != SOCKET_ERROR;
+    if (ok) {
+        pair[0] = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP);
+        ok = pair[0] != INVALID_SOCKET &&
+             connect(pair[0], reinterpret_cast<sockaddr*>(&address), sizeof(address)) != SOCKET_ERROR;
+    }
+    if (ok) {
+        pair[1] = accept(listener, nullptr, nullptr);
+        ok = pair[1] != INVALID_SOCKET;
+    }
+    closesocket(listener);
+    if (!ok) {
+        if (pair[0] != INVALID_SOCKET) closesocket(pair[0]);
+        if (pair[1] != INVALID_SOCKET) closesocket(pair[1]);
+        return false;
+    }
+    // 本地连接上的小消息不需要合并
+    int noDelay = 1;
+    setsockopt(pair[0], IPPROTO_TCP, TCP_NODELAY, reinterpret_cast<const char*>(&noDelay), sizeof(noDelay));
+    setsockopt(pair[1], IPPROTO_TCP, TCP_NODELAY, reinterpret_cast<const char*>(&noDelay), sizeof(noDelay));
+    return true;
+#else
+    int fds[2];
+    if (socketpair(AF_UNIX, SOCK_STREAM, 0, fds) != 0) {
+        return false;
+    }
+    pair[0] = fds[0];
+    pair[1] = fds[1];
+    return true;
+#endif
+}
+
+Session::Session(SOCKET socket, Reader reader, Handler handler)
+    : m_socket(socket), m_reader(std::move(reader)), m_handler(std::move(handler)) {
+}
+
+bool Session::readExact(char* out, size_t length) {
+    size_t received = 0;
+    while (received < length) {
+        int n = m_reader(out + received, length - received);
+        if (n <= 0) {
+            return false;
+        }
+        received += n;
+    }
+    return true;
+}
+
+void Session::run() {
+    std::thread writer(&Session::writeLoop, this);
+
+    unsigned char header[HEADER_SIZE];
+    std::vector<char> payload;
+    while (readExact(reinterpret_cast<char*>(header), HEADER_SIZE)) {
+        unsigned char type = header[0];
+        uint16_t id = static_cast<uint16_t>(header[2] | (header[3] << 8));
+        uint32_t length = readU32(header + 4);
+        if (length > MAX_CHUNK) {
+            break;  // 协议错误
+        }
+        payload.resize(length);
+        if (length > 0 && !readExact(payload.data(), length)) {
+            break;
+        }
+
+        if (type == FRAME_OPEN) {
+            openChannel(id);
+            continue;
+        }
+
+        std::lock_guard<std::mutex> lock(m_mutex);
+        auto it = m_channels.find(id);
+        if (it == m_channels.end()) {
+            continue;  // 已经结束的通道上迟到的帧
+        }
+        Channel& channel = *it->second;
+        if (type == FRAME_DATA) {
+            channel.received.push_back(payload);
+            channel.receivedReady.notify_one();
+        } else if (type == FRAME_WINDOW && length == 4) {
+            channel.credit += readU32(reinterpret_cast<const unsigned char*>(payload.data()));
+            m_writerWake.notify_one();
+        } else if (type == FRAME_CLOSE) {
+            channel.remoteClosed = true;
+            channel.receivedReady.notify_one();
+        }
+    }
+
+    // 连接断开：停止发送，关闭所有通道的本地socket让处理函数和搬运线程退出
+    std::vector<std::shared_ptr<Channel>> channels;
+    {
+        std::lock_guard<std::mutex> lock(m_mutex);
+        m_stopping = true;
+        for (auto& entry : m_channels) {
+            Channel& channel = *entry.second;
+            channel.remoteClosed = true;
+            channel.receivedReady.notify_all();
+            channel.chunkTaken.notify_all();
+            shutdownSocket(channel.local, true);
+            channels.push_back(entry.second);
+        }
+        m_channels.clear();
+        m_writerWake.notify_all();
+    }
+    shutdownSocket(m_socket, true);
+
+    for (auto& channel : channels) {
+        channel->handler.join();
+        channel->inbound.join();
+        channel->outbound.join();
+        closesocket(channel->local);
+    }
+    writer.join();
+}
+
+void Session::openChannel(uint16_t id) {
+    reapChannels();
+
+    std::lock_guard<std::mutex> lock(m_mutex);
+    SOCKET pair[2];
+    if (m_channels.count(id) || m_channels.size() >= MAX_CHANNELS || !createSocketPair(pair)) {
+        // 无法打开时直接回一个关闭帧，对端在该通道上读到EOF
+        m_control.push_back(encodeHeader(FRAME_CLOSE, id, 0));
+        m_writerWake.notify_one();
+        return;
+    }
+
+    auto channel = std::make_shared<Channel>();
+    channel->id = id;
+    channel->local = pair[0];
+    channel->inner = pair[1];
+    m_channels[id] = channel;
+
+    channel->handler = std::thread([this, channel]() {
+        m_handler(channel->inner);
+        threadDone(*channel);
+    });
+    channel->inbound = std::thread(&Session::inboundLoop, this, channel);
+    channel->outbound = std::thread(&Session::outboundLoop, this, channel);
+}
+
+void Session::reapChannels() {
+    // 三个线程都已退出并且关闭帧已发出的通道可以回收
+    std::vector<std::shared_ptr<Channel>> finished;
+    {
+        std::lock_guard<std::mutex> lock(m_mutex);
+        for (auto it = m_channels.begin(); it != m_channels.end();) {
+            if (it->second->runningThreads == 0 && it->second->closeSent) {
+                finished.push_back(it->second);
+                it = m_channels.erase(it);
+            } else {
+                ++it;
+            }
+        }
+    }
+    for (auto& channel : finished) {
+        channel->handler.join();
+        channel->inbound.join();
+        channel->outbound.join();
+        closesocket(channel->local);
+    }
+}
+
+void Session::threadDone(Channel& channel) {
+    std::lock_guard<std::mutex> lock(m_mutex);
+    --channel.runningThreads;
+}
+
+void Session::inboundLoop(std::shared_ptr<Channel> channel) {
+    // 对端数据 -> 本地socket；每写完一块把窗口还给对端
+    bool writable = true;
+    std::unique_lock<std::mutex> lock(m_mutex);
+    while (true) {
+        channel->receivedReady.wait(lock, [&] { return !channel->received.empty() || channel->remoteClosed; });
+        if (channel->received.empty()) {
+            break;
+        }
+        std::vector<char> data = std::move(channel->received.front());
+        channel->received.pop_front();
+        lock.unlock();
+
+        // 处理函数已经退出时丢弃数据，但照常归还窗口，避免对端卡住
+        if (writable) {
+            writable = sendAll(channel->local, data.data(), data.size());
+        }
+
+        lock.lock();
+        if (!m_stopping) {
+            std::string frame = encodeHeader(FRAME_WINDOW, channel->id, 4);
+            appendU32(frame, static_cast<uint32_t>(data.size()));
+            m_control.push_back(std::move(frame));
+            m_writerWake.notify_one();
+        }
+    }
+    lock.unlock();
+
+    // 对端不再发送：处理函数读到EOF后自行结束
+    shutdownSocket(channel->local, false);
+    threadDone(*channel);
+}
+
+void Session::outboundLoop(std::shared_ptr<Channel> channel) {
+    // 本地socket -> 待发送块；同一时间只缓存一块，写线程取走前不再读取，背压一直传到处理函数
+    std::vector<char> buffer(MAX_CHUNK);
+    while (true) {
+        int n = recv(channel->local, buffer.data(), static_cast<int>(buffer.size()), 0);
+
+        std::unique_lock<std::mutex> lock(m_mutex);
+        channel->chunkTaken.wait(lock, [&] { return !channel->hasChunk || m_stopping; });
+        if (n <= 0 || m_stopping) {
+            channel->localClosed = true;
+            m_writerWake.notify_one();
+            break;
+        }
+        channel->chunk.assign(buffer.data(), buffer.data() + n);
+        channel->chunkOffset = 0;
+        channel->hasChunk = true;
+        m_writerWake.notify_one();
+    }
+    threadDone(*channel);
+}
+
+bool Session::nextFrame(std::string& frame) {
+    std::unique_lock<std::mutex> lock(m_mutex);
+    while (true) {
+        if (m_stopping) {
+            return false;
+        }
+        // 控制帧优先：窗口更新不及时会让对端停下来
+        if (!m_control.empty()) {
+            frame = std::move(m_control.front());
+            m_control.pop_front();
+            return true;
+        }
+
+        // 从上一次发送的通道之后开始轮转，每个通道每轮最多发一块，大下载不会饿死其他通道
+        auto start = m_channels.upper_bound(m_cursor);
+        for (size_t i = 0; i < m_channels.size(); ++i, ++start) {
+            if (start == m_channels.end()) {
+                start = m_channels.begin();
+            }
+            Channel& channel = *start->second;
+            if (channel.hasChunk && channel.credit > 0) {
+                size_t size = std::min(channel.chunk.size() - channel.chunkOffset, channel.credit);
+                frame = encodeHeader(FRAME_DATA, channel.id, static_cast<uint32_t>(size));
+                frame.append(channel.chunk.data() + channel.chunkOffset, size);
+                channel.chunkOffset += size;
+                channel.credit -= size;
+                if (channel.chunkOffset == channel.chunk.size()) {
+                    channel.hasChunk = false;
+                    channel.chunkTaken.notify_one();
+                }
+                m_cursor = channel.id;
+                return true;
+            }
+            if (channel.localClosed && !channel.closeSent && !channel.hasChunk) {
+                channel.closeSent = true;
+                frame = encodeHeader(FRAME_CLOSE, channel.id, 0);
+                m_cursor = channel.id;
+                return true;
+            }
+        }
+        m_writerWake.wait(lock);
+    }
+}
+
+void Session::writeLoop() {
+    std::string frame;
+    while (nextFrame(frame)) {
+        if (!sendAll(m_socket, frame.data(), frame.size())) {
+            // 连接已不可写：让读取循环也退出
+            shutdownSocket(m_socket, true);
+            break;
+        }
+    }
+}
+
+}
@@ -1,4 +1,7 @@
 #include "socket_server.h"
+#include "hash_utils.h"
+#include "compression_utils.h"
+#include "mux_session.h"
 #include <iostream>
 #include <thread>
 #include <sstream>
@@ -7,6 +10,226 @@
 #include <algorithm>
 #include <locale>
 #include <codecvt>
+#include <cstdint>
+#include <csignal>
+#include <future>
+#include <chrono>
+#include <cerrno>
+#include <cstring>
+
+namespace {
+    // 打包上传条目头部: 路径长度(u16) + 数据长度(u64)，小端序
+    const size_t BUNDLE_HEADER_SIZE = 10;
+
+    // 断点续传上传过程中的临时文件后缀，文件列表中不显示
+    const std::string PARTIAL_SUFFIX = ".ftpart";
+
+    // 增量上传: 操作头部为 类型(u8) + 两个u64参数，小端序
+    const size_t DELTA_OP_SIZE = 17;
+    const unsigned char DELTA_OP_END = 0;      // 结束，后跟32字节的新文件SHA-256
+    const unsigned char DELTA_OP_COPY = 1;     // 从旧文件复制: 起始块号, 块数
+    const unsigned char DELTA_OP_LITERAL = 2;  // 字面数据: 长度，后跟数据
+    const uint64_t DELTA_MAX_BLOCK_SIZE = 16 * 1024 * 1024;
+    
+    // 增量重建过程中的临时文件后缀，文件列表中不显示
+    const std::string DELTA_SUFFIX = ".ftdelta";
+    
+    // 去重复制过程中的临时文件后缀，文件列表中不显示
+    const std::string DEDUP_SUFFIX = ".ftdedup";
+    
+    // 去重查询: 条目头部为 SHA-256(32字节) + 文件大小(u64) + 文件名长度(u16)，小端序
+    const size_t DEDUP_ENTRY_HEADER_SIZE = 42;
+    const size_t DEDUP_MAX_ENTRIES = 100000;
+    
+    // 分页列表每页最多返回的条目数
+    const size_t LIST_MAX_PAGE_SIZE = 10000;
+    
+    // 分页列表的缓存：目录排序后的内容在目录修改时间变化前一直有效；子目录的汇总（文件数、总大小）
+    // 还受深层目录变化影响，最多使用这么多秒。缓存的目录数超过上限时整个清空
+    const auto LIST_TOTALS_TTL = std::chrono::seconds(10);
+    const size_t LIST_CACHE_MAX_DIRS = 4096;
+    
+    // unix套接字accept因描述符耗尽等资源不足失败后，等待这么久再重试
+    const auto UNIX_ACCEPT_BACKOFF = std::chrono::milliseconds(100);
+    
+    // 分帧控制消息: 魔数(u8) + 类型(u8) + 标志(u16) + 负载长度(u32)，小端序，与Python端 wire_protocol.py 保持一致
+    // 魔数0xF7不会出现在UTF-8文本开头，据此区分分帧消息和旧的文本命令
+    const size_t FRAME_HEADER_SIZE = 8;
+    const unsigned char FRAME_MAGIC = 0xF7;
+    const unsigned char FRAME_TEXT = 1;
+    const size_t MAX_MESSAGE_SIZE = 1024 * 1024;
+    const size_t CONNECTION_BUFFER_SIZE = 64 * 1024;
+    
+    // 每个客户端连接由独立的线程处理，连接的协议状态放在线程局部变量里
+    struct ConnectionState {
+        bool framed = false;       // 收到过分帧消息后，回复也按帧发送
+        std::vector<char> buffer;  // 解析命令时多收到、尚未消费的数据（例如流水线发来的下一条命令）
+        size_t start = 0;
+        size_t end = 0;
+    };
+    thread_local ConnectionState t_connection;
+    
+    // 从连接读取原始数据：先交出缓冲区里剩余的数据，再从socket接收
+    int receiveRaw(SOCKET socket, char* out, size_t length) {
+        ConnectionState& state = t_connection;
+        if (state.start < state.end) {
+            size_t chunk = std::min(state.end - state.start, length);
+            std::copy(state.buffer.data() + state.start, state.buffer.data() + state.start + chunk, out);
+            state.start += chunk;
+            return static_cast<int>(chunk);
+        }
+        return recv(socket, out, static_cast<int>(length), 0);
+    }
+    
+    bool endsWith(const std::string& value, const std::string& suffix) {
+        return value.size() >= suffix.size() &&
+               value.compare(value.size() - suffix.size(), suffix.size(), suffix) == 0;
+    }
+
+    // 上传过程中的临时文件（断点续传、增量重建、去重复制）不对外显示，也不参与去重
+    bool isTemporaryName(const std::string& name) {
+        return endsWith(name, PARTIAL_SUFFIX) || endsWith(name, DELTA_SUFFIX) || endsWith(name, DEDUP_SUFFIX);
+    }
+    
+    // 流式计算文件的SHA-256
+    bool hashFile(const std::filesystem::path& path, Sha256::Digest& digest) {
+        std::ifstream file(path, std::ios::binary);
+        if (!file.is_open()) {
+            return false;
+        }
+        Sha256 sha;
+        std::vector<char> buffer(1024 * 1024);
+        while (file) {
+            file.read(buffer.data(), static_cast<std::streamsize>(buffer.size()));
+            if (file.gcount() > 0) {
+                sha.update(buffer.data(), static_cast<size_t>(file.gcount()));
+            }
+        }
+        if (!file.eof()) {
+            return false;
+        }
+        digest = sha.digest();
+        return true;
+    }
+    
+    uint64_t readLittleEndian(const unsigned char* data, size_t bytes) {
+        uint64_t value = 0;
+        for (size_t i = bytes; i > 0; --i) {
+            value = (value << 8) | data[i - 1];
+        }
+        return value;
+    }
+    
+    void appendLittleEndian(std::string& out, uint64_t value, size_t bytes) {
+        for (size_t i = 0; i < bytes; ++i) {
+            out += static_cast<char>((value >> (8 * i)) & 0xff);
+        }
+    }
+    
+    // 文件名通配符匹配，支持 * 和 ?（不依赖平台的fnmatch）
+    bool globMatch(const std::string& pattern, const std::string& text) {
+        size_t p = 0;
+        size_t t = 0;
+        size_t starPattern = std::string::npos;
+        size_t starText = 0;
+        while (t < text.size()) {
+            if (p < pattern.size() && (pattern[p] == '?' || pattern[p] == text[t])) {
+                ++p;
+                ++t;
+            } else if (p < pattern.size() && pattern[p] == '*') {
+                starPattern = p++;
+                starText = t;
+            } else if (starPattern != std::string::npos) {
+                p = starPattern + 1;
+                t = ++starText;
+            } else {
+                return false;
+            }
+        }
+        while (p < pattern.size() && pattern[p] == '*') {
+            ++p;
+        }
+        return p == pattern.size();
+    }
+    
+    bool sendAll(SOCKET socket, const char* data, size_t length) {
+        size_t totalSent = 0;
+        while (totalSent < length) {
+            int result = send(socket, data + totalSent, static_cast<int>(length - totalSent), 0);
+            if (result == SOCKET_ERROR || result == 0) {
+                return false;
+            }
+            totalSent += result;
+        }
+        return true;
+    }
+    
+    std::vector<std::string> splitPath(const std::string& path) {
+        std::vector<std::string> components;
+        std::stringstream ss(path);
+        std::string item;
+        while (std::getline(ss, item, '/')) {
+            if (!item.empty()) {
+                components.push_back(item);
+            }
+        }
+        return components;
+    }
+    
+    // 带缓冲的socket读取：一次recv一大块，再从缓冲区里按需切出，
+    // 用于打包上传、增量上传这类由许多小记录组成的数据流
+    class SocketReader {
+    public:
+        explicit SocketReader(SOCKET socket, size_t bufferSize = 256 * 1024)
+            : m_socket(socket), m_buffer(bufferSize), m_start(0), m_end(0) {}
+        
+        // 读取length字节到out
+        bool read(void* out, size_t length) {
+            char* dest = static_cast<char*>(out);
+            return consume(length, [&](const char* data, size_t chunk) {
+                std::copy(data, data + chunk, dest);
+                dest += chunk;
+            });
+        }
+        
+        // 读取length字节写入file（file为空时丢弃），可选地同时计算SHA-256
+        bool copyTo(std::ofstream* file, uint64_t length, Sha256* sha = nullptr) {
+            return consume(length, [&](const char* data, size_t chunk) {
+                if (file) {
+                    file->write(data, chunk);
+                }
+                if (sha) {
+                    sha->update(data, chunk);
+                }
+            });
+        }
+        
+    private:
+        template <typename Sink>
+        bool consume(uint64_t length, Sink sink) {
+            while (length > 0) {
+                if (m_start == m_end) {
+                    int bytesReceived = receiveRaw(m_socket, m_buffer.data(), m_buffer.size());
+                    if (bytesReceived <= 0) {
+                        return false;
+                    }
+                    m_start = 0;
+                    m_end = bytesReceived;
+                }
+                size_t chunk = static_cast<size_t>(std::min<uint64_t>(m_end - m_start, length));
+                sink(m_buffer.data() + m_start, chunk);
+                m_start += chunk;
+                length -= chunk;
+            }
+            return true;
+        }
+        
+        SOCKET m_socket;
+        std::vector<char> m_buffer;
+        size_t m_start;
+        size_t m_end;
+    };
+}
 
 #ifdef _WIN32
 // Windows下UTF-8字符串转换为宽字符串
@@ -95,15 +318,85 @@ bool SocketServer::start() {
         return false;
     }
 
-    // Start listening
-    if (listen(m_serverSocket, 5) == SOCKET_ERROR) {
+    // Start listening (a deep backlog so bursts of concurrent clients are not dropped during the handshake)
+    if (listen(m_serverSocket, SOMAXCONN) == SOCKET_ERROR) {
         logError("Failed to listen");
         return false;
     }
 
     m_running = true;
     logInfo("Server started successfully, listening on port: " + std::to_string(m_port));
+    
+    if (!m_unixSocketPath.empty() && !startUnixListener()) {
+        stop();
+        return false;
+    }
+    return true;
+}
+
+void SocketServer::setUnixSocketPath(const std::string& path) {
+    m_unixSocketPath = path;
+}
+
+bool SocketServer::startUnixListener() {
+#ifdef _WIN32
+    logError("Unix domain sockets are not supported on this platform");
+    return false;
+#else
+    sockaddr_un address{};
+    address.sun_family = AF_UNIX;
+    if (m_unixSocketPath.size() >= sizeof(address.sun_path)) {
+        logError("Unix socket path too long: " + m_unixSocketPath);
+        return false;
+    }
+    std::copy(m_unixSocketPath.begin(), m_unixSocketPath.end(), address.sun_path);
+    
+    m_unixSocket = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (m_unixSocket == INVALID_SOCKET) {
+        logError("Failed to create unix socket");
+        return false;
+    }
+    // 上次异常退出留下的套接字文件会让bind失败
+    unlink(m_unixSocketPath.c_str());
+    if (bind(m_unixSocket, (sockaddr*)&address, sizeof(address)) == SOCKET_ERROR ||
+        listen(m_unixSocket, SOMAXCONN) == SOCKET_ERROR) {
+        logError("Failed to listen on unix socket: " + m_unixSocketPath);
+        closesocket(m_unixSocket);
+        m_unixSocket = INVALID_SOCKET;
+        return false;
+    }
+    
+    m_unixAcceptThread = std::thread(&SocketServer::acceptUnixClients, this, m_unixSocket);
+    logInfo("Listening on unix socket: " + m_unixSocketPath);
     return true;
+#endif
+}
+
+void SocketServer::acceptUnixClients(SOCKET listenSocket) {
+#ifndef _WIN32
+    while (m_running) {
+        SOCKET clientSocket = accept(listenSocket, nullptr, nullptr);
+        if (clientSocket == INVALID_SOCKET) {
+            int error = errno;
+            if (!m_running) {
+                break;
+            }
+            if (error == EINTR || error == ECONNABORTED) {
+                continue;
+            }
+            logError("Failed to accept unix socket connection: " + std::string(strerror(error)));
+            // 文件描述符或内存耗尽时accept会立即再次失败，等一会儿再试，不空转占满CPU
+            if (error == EMFILE || error == ENFILE || error == ENOBUFS || error == ENOMEM) {
+                std::this_thread::sleep_for(UNIX_ACCEPT_BACKOFF);
+                continue;
+            }
+            break;
+        }
+        logInfo("New client connected on unix socket");
+        std::thread clientThread(&SocketServer::handleClient, this, clientSocket);
+        clientThread.detach();
+    }
+#endif
 }
 
 void SocketServer::stop() {
@@ -117,6 +410,19 @@ void SocketServer::stop() {
         closesocket(m_serverSocket);
         m_serverSocket = INVALID_SOCKET;
     }
+    
+    if (m_unixSocket != INVALID_SOCKET) {
+#ifndef _WIN32
+        // 唤醒阻塞在accept上的线程，等它退出后再关闭套接字，避免它在已关闭（或被复用）的描述符上accept
+        shutdown(m_unixSocket, SHUT_RDWR);
+        unlink(m_unixSocketPath.c_str());
+#endif
+        if (m_unixAcceptThread.joinable()) {
+            m_unixAcceptThread.join();
+        }
+        closesocket(m_unixSocket);
+        m_unixSocket = INVALID_SOCKET;
+    }
 
     logInfo("Server stopped");
 }
@@ -148,6 +454,10 @@ void SocketServer::run() {
         
         logInfo("New client connected: " + std::string(clientIP) + ":" + std::to_string(ntohs(clientAddr.sin_port)));
 
+        // 控制消息的回复都是小包：流水线发来的多条命令的回复不能被Nagle算法攒住，等待对端的延迟ACK
+        int noDelay = 1;
+        setsockopt(clientSocket, IPPROTO_TCP, TCP_NODELAY, reinterpret_cast<const char*>(&noDelay), sizeof(noDelay));
+
         // Handle client in new thread
         std::thread clientThread(&SocketServer::handleClient, this, clientSocket);
         clientThread.detach();
@@ -161,6 +471,14 @@ void SocketServer::setClientHandler(ClientHandler handler) {
 void SocketServer::setFileDirectory(const std::string& dir) {
     m_fileDirectory = dir;
     createFileDirectory();
+    
+    std::lock_guard<std::mutex> lock(m_contentMutex);
+    ++m_contentGeneration;
+    m_contentIndexed = false;
+    m_pathsBySize.clear();
+    m_sizeByPath.clear();
+    m_pendingStored.clear();
+    m_storedDigests.clear();
 }
 
 #ifdef USE_SPDLOG
@@ -285,6 +603,10 @@ bool SocketServer::initializeSocket() {
         m_wsaInitialized = true;
         logDebug("WSA initialized successfully");
     }
+#else
+    // 客户端在传输中途断开时send会触发SIGPIPE，忽略它让send返回错误，
+    // 否则整个服务器进程会被终止（断点续传正依赖于中断后重新连接）
+    signal(SIGPIPE, SIG_IGN);
 #endif
     return true;
 }
@@ -299,6 +621,7 @@ void SocketServer::cleanup() {
 }
 
 void SocketServer::handleClient(SOCKET clientSocket) {
+    t_connection = ConnectionState();
     try {
         while (m_running) {
             std::string message = receiveMessage(clientSocket);
@@ -334,20 +657,80 @@ void SocketServer::handleClient(SOCKET clientSocket) {
 }
 
 std::string SocketServer::receiveMessage(SOCKET clientSocket) {
-    char buffer[1024];
-    int bytesReceived = recv(clientSocket, buffer, sizeof(buffer) - 1, 0);
+    ConnectionState& state = t_connection;
+    if (state.buffer.empty()) {
+        state.buffer.resize(CONNECTION_BUFFER_SIZE);
+    }
     
-    if (bytesReceived <= 0) {
-        return ""; // Connection closed or error
+    // 旧的文本协议没有消息边界，一次recv收到的内容就是一条命令
+    if (!state.framed && state.start == state.end) {
+        int bytesReceived = recv(clientSocket, state.buffer.data(), static_cast<int>(state.buffer.size()), 0);
+        if (bytesReceived <= 0) {
+            return ""; // Connection closed or error
+        }
+        state.start = 0;
+        state.end = bytesReceived;
+        if (static_cast<unsigned char>(state.buffer[0]) != FRAME_MAGIC) {
+            state.end = 0;
+            return std::string(state.buffer.data(), bytesReceived);
+        }
+        state.framed = true;
+        logInfo("Client switched to framed messages");
     }
     
-    buffer[bytesReceived] = '\0';
-    return std::string(buffer);
+    // 分帧协议：在连接缓冲区里原地解析，凑不齐一帧时继续接收；一帧之后的数据留给下一次读取
+    while (true) {
+        size_t available = state.end - state.start;
+        if (available >= FRAME_HEADER_SIZE) {
+            const unsigned char* header = reinterpret_cast<const unsigned char*>(state.buffer.data() + state.start);
+            uint64_t length = readLittleEndian(header + 4, 4);
+            if (header[0] != FRAME_MAGIC || header[1] != FRAME_TEXT || length > MAX_MESSAGE_SIZE) {
+                logError("Invalid message frame");
+                return "";
+            }
+            if (available >= FRAME_HEADER_SIZE + length) {
+                std::string message(state.buffer.data() + state.start + FRAME_HEADER_SIZE, static_cast<size_t>(length));
+                state.start += FRAME_HEADER_SIZE + static_cast<size_t>(length);
+                if (state.start == state.end) {
+                    state.start = state.end = 0;
+                }
+                return message;
+            }
+            if (state.buffer.size() < FRAME_HEADER_SIZE + length) {
+                state.buffer.resize(FRAME_HEADER_SIZE + static_cast<size_t>(length));
+            }
+        }
+        
+        // 腾出缓冲区尾部的空间
+        if (state.end == state.buffer.size()) {
+            std::copy(state.buffer.begin() + state.start, state.buffer.begin() + state.end, state.buffer.begin());
+            state.end -= state.start;
+            state.start = 0;
+        }
+        int bytesReceived = recv(clientSocket, state.buffer.data() + state.end,
+                                 static_cast<int>(state.buffer.size() - state.end), 0);
+        if (bytesReceived <= 0) {
+            return "";
+        }
+        state.end += bytesReceived;
+    }
 }
 
 bool SocketServer::sendMessage(SOCKET clientSocket, const std::string& message) {
-    int bytesSent = send(clientSocket, message.c_str(), static_cast<int>(message.length()), 0);
-    return bytesSent != SOCKET_ERROR;
+    // 分帧连接上每条消息前加帧头，和消息一起一次发出
+    if (t_connection.framed) {
+        std::string frame;
+        frame.reserve(FRAME_HEADER_SIZE + message.size());
+        frame += static_cast<char>(FRAME_MAGIC);
+        frame += static_cast<char>(FRAME_TEXT);
+        appendLittleEndian(frame, 0, 2);
+        appendLittleEndian(frame, message.size(), 4);
+        frame += message;
+        return sendAll(clientSocket, frame.data(), frame.size());
+    }
+    
+    // 长消息（文件列表、打包结果表）可能一次send发不完，sendAll循环直到全部发出
+    return sendAll(clientSocket, message.data(), message.size());
 }
 
 void SocketServer::handleFileCommand(SOCKET clientSocket, const std::string& command) {
@@ -371,8 +754,45 @@ void SocketServer::handleFileCommand(SOCKET clientSocket, const std::string& com
     
     // LIST命令不需要文件名
     if (action == "LIST") {
-        logInfo("File list request");
-        sendFileList(clientSocket);
+        if (parts.size() <= 2) {
+            logInfo("File list request");
+            sendFileList(clientSocket);
+            return;
+        }
+        
+        // 分页列表: FILE:LIST:<每页条数>:<R递归|D单层>:<前缀>:<通配符>:<光标>
+        // 光标是上一页最后一条的路径，可能含有冒号，取剩余全部字段
+        ListPageRequest request;
+        request.limit = static_cast<size_t>(std::stoull(parts[2]));
+        request.recursive = parts.size() <= 3 || parts[3] != "D";
+        request.prefix = (parts.size() > 4) ? parts[4] : "";
+        request.pattern = (parts.size() > 5) ? parts[5] : "";
+        for (size_t i = 6; i < parts.size(); ++i) {
+            request.cursor += (i > 6 ? ":" : "") + parts[i];
+        }
+        logDebug("File list page request: prefix='" + request.prefix + "' pattern='" + request.pattern +
+                 "' cursor='" + request.cursor + "'");
+        sendFileListPage(clientSocket, request);
+        return;
+    }
+    
+    // 多路复用: 之后这条连接只承载通道帧，每个通道当作一条独立的客户端连接处理
+    if (action == "MUX") {
+        if (!sendMessage(clientSocket, "MUX_READY\n")) {
+            return;
+        }
+        logInfo("Multiplexed session started");
+        mux::Session session(clientSocket,
+            [clientSocket](char* out, size_t length) { return receiveRaw(clientSocket, out, length); },
+            [this](SOCKET channelSocket) { handleClient(channelSocket); });
+        session.run();
+        logInfo("Multiplexed session ended");
+        return;
+    }
+    
+    // 能力协商: 服务器支持的压缩算法
+    if (action == "CAPS") {
+        sendCapabilities(clientSocket);
         return;
     }
     
@@ -399,6 +819,70 @@ void SocketServer::handleFileCommand(SOCKET clientSocket, const std::string& com
             sendMessage(clientSocket, "ERROR: File upload failed\n");
         }
     }
+    else if (action == "PARTIAL") {
+        sendPartialSize(clientSocket, filename);
+    }
+    else if (action == "RESUME") {
+        // FILE:RESUME:<文件名>:<总大小>:<偏移>
+        if (parts.size() < 5) {
+            sendMessage(clientSocket, "ERROR: File size and offset required for resume\n");
+            return;
+        }
+        
+        uint64_t fileSize = std::stoull(parts[3]);
+        uint64_t offset = std::stoull(parts[4]);
+        logInfo("Resumable upload request: " + filename + " (" + std::to_string(offset) + "/" +
+                std::to_string(fileSize) + " bytes already present)");
+        
+        if (handleResumableUpload(clientSocket, filename, fileSize, offset)) {
+            sendMessage(clientSocket, "SUCCESS: File uploaded successfully\n");
+        } else {
+            sendMessage(clientSocket, "ERROR: File upload failed\n");
+        }
+    }
+    else if (action == "ZUPLOAD") {
+        // FILE:ZUPLOAD:<文件名>:<总大小>:<算法>[:<续传偏移>]，带偏移时按断点续传写入临时文件
+        if (parts.size() < 5) {
+            sendMessage(clientSocket, "ERROR: File size and codec required for compressed upload\n");
+            return;
+        }
+        
+        uint64_t fileSize = std::stoull(parts[3]);
+        std::string codec = parts[4];
+        bool resumable = parts.size() > 5;
+        uint64_t offset = resumable ? std::stoull(parts[5]) : 0;
+        logInfo("Compressed upload request: " + filename + " (" + std::to_string(fileSize) + " bytes, " + codec +
+                (resumable ? ", resume at " + std::to_string(offset) : "") + ")");
+        
+        std::string summary;
+        if (handleCompressedUpload(clientSocket, filename, fileSize, codec, offset, resumable, summary)) {
+            sendMessage(clientSocket, "SUCCESS: File uploaded successfully (" + summary + ")\n");
+        } else {
+            sendMessage(clientSocket, "ERROR: File upload failed\n");
+        }
+    }
+    else if (action == "DEDUP") {
+        // FILE:DEDUP:<条目数>，随后是二进制查询条目
+        size_t count = std::stoull(parts[2]);
+        if (count > DEDUP_MAX_ENTRIES) {
+            sendMessage(clientSocket, "ERROR: Too many dedup entries\n");
+            return;
+        }
+        logInfo("Dedup query: " + std::to_string(count) + " files");
+        
+        if (!handleDedupQuery(clientSocket, count)) {
+            logError("Dedup query aborted");
+        }
+    }
+    else if (action == "BUNDLE") {
+        // FILE:BUNDLE:<文件数>:<总字节数>
+        size_t fileCount = std::stoull(parts[2]);
+        logInfo("Bundle upload request: " + std::to_string(fileCount) + " files");
+        
+        if (!handleBundleUpload(clientSocket, fileCount)) {
+            logError("Bundle upload aborted");
+        }
+    }
     else if (action == "DOWNLOAD") {
         logInfo("File download request: " + filename);
         
@@ -408,6 +892,67 @@ void SocketServer::handleFileCommand(SOCKET clientSocket, const std::string& com
             sendMessage(clientSocket, "ERROR: File not found or download failed\n");
         }
     }
+    else if (action == "DOWNLOAD_RANGE") {
+        // FILE:DOWNLOAD_RANGE:<文件名>:<偏移>:<长度>
+        if (parts.size() < 5) {
+            sendMessage(clientSocket, "ERROR: Offset and length required for range download\n");
+            return;
+        }
+        
+        uint64_t offset = std::stoull(parts[3]);
+        uint64_t length = std::stoull(parts[4]);
+        logDebug("Range download request: " + filename + " [" + std::to_string(offset) + ", +" + std::to_string(length) + ")");
+        
+        if (!handleFileDownload(clientSocket, filename, offset, length)) {
+            sendMessage(clientSocket, "ERROR: File not found or download failed\n");
+        }
+    }
+    else if (action == "ZDOWNLOAD") {
+        // FILE:ZDOWNLOAD:<文件名>:<算法>[:<偏移>:<长度>]
+        if (parts.size() < 4) {
+            sendMessage(clientSocket, "ERROR: Codec required for compressed download\n");
+            return;
+        }
+        
+        uint64_t offset = (parts.size() > 5) ? std::stoull(parts[4]) : 0;
+        uint64_t length = (parts.size() > 5) ? std::stoull(parts[5]) : UINT64_MAX;
+        logInfo("Compressed download request: " + filename + " (" + parts[3] + ")");
+        
+        if (!handleCompressedDownload(clientSocket, filename, parts[3], offset, length)) {
+            sendMessage(clientSocket, "ERROR: File not found or download failed\n");
+        }
+    }
+    else if (action == "STAT") {
+        sendFileStat(clientSocket, filename);
+    }
+    else if (action == "SIGNATURES") {
+        // FILE:SIGNATURES:<文件名>:<块大小>
+        uint64_t blockSize = (parts.size() >= 4) ? std::stoull(parts[3]) : 0;
+        if (blockSize == 0 || blockSize > DELTA_MAX_BLOCK_SIZE) {
+            sendMessage(clientSocket, "ERROR: Invalid block size\n");
+            return;
+        }
+        sendBlockSignatures(clientSocket, filename, static_cast<size_t>(blockSize));
+    }
+    else if (action == "DELTA") {
+        // FILE:DELTA:<文件名>:<新文件大小>:<块大小>
+        if (parts.size() < 5) {
+            sendMessage(clientSocket, "ERROR: File size and block size required for delta upload\n");
+            return;
+        }
+        
+        uint64_t fileSize = std::stoull(parts[3]);
+        uint64_t blockSize = std::stoull(parts[4]);
+        logInfo("Delta upload request: " + filename + " (" + std::to_string(fileSize) + " bytes, block " +
+                std::to_string(blockSize) + ")");
+        
+        std::string summary;
+        if (handleDeltaUpload(clientSocket, filename, fileSize, blockSize, summary)) {
+            sendMessage(clientSocket, "SUCCESS: Delta applied (" + summary + ")\n");
+        } else {
+            sendMessage(clientSocket, "ERROR: Delta upload failed\n");
+        }
+    }
     else {
         sendMessage(clientSocket, "ERROR: Unknown file action\n");
     }
@@ -420,10 +965,84 @@ bool SocketServer::handleFileUpload(SOCKET clientSocket, const std::string& file
     }
     
     std::string filepath = getFilePath(filename);
-    return receiveFileData(clientSocket, filepath, fileSize);
+    if (!receiveFileData(clientSocket, filepath, fileSize)) {
+        return false;
+    }
+    noteStoredFile(filepath);
+    return true;
+}
+
+bool SocketServer::handleResumableUpload(SOCKET clientSocket, const std::string& filename,
+                                         uint64_t fileSize, uint64_t offset) {
+    std::string filepath = getFilePath(filename);
+    std::string partPath = filepath + PARTIAL_SUFFIX;
+    if (!preparePartialFile(partPath, fileSize, offset)) {
+        return false;
+    }
+    
+    std::error_code ec;
+#ifdef _WIN32
+    std::filesystem::path partFsPath(utf8ToWide(partPath));
+    std::filesystem::path finalFsPath(utf8ToWide(filepath));
+#else
+    std::filesystem::path partFsPath(partPath);
+    std::filesystem::path finalFsPath(filepath);
+#endif
+    
+    if (!sendMessage(clientSocket, "READY\n")) {
+        return false;
+    }
+    
+    // 连接中断时保留临时文件，下次从已收到的位置继续
+    if (!receiveFileData(clientSocket, partPath, fileSize - offset, offset, false)) {
+        return false;
+    }
+    
+    std::filesystem::rename(partFsPath, finalFsPath, ec);
+    if (ec) {
+        logError("Failed to finalize " + filepath + ": " + ec.message());
+        return false;
+    }
+    noteStoredFile(filepath);
+    return true;
+}
+
+bool SocketServer::preparePartialFile(const std::string& partPath, uint64_t fileSize, uint64_t offset) {
+    // 续传偏移不能超过服务器已保存的部分；已保存的部分比偏移长时截掉多余的尾部
+    std::error_code ec;
+#ifdef _WIN32
+    std::filesystem::path partFsPath(utf8ToWide(partPath));
+#else
+    std::filesystem::path partFsPath(partPath);
+#endif
+    uint64_t partSize = std::filesystem::exists(partFsPath, ec) ? std::filesystem::file_size(partFsPath, ec) : 0;
+    if (offset > partSize || offset > fileSize) {
+        logError("Invalid resume offset " + std::to_string(offset) + " for " + partPath +
+                 " (" + std::to_string(partSize) + " bytes present)");
+        return false;
+    }
+    if (offset > 0 && partSize > offset) {
+        std::filesystem::resize_file(partFsPath, offset, ec);
+    }
+    return true;
+}
+
+bool SocketServer::sendPartialSize(SOCKET clientSocket, const std::string& filename) {
+    std::string partPath = getFilePath(filename, false) + PARTIAL_SUFFIX;
+    std::error_code ec;
+#ifdef _WIN32
+    uintmax_t partSize = std::filesystem::file_size(utf8ToWide(partPath), ec);
+#else
+    uintmax_t partSize = std::filesystem::file_size(partPath, ec);
+#endif
+    if (ec) {
+        partSize = 0;
+    }
+    return sendMessage(clientSocket, "PARTIAL:" + std::to_string(partSize) + "\n");
 }
 
-bool SocketServer::handleFileDownload(SOCKET clientSocket, const std::string& filename) {
+bool SocketServer::handleFileDownload(SOCKET clientSocket, const std::string& filename,
+                                      uint64_t offset, uint64_t length) {
     std::string filepath = getFilePath(filename);
     
     // 检查文件是否存在（Windows下使用宽字符路径确保UTF-8支持）
@@ -439,11 +1058,17 @@ bool SocketServer::handleFileDownload(SOCKET clientSocket, const std::string& fi
     }
     
     // 获取文件大小
-    size_t fileSize = file.tellg();
+    uint64_t fileSize = static_cast<uint64_t>(file.tellg());
     file.close();
     
-    // 发送文件信息
-    std::string fileInfo = "FILE_INFO:" + std::to_string(fileSize) + "\n";
+    // 区间下载：截取到文件末尾为止
+    if (offset > fileSize) {
+        return false;
+    }
+    uint64_t sendSize = std::min(length, fileSize - offset);
+    
+    // 发送文件信息（区间下载时为区间实际长度）
+    std::string fileInfo = "FILE_INFO:" + std::to_string(sendSize) + "\n";
     if (!sendMessage(clientSocket, fileInfo)) {
         return false;
     }
@@ -454,36 +1079,705 @@ bool SocketServer::handleFileDownload(SOCKET clientSocket, const std::string& fi
         return false;
     }
     
-    return sendFileData(clientSocket, filepath);
+    return sendFileData(clientSocket, filepath, offset, sendSize);
 }
 
-bool SocketServer::sendFileList(SOCKET clientSocket) {
-    try {
-        std::string fileList = "FILE_LIST:\n";
-        
-        if (std::filesystem::exists(m_fileDirectory)) {
-            // 递归遍历所有文件，包括子目录
-            for (const auto& entry : std::filesystem::recursive_directory_iterator(m_fileDirectory)) {
-                if (entry.is_regular_file()) {
-                    std::filesystem::path relativePath = std::filesystem::relative(entry.path(), m_fileDirectory);
-                    
-                    // Windows下需要将路径转换为UTF-8
+bool SocketServer::sendFileStat(SOCKET clientSocket, const std::string& filename) {
+    std::filesystem::path path = toFsPath(getFilePath(filename, false));
+    std::error_code ec;
+    uintmax_t fileSize = std::filesystem::file_size(path, ec);
+    std::filesystem::file_time_type mtime;
+    if (!ec) {
+        mtime = std::filesystem::last_write_time(path, ec);
+    }
+    if (ec) {
+        return sendMessage(clientSocket, "ERROR: File not found\n");
+    }
+    // 修改时间只用于判断文件是否被替换（续传前比较），按文件时钟的纳秒数原样返回
+    long long mtimeNs = std::chrono::duration_cast<std::chrono::nanoseconds>(mtime.time_since_epoch()).count();
+    return sendMessage(clientSocket, "FILE_STAT:" + std::to_string(fileSize) + ":" + std::to_string(mtimeNs) + "\n");
+}
+
+bool SocketServer::sendBlockSignatures(SOCKET clientSocket, const std::string& filename, size_t blockSize) {
+    std::string filepath = getFilePath(filename, false);
 #ifdef _WIN32
-                    std::wstring wpath = relativePath.wstring();
-                    std::string filename = wideToUtf8(wpath);
+    std::ifstream file(utf8ToWide(filepath), std::ios::binary | std::ios::ate);
 #else
-                    std::string filename = relativePath.string();
+    std::ifstream file(filepath, std::ios::binary | std::ios::ate);
 #endif
-                    
-                    // 统一使用正斜杠作为路径分隔符
-                    std::replace(filename.begin(), filename.end(), '\\', '/');
-                    size_t fileSize = entry.file_size();
-                    fileList += filename + ":" + std::to_string(fileSize) + "\n";
-                }
-            }
+    if (!file.is_open()) {
+        return sendMessage(clientSocket, "ERROR: File not found\n");
+    }
+    
+    // 只为完整的块生成签名，不足一块的尾部总是作为字面数据发送
+    uint64_t fileSize = static_cast<uint64_t>(file.tellg());
+    uint64_t blockCount = fileSize / blockSize;
+    file.seekg(0);
+    
+    // 先算完全部签名再发送，读取失败时还能回复错误，客户端不会卡在读签名上
+    // 每块 弱校验和(u32) + SHA-256(32字节)
+    std::string entries;
+    entries.reserve(static_cast<size_t>(blockCount) * (4 + Sha256::DIGEST_SIZE));
+    std::vector<char> block(blockSize);
+    for (uint64_t i = 0; i < blockCount; ++i) {
+        if (!file.read(block.data(), blockSize)) {
+            logError("Failed to read block " + std::to_string(i) + " of " + filepath);
+            return sendMessage(clientSocket, "ERROR: Failed to read file\n");
         }
-        
-        fileList += "END_LIST\n";
+        const unsigned char* data = reinterpret_cast<const unsigned char*>(block.data());
+        appendLittleEndian(entries, weakChecksum(data, blockSize), 4);
+        Sha256::Digest digest = Sha256::hash(data, blockSize);
+        entries.append(reinterpret_cast<const char*>(digest.data()), digest.size());
+    }
+    
+    // 响应: SIGNATURES:<文件大小>:<块数>\n，随后是全部签名
+    if (!sendMessage(clientSocket, "SIGNATURES:" + std::to_string(fileSize) + ":" + std::to_string(blockCount) + "\n")) {
+        return false;
+    }
+    logInfo("Sent " + std::to_string(blockCount) + " block signatures for " + filepath);
+    return entries.empty() || sendMessage(clientSocket, entries);
+}
+
+bool SocketServer::handleDeltaUpload(SOCKET clientSocket, const std::string& filename,
+                                     uint64_t fileSize, uint64_t blockSize, std::string& summary) {
+    if (blockSize == 0 || blockSize > DELTA_MAX_BLOCK_SIZE) {
+        return false;
+    }
+    
+    std::string filepath = getFilePath(filename);
+    std::string tempPath = filepath + DELTA_SUFFIX;
+#ifdef _WIN32
+    std::filesystem::path finalFsPath(utf8ToWide(filepath));
+    std::filesystem::path tempFsPath(utf8ToWide(tempPath));
+#else
+    std::filesystem::path finalFsPath(filepath);
+    std::filesystem::path tempFsPath(tempPath);
+#endif
+    
+    // 旧文件作为重建的基准，新文件先写到临时文件，校验通过后再替换
+    std::ifstream basis(finalFsPath, std::ios::binary | std::ios::ate);
+    if (!basis.is_open()) {
+        logError("Delta basis not found: " + filepath);
+        return false;
+    }
+    uint64_t basisBlocks = static_cast<uint64_t>(basis.tellg()) / blockSize;
+    
+    std::ofstream output(tempFsPath, std::ios::binary | std::ios::trunc);
+    if (!output.is_open()) {
+        logError("Failed to create file: " + tempPath);
+        return false;
+    }
+    
+    if (!sendMessage(clientSocket, "READY\n")) {
+        return false;
+    }
+    
+    SocketReader reader(clientSocket);
+    Sha256 sha;
+    std::vector<char> block(static_cast<size_t>(blockSize));
+    uint64_t written = 0;
+    uint64_t literalBytes = 0;
+    uint64_t copiedBytes = 0;
+    bool valid = true;
+    unsigned char expected[Sha256::DIGEST_SIZE];
+    
+    while (true) {
+        unsigned char header[DELTA_OP_SIZE];
+        if (!reader.read(header, sizeof(header))) {
+            logError("Connection lost during delta upload: " + filepath);
+            output.close();
+            std::filesystem::remove(tempFsPath);
+            return false;
+        }
+        
+        unsigned char op = header[0];
+        uint64_t first = readLittleEndian(header + 1, 8);
+        uint64_t second = readLittleEndian(header + 9, 8);
+        
+        if (op == DELTA_OP_END) {
+            if (!reader.read(expected, sizeof(expected))) {
+                output.close();
+                std::filesystem::remove(tempFsPath);
+                return false;
+            }
+            break;
+        }
+        else if (op == DELTA_OP_LITERAL) {
+            // 即使已经判定无效也要读走数据，保持流同步直到结束标记
+            if (!reader.copyTo(valid ? &output : nullptr, first, &sha)) {
+                output.close();
+                std::filesystem::remove(tempFsPath);
+                return false;
+            }
+            literalBytes += first;
+            written += first;
+        }
+        else if (op == DELTA_OP_COPY) {
+            // first + second 可能溢出，先比较起点再比较剩余块数
+            if (first > basisBlocks || second > basisBlocks - first) {
+                logError("Delta references block beyond basis: " + std::to_string(first) + "+" +
+                         std::to_string(second));
+                valid = false;
+                continue;
+            }
+            basis.seekg(static_cast<std::streamoff>(first * blockSize));
+            for (uint64_t i = 0; i < second && valid; ++i) {
+                if (!basis.read(block.data(), static_cast<std::streamsize>(blockSize))) {
+                    logError("Failed to read basis block from " + filepath);
+                    valid = false;
+                    break;
+                }
+                output.write(block.data(), static_cast<std::streamsize>(blockSize));
+                sha.update(block.data(), static_cast<size_t>(blockSize));
+            }
+            copiedBytes += second * blockSize;
+            written += second * blockSize;
+        }
+        else {
+            // 未知操作无法确定长度，流已失步
+            logError("Unknown delta op " + std::to_string(op));
+            output.close();
+            std::filesystem::remove(tempFsPath);
+            return false;
+        }
+    }
+    
+    output.close();
+    basis.close();
+    
+    Sha256::Digest actual = sha.digest();
+    if (!valid || !output || written != fileSize ||
+        !std::equal(actual.begin(), actual.end(), expected)) {
+        logError("Delta verification failed for " + filepath + ": expected " +
+                 toHex(expected, sizeof(expected)) + ", got " + toHex(actual.data(), actual.size()));
+        std::filesystem::remove(tempFsPath);
+        return false;
+    }
+    
+    std::error_code ec;
+    std::filesystem::rename(tempFsPath, finalFsPath, ec);
+    if (ec) {
+        logError("Failed to finalize " + filepath + ": " + ec.message());
+        std::filesystem::remove(tempFsPath, ec);
+        return false;
+    }
+    
+    noteStoredFile(filepath);
+    summary = std::to_string(literalBytes) + " literal bytes, " + std::to_string(copiedBytes) + " copied bytes";
+    logInfo("Delta applied to " + filepath + ": " + summary);
+    return true;
+}
+
+bool SocketServer::sendCapabilities(SOCKET clientSocket) {
+    // CAPS:compress=<算法列表>;frame=1;mux=1，以后新增的能力用分号分隔追加
+    return sendMessage(clientSocket, "CAPS:compress=" + compression::supportedCodecs() + ";frame=1;mux=1\n");
+}
+
+bool SocketServer::handleCompressedUpload(SOCKET clientSocket, const std::string& filename, uint64_t fileSize,
+                                          const std::string& codec, uint64_t offset, bool resumable,
+                                          std::string& summary) {
+    if (!compression::codecSupported(codec)) {
+        logError("Unsupported compression codec: " + codec);
+        return false;
+    }
+    
+    std::string filepath = getFilePath(filename);
+    std::string targetPath = resumable ? filepath + PARTIAL_SUFFIX : filepath;
+    if (resumable && !preparePartialFile(targetPath, fileSize, offset)) {
+        return false;
+    }
+#ifdef _WIN32
+    std::filesystem::path targetFsPath(utf8ToWide(targetPath));
+    std::filesystem::path finalFsPath(utf8ToWide(filepath));
+#else
+    std::filesystem::path targetFsPath(targetPath);
+    std::filesystem::path finalFsPath(filepath);
+#endif
+    
+    std::ios::openmode mode = std::ios::binary | std::ios::out;
+    if (offset > 0) {
+        mode |= std::ios::in;
+    }
+    std::ofstream file(targetFsPath, mode);
+    if (!file.is_open()) {
+        logError("Failed to create file: " + targetPath);
+        return false;
+    }
+    file.seekp(static_cast<std::streamoff>(offset));
+    
+    if (!sendMessage(clientSocket, "READY\n")) {
+        return false;
+    }
+    
+    // 连接中断时：续传模式保留已解压写入的部分，普通模式删除不完整的文件
+    auto abort = [&]() {
+        file.close();
+        if (!resumable) {
+            std::error_code ec;
+            std::filesystem::remove(targetFsPath, ec);
+        }
+        return false;
+    };
+    
+    SocketReader reader(clientSocket);
+    std::vector<char> payload;
+    std::vector<char> raw;
+    uint64_t received = offset;
+    uint64_t wireBytes = 0;
+    bool valid = true;
+    
+    while (true) {
+        unsigned char header[compression::FRAME_HEADER_SIZE];
+        if (!reader.read(header, sizeof(header))) {
+            logError("Connection lost during compressed upload: " + targetPath);
+            return abort();
+        }
+        wireBytes += sizeof(header);
+        
+        unsigned char kind = header[0];
+        size_t wireLength = static_cast<size_t>(readLittleEndian(header + 1, 4));
+        size_t rawLength = static_cast<size_t>(readLittleEndian(header + 5, 4));
+        if (rawLength == 0) {
+            break;
+        }
+        if (wireLength > compression::MAX_FRAME_SIZE || rawLength > compression::MAX_FRAME_SIZE) {
+            // 帧长度不可信，流已失步
+            logError("Compressed frame too large: " + std::to_string(wireLength) + "/" + std::to_string(rawLength));
+            return abort();
+        }
+        wireBytes += wireLength;
+        if (received + rawLength > fileSize) {
+            valid = false;
+        }
+        
+        // 即使已经判定无效也要读走数据，保持流同步直到结束帧
+        if (kind == compression::FRAME_RAW && wireLength == rawLength) {
+            if (!reader.copyTo(valid ? &file : nullptr, wireLength)) {
+                return abort();
+            }
+        } else {
+            payload.resize(wireLength);
+            if (!reader.read(payload.data(), wireLength)) {
+                return abort();
+            }
+            raw.resize(rawLength);
+            if (valid && kind == compression::FRAME_COMPRESSED &&
+                compression::decompressBlock(codec, payload.data(), wireLength, raw.data(), rawLength)) {
+                file.write(raw.data(), static_cast<std::streamsize>(rawLength));
+            } else if (valid) {
+                logError("Failed to decode compressed frame at " + std::to_string(received) + " of " + targetPath);
+                valid = false;
+            }
+        }
+        received += rawLength;
+    }
+    
+    file.close();
+    if (!valid || !file || received != fileSize) {
+        logError("Compressed upload incomplete: " + targetPath + " (" + std::to_string(received) + "/" +
+                 std::to_string(fileSize) + " bytes)");
+        std::error_code ec;
+        std::filesystem::remove(targetFsPath, ec);
+        return false;
+    }
+    
+    if (resumable) {
+        std::error_code ec;
+        std::filesystem::rename(targetFsPath, finalFsPath, ec);
+        if (ec) {
+            logError("Failed to finalize " + filepath + ": " + ec.message());
+            return false;
+        }
+    }
+    
+    noteStoredFile(filepath);
+    summary = std::to_string(wireBytes) + " wire bytes for " + std::to_string(fileSize - offset) + " bytes";
+    logInfo("Compressed upload received: " + filepath + " (" + codec + ", " + summary + ")");
+    return true;
+}
+
+bool SocketServer::handleCompressedDownload(SOCKET clientSocket, const std::string& filename,
+                                            const std::string& codec, uint64_t offset, uint64_t length) {
+    if (!compression::codecSupported(codec)) {
+        logError("Unsupported compression codec: " + codec);
+        return false;
+    }
+    
+    std::string filepath = getFilePath(filename, false);
+#ifdef _WIN32
+    std::ifstream file(utf8ToWide(filepath), std::ios::binary | std::ios::ate);
+#else
+    std::ifstream file(filepath, std::ios::binary | std::ios::ate);
+#endif
+    if (!file.is_open()) {
+        return false;
+    }
+    uint64_t fileSize = static_cast<uint64_t>(file.tellg());
+    if (offset > fileSize) {
+        return false;
+    }
+    uint64_t sendSize = std::min(length, fileSize - offset);
+    file.seekg(static_cast<std::streamoff>(offset));
+    
+    if (!sendMessage(clientSocket, "FILE_INFO:" + std::to_string(sendSize) + "\n")) {
+        return false;
+    }
+    std::string response = receiveMessage(clientSocket);
+    if (response.find("READY") == std::string::npos) {
+        return false;
+    }
+    
+    struct Frame {
+        std::vector<char> raw;
+        std::vector<char> compressed;
+        bool isCompressed = false;
+        bool tried = false;
+    };
+    
+    // 读盘和发送在当前线程，下一帧的压缩在后台线程进行，与发送重叠
+    compression::Detector detector;
+    size_t frameSize = compression::frameSize(codec);
+    bool compressAll = true;
+    uint64_t readTotal = 0;
+    auto nextFrame = [&]() -> std::future<Frame> {
+        size_t toRead = static_cast<size_t>(std::min<uint64_t>(frameSize, sendSize - readTotal));
+        Frame frame;
+        frame.raw.resize(toRead);
+        if (!file.read(frame.raw.data(), static_cast<std::streamsize>(toRead))) {
+            frame.raw.resize(static_cast<size_t>(file.gcount()));
+        }
+        readTotal += toRead;
+        
+        // 第一帧先抽样，已经是压缩格式的文件整个传输都不再尝试
+        if (readTotal == toRead && compression::looksIncompressible(frame.raw.data(), frame.raw.size())) {
+            compressAll = false;
+            logDebug("Skipping compression for incompressible file: " + filepath);
+        }
+        frame.tried = compressAll && detector.shouldCompress();
+        if (!frame.tried) {
+            std::promise<Frame> ready;
+            ready.set_value(std::move(frame));
+            return ready.get_future();
+        }
+        return std::async(std::launch::async, [codec](Frame frame) {
+            frame.isCompressed = compression::compressBlock(codec, frame.raw.data(), frame.raw.size(), frame.compressed);
+            return frame;
+        }, std::move(frame));
+    };
+    
+    uint64_t sentRaw = 0;
+    uint64_t wireBytes = 0;
+    std::future<Frame> pending;
+    if (sendSize > 0) {
+        pending = nextFrame();
+    }
+    while (pending.valid()) {
+        Frame frame = pending.get();
+        if (frame.raw.empty()) {
+            logError("File shrank during compressed download: " + filepath);
+            return false;
+        }
+        if (readTotal < sendSize) {
+            pending = nextFrame();
+        }
+        if (frame.tried) {
+            detector.record(frame.isCompressed);
+        }
+        
+        const std::vector<char>& payload = frame.isCompressed ? frame.compressed : frame.raw;
+        std::string header;
+        header += static_cast<char>(frame.isCompressed ? compression::FRAME_COMPRESSED : compression::FRAME_RAW);
+        appendLittleEndian(header, payload.size(), 4);
+        appendLittleEndian(header, frame.raw.size(), 4);
+        if (!sendAll(clientSocket, header.data(), header.size()) ||
+            !sendAll(clientSocket, payload.data(), payload.size())) {
+            logError("Failed to send compressed frame: " + filepath);
+            if (pending.valid()) {
+                pending.wait();
+            }
+            return false;
+        }
+        sentRaw += frame.raw.size();
+        wireBytes += header.size() + payload.size();
+    }
+    
+    std::string end(compression::FRAME_HEADER_SIZE, '\0');
+    if (!sendAll(clientSocket, end.data(), end.size())) {
+        return false;
+    }
+    wireBytes += end.size();
+    logInfo("Compressed download sent: " + filepath + " (" + codec + ", " + std::to_string(wireBytes) +
+            " wire bytes for " + std::to_string(sentRaw) + " bytes)");
+    return true;
+}
+
+std::filesystem::path SocketServer::toFsPath(const std::string& utf8path) {
+#ifdef _WIN32
+    return std::filesystem::path(utf8ToWide(utf8path));
+#else
+    return std::filesystem::path(utf8path);
+#endif
+}
+
+bool SocketServer::handleDedupQuery(SOCKET clientSocket, size_t count) {
+    if (!sendMessage(clientSocket, "READY\n")) {
+        return false;
+    }
+    
+    // 先读完全部条目，再逐个查找，慢速的哈希和复制不会让客户端的发送阻塞在半途
+    struct DedupEntry {
+        Sha256::Digest digest;
+        uint64_t size;
+        std::string filename;
+    };
+    std::vector<DedupEntry> entries(count);
+    SocketReader reader(clientSocket);
+    for (DedupEntry& entry : entries) {
+        unsigned char header[DEDUP_ENTRY_HEADER_SIZE];
+        if (!reader.read(header, sizeof(header))) {
+            return false;
+        }
+        std::copy(header, header + Sha256::DIGEST_SIZE, entry.digest.begin());
+        entry.size = readLittleEndian(header + 32, 8);
+        entry.filename.resize(static_cast<size_t>(readLittleEndian(header + 40, 2)));
+        if (!entry.filename.empty() && !reader.read(&entry.filename[0], entry.filename.size())) {
+            return false;
+        }
+    }
+    
+    std::string flags;
+    flags.reserve(count);
+    size_t hits = 0;
+    uint64_t savedBytes = 0;
+    for (const DedupEntry& entry : entries) {
+        std::filesystem::path source = entry.filename.empty() ? std::filesystem::path()
+                                                              : findStoredContent(entry.digest, entry.size);
+        if (!source.empty() && copyStoredContent(source, entry.filename)) {
+            flags += 'H';
+            ++hits;
+            savedBytes += entry.size;
+        } else {
+            flags += 'M';
+        }
+    }
+    
+    logInfo("Dedup query: " + std::to_string(hits) + "/" + std::to_string(count) + " files already stored (" +
+            std::to_string(savedBytes) + " bytes not transferred)");
+    return sendMessage(clientSocket, "DEDUP_RESULT:" + std::to_string(count) + ":" + std::to_string(hits) + "\n" +
+                                     flags + "\nEND_DEDUP\n");
+}
+
+void SocketServer::buildContentIndex() {
+    // 只取目录项大小，内容哈希等到有同样大小的查询时再算。遍历整个存储目录可能很慢，
+    // 在锁外进行，上传线程的 noteStoredFile 不必等待
+    uint64_t generation;
+    {
+        std::lock_guard<std::mutex> lock(m_contentMutex);
+        if (m_contentIndexed || m_contentBuilding) {
+            return;
+        }
+        m_contentBuilding = true;
+        generation = m_contentGeneration;
+    }
+    
+    std::unordered_map<uint64_t, std::unordered_set<std::filesystem::path, PathHash>> pathsBySize;
+    std::unordered_map<std::filesystem::path, uint64_t, PathHash> sizeByPath;
+    std::error_code ec;
+    std::filesystem::path root = toFsPath(m_fileDirectory);
+    for (std::filesystem::recursive_directory_iterator it(root, ec), end; !ec && it != end; it.increment(ec)) {
+        std::error_code entryError;
+        if (!it->is_regular_file(entryError) || isTemporaryName(fileNameUtf8(it->path()))) {
+            continue;
+        }
+        uint64_t size = it->file_size(entryError);
+        if (!entryError) {
+            pathsBySize[size].insert(it->path());
+            sizeByPath.emplace(it->path(), size);
+        }
+    }
+    
+    std::lock_guard<std::mutex> lock(m_contentMutex);
+    m_contentBuilding = false;
+    if (generation != m_contentGeneration) {
+        m_pendingStored.clear();
+        return; // 遍历期间存储目录已更换
+    }
+    m_pathsBySize.swap(pathsBySize);
+    m_sizeByPath.swap(sizeByPath);
+    m_contentIndexed = true;
+    // 遍历期间保存的文件可能没被扫描到，或扫描到的是旧的大小
+    for (const std::filesystem::path& path : m_pendingStored) {
+        indexStoredFile(path);
+    }
+    m_pendingStored.clear();
+    logInfo("Content index built: " + std::to_string(m_sizeByPath.size()) + " files");
+}
+
+void SocketServer::noteStoredFile(const std::string& filepath) {
+    std::filesystem::path path = toFsPath(filepath);
+    std::lock_guard<std::mutex> lock(m_contentMutex);
+    if (m_contentBuilding) {
+        m_pendingStored.push_back(std::move(path));
+    } else if (m_contentIndexed) {
+        indexStoredFile(path);
+    }
+    // 索引尚未建立时不必记录，第一次去重查询时会扫描到该文件
+}
+
+void SocketServer::indexStoredFile(const std::filesystem::path& path) {
+    // 调用方持有 m_contentMutex；按路径记录大小，同一路径换了大小时从旧的分组中移除，查找和更新都是O(1)
+    std::error_code ec;
+    uint64_t size = std::filesystem::file_size(path, ec);
+    if (ec) {
+        return;
+    }
+    m_storedDigests.erase(path);
+    auto known = m_sizeByPath.find(path);
+    if (known != m_sizeByPath.end()) {
+        if (known->second == size) {
+            return;
+        }
+        auto bucket = m_pathsBySize.find(known->second);
+        if (bucket != m_pathsBySize.end()) {
+            bucket->second.erase(path);
+            if (bucket->second.empty()) {
+                m_pathsBySize.erase(bucket);
+            }
+        }
+        known->second = size;
+    } else {
+        m_sizeByPath.emplace(path, size);
+    }
+    m_pathsBySize[size].insert(path);
+}
+
+std::filesystem::path SocketServer::findStoredContent(const Sha256::Digest& digest, uint64_t size) {
+    bool indexed;
+    {
+        std::lock_guard<std::mutex> lock(m_contentMutex);
+        indexed = m_contentIndexed;
+    }
+    if (!indexed) {
+        buildContentIndex();
+    }
+    
+    std::vector<std::filesystem::path> candidates;
+    {
+        std::lock_guard<std::mutex> lock(m_contentMutex);
+        if (!m_contentIndexed) {
+            return {}; // 另一个线程正在建立索引，这次按未命中处理
+        }
+        auto bucket = m_pathsBySize.find(size);
+        if (bucket == m_pathsBySize.end()) {
+            return {};
+        }
+        candidates.assign(bucket->second.begin(), bucket->second.end());
+    }
+    
+    // 只有大小相同的文件才可能内容相同；哈希按 (大小, 修改时间) 缓存，文件变化后重新计算
+    for (const std::filesystem::path& candidate : candidates) {
+        std::error_code ec;
+        uint64_t candidateSize = std::filesystem::file_size(candidate, ec);
+        if (ec || candidateSize != size) {
+            continue;
+        }
+        std::filesystem::file_time_type mtime = std::filesystem::last_write_time(candidate, ec);
+        if (ec) {
+            continue;
+        }
+        
+        Sha256::Digest candidateDigest;
+        bool cached = false;
+        {
+            std::lock_guard<std::mutex> lock(m_contentMutex);
+            auto known = m_storedDigests.find(candidate);
+            if (known != m_storedDigests.end() && known->second.size == size && known->second.mtime == mtime) {
+                candidateDigest = known->second.digest;
+                cached = true;
+            }
+        }
+        if (!cached) {
+            if (!hashFile(candidate, candidateDigest)) {
+                continue;
+            }
+            std::lock_guard<std::mutex> lock(m_contentMutex);
+            m_storedDigests[candidate] = StoredDigest{size, mtime, candidateDigest};
+        }
+        
+        if (candidateDigest == digest) {
+            return candidate;
+        }
+    }
+    return {};
+}
+
+bool SocketServer::copyStoredContent(const std::filesystem::path& source, const std::string& filename) {
+    std::string filepath = getFilePath(filename);
+    std::filesystem::path target = toFsPath(filepath);
+    std::error_code ec;
+    if (std::filesystem::equivalent(source, target, ec)) {
+        return true; // 目标就是这份内容本身
+    }
+    
+    // 不用硬链接：普通上传会原地覆盖文件，硬链接会把另一个文件名下的内容一起改掉。
+    // 先复制到临时文件再改名，中途失败不会留下不完整的目标文件
+    std::filesystem::path temp = toFsPath(filepath + DEDUP_SUFFIX);
+    std::filesystem::copy_file(source, temp, std::filesystem::copy_options::overwrite_existing, ec);
+    if (!ec) {
+        std::filesystem::rename(temp, target, ec);
+    }
+    if (ec) {
+        logError("Failed to copy stored content to " + filepath + ": " + ec.message());
+        std::error_code removeError;
+        std::filesystem::remove(temp, removeError);
+        return false;
+    }
+    
+    noteStoredFile(filepath);
+    logDebug("Dedup copy: " + filepath);
+    return true;
+}
+
+bool SocketServer::sendFileList(SOCKET clientSocket) {
+    try {
+        std::string fileList = "FILE_LIST:\n";
+        
+        if (std::filesystem::exists(m_fileDirectory)) {
+            // 递归遍历所有文件，包括子目录
+            for (const auto& entry : std::filesystem::recursive_directory_iterator(m_fileDirectory)) {
+                if (entry.is_regular_file()) {
+                    // 未完成的断点续传、增量重建临时文件不对外显示
+                    std::string entryName = entry.path().filename().string();
+                    if (isTemporaryName(entryName)) {
+                        continue;
+                    }
+                    std::filesystem::path relativePath = std::filesystem::relative(entry.path(), m_fileDirectory);
+                    
+                    // Windows下需要将路径转换为UTF-8
+#ifdef _WIN32
+                    std::wstring wpath = relativePath.wstring();
+                    std::string filename = wideToUtf8(wpath);
+#else
+                    std::string filename = relativePath.string();
+#endif
+                    
+                    // 统一使用正斜杠作为路径分隔符
+                    std::replace(filename.begin(), filename.end(), '\\', '/');
+                    size_t fileSize = entry.file_size();
+                    fileList += filename + ":" + std::to_string(fileSize) + "\n";
+                    
+                    // 边遍历边发送，不在内存中拼出整个列表
+                    if (fileList.size() >= 64 * 1024) {
+                        if (!sendMessage(clientSocket, fileList)) {
+                            return false;
+                        }
+                        fileList.clear();
+                    }
+                }
+            }
+        }
+        
+        fileList += "END_LIST\n";
         return sendMessage(clientSocket, fileList);
     } catch (const std::exception& e) {
         logError("Error listing files: " + std::string(e.what()));
@@ -491,6 +1785,194 @@ bool SocketServer::sendFileList(SOCKET clientSocket) {
     }
 }
 
+std::string SocketServer::fileNameUtf8(const std::filesystem::path& path) {
+#ifdef _WIN32
+    return wideToUtf8(path.filename().wstring());
+#else
+    return path.filename().string();
+#endif
+}
+
+std::shared_ptr<const std::vector<SocketServer::DirectoryChild>> SocketServer::readDirectorySorted(
+    const std::filesystem::path& dir) {
+    // 翻页时每一页都要从头看一遍同一个目录，排序结果按目录修改时间缓存（增删、改名都会改变它）
+    std::error_code timeError;
+    auto mtime = std::filesystem::last_write_time(dir, timeError);
+    if (!timeError) {
+        std::lock_guard<std::mutex> lock(m_listCacheMutex);
+        auto cached = m_listingCache.find(dir);
+        if (cached != m_listingCache.end() && cached->second.mtime == mtime) {
+            return cached->second.children;
+        }
+    }
+    
+    auto children = std::make_shared<std::vector<DirectoryChild>>();
+    std::error_code ec;
+    for (std::filesystem::directory_iterator it(dir, ec), end; !ec && it != end; it.increment(ec)) {
+        const auto& entry = *it;
+        std::error_code typeError;
+        DirectoryChild child;
+        child.name = fileNameUtf8(entry.path());
+        child.entry = entry;
+        // 类型来自目录项本身（多数平台无需额外stat），文件大小等到真正返回时再取
+        child.isDir = entry.is_directory(typeError);
+        if (!child.isDir) {
+            if (!entry.is_regular_file(typeError) || isTemporaryName(child.name)) {
+                continue;
+            }
+        }
+        children->push_back(std::move(child));
+    }
+    std::sort(children->begin(), children->end(),
+              [](const DirectoryChild& a, const DirectoryChild& b) { return a.name < b.name; });
+    
+    if (!timeError && !ec) {
+        std::lock_guard<std::mutex> lock(m_listCacheMutex);
+        if (m_listingCache.size() >= LIST_CACHE_MAX_DIRS) {
+            m_listingCache.clear();
+        }
+        m_listingCache[dir] = DirectoryListing{mtime, children};
+    }
+    return children;
+}
+
+void SocketServer::directoryTotals(const std::filesystem::path& dir, uint64_t& fileCount, uint64_t& totalBytes) {
+    // 汇总需要遍历整个子树，同一目录在有效期内（且修改时间未变）只遍历一次
+    std::error_code timeError;
+    auto mtime = std::filesystem::last_write_time(dir, timeError);
+    auto now = std::chrono::steady_clock::now();
+    if (!timeError) {
+        std::lock_guard<std::mutex> lock(m_listCacheMutex);
+        auto cached = m_totalsCache.find(dir);
+        if (cached != m_totalsCache.end() && cached->second.mtime == mtime &&
+            now - cached->second.computed < LIST_TOTALS_TTL) {
+            fileCount = cached->second.fileCount;
+            totalBytes = cached->second.totalBytes;
+            return;
+        }
+    }
+    
+    fileCount = 0;
+    totalBytes = 0;
+    std::error_code ec;
+    for (std::filesystem::recursive_directory_iterator it(dir, ec), end; !ec && it != end; it.increment(ec)) {
+        std::error_code typeError;
+        if (it->is_regular_file(typeError)) {
+            std::string name = fileNameUtf8(it->path());
+            if (isTemporaryName(name)) {
+                continue;
+            }
+            ++fileCount;
+            totalBytes += it->file_size(typeError);
+        }
+    }
+    
+    if (!timeError) {
+        std::lock_guard<std::mutex> lock(m_listCacheMutex);
+        if (m_totalsCache.size() >= LIST_CACHE_MAX_DIRS) {
+            m_totalsCache.clear();
+        }
+        m_totalsCache[dir] = DirectoryTotals{mtime, now, fileCount, totalBytes};
+    }
+}
+
+bool SocketServer::sendFileListPage(SOCKET clientSocket, const ListPageRequest& request) {
+    ListPageState state;
+    state.request = &request;
+    state.limit = std::max<size_t>(1, std::min(request.limit, LIST_MAX_PAGE_SIZE));
+    
+    // 前缀拆成 目录部分 + 文件名前缀: "docs/rep" 从 docs/ 开始，只看以 rep 开头的条目
+    std::string prefix = request.prefix;
+    std::replace(prefix.begin(), prefix.end(), '\\', '/');
+    size_t slash = prefix.rfind('/');
+    std::string baseDir = (slash == std::string::npos) ? "" : prefix.substr(0, slash + 1);
+    std::string namePrefix = (slash == std::string::npos) ? prefix : prefix.substr(slash + 1);
+    
+    // 光标是上一页最后一条的完整路径，转成相对起始目录的路径分量
+    if (!request.cursor.empty() && request.cursor.compare(0, baseDir.size(), baseDir) == 0) {
+        state.cursor = splitPath(request.cursor.substr(baseDir.size()));
+    }
+    
+    std::string body;
+    state.out = &body;
+    bool complete = true;
+    std::string startPath = getFilePath(baseDir, false);
+#ifdef _WIN32
+    std::filesystem::path startDir(utf8ToWide(startPath));
+#else
+    std::filesystem::path startDir(startPath);
+#endif
+    std::error_code ec;
+    if (std::filesystem::is_directory(startDir, ec)) {
+        complete = collectListPage(startDir, baseDir, 0, !state.cursor.empty(), namePrefix, state);
+    }
+    
+    // 页满时返回光标，客户端带着它请求下一页；没有 NEXT 行表示已经列完
+    std::string reply = "FILE_PAGE:" + std::to_string(state.count) + "\n" + body;
+    if (!complete) {
+        reply += "NEXT:" + state.last + "\n";
+    }
+    reply += "END_LIST\n";
+    return sendMessage(clientSocket, reply);
+}
+
+bool SocketServer::collectListPage(const std::filesystem::path& dir, const std::string& relDir, size_t depth,
+                                   bool cursorActive, const std::string& namePrefix, ListPageState& state) {
+    // 同一目录下的条目按名称排序后深度优先遍历，顺序稳定，光标之前的子树整个跳过
+    auto children = readDirectorySorted(dir);
+    for (const auto& child : *children) {
+        if (!namePrefix.empty() && child.name.compare(0, namePrefix.size(), namePrefix) != 0) {
+            continue;
+        }
+        
+        bool childCursor = false;
+        if (cursorActive) {
+            int cmp = child.name.compare(state.cursor[depth]);
+            if (cmp < 0) {
+                continue;
+            }
+            if (cmp == 0) {
+                if (depth + 1 == state.cursor.size()) {
+                    continue; // 光标指向的条目已在上一页返回
+                }
+                childCursor = true;
+            }
+            // 越过光标所在的分支后，后面的条目都不再受光标限制
+            cursorActive = (cmp == 0);
+        }
+        
+        std::string relPath = relDir + child.name;
+        if (child.isDir) {
+            if (state.request->recursive) {
+                if (!collectListPage(child.entry.path(), relPath + "/", depth + 1, childCursor, "", state)) {
+                    return false;
+                }
+                continue;
+            }
+            
+            // 单层模式：子目录返回汇总的文件数和总大小
+            uint64_t fileCount = 0;
+            uint64_t totalBytes = 0;
+            directoryTotals(child.entry.path(), fileCount, totalBytes);
+            *state.out += "D:" + relPath + ":" + std::to_string(fileCount) + ":" + std::to_string(totalBytes) + "\n";
+        } else {
+            if (!state.request->pattern.empty() && !globMatch(state.request->pattern, child.name)) {
+                continue;
+            }
+            // 目录项可能来自缓存，大小总是重新读取
+            std::error_code ec;
+            uint64_t fileSize = std::filesystem::file_size(child.entry.path(), ec);
+            *state.out += "F:" + relPath + ":" + std::to_string(fileSize) + "\n";
+        }
+        
+        state.last = relPath;
+        if (++state.count >= state.limit) {
+            return false;
+        }
+    }
+    return true;
+}
+
 bool SocketServer::createFileDirectory() {
     try {
         if (!std::filesystem::exists(m_fileDirectory)) {
@@ -504,7 +1986,7 @@ bool SocketServer::createFileDirectory() {
     }
 }
 
-std::string SocketServer::getFilePath(const std::string& filename) {
+std::string SocketServer::getFilePath(const std::string& filename, bool createParent) {
     // 防止路径遍历攻击
     std::string safeName = filename;
     size_t pos = 0;
@@ -519,6 +2001,10 @@ std::string SocketServer::getFilePath(const std::string& filename) {
     // 构造完整文件路径
     std::string fullPath = m_fileDirectory + "/" + safeName;
     
+    if (!createParent) {
+        return fullPath;
+    }
+    
     // 确保父目录存在
     std::filesystem::path filePath(fullPath);
     std::filesystem::path parentDir = filePath.parent_path();
@@ -535,14 +2021,22 @@ std::string SocketServer::getFilePath(const std::string& filename) {
     return fullPath;
 }
 
-bool SocketServer::receiveFileData(SOCKET clientSocket, const std::string& filepath, size_t fileSize) {
-    // Windows下使用宽字符路径确保UTF-8文件名正确处理
+bool SocketServer::receiveFileData(SOCKET clientSocket, const std::string& filepath, size_t fileSize,
+                                   uint64_t offset, bool removeOnFailure) {
+    // Windows下使用宽字符路径确保UTF-8文件名正确处理；续传时保留已有内容，从offset处继续写
+    std::ios::openmode mode = std::ios::binary | std::ios::out;
+    if (offset > 0) {
+        mode |= std::ios::in;
+    }
 #ifdef _WIN32
     std::wstring wpath = utf8ToWide(filepath);
-    std::ofstream file(wpath, std::ios::binary);
+    std::ofstream file(wpath, mode);
 #else
-    std::ofstream file(filepath, std::ios::binary);
+    std::ofstream file(filepath, mode);
 #endif
+    if (file.is_open() && offset > 0) {
+        file.seekp(static_cast<std::streamoff>(offset));
+    }
     
     if (!file.is_open()) {
         logError("Failed to create file: " + filepath);
@@ -555,16 +2049,18 @@ bool SocketServer::receiveFileData(SOCKET clientSocket, const std::string& filep
     
     while (totalReceived < fileSize) {
         size_t toReceive = (bufferSize < (fileSize - totalReceived)) ? bufferSize : (fileSize - totalReceived);
-        int bytesReceived = recv(clientSocket, buffer, static_cast<int>(toReceive), 0);
+        int bytesReceived = receiveRaw(clientSocket, buffer, toReceive);
         
         if (bytesReceived <= 0) {
             logError("Failed to receive file data");
             file.close();
+            if (removeOnFailure) {
 #ifdef _WIN32
-            std::filesystem::remove(wpath);
+                std::filesystem::remove(wpath);
 #else
-            std::filesystem::remove(filepath);
+                std::filesystem::remove(filepath);
 #endif
+            }
             return false;
         }
         
@@ -582,7 +2078,8 @@ bool SocketServer::receiveFileData(SOCKET clientSocket, const std::string& filep
     return true;
 }
 
-bool SocketServer::sendFileData(SOCKET clientSocket, const std::string& filepath) {
+bool SocketServer::sendFileData(SOCKET clientSocket, const std::string& filepath,
+                                uint64_t offset, uint64_t length) {
     // Windows下使用宽字符路径确保UTF-8文件名正确处理
 #ifdef _WIN32
     std::wstring wpath = utf8ToWide(filepath);
@@ -596,16 +2093,22 @@ bool SocketServer::sendFileData(SOCKET clientSocket, const std::string& filepath
         return false;
     }
     
-    const size_t bufferSize = 8192;
-    char buffer[bufferSize];
-    size_t totalSent = 0;
+    file.seekg(static_cast<std::streamoff>(offset));
     
-    while (file.read(buffer, bufferSize) || file.gcount() > 0) {
+    const size_t bufferSize = 65536;
+    std::vector<char> buffer(bufferSize);
+    uint64_t totalSent = 0;
+    
+    while (totalSent < length) {
+        size_t toRead = static_cast<size_t>(std::min<uint64_t>(bufferSize, length - totalSent));
+        if (!file.read(buffer.data(), toRead) && file.gcount() <= 0) {
+            break;
+        }
         size_t bytesToSend = file.gcount();
         size_t bytesSent = 0;
         
         while (bytesSent < bytesToSend) {
-            int result = send(clientSocket, buffer + bytesSent, 
+            int result = send(clientSocket, buffer.data() + bytesSent, 
                             static_cast<int>(bytesToSend - bytesSent), 0);
             if (result == SOCKET_ERROR) {
                 logError("Failed to send file data");
@@ -627,3 +2130,80 @@ bool SocketServer::sendFileData(SOCKET clientSocket, const std::string& filepath
     logInfo("File sent successfully: " + filepath + " (" + std::to_string(totalSent) + " bytes)");
     return true;
 }
+
+bool SocketServer::handleBundleUpload(SOCKET clientSocket, size_t fileCount) {
+    if (!sendMessage(clientSocket, "READY\n")) {
+        return false;
+    }
+    
+    // 小文件的头部、路径和数据通常挤在同一个TCP段里，
+    // 用一块大缓冲区批量recv，再从缓冲区里逐项切出来，避免每个文件多次系统调用
+    SocketReader reader(clientSocket);
+    
+    std::string results;
+    std::string lastParent;
+    size_t succeeded = 0;
+    size_t failed = 0;
+    size_t received = 0;
+    
+    while (true) {
+        unsigned char header[BUNDLE_HEADER_SIZE];
+        if (!reader.read(header, sizeof(header))) {
+            return false;
+        }
+        
+        size_t pathLength = static_cast<size_t>(readLittleEndian(header, 2));
+        uint64_t dataLength = readLittleEndian(header + 2, 8);
+        if (pathLength == 0) {
+            break; // 结束标记
+        }
+        
+        std::string filename(pathLength, '\0');
+        if (!reader.read(&filename[0], pathLength)) {
+            return false;
+        }
+        
+        // 同一目录下的连续文件只在第一次时检查/创建父目录
+        std::string filepath = getFilePath(filename, false);
+        std::string parent = std::filesystem::path(filepath).parent_path().string();
+        if (parent != lastParent) {
+            getFilePath(filename);
+            lastParent = parent;
+        }
+        
+#ifdef _WIN32
+        std::ofstream file(utf8ToWide(filepath), std::ios::binary);
+#else
+        std::ofstream file(filepath, std::ios::binary);
+#endif
+        
+        // 无法创建文件时仍需读走数据，保持流同步
+        bool ok = file.is_open();
+        if (!reader.copyTo(ok ? &file : nullptr, dataLength)) {
+            return false;
+        }
+        ok = ok && file.good();
+        file.close();
+        
+        if (ok) {
+            ++succeeded;
+            results += "OK:" + filename + "\n";
+            noteStoredFile(filepath);
+        } else {
+            ++failed;
+            results += "ERR:" + filename + "\n";
+            logError("Failed to write bundled file: " + filepath);
+        }
+        ++received;
+    }
+    
+    if (received != fileCount) {
+        logDebug("Bundle announced " + std::to_string(fileCount) + " files, received " + std::to_string(received));
+    }
+    logInfo("Bundle received: " + std::to_string(succeeded) + " ok, " + std::to_string(failed) + " failed");
+    
+    std::string reply = "BUNDLE_RESULT:" + std::to_string(succeeded) + ":" + std::to_string(failed) + "\n";
+    reply += results;
+    reply += "END_BUNDLE\n";
+    return sendMessage(clientSocket, reply);
+}
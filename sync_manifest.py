@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+文件夹增量同步清单
+每个同步目标（服务器 + 本地文件夹）在 ~/.file_transfer_manifests/ 下对应一个SQLite数据库，
+记录上次成功上传时每个文件的大小、修改时间、inode和内容哈希。
+再次同步时只需对比目录扫描得到的stat结果：完全一致的文件不读取内容，
+stat变化但大小相同的文件再比较内容哈希，只有新增或内容变化的文件才上传
+"""
+
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# 默认清单目录，与续传日志一样放在用户主目录下
+MANIFEST_DIR = Path.home() / ".file_transfer_manifests"
+
+# 内容哈希：blake2b比SHA-256快，16字节摘要足够判断文件是否变化
+HASH_DIGEST_SIZE = 16
+HASH_READ_SIZE = 1024 * 1024
+
+
+def content_hash(path):
+    """计算文件内容哈希"""
+    digest = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+    buffer = bytearray(HASH_READ_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as file:
+        while True:
+            n = file.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.digest()
+
+
+def content_hashes(paths, workers=None):
+    """并行计算多个文件的内容哈希（hashlib计算时释放GIL），读取失败的文件对应None"""
+    def safe_hash(path):
+        try:
+            return content_hash(path)
+        except OSError:
+            return None
+
+    workers = workers or max(1, min(4, os.cpu_count() or 1))
+    if len(paths) <= 1 or workers == 1:
+        return [safe_hash(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='manifest-hash') as executor:
+        return list(executor.map(safe_hash, paths))
+
+
+class ManifestEntry:
+    """清单中一个文件上次上传时的状态"""
+    __slots__ = ('size', 'mtime_ns', 'inode', 'hash')
+
+    def __init__(self, size, mtime_ns, inode, hash):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.hash = hash
+
+
+class SyncManifest:
+    """一个同步目标的清单数据库"""
+
+    def __init__(self, path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL, hash BLOB) WITHOUT ROWID")
+        self.connection.commit()
+
+    @classmethod
+    def open(cls, endpoint, local_root, manifest_dir=None):
+        """打开（或新建）某个同步目标的清单
+
+        endpoint:   目标服务器 "host:port"
+        local_root: 本地文件夹
+        """
+        manifest_dir = Path(manifest_dir or MANIFEST_DIR)
+        local_root = os.path.abspath(local_root)
+        key = hashlib.sha1(f"{endpoint}|{local_root}".encode('utf-8')).hexdigest()
+        return cls(manifest_dir / f"{key}.db")
+
+    def load(self):
+        """一次性读出全部记录，返回 {服务器文件名: ManifestEntry}"""
+        cursor = self.connection.execute("SELECT path, size, mtime_ns, inode, hash FROM files")
+        return {row[0]: ManifestEntry(row[1], row[2], row[3], row[4]) for row in cursor}
+
+    def record(self, rows):
+        """记录上传成功的文件: rows 为 (服务器文件名, 大小, mtime_ns, inode, 内容哈希)"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, hash) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def remove(self, paths):
+        """删除本地已不存在的文件的记录"""
+        with self.connection:
+            self.connection.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in paths))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
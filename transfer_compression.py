@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+传输压缩
+文件数据切成独立压缩的帧在线路上传输，压缩/解压在工作线程上进行，与socket收发重叠。
+每一帧单独决定是否压缩：压不下去的帧按原样发送，连续几帧都压不下去时暂停尝试一段时间；
+传输开始前先对开头几个块抽样试压，已经压缩过的媒体文件（zip、jpg、mp4……）直接走不压缩的普通传输
+"""
+
+import lzma
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from transfer_engine import _write_at
+from transfer_progress import format_rate
+
+# 支持的压缩算法：zlib速度快，lzma压缩率高但慢得多
+CODECS = ('zlib', 'lzma')
+
+# 每帧的原始数据大小；lzma的字典更大，用更大的帧才能发挥压缩率
+COMPRESS_BLOCK_SIZE = {'zlib': 1024 * 1024, 'lzma': 4 * 1024 * 1024}
+# 与服务器约定的单帧原始数据上限
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+ZLIB_LEVEL = 6
+LZMA_PRESET = 6
+
+# 帧头: 类型(u8) + 线上长度(u32) + 原始长度(u32)，小端序，与服务器 socket_server.cpp 保持一致
+# 原始长度为0的帧表示结束
+FRAME_HEADER = struct.Struct('<BII')
+FRAME_RAW = 0
+FRAME_COMPRESSED = 1
+
+# 压缩后不小于原大小的这个比例就视为压不下去，按原样发送
+MIN_SAVING_RATIO = 0.9
+# 连续这么多帧压不下去时，接下来的若干帧不再尝试压缩
+MISS_LIMIT = 2
+SKIP_BLOCKS = 32
+
+# 传输开始前的抽样：从开头取几段试压
+SAMPLE_SPAN = 1024 * 1024
+SAMPLE_SLICES = 4
+SAMPLE_SLICE_SIZE = 16 * 1024
+
+# 常见压缩格式的文件头，命中时不必试压
+COMPRESSED_MAGIC = (
+    b'PK\x03\x04',          # zip / docx / jar / apk
+    b'\x1f\x8b',            # gzip
+    b'BZh',                 # bzip2
+    b'\xfd7zXZ\x00',        # xz
+    b'(\xb5/\xfd',          # zstd
+    b'7z\xbc\xaf\x27\x1c',  # 7z
+    b'Rar!\x1a\x07',        # rar
+    b'\xff\xd8\xff',        # jpeg
+    b'\x89PNG\r\n\x1a\n',   # png
+    b'GIF8',                # gif
+    b'OggS',                # ogg
+    b'fLaC',                # flac
+    b'ID3',                 # mp3
+    b'\x1aE\xdf\xa3',       # mkv / webm
+)
+
+
+def compression_workers():
+    """压缩线程数：至少一个，与socket收发重叠；多核时并行压缩多帧"""
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def compress_block(codec, data):
+    if codec == 'zlib':
+        return zlib.compress(data, ZLIB_LEVEL)
+    return lzma.compress(data, preset=LZMA_PRESET)
+
+
+def decompress_block(codec, data):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    return lzma.decompress(data)
+
+
+def looks_incompressible(sample):
+    """快速判断一段开头数据是否已经是压缩格式：先看文件头，再用最快的zlib级别试压几小段"""
+    if not sample:
+        return True
+    if sample.startswith(COMPRESSED_MAGIC) or sample[4:8] == b'ftyp':  # ftyp: mp4 / mov / heic
+        return True
+    if len(sample) <= SAMPLE_SLICE_SIZE:
+        slices = [sample]
+    else:
+        step = (len(sample) - SAMPLE_SLICE_SIZE) // (SAMPLE_SLICES - 1)
+        slices = [sample[i * step:i * step + SAMPLE_SLICE_SIZE] for i in range(SAMPLE_SLICES)]
+    raw = sum(len(piece) for piece in slices)
+    compressed = sum(len(zlib.compress(piece, 1)) for piece in slices)
+    return compressed >= raw * MIN_SAVING_RATIO
+
+
+def file_looks_incompressible(path, offset=0):
+    """对文件offset处开始的前几个块抽样"""
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        return looks_incompressible(file.read(SAMPLE_SPAN))
+
+
+class CompressionStats:
+    """一次压缩传输的统计"""
+
+    def __init__(self, codec):
+        self.codec = codec
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.compressed_frames = 0
+        self.raw_frames = 0
+        self.started = time.monotonic()
+        self.seconds = 0.0
+
+    def add_frame(self, raw_length, wire_length, compressed):
+        self.raw_bytes += raw_length
+        self.wire_bytes += FRAME_HEADER.size + wire_length
+        if compressed:
+            self.compressed_frames += 1
+        else:
+            self.raw_frames += 1
+
+    def finish(self):
+        self.wire_bytes += FRAME_HEADER.size
+        self.seconds = time.monotonic() - self.started
+
+    @property
+    def ratio(self):
+        return self.raw_bytes / max(self.wire_bytes, 1)
+
+    def summary(self):
+        """压缩比，以及按原始字节计算的等效吞吐相对线上吞吐的提升"""
+        seconds = max(self.seconds, 1e-6)
+        saved = (1 - self.wire_bytes / max(self.raw_bytes, 1)) * 100
+        return (f"📊 {self.codec}压缩: {self.raw_bytes} → {self.wire_bytes} bytes "
+                f"(压缩比 {self.ratio:.2f}x, 节省 {saved:.1f}%, "
+                f"{self.compressed_frames} 帧压缩 / {self.raw_frames} 帧原样)\n"
+                f"📊 等效吞吐 {format_rate(self.raw_bytes / seconds)}，线上吞吐 "
+                f"{format_rate(self.wire_bytes / seconds)}，提升 {self.ratio:.2f}x")
+
+
+class _Detector:
+    """按已发送帧的压缩效果决定下一帧是否尝试压缩"""
+
+    def __init__(self):
+        self.misses = 0
+        self.skip = 0
+
+    def should_compress(self):
+        if self.skip:
+            self.skip -= 1
+            return False
+        return True
+
+    def record(self, raw_length, wire_length):
+        if wire_length >= raw_length * MIN_SAVING_RATIO:
+            self.misses += 1
+            if self.misses >= MISS_LIMIT:
+                self.skip = SKIP_BLOCKS
+                self.misses = 0
+        else:
+            self.misses = 0
+
+
+def _encode_frame(codec, block):
+    compressed = compress_block(codec, block)
+    if len(compressed) >= len(block) * MIN_SAVING_RATIO:
+        return FRAME_RAW, block, len(block)
+    return FRAME_COMPRESSED, compressed, len(block)
+
+
+def _raw_frame(block):
+    future = Future()
+    future.set_result((FRAME_RAW, block, len(block)))
+    return future
+
+
+def send_compressed(sock, file, file_size, codec, offset=0, on_progress=None, workers=None, lease=None):
+    """从文件offset处读取file_size字节，压缩成帧发送，最后发送结束帧
+
+    读盘和发送在调用线程上，压缩在线程池里提前进行（最多领先 2×线程数 帧）。
+    传入 transfer_limiter.TransferLease 时按压缩后的字节数限速。
+    返回 CompressionStats
+    """
+    block_size = COMPRESS_BLOCK_SIZE[codec]
+    workers = workers or compression_workers()
+    stats = CompressionStats(codec)
+    detector = _Detector()
+    pending = deque()
+    file.seek(offset)
+    remaining = file_size
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='compress') as executor:
+        try:
+            while remaining or pending:
+                while remaining and len(pending) < workers * 2:
+                    block = file.read(min(block_size, remaining))
+                    if not block:
+                        raise IOError(f"文件在发送过程中被截断: 期望{file_size}字节，仅读取{file_size - remaining}字节")
+                    remaining -= len(block)
+                    if detector.should_compress():
+                        pending.append((executor.submit(_encode_frame, codec, block), True))
+                    else:
+                        pending.append((_raw_frame(block), False))
+
+                future, tried = pending.popleft()
+                kind, payload, raw_length = future.result()
+                sock.sendall(FRAME_HEADER.pack(kind, len(payload), raw_length))
+                if lease is not None:
+                    lease.sendall(sock, payload)
+                else:
+                    sock.sendall(payload)
+                if tried:
+                    detector.record(raw_length, len(payload))
+                stats.add_frame(raw_length, len(payload), kind == FRAME_COMPRESSED)
+                if on_progress:
+                    on_progress(stats.raw_bytes)
+        finally:
+            for future, _ in pending:
+                future.cancel()
+
+    sock.sendall(FRAME_HEADER.pack(FRAME_RAW, 0, 0))
+    stats.finish()
+    return stats
+
+
+def _recv_exact(sock, length):
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        n = sock.recv_into(view[received:], length - received)
+        if not n:
+            raise ConnectionError(f"连接提前关闭: 帧数据期望{length}字节，仅收到{received}字节")
+        received += n
+    return buffer
+
+
+def _decode_frame(codec, kind, payload, raw_length):
+    data = decompress_block(codec, payload) if kind == FRAME_COMPRESSED else payload
+    if len(data) != raw_length:
+        raise IOError(f"解压后长度不符: 期望{raw_length}字节，得到{len(data)}字节")
+    return data
+
+
+def _write_decoded(file, future, write_offset):
+    data = future.result()
+    _write_at(file, data, write_offset)
+    return len(data)
+
+
+def recv_compressed(sock, file, file_size, codec, offset=0, on_progress=None, workers=None, lease=None):
+    """接收压缩帧直到结束帧，解压后写入文件的offset处
+
+    收包和写盘在调用线程上，解压在线程池里进行；解压结果按提交顺序写盘，
+    没有 os.pwrite 的平台（Windows）上 seek + write 不会被其他线程打断。
+    传入 transfer_limiter.TransferLease 时每收完一帧按帧长取令牌。
+    返回 CompressionStats
+    """
+    workers = workers or compression_workers()
+    stats = CompressionStats(codec)
+    pending = deque()
+    write_offset = offset
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decompress') as executor:
+        try:
+            while True:
+                kind, wire_length, raw_length = FRAME_HEADER.unpack(_recv_exact(sock, FRAME_HEADER.size))
+                if raw_length == 0:
+                    break
+                if raw_length > MAX_FRAME_SIZE or wire_length > MAX_FRAME_SIZE:
+                    raise IOError(f"帧过大: {wire_length}/{raw_length}字节")
+                if stats.raw_bytes + raw_length > file_size:
+                    raise IOError(f"数据超出文件大小: {file_size}字节")
+                payload = _recv_exact(sock, wire_length)
+                if lease is not None:
+                    lease.acquire(wire_length)
+                pending.append((executor.submit(_decode_frame, codec, kind, payload, raw_length), write_offset))
+                write_offset += raw_length
+                stats.add_frame(raw_length, wire_length, kind == FRAME_COMPRESSED)
+
+                # 只让解压落后有限的帧数，按提交顺序写盘并汇报进度
+                while pending and (len(pending) > workers * 2 or pending[0][0].done()):
+                    done += _write_decoded(file, *pending.popleft())
+                    if on_progress:
+                        on_progress(done)
+            while pending:
+                done += _write_decoded(file, *pending.popleft())
+                if on_progress:
+                    on_progress(done)
+        finally:
+            for future, _ in pending:
+                future.cancel()
+
+    stats.finish()
+    if stats.raw_bytes != file_size:
+        raise IOError(f"文件大小不符: 期望{file_size}字节，收到{stats.raw_bytes}字节")
+    return stats
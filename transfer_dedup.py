@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+按内容去重的上传预检
+客户端流式计算文件的SHA-256，连同大小和目标文件名批量发给服务器；
+服务器上已有相同内容的文件时直接在本地复制到目标位置，这些文件的数据不再经过网络
+"""
+
+import hashlib
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+# 每个查询条目: SHA-256(32字节) + 文件大小(u64) + 文件名长度(u16)，后跟UTF-8文件名，小端序
+# 与服务器 socket_server.cpp 保持一致
+DEDUP_ENTRY = struct.Struct('<32sQH')
+
+# 一次往返最多查询的文件数
+DEDUP_BATCH = 10000
+
+HASH_READ_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """流式计算文件的SHA-256，复用同一块缓冲区分块读取"""
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_READ_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as file:
+        while True:
+            n = file.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.digest()
+
+
+def hash_files(paths, workers=None):
+    """并行计算多个文件的SHA-256（hashlib计算时释放GIL），读取失败的文件对应None"""
+    def safe_digest(path):
+        try:
+            return file_digest(path)
+        except OSError:
+            return None
+
+    workers = workers or max(1, min(4, os.cpu_count() or 1))
+    if len(paths) <= 1 or workers == 1:
+        return [safe_digest(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dedup-hash') as executor:
+        return list(executor.map(safe_digest, paths))
+
+
+def pack_query(entries):
+    """打包一批查询条目: entries 为 [(SHA-256, 大小, 服务器文件名)]"""
+    payload = bytearray()
+    for digest, file_size, server_filename in entries:
+        name = server_filename.encode('utf-8')
+        payload += DEDUP_ENTRY.pack(digest, file_size, len(name))
+        payload += name
+    return payload
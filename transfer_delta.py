@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+rsync式增量上传
+服务器为已有的旧文件生成分块签名（弱滚动校验和 + SHA-256），客户端用滚动校验和在新文件的
+每个字节位置查找与旧文件相同的块，只发送块引用和变化的字面数据，服务器据此重建新文件。
+安装了numpy时滚动校验和按整个扫描窗口向量化计算，否则退回逐字节滚动的纯Python实现
+"""
+
+import hashlib
+import math
+import struct
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # numpy是可选依赖
+    np = None
+
+# 块大小取文件大小的平方根附近的2的幂，限制在此范围内
+DELTA_MIN_BLOCK = 4 * 1024
+DELTA_MAX_BLOCK = 1024 * 1024
+
+# 每次从文件读入的扫描窗口，字面数据累积到此大小就先发出去
+SCAN_WINDOW = 8 * 1024 * 1024
+LITERAL_FLUSH = 1024 * 1024
+
+# numpy路径中弱校验和粗筛位图的大小（按弱校验和低24位索引）
+WEAK_FILTER_SIZE = 1 << 24
+
+# 线上格式（小端序），与服务器 socket_server.cpp 保持一致
+SIGNATURE_ENTRY = struct.Struct('<I32s')
+DELTA_OP = struct.Struct('<BQQ')
+OP_END = 0
+OP_COPY = 1
+OP_LITERAL = 2
+
+
+def choose_block_size(file_size):
+    """按文件大小选择块大小：块越大签名越少，块越小变化部分的字面数据越少"""
+    if file_size <= 0:
+        return DELTA_MIN_BLOCK
+    block = 1 << round(math.log2(math.sqrt(file_size)))
+    return max(DELTA_MIN_BLOCK, min(DELTA_MAX_BLOCK, block))
+
+
+def weak_checksum(data):
+    """弱校验和: a = Σx[i], b = Σ(L-i)·x[i]，各取低16位，返回 a | (b << 16)"""
+    a = sum(data) & 0xffff
+    b = sum(accumulate(data)) & 0xffff
+    return a | (b << 16)
+
+
+class BlockSignatures:
+    """旧文件的分块签名表"""
+
+    def __init__(self, block_size, file_size, entries):
+        self.block_size = block_size
+        self.file_size = file_size
+        self.weak_set = set()
+        self.strong_index = {}
+        for index, (weak, strong) in enumerate(entries):
+            self.weak_set.add(weak)
+            self.strong_index.setdefault(strong, index)
+        self.weak_array = None
+        if np is not None:
+            self.weak_array = np.array(sorted(self.weak_set), dtype=np.uint32)
+            # 按低位索引的位图先粗筛，只有命中的少数位置才做二分查找
+            self.weak_filter = np.zeros(WEAK_FILTER_SIZE, dtype=bool)
+            self.weak_filter[self.weak_array & (WEAK_FILTER_SIZE - 1)] = True
+
+    def __len__(self):
+        return len(self.strong_index)
+
+    @classmethod
+    def parse(cls, block_size, file_size, payload):
+        """解析服务器发来的签名数据（每块 弱校验和u32 + SHA-256）"""
+        return cls(block_size, file_size, SIGNATURE_ENTRY.iter_unpack(payload))
+
+    @classmethod
+    def from_file(cls, file, block_size):
+        """在本地为文件生成签名，与服务器的算法相同（用于测试和基准）"""
+        entries = []
+        file_size = 0
+        while True:
+            block = file.read(block_size)
+            file_size += len(block)
+            if len(block) < block_size:
+                break
+            entries.append((weak_checksum(block), hashlib.sha256(block).digest()))
+        return cls(block_size, file_size, entries)
+
+    def lookup(self, view):
+        """按强校验和查找一个完整块，返回旧文件中的块号或None"""
+        return self.strong_index.get(hashlib.sha256(view).digest())
+
+    def find(self, data, start, end):
+        """在 data 的 [start, end] 位置中查找第一个与旧文件某块相同的窗口，返回 (位置, 块号)"""
+        if start > end:
+            return None, None
+        if self.weak_array is not None:
+            candidates = self._weak_candidates_numpy(data, start, end)
+        else:
+            candidates = self._weak_candidates_rolling(data, start, end)
+
+        view = memoryview(data)
+        block_size = self.block_size
+        for position in candidates:
+            index = self.lookup(view[position:position + block_size])
+            if index is not None:
+                return position, index
+        return None, None
+
+    def _weak_candidates_numpy(self, data, start, end):
+        """向量化计算 [start, end] 每个位置的弱校验和，返回命中签名表的位置"""
+        block_size = self.block_size
+        count = end - start + 1
+        # 只需要低16位，全部按uint32做模2^32运算即可，溢出不影响结果
+        x = np.frombuffer(data, dtype=np.uint8, count=count + block_size - 1, offset=start).astype(np.uint32)
+        positions = np.arange(x.size, dtype=np.uint32)
+        # 前缀和: S[k] = Σx[0..k), T[k] = Σj·x[j] (j < k)
+        prefix = np.zeros(x.size + 1, dtype=np.uint32)
+        np.cumsum(x, out=prefix[1:])
+        weighted = np.zeros(x.size + 1, dtype=np.uint32)
+        np.multiply(x, positions, out=x)
+        np.cumsum(x, out=weighted[1:])
+
+        # a[k] = S[k+L] - S[k]，b[k] = (k+L)·a[k] - (T[k+L] - T[k])
+        a = prefix[block_size:block_size + count] - prefix[:count]
+        b = positions[:count]
+        b += block_size
+        b *= a
+        b -= weighted[block_size:block_size + count]
+        b += weighted[:count]
+        a &= 0xffff
+        b <<= 16
+        b |= a
+        weak = b
+
+        hits = np.nonzero(self.weak_filter[weak & (WEAK_FILTER_SIZE - 1)])[0]
+        if hits.size:
+            # 签名表已排序，二分查找剔除位图的误报
+            slots = np.minimum(np.searchsorted(self.weak_array, weak[hits]), self.weak_array.size - 1)
+            hits = hits[self.weak_array[slots] == weak[hits]]
+        return (start + int(i) for i in hits)
+
+    def _weak_candidates_rolling(self, data, start, end):
+        """逐字节滚动弱校验和，依次产出命中签名表的位置"""
+        block_size = self.block_size
+        weak_set = self.weak_set
+        window = data[start:start + block_size]
+        a = sum(window) & 0xffff
+        b = sum(accumulate(window)) & 0xffff
+        if (a | (b << 16)) in weak_set:
+            yield start
+        for position in range(start + 1, end + 1):
+            removed = data[position - 1]
+            a = (a - removed + data[position + block_size - 1]) & 0xffff
+            b = (b - block_size * removed + a) & 0xffff
+            if (a | (b << 16)) in weak_set:
+                yield position
+
+
+class DeltaEncoder:
+    """扫描新文件，依次产出增量操作:
+    ('copy', 起始块号, 块数) 或 ('literal', 数据)
+
+    遍历结束后 digest 为新文件的SHA-256，literal_bytes/copied_bytes 为统计
+    """
+
+    def __init__(self, file, signatures, search_span=None):
+        self.file = file
+        self.signatures = signatures
+        self.block_size = signatures.block_size
+        # 当前位置不匹配时，一次向后搜索的字节数；连续找不到时逐次加倍，找到后恢复
+        self.search_span = search_span or 4 * self.block_size
+        self.digest = None
+        self.literal_bytes = 0
+        self.copied_bytes = 0
+
+    def __iter__(self):
+        block_size = self.block_size
+        signatures = self.signatures
+        sha = hashlib.sha256()
+        data = b''
+        view = memoryview(data)
+        position = 0
+        literal_start = 0
+        pending_copy = None
+        eof = False
+        span = self.search_span
+
+        while True:
+            # 窗口内剩余数据不足时，丢掉已处理的部分并读入下一段
+            if not eof and len(data) - position < SCAN_WINDOW:
+                chunk = self.file.read(SCAN_WINDOW)
+                if chunk:
+                    sha.update(chunk)
+                    data = data[literal_start:] + chunk
+                    position -= literal_start
+                    literal_start = 0
+                    view = memoryview(data)
+                else:
+                    eof = True
+                continue
+
+            if len(data) - position < block_size:
+                break
+
+            # 先检查当前位置（未修改的区域每块一次哈希即可确认）
+            index = signatures.lookup(view[position:position + block_size])
+            if index is None:
+                limit = min(position + span, len(data) - block_size)
+                match_position, index = signatures.find(data, position + 1, limit)
+                if index is None:
+                    position = limit + 1
+                    span = min(span * 2, SCAN_WINDOW // 2)
+                    if position - literal_start >= LITERAL_FLUSH:
+                        if pending_copy:
+                            yield self._copy(pending_copy)
+                            pending_copy = None
+                        yield self._literal(view[literal_start:position])
+                        literal_start = position
+                    continue
+                position = match_position
+                span = self.search_span
+
+            # 找到匹配块：先发出之前的字面数据，相邻的块引用合并成一条
+            if position > literal_start:
+                if pending_copy:
+                    yield self._copy(pending_copy)
+                    pending_copy = None
+                yield self._literal(view[literal_start:position])
+            if pending_copy and pending_copy[0] + pending_copy[1] == index:
+                pending_copy[1] += 1
+            else:
+                if pending_copy:
+                    yield self._copy(pending_copy)
+                pending_copy = [index, 1]
+            position += block_size
+            literal_start = position
+
+        if pending_copy:
+            yield self._copy(pending_copy)
+        if len(data) > literal_start:
+            yield self._literal(view[literal_start:])
+        self.digest = sha.digest()
+
+    def _copy(self, pending_copy):
+        self.copied_bytes += pending_copy[1] * self.block_size
+        return ('copy', pending_copy[0], pending_copy[1])
+
+    def _literal(self, data):
+        self.literal_bytes += len(data)
+        return ('literal', data)
+
+
+def apply_delta(basis, ops, block_size, output):
+    """在本地按增量操作重建文件（与服务器的重建逻辑相同，用于测试和基准）"""
+    for op in ops:
+        if op[0] == 'copy':
+            basis.seek(op[1] * block_size)
+            output.write(basis.read(op[2] * block_size))
+        else:
+            output.write(op[1])
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+文件数据收发引擎
+上传优先走 socket.sendfile()（内核 sendfile/splice 零拷贝），不可用时退回大缓冲区 memoryview 循环；
+下载用 recv_into 填充一块可复用的缓冲区，攒满后用 os.pwrite 一次写盘。
+传入 transfer_tuning.TransportTuner 时，分片大小和写盘粒度由它在传输开始时测量后决定，发送期间开启 TCP_CORK；
+传入 transfer_limiter.TransferLease 时，每个分片收发前后向限速器取令牌
+"""
+
+import contextlib
+import os
+
+# 回退路径使用的读缓冲区大小
+SEND_BUFFER_SIZE = 1024 * 1024
+# 每次 sendfile 调用最多发送的字节数（决定进度回调的粒度）
+SENDFILE_SLICE = 8 * 1024 * 1024
+# 下载接收缓冲区默认大小
+RECV_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def sendfile_supported(sock, file):
+    """判断能否对该socket和文件使用内核sendfile"""
+    if not hasattr(os, 'sendfile'):
+        return False
+    try:
+        sock.fileno()
+        file.fileno()
+    except (AttributeError, OSError, ValueError):
+        return False
+    return True
+
+
+def send_file_data(sock, file, file_size, offset=0, on_progress=None, buffer_size=SEND_BUFFER_SIZE, tuner=None,
+                   lease=None):
+    """从文件的offset处开始，向socket发送恰好file_size字节
+
+    文件在发送过程中变大时多出的部分不会被发送；文件变短时抛出IOError，
+    避免服务器一直等待永远不会到达的数据。
+    on_progress(bytes_sent) 在每个分片发送完成后以累计字节数回调。
+    返回实际发送的字节数。
+    """
+    if file_size <= 0:
+        return 0
+
+    if tuner is not None:
+        tuner.begin('send')
+    with tuner.bulk() if tuner is not None else contextlib.nullcontext():
+        if sendfile_supported(sock, file):
+            return _send_with_sendfile(sock, file, file_size, offset, on_progress, tuner, lease)
+        return _send_with_buffer(sock, file, file_size, offset, on_progress, buffer_size, tuner, lease)
+
+
+def _send_with_sendfile(sock, file, file_size, offset, on_progress, tuner, lease):
+    """零拷贝路径：分片调用socket.sendfile()，数据不经过用户态"""
+    bytes_sent = 0
+    while bytes_sent < file_size:
+        slice_size = tuner.chunk_size if tuner is not None else SENDFILE_SLICE
+        count = min(slice_size, file_size - bytes_sent)
+        if lease is not None:
+            count = lease.limit(count)
+            lease.acquire(count)
+        sent = sock.sendfile(file, offset + bytes_sent, count)
+        if sent <= 0:
+            raise IOError(f"文件在发送过程中被截断: 期望{file_size}字节，仅发送{bytes_sent}字节")
+        bytes_sent += sent
+        if tuner is not None:
+            tuner.observe(bytes_sent)
+        if on_progress:
+            on_progress(bytes_sent)
+    return bytes_sent
+
+
+def _send_with_buffer(sock, file, file_size, offset, on_progress, buffer_size, tuner, lease):
+    """回退路径：复用同一块缓冲区readinto + sendall，不为每个分片分配新对象"""
+    buffer = bytearray(min(buffer_size, file_size))
+    view = memoryview(buffer)
+    file.seek(offset)
+
+    bytes_sent = 0
+    while bytes_sent < file_size:
+        slice_size = tuner.chunk_size if tuner is not None else len(buffer)
+        want = min(len(buffer), slice_size, file_size - bytes_sent)
+        if lease is not None:
+            want = lease.limit(want)
+            lease.acquire(want)
+        n = file.readinto(view[:want])
+        if not n:
+            raise IOError(f"文件在发送过程中被截断: 期望{file_size}字节，仅发送{bytes_sent}字节")
+        sock.sendall(view[:n])
+        bytes_sent += n
+        if tuner is not None:
+            tuner.observe(bytes_sent)
+        if on_progress:
+            on_progress(bytes_sent)
+    return bytes_sent
+
+
+def recv_file_data(sock, file, file_size, offset=0, on_progress=None, buffer=None,
+                   buffer_size=RECV_BUFFER_SIZE, tuner=None, lease=None):
+    """从socket接收恰好file_size字节，写入文件的offset处
+
+    数据用recv_into直接收进buffer（可传入调用方复用的bytearray），
+    缓冲区攒满（有 tuner 时为攒够一个分片）或数据收完时才写盘一次，整个过程不为每个分片分配新对象。
+    连接提前关闭时抛出ConnectionError。返回接收的字节数。
+    """
+    if file_size <= 0:
+        return 0
+
+    if tuner is not None:
+        tuner.begin('recv')
+    if buffer is None:
+        buffer = bytearray(min(buffer_size, file_size))
+    view = memoryview(buffer)
+    capacity = len(buffer)
+
+    bytes_received = 0
+    write_offset = offset
+    filled = 0
+    try:
+        while bytes_received < file_size:
+            flush_size = min(tuner.chunk_size, capacity) if tuner is not None else capacity
+            want = min(max(flush_size - filled, 1), capacity - filled, file_size - bytes_received)
+            if lease is not None:
+                want = lease.limit(want)
+            n = sock.recv_into(view[filled:filled + want], want)
+            if not n:
+                raise ConnectionError(f"连接提前关闭: 期望{file_size}字节，仅收到{bytes_received}字节")
+            if lease is not None:
+                # 收到后再取令牌：等待期间不读socket，TCP接收窗口收紧，对端随之放慢
+                lease.acquire(n)
+            filled += n
+            bytes_received += n
+
+            if filled >= flush_size or bytes_received == file_size:
+                _write_at(file, view[:filled], write_offset)
+                write_offset += filled
+                filled = 0
+                if tuner is not None:
+                    tuner.observe(bytes_received)
+                if on_progress:
+                    on_progress(bytes_received)
+    finally:
+        view.release()
+    return bytes_received
+
+
+def _write_at(file, data, offset):
+    """把data写到文件offset处；有os.pwrite时不移动文件指针，也不经过Python缓冲层"""
+    if hasattr(os, 'pwrite'):
+        fd = file.fileno()
+        written = 0
+        total = len(data)
+        while written < total:
+            written += os.pwrite(fd, data[written:], offset + written)
+    else:
+        file.seek(offset)
+        file.write(data)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+断点续传日志
+每个未完成的传输在 ~/.file_transfer_journals/ 下保存一个小的JSON文件，
+记录本地文件的身份（大小、修改时间）和已完成的字节区间，连接中断后据此只补传缺失部分
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# 默认日志目录，与GUI配置文件一样放在用户主目录下
+JOURNAL_DIR = Path.home() / ".file_transfer_journals"
+
+
+class TransferJournal:
+    """单个传输的续传日志"""
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def open(cls, kind, endpoint, remote_name, local_path, journal_dir=None):
+        """打开（或新建）某个传输的日志
+
+        kind:     'upload' 或 'download'
+        endpoint: 目标服务器 "host:port"
+        """
+        journal_dir = Path(journal_dir or JOURNAL_DIR)
+        local_path = os.path.abspath(local_path)
+        key = hashlib.sha1(f"{kind}|{endpoint}|{remote_name}|{local_path}".encode('utf-8')).hexdigest()
+        path = journal_dir / f"{key}.json"
+
+        data = None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        if not isinstance(data, dict) or data.get('remote') != remote_name:
+            data = {'kind': kind, 'endpoint': endpoint, 'remote': remote_name, 'local': local_path,
+                    'size': None, 'mtime_ns': None, 'ranges': []}
+        return cls(path, data)
+
+    @property
+    def size(self):
+        return self.data.get('size')
+
+    @property
+    def ranges(self):
+        return [tuple(r) for r in self.data.get('ranges', [])]
+
+    def matches(self, size, mtime_ns=None):
+        """日志记录的文件身份是否与当前一致（不一致时已完成区间作废）"""
+        return self.data.get('size') == size and self.data.get('mtime_ns') == mtime_ns
+
+    def reset(self, size, mtime_ns=None):
+        """开始一次新的传输，清空已完成区间"""
+        self.data['size'] = size
+        self.data['mtime_ns'] = mtime_ns
+        self.data['ranges'] = []
+
+    def add_range(self, start, end):
+        """记录 [start, end) 已完成，与相邻或重叠的区间合并"""
+        if end <= start:
+            return
+        merged = []
+        for r_start, r_end in sorted(self.ranges + [(start, end)]):
+            if merged and r_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], r_end)
+            else:
+                merged.append([r_start, r_end])
+        self.data['ranges'] = merged
+
+    def completed_bytes(self):
+        return sum(end - start for start, end in self.ranges)
+
+    def contiguous_bytes(self):
+        """从文件开头起连续完成的字节数"""
+        ranges = self.ranges
+        if ranges and ranges[0][0] == 0:
+            return ranges[0][1]
+        return 0
+
+    def missing_ranges(self, total=None):
+        """返回尚未完成的区间列表"""
+        total = self.size if total is None else total
+        missing = []
+        position = 0
+        for start, end in self.ranges:
+            if start > position:
+                missing.append((position, min(start, total)))
+            position = max(position, end)
+        if position < total:
+            missing.append((position, total))
+        return [(start, end) for start, end in missing if end > start]
+
+    def save(self):
+        """原子地写回磁盘（先写临时文件再替换）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def discard(self):
+        """传输完成后删除日志"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
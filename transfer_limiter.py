@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+带宽限制
+upload_folder 等大批量传输会占满代理的上行带宽，让经同一代理的其他会话卡住。
+本模块提供进程内共享的令牌桶，同一方向的所有连接（并行连接、多路复用通道）从同一个桶取令牌：
+- 每次传输租用一个 TransferLease，带一个优先级（high / normal / low，对应不同权重）
+- 多个传输同时等待令牌时按起始时间公平排队（SFQ）分配，带宽按权重比例分给各个传输，低优先级不会被饿死
+- 限速可以在运行中随时调整（命令行 limit 命令、GUI的限速输入框），正在进行的传输立即按新速率进行
+- 未限速时 acquire 只做一次判断，收发循环几乎没有额外开销
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from transfer_progress import format_rate
+
+# 优先级及其权重：同时传输时带宽按权重比例分配
+PRIORITY_WEIGHTS = {'high': 4, 'normal': 2, 'low': 1}
+DEFAULT_PRIORITY = 'normal'
+
+# 令牌桶容量：限速下这么长时间的数据量，空闲后最多允许这么大的突发
+BURST_SECONDS = 0.05
+MIN_BURST = 64 * 1024
+
+# 限速时每次收发的分片不超过这么长时间的数据量，多个传输可以在较细的粒度上交替
+SLICE_SECONDS = 0.05
+MIN_SLICE = 16 * 1024
+
+# 限速写法的单位（字节/秒）
+RATE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_rate(text):
+    """解析限速写法：10M、512K、1.5G（每秒字节数，可带 B 或 /s 后缀）；off、0 或空表示不限速，返回None
+
+    负数和无法识别的写法抛出 ValueError
+    """
+    value = text.strip().upper().replace('/S', '')
+    if value in ('', 'OFF', 'NONE', '0'):
+        return None
+    if value.endswith('B') and len(value) > 1 and value[-2] in RATE_UNITS:
+        value = value[:-1]
+    unit = value[-1] if value[-1] in RATE_UNITS else ''
+    number = value[:-1] if unit else value
+    try:
+        rate = float(number) * RATE_UNITS[unit]
+    except ValueError:
+        raise ValueError(f"无法识别的限速: {text}（示例: 10M、512K、off）")
+    if rate < 0 or not math.isfinite(rate):
+        raise ValueError(f"限速必须是非负的有限数值: {text}（示例: 10M、512K、off）")
+    if rate == 0:
+        return None
+    return rate
+
+
+def format_limit(rate):
+    return format_rate(rate) if rate is not None else "不限速"
+
+
+class TransferLease:
+    """一次传输在限速器上的租约
+
+    收发循环在发送前（或接收后）调用 acquire(字节数)，限速时可能阻塞到令牌足够、轮到本传输为止
+    """
+
+    def __init__(self, limiter, priority=DEFAULT_PRIORITY):
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"未知的优先级: {priority}（可选: {', '.join(PRIORITY_WEIGHTS)}）")
+        self.limiter = limiter
+        self.priority = priority
+        self.weight = PRIORITY_WEIGHTS[priority]
+        self.finish = 0.0          # SFQ 的结束标签
+        self.bytes = 0
+        self.waited = 0.0
+
+    def acquire(self, n):
+        self.bytes += n
+        if self.limiter.rate is not None:
+            self.limiter._acquire(self, n)
+
+    def limit(self, size):
+        """限速时把分片限制在 SLICE_SECONDS 的数据量内"""
+        rate = self.limiter.rate
+        if rate is None:
+            return size
+        return max(1, min(size, max(MIN_SLICE, int(rate * SLICE_SECONDS))))
+
+    def sendall(self, sock, data):
+        """按限速分片发送一整块数据"""
+        view = memoryview(data)
+        sent = 0
+        while sent < len(view):
+            size = self.limit(len(view) - sent)
+            self.acquire(size)
+            sock.sendall(view[sent:sent + size])
+            sent += size
+
+    def close(self):
+        self.limiter._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BandwidthLimiter:
+    """一个方向（上传或下载）的进程级令牌桶"""
+
+    def __init__(self, name, rate=None):
+        self.name = name
+        self._cond = threading.Condition()
+        self._queue = []               # 等待令牌的请求：(起始标签, 序号)
+        self._seq = itertools.count()
+        self._virtual = 0.0            # SFQ 虚拟时间：最近一次放行请求的起始标签
+        self._active = {}              # 进行中的传输数，按优先级
+        self.rate = None
+        self._tokens = 0.0
+        self._burst = 0.0
+        self._stamp = time.perf_counter()
+        # 限速期间放行的字节数和累计等待时间
+        self.throttled_bytes = 0
+        self.wait_seconds = 0.0
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """调整限速（字节/秒，None表示不限速），等待中的传输立即按新速率继续"""
+        with self._cond:
+            self.rate = rate if rate else None
+            self._stamp = time.perf_counter()
+            if self.rate is not None:
+                self._burst = max(MIN_BURST, self.rate * BURST_SECONDS)
+                self._tokens = min(self._tokens, self._burst)
+            self._cond.notify_all()
+
+    def lease(self, priority=DEFAULT_PRIORITY):
+        lease = TransferLease(self, priority)
+        with self._cond:
+            self._active[priority] = self._active.get(priority, 0) + 1
+        return lease
+
+    def _release(self, lease):
+        with self._cond:
+            self._active[lease.priority] -= 1
+
+    def _refill(self, now):
+        self._tokens = min(self._burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def _acquire(self, lease, n):
+        """排队取 n 字节的令牌：起始标签最小的请求先放行，令牌不足时允许透支，下一个请求等到还清为止"""
+        started = time.perf_counter()
+        with self._cond:
+            start = max(self._virtual, lease.finish)
+            lease.finish = start + n / lease.weight
+            ticket = (start, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            try:
+                while self.rate is not None:
+                    timeout = None
+                    if self._queue[0] == ticket:
+                        self._refill(time.perf_counter())
+                        if self._tokens >= 0:
+                            self._tokens -= n
+                            self._virtual = start
+                            self.throttled_bytes += n
+                            break
+                        timeout = -self._tokens / self.rate
+                    self._cond.wait(timeout)
+            finally:
+                if self._queue[0] == ticket:
+                    heapq.heappop(self._queue)
+                else:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                self._cond.notify_all()
+                waited = time.perf_counter() - started
+                lease.waited += waited
+                self.wait_seconds += waited
+
+    def active(self):
+        with self._cond:
+            return {priority: count for priority, count in self._active.items() if count}
+
+    def summary(self):
+        text = f"🚦 {self.name}限速: {format_limit(self.rate)}"
+        active = self.active()
+        if active:
+            text += ", 进行中: " + ", ".join(f"{priority}×{count}" for priority, count in active.items())
+        if self.throttled_bytes:
+            text += f", 限速期间放行 {self.throttled_bytes} bytes, 累计等待 {self.wait_seconds:.1f} 秒"
+        return text
+
+
+# 进程内共享的限速器：所有客户端、并行连接和多路复用通道共用
+upload_limiter = BandwidthLimiter('上传')
+download_limiter = BandwidthLimiter('下载')
+
+
+def limiter_for(direction):
+    """'send' 返回上传限速器，'recv' 返回下载限速器"""
+    return upload_limiter if direction == 'send' else download_limiter
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+单连接多路复用
+FILE:MUX 之后一条TCP连接上可以同时进行多个操作（列表、上传、下载），每个操作占用一个通道：
+- 各通道的数据切成不超过64KB的帧轮流发送，大下载不会阻塞其他通道的小请求
+- 每个通道每个方向有独立的流控窗口，接收方消费数据后才归还窗口，一个通道读得慢不会拖住整条连接
+open_channel 返回一个本地socket，FileTransferClient 像使用普通连接一样在上面收发命令和数据
+"""
+
+import bisect
+import collections
+import socket
+import threading
+
+from file_transfer_client import FileTransferClient
+from wire_protocol import (MUX_CLOSE, MUX_DATA, MUX_HEADER, MUX_INITIAL_WINDOW, MUX_MAX_CHUNK, MUX_OPEN,
+                           MUX_WINDOW, MUX_WINDOW_UPDATE)
+
+# 通道号的取值范围（0保留不用）
+MUX_MAX_CHANNEL_ID = 0xFFFF
+
+
+class _MuxChannel:
+    """一个通道的状态，除 local 的收发外都在会话锁内访问"""
+
+    def __init__(self, channel_id, local):
+        self.id = channel_id
+        self.local = local          # 会话一端的本地socket
+        self.running = 2            # 仍在运行的搬运线程数
+        # 对端发来、尚未写入本地socket的数据
+        self.received = collections.deque()
+        self.remote_closed = False
+        # 从本地socket读出、等待发送的一块数据
+        self.chunk = None
+        self.chunk_offset = 0
+        self.local_closed = False
+        self.close_sent = False
+        # 对端还能接收的字节数
+        self.credit = MUX_INITIAL_WINDOW
+
+
+class MuxSession:
+    """一条多路复用连接
+
+    读线程解析服务器发来的帧并分发到各通道，写线程按轮转顺序发送各通道的数据；
+    每个通道另有两个线程在本地socket和通道帧之间搬运数据
+    """
+
+    def __init__(self, host='localhost', port=8080, proxy_host=None, proxy_port=None):
+        self.host = host
+        self.port = port
+        self.proxy_host = proxy_host
+        self.proxy_port = proxy_port
+        self._sock = None
+        self._cond = threading.Condition()
+        self._channels = {}
+        self._control = collections.deque()   # 待发送的控制帧，优先于数据帧
+        self._cursor = 0                      # 轮转发送：上一次发送数据的通道
+        self._next_id = 1
+        self._stopping = False
+        self._threads = []
+
+    @property
+    def connected(self):
+        return self._sock is not None and not self._stopping
+
+    def connect(self):
+        """建立连接并切换到多路复用模式；服务器不支持时返回False"""
+        carrier = FileTransferClient(self.host, self.port, self.proxy_host, self.proxy_port, framing=False)
+        if not carrier.connect():
+            return False
+        try:
+            carrier.channel.send_message("FILE:MUX")
+            response = carrier.channel.recv_message().strip()
+        except OSError as e:
+            print(f"❌ 多路复用请求失败: {e}")
+            carrier.disconnect()
+            return False
+        if response != "MUX_READY":
+            print(f"⚠️ 服务器不支持多路复用: {response}")
+            carrier.disconnect()
+            return False
+
+        # 连接空闲是正常状态，不设超时；各通道上的超时由使用通道的客户端自己设置
+        self._sock = carrier.socket
+        self._sock.settimeout(None)
+        # 各通道的小帧（打开、命令、窗口更新）交错发送，不能被Nagle算法攒着等ACK
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._threads = [threading.Thread(target=self._read_loop, name='mux-reader', daemon=True),
+                         threading.Thread(target=self._write_loop, name='mux-writer', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        print("✅ 已启用多路复用")
+        return True
+
+    def open_channel(self):
+        """打开一个新通道，返回连到该通道的本地socket，用法与普通TCP连接相同，关闭它即关闭通道"""
+        local, remote = socket.socketpair()
+        with self._cond:
+            if not self.connected:
+                local.close()
+                remote.close()
+                raise ConnectionError("多路复用连接已关闭")
+            channel_id = self._allocate_id()
+            channel = _MuxChannel(channel_id, local)
+            self._channels[channel_id] = channel
+            self._control.append(MUX_HEADER.pack(MUX_OPEN, 0, channel_id, 0))
+            self._cond.notify_all()
+        threading.Thread(target=self._inbound_loop, args=(channel,), name=f'mux-in-{channel_id}',
+                         daemon=True).start()
+        threading.Thread(target=self._outbound_loop, args=(channel,), name=f'mux-out-{channel_id}',
+                         daemon=True).start()
+        return remote
+
+    def close(self):
+        """关闭连接，所有通道上的本地socket随之读到EOF"""
+        self._stop()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _allocate_id(self):
+        # 通道号递增分配，绕回后跳过仍在使用的号，避免与服务器上尚未回收的旧通道冲突
+        for _ in range(MUX_MAX_CHANNEL_ID):
+            channel_id = self._next_id
+            self._next_id = self._next_id % MUX_MAX_CHANNEL_ID + 1
+            if channel_id not in self._channels:
+                return channel_id
+        raise ConnectionError("多路复用通道已用尽")
+
+    def _stop(self):
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            channels = list(self._channels.values())
+            for channel in channels:
+                channel.remote_closed = True
+            self._cond.notify_all()
+        for channel in channels:
+            try:
+                channel.local.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _thread_done(self, channel):
+        with self._cond:
+            channel.running -= 1
+            self._release_if_done(channel)
+
+    def _release_if_done(self, channel):
+        # 两个搬运线程都已退出并且关闭帧已发出（或连接已断开）时释放通道
+        if channel.running == 0 and (channel.close_sent or self._stopping):
+            self._channels.pop(channel.id, None)
+            channel.local.close()
+
+    def _read_loop(self):
+        """读取服务器发来的帧并分发到各通道"""
+        reader = self._sock.makefile('rb')
+        try:
+            while True:
+                header = reader.read(MUX_HEADER.size)
+                if len(header) < MUX_HEADER.size:
+                    break
+                frame_type, _, channel_id, length = MUX_HEADER.unpack(header)
+                if length > MUX_MAX_CHUNK:
+                    break  # 协议错误
+                payload = reader.read(length) if length else b''
+                if len(payload) < length:
+                    break
+                with self._cond:
+                    channel = self._channels.get(channel_id)
+                    if channel is None:
+                        continue
+                    if frame_type == MUX_DATA:
+                        channel.received.append(payload)
+                    elif frame_type == MUX_WINDOW:
+                        channel.credit += MUX_WINDOW_UPDATE.unpack(payload)[0]
+                    elif frame_type == MUX_CLOSE:
+                        channel.remote_closed = True
+                    self._cond.notify_all()
+        except (OSError, ValueError):
+            pass
+        finally:
+            reader.close()
+            self._stop()
+
+    def _inbound_loop(self, channel):
+        """对端数据 -> 本地socket；每写完一块把窗口还给对端"""
+        writable = True
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: channel.received or channel.remote_closed)
+                if not channel.received:
+                    break
+                data = channel.received.popleft()
+
+            # 使用方已经关闭通道时丢弃数据，但照常归还窗口，避免对端卡住
+            if writable:
+                try:
+                    channel.local.sendall(data)
+                except OSError:
+                    writable = False
+
+            with self._cond:
+                if not self._stopping:
+                    self._control.append(MUX_HEADER.pack(MUX_WINDOW, 0, channel.id, MUX_WINDOW_UPDATE.size) +
+                                         MUX_WINDOW_UPDATE.pack(len(data)))
+                    self._cond.notify_all()
+
+        # 对端不再发送：使用方读到EOF
+        try:
+            channel.local.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        self._thread_done(channel)
+
+    def _outbound_loop(self, channel):
+        """本地socket -> 待发送块；同一时间只缓存一块，写线程取走前不再读取，背压一直传到使用方"""
+        while True:
+            try:
+                data = channel.local.recv(MUX_MAX_CHUNK)
+            except OSError:
+                data = b''
+            with self._cond:
+                self._cond.wait_for(lambda: channel.chunk is None or self._stopping)
+                if not data or self._stopping:
+                    channel.local_closed = True
+                    self._cond.notify_all()
+                    break
+                channel.chunk = data
+                channel.chunk_offset = 0
+                self._cond.notify_all()
+        self._thread_done(channel)
+
+    def _next_frame(self):
+        """取下一个要发送的帧（在锁内调用），没有可发送的帧时返回None"""
+        if self._control:
+            return self._control.popleft()
+
+        # 从上一次发送的通道之后开始轮转，每个通道每轮最多发一块，大下载不会饿死其他通道
+        ids = sorted(self._channels)
+        start = bisect.bisect_right(ids, self._cursor)
+        for channel_id in ids[start:] + ids[:start]:
+            channel = self._channels[channel_id]
+            if channel.chunk is not None and channel.credit > 0:
+                begin = channel.chunk_offset
+                size = min(len(channel.chunk) - begin, channel.credit)
+                frame = MUX_HEADER.pack(MUX_DATA, 0, channel_id, size) + channel.chunk[begin:begin + size]
+                channel.chunk_offset += size
+                channel.credit -= size
+                if channel.chunk_offset == len(channel.chunk):
+                    channel.chunk = None
+                    self._cond.notify_all()
+                self._cursor = channel_id
+                return frame
+            if channel.local_closed and not channel.close_sent and channel.chunk is None:
+                channel.close_sent = True
+                self._cursor = channel_id
+                self._release_if_done(channel)
+                return MUX_HEADER.pack(MUX_CLOSE, 0, channel_id, 0)
+        return None
+
+    def _write_loop(self):
+        """按顺序发送控制帧和各通道的数据帧"""
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    frame = self._next_frame()
+                    if frame is not None:
+                        break
+                    self._cond.wait()
+            try:
+                self._sock.sendall(frame)
+            except OSError:
+                self._stop()
+                return
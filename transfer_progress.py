@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+传输进度事件总线
+传输线程只负责累加字节计数（热路径上没有锁、没有时间调用、没有I/O），
+后台线程按固定频率或字节阈值合并出进度事件，推送给CLI、GUI等订阅者
+"""
+
+import sys
+import threading
+import time
+
+
+class ProgressEvent:
+    """一次合并后的进度快照"""
+    __slots__ = ('name', 'done', 'total', 'instant_bps', 'ewma_bps', 'eta', 'elapsed', 'finished', 'success')
+
+    def __init__(self, name, done, total, instant_bps, ewma_bps, eta, elapsed, finished=False, success=True):
+        self.name = name
+        self.done = done
+        self.total = total
+        self.instant_bps = instant_bps
+        self.ewma_bps = ewma_bps
+        self.eta = eta
+        self.elapsed = elapsed
+        self.finished = finished
+        self.success = success
+
+    @property
+    def percent(self):
+        if self.total <= 0:
+            return 100.0
+        return min(self.done / self.total * 100, 100.0)
+
+
+class TransferProgress:
+    """单个传输的进度计数器，只应由执行传输的那个线程写入"""
+    __slots__ = ('bus', 'name', 'total', 'done', 'started', 'next_mark',
+                 'last_done', 'last_time', 'ewma_bps', 'finished')
+
+    def __init__(self, bus, name, total):
+        self.bus = bus
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self.next_mark = bus.byte_threshold or 0
+        self.last_done = 0
+        self.last_time = self.started
+        self.ewma_bps = 0.0
+        self.finished = False
+
+    def add(self, n):
+        """累加已传输字节数（热路径）"""
+        self.done += n
+        if self.next_mark and self.done >= self.next_mark:
+            self.bus.wake()
+
+    def update(self, done):
+        """设置累计已传输字节数，可直接作为 transfer_engine 的 on_progress 回调"""
+        self.done = done
+        if self.next_mark and done >= self.next_mark:
+            self.bus.wake()
+
+    def finish(self, success=True):
+        """结束传输并立即推送最终事件"""
+        self.bus.finish(self, success)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc_type is None)
+        return False
+
+
+class ProgressBus:
+    """进度事件总线
+
+    interval:       按时间推送的周期（秒）
+    byte_threshold: 传输量每增加这么多字节就提前推送一次（None表示只按时间推送）
+    ewma_alpha:     平滑吞吐量的指数加权系数
+    """
+    def __init__(self, interval=0.2, byte_threshold=None, ewma_alpha=0.3):
+        self.interval = interval
+        self.byte_threshold = byte_threshold
+        self.ewma_alpha = ewma_alpha
+        self._subscribers = []
+        self._active = []
+        self._lock = threading.Lock()
+        self._emit_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """订阅进度事件，callback(event) 在后台线程或传输线程中被调用"""
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [cb for cb in self._subscribers if cb is not callback]
+
+    def start(self, name, total):
+        """登记一个新的传输，返回它的计数器
+
+        计数器要用 with 语句包住传输（with bus.start(...) as progress:），
+        传输抛出异常时也会结束并从推送列表中移除，不会一直推送过期的进度
+        """
+        progress = TransferProgress(self, name, total)
+        with self._lock:
+            self._active.append(progress)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="progress-bus", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return progress
+
+    def wake(self):
+        """字节阈值触发时提前唤醒推送线程"""
+        self._wake.set()
+
+    def finish(self, progress, success=True):
+        with self._lock:
+            if progress.finished:
+                return
+            progress.finished = True
+            if progress in self._active:
+                self._active.remove(progress)
+        self._emit(progress, time.monotonic(), finished=True, success=success)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                active = list(self._active)
+            now = time.monotonic()
+            for progress in active:
+                if progress.done != progress.last_done or progress.last_time == progress.started:
+                    self._emit(progress, now)
+
+    def _emit(self, progress, now, finished=False, success=True):
+        with self._emit_lock:
+            if progress.finished and not finished:
+                return
+            done = progress.done
+            dt = now - progress.last_time
+            if dt > 0:
+                instant = (done - progress.last_done) / dt
+                if progress.ewma_bps:
+                    progress.ewma_bps += self.ewma_alpha * (instant - progress.ewma_bps)
+                else:
+                    progress.ewma_bps = instant
+            else:
+                instant = progress.ewma_bps
+            progress.last_done = done
+            progress.last_time = now
+            if self.byte_threshold:
+                progress.next_mark = done + self.byte_threshold
+
+            remaining = max(progress.total - done, 0)
+            eta = remaining / progress.ewma_bps if progress.ewma_bps > 0 else None
+            event = ProgressEvent(progress.name, done, progress.total, instant, progress.ewma_bps,
+                                  0.0 if finished else eta, now - progress.started, finished, success)
+
+            for callback in self._subscribers:
+                try:
+                    callback(event)
+                except Exception:
+                    pass
+
+
+def format_rate(bps):
+    """把字节/秒格式化为易读的速率"""
+    for unit in ('B/s', 'KB/s', 'MB/s'):
+        if bps < 1024:
+            return f"{bps:.1f} {unit}"
+        bps /= 1024
+    return f"{bps:.2f} GB/s"
+
+
+def format_eta(seconds):
+    """把剩余秒数格式化为 mm:ss / hh:mm:ss"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class ConsoleProgressPrinter:
+    """命令行订阅者：在同一行刷新进度"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def __call__(self, event):
+        line = (f"📊 {event.name}: {event.percent:.1f}% ({event.done}/{event.total} bytes) "
+                f"{format_rate(event.ewma_bps)} ETA {format_eta(event.eta)}")
+        self.stream.write(line + "   \r")
+        self.stream.flush()
+
+
+_console_bus = None
+
+
+def get_console_bus():
+    """进程内共享的命令行进度总线，未显式指定总线的客户端默认使用它"""
+    global _console_bus
+    if _console_bus is None:
+        _console_bus = ProgressBus()
+        _console_bus.subscribe(ConsoleProgressPrinter())
+    return _console_bus
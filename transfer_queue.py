@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+传输任务队列
+上传、下载作为任务加入队列，由固定数量的工作线程执行，每个任务从连接池租用一条独立连接，
+任务之间不会共用同一个socket：
+- 调度策略：sjf（最短任务优先，小文件先完成）或 fifo（按加入顺序）
+- 暂停 / 取消：等待中的任务直接改变状态；运行中的任务在下一个分片处中断，连接不再放回池中。
+  大文件上传和所有下载都有续传日志，暂停后继续时从中断处接着传
+- 工作线程数可以随时调整；throughput() 给出所有任务合计的吞吐
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+from file_transfer_client import scan_folder
+
+# 调度策略
+POLICY_SJF = 'sjf'
+POLICY_FIFO = 'fifo'
+POLICIES = (POLICY_SJF, POLICY_FIFO)
+
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 16
+
+# 任务类型
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+
+# 任务状态
+PENDING = 'pending'
+RUNNING = 'running'
+PAUSED = 'paused'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+STATE_LABELS = {
+    PENDING: '等待',
+    RUNNING: '运行中',
+    PAUSED: '已暂停',
+    DONE: '完成',
+    FAILED: '失败',
+    CANCELLED: '已取消',
+}
+
+# 合计吞吐按最近这么长时间内传输的字节数计算
+THROUGHPUT_WINDOW = 2.0
+
+
+class TransferInterrupted(Exception):
+    """运行中的任务被暂停或取消"""
+
+
+class TransferJob:
+    """队列中的一个传输任务
+
+    上传时 local_path 为本地文件、remote_name 为服务器文件名；
+    下载时 remote_name 为服务器文件名、local_path 为保存目录
+    """
+
+    def __init__(self, job_id, kind, local_path, remote_name, size):
+        self.id = job_id
+        self.kind = kind
+        self.local_path = local_path
+        self.remote_name = remote_name
+        self.size = size
+        self.state = PENDING
+        self.done = 0
+        self.moved = 0            # 累计传输的字节数（含暂停前的部分，用于合计吞吐）
+        self.started = None
+        self.finished = None
+        self.error = None
+        self._stop = None         # 运行中被请求暂停或取消时为目标状态
+
+    @property
+    def percent(self):
+        if self.size <= 0:
+            return 100.0 if self.state == DONE else 0.0
+        return min(self.done / self.size * 100, 100.0)
+
+    @property
+    def state_label(self):
+        return STATE_LABELS[self.state]
+
+
+class _JobProgress:
+    """代替进度总线返回的计数器：记录任务进度，任务被暂停或取消时在下一个分片处中断传输"""
+
+    def __init__(self, job):
+        self.job = job
+
+    def add(self, n):
+        self.update(self.job.done + n)
+
+    def update(self, done):
+        job = self.job
+        if done > job.done:
+            job.moved += done - job.done
+        job.done = done
+        if job._stop is not None:
+            raise TransferInterrupted(STATE_LABELS[job._stop])
+
+    def finish(self, success=True):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _JobProgressBus:
+    """租到的客户端在执行任务期间使用的进度总线"""
+
+    def __init__(self, job):
+        self.job = job
+
+    def start(self, name, total):
+        # 下载任务加入队列时可能还不知道大小，以传输开始时服务器告知的为准
+        if total:
+            self.job.size = total
+        return _JobProgress(self.job)
+
+
+class TransferQueue:
+    """传输任务队列
+
+    pool:     connection_pool.ConnectionPool，任务从中租用连接
+    template: 提供连接参数和传输选项（压缩、优先级等）的客户端，每次租用时同步到连接上
+    on_event: on_event(job) 在任务状态变化时由工作线程调用
+    """
+
+    def __init__(self, pool, template, workers=DEFAULT_WORKERS, policy=POLICY_SJF, on_event=None):
+        self.pool = pool
+        self.template = template
+        self.policy = policy
+        self.on_event = on_event
+        self.workers = 0
+        self._cond = threading.Condition()
+        self._jobs = []
+        self._ids = itertools.count(1)
+        self._threads = {}
+        self._cleared_bytes = 0
+        self._samples = deque()
+        self._closed = False
+        self.set_workers(workers)
+
+    # ---------- 加入任务 ----------
+
+    def add_upload(self, local_path, remote_name=None):
+        remote_name = remote_name or os.path.basename(local_path)
+        return self._add(UPLOAD, local_path, remote_name, os.path.getsize(local_path))
+
+    def add_folder(self, folder_path):
+        """文件夹中的每个文件各是一个任务，服务器文件名保持目录结构"""
+        _, files, _ = scan_folder(folder_path)
+        return [self._add(UPLOAD, local_path, remote_name, size) for local_path, remote_name, size in files]
+
+    def add_download(self, remote_name, local_dir, size=0):
+        return self._add(DOWNLOAD, local_dir, remote_name, size)
+
+    def _add(self, kind, local_path, remote_name, size):
+        with self._cond:
+            job = TransferJob(next(self._ids), kind, local_path, remote_name, size)
+            self._jobs.append(job)
+            self._cond.notify_all()
+        return job
+
+    # ---------- 控制 ----------
+
+    def pause(self, job):
+        with self._cond:
+            if job.state == PENDING:
+                job.state = PAUSED
+            elif job.state == RUNNING:
+                job._stop = PAUSED
+            else:
+                return
+        self._notify(job)
+
+    def resume(self, job):
+        """继续已暂停的任务，或重试失败、已取消的任务"""
+        with self._cond:
+            if job.state not in (PAUSED, FAILED, CANCELLED):
+                return
+            job.state = PENDING
+            job.error = None
+            self._cond.notify_all()
+        self._notify(job)
+
+    def cancel(self, job):
+        with self._cond:
+            if job.state in (PENDING, PAUSED):
+                job.state = CANCELLED
+            elif job.state == RUNNING:
+                job._stop = CANCELLED
+            else:
+                return
+        self._notify(job)
+
+    def clear_finished(self):
+        """从列表中移除已完成、失败和已取消的任务"""
+        with self._cond:
+            finished = [job for job in self._jobs if job.state in (DONE, FAILED, CANCELLED)]
+            self._cleared_bytes += sum(job.moved for job in finished)
+            self._jobs = [job for job in self._jobs if job.state not in (DONE, FAILED, CANCELLED)]
+        return finished
+
+    def set_policy(self, policy):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的调度策略: {policy}（可选: {', '.join(POLICIES)}）")
+        with self._cond:
+            self.policy = policy
+
+    def set_workers(self, workers):
+        """调整工作线程数：增加时立即启动，减少时多余的线程完成手上的任务后退出"""
+        with self._cond:
+            self.workers = max(1, min(int(workers), MAX_WORKERS))
+            for index in range(self.workers):
+                if index not in self._threads:
+                    thread = threading.Thread(target=self._worker, args=(index,),
+                                              name=f'transfer-queue-{index}', daemon=True)
+                    self._threads[index] = thread
+                    thread.start()
+            self._cond.notify_all()
+
+    def close(self):
+        """停止调度并中断运行中的任务（之后可以从续传日志继续）"""
+        with self._cond:
+            self._closed = True
+            for job in self._jobs:
+                if job.state == RUNNING:
+                    job._stop = PAUSED
+            self._cond.notify_all()
+
+    # ---------- 状态 ----------
+
+    def jobs(self):
+        with self._cond:
+            return list(self._jobs)
+
+    def counts(self):
+        counts = dict.fromkeys(STATE_LABELS, 0)
+        for job in self.jobs():
+            counts[job.state] += 1
+        return counts
+
+    def throughput(self):
+        """所有任务合计的吞吐（字节/秒），按最近 THROUGHPUT_WINDOW 秒计算"""
+        now = time.monotonic()
+        with self._cond:
+            moved = self._cleared_bytes + sum(job.moved for job in self._jobs)
+            self._samples.append((now, moved))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= THROUGHPUT_WINDOW:
+                self._samples.popleft()
+            first_time, first_moved = self._samples[0]
+        return (moved - first_moved) / (now - first_time) if now > first_time else 0.0
+
+    # ---------- 调度 ----------
+
+    def _next_job(self):
+        pending = [job for job in self._jobs if job.state == PENDING]
+        if not pending:
+            return None
+        if self.policy == POLICY_SJF:
+            return min(pending, key=lambda job: (job.size, job.id))
+        return pending[0]
+
+    def _worker(self, index):
+        while True:
+            with self._cond:
+                job = None
+                while not self._closed and index < self.workers:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    del self._threads[index]
+                    return
+                job.state = RUNNING
+                job.started = time.monotonic()
+                job.finished = None
+            self._notify(job)
+            self._run(job)
+            self._notify(job)
+
+    def _run(self, job):
+        client = self.pool.acquire(self.template)
+        if client is None:
+            self._finish(job, False, "无法建立连接")
+            return
+        client.progress_bus = _JobProgressBus(job)
+        ok = False
+        error = None
+        try:
+            if job.kind == UPLOAD:
+                ok = client.upload_file(job.local_path, job.remote_name)
+            else:
+                ok = client.download_file(job.remote_name, job.local_path)
+        except Exception as e:
+            error = str(e)
+        finally:
+            # 失败或被中断时连接上可能还有未收发完的数据，不能再复用
+            self.pool.release(client, reusable=ok and job._stop is None and client.connected)
+        self._finish(job, ok, error)
+
+    def _finish(self, job, ok, error):
+        with self._cond:
+            if ok:
+                job.state = DONE
+                job.size = max(job.size, job.done)
+                job.done = job.size
+            elif job._stop is not None:
+                job.state = job._stop
+            else:
+                job.state = FAILED
+                job.error = error or "传输失败"
+            job._stop = None
+            job.finished = time.monotonic()
+            self._cond.notify_all()
+
+    def _notify(self, job):
+        if self.on_event is not None:
+            try:
+                self.on_event(job)
+            except Exception:
+                pass
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+传输参数自适应
+固定的分片大小和内核默认的socket缓冲区在本机回环和经代理的高带宽时延积链路上都不是最优：
+- 连接建立后控制消息使用 TCP_NODELAY，命令和回复不会被Nagle算法攒着等ACK
+- 发送文件数据期间开启 TCP_CORK（Linux），只发满段，数据发完后取消以立即推出尾部
+- 每次传输开始时用小分片探测：测得吞吐和往返时间（TCP_INFO，或控制消息的往返）后，
+  按 吞吐 × 目标时长 选分片大小；显式开启 tune_buffers 时再按带宽时延积调大内核缓冲区，都限制在配置的上下限内
+选定的参数和依据由 summary() 输出，可以看到一次传输为什么跑出这样的速度
+"""
+
+import contextlib
+import socket
+import struct
+import time
+
+from transfer_progress import format_rate
+
+# 分片大小的上下限，以及探测阶段使用的初始分片
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+PROBE_CHUNK_SIZE = 1024 * 1024
+
+# 分片大小取测得吞吐下约这么长时间的数据量：太小则系统调用和进度回调过多，太大则进度不连贯
+CHUNK_SECONDS = 0.05
+
+# 探测阶段：传输了这么长时间或这么多数据后根据测量结果调整参数
+PROBE_SECONDS = 0.1
+PROBE_BYTES = 8 * 1024 * 1024
+
+# 内核socket缓冲区的上下限。Linux上对连接设置过 SO_SNDBUF/SO_RCVBUF（无论调大还是调小）后，
+# 这个方向的缓冲区大小就固定下来，内核不再自动调整；所以默认不设置，只在显式开启 tune_buffers 时按带宽时延积调大
+MIN_SOCKET_BUFFER = 256 * 1024
+MAX_SOCKET_BUFFER = 32 * 1024 * 1024
+# 缓冲区取带宽时延积的倍数，留出余量应对吞吐和往返时间的波动
+BDP_FACTOR = 2
+
+# struct tcp_info 中 tcpi_rtt（微秒）的偏移，Linux专有
+TCP_INFO_RTT = struct.Struct('=I')
+TCP_INFO_RTT_OFFSET = 68
+TCP_INFO_SIZE = 104
+
+
+def tcp_socket(sock):
+    return sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6)
+
+
+def kernel_rtt(sock):
+    """从 TCP_INFO 读取内核平滑后的往返时间（秒），平台不支持时返回None"""
+    if not tcp_socket(sock) or not hasattr(socket, 'TCP_INFO'):
+        return None
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, TCP_INFO_SIZE)
+        rtt_us = TCP_INFO_RTT.unpack_from(info, TCP_INFO_RTT_OFFSET)[0]
+    except (OSError, struct.error):
+        return None
+    return rtt_us / 1e6 if rtt_us else None
+
+
+def _round_chunk(size):
+    """分片取不超过 size 的2的幂，便于和页缓存、缓冲区对齐"""
+    return 1 << (max(int(size), 1).bit_length() - 1)
+
+
+class TransportTuner:
+    """一条连接的传输参数
+
+    connect 后调用 configure(sock)；每次收发文件数据时 begin(direction) 开始一次传输，
+    数据引擎每发完/收完一个分片调用 observe(累计字节数)，并按 chunk_size 取下一个分片的大小
+    """
+
+    def __init__(self, min_chunk=MIN_CHUNK_SIZE, max_chunk=MAX_CHUNK_SIZE,
+                 min_buffer=MIN_SOCKET_BUFFER, max_buffer=MAX_SOCKET_BUFFER, enabled=True, tune_buffers=False):
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.min_buffer = min_buffer
+        self.max_buffer = max_buffer
+        self.enabled = enabled
+        # 是否按带宽时延积设置内核缓冲区（设置后内核不再自动调整该连接的缓冲区）
+        self.tune_buffers = tune_buffers
+        self.sock = None
+        self.app_rtt = None          # 控制消息的往返时间（端到端，经代理时包含代理）
+        self.chunk_size = max_chunk
+        self._reset_transfer(None)
+
+    def copy(self):
+        """上下限相同、尚未测量的新实例（用于并行连接）"""
+        return TransportTuner(self.min_chunk, self.max_chunk, self.min_buffer, self.max_buffer, self.enabled,
+                              self.tune_buffers)
+
+    def configure(self, sock):
+        """连接建立后设置：控制消息不经Nagle算法延迟"""
+        self.sock = sock
+        self.app_rtt = None
+        if self.enabled and tcp_socket(sock):
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                pass
+
+    def note_round_trip(self, seconds):
+        """记录一次控制消息的往返时间，取最小值作为估计（排除服务器处理的波动）"""
+        self.app_rtt = seconds if self.app_rtt is None else min(self.app_rtt, seconds)
+
+    def _reset_transfer(self, direction):
+        self.direction = direction
+        self.probing = False
+        self.started = time.perf_counter()
+        self.rtt = None
+        self.rtt_source = None
+        self.throughput = None
+        self.buffer_before = None
+        self.buffer_after = None
+        self.reasons = []
+
+    def begin(self, direction):
+        """开始一次传输，direction 为 'send' 或 'recv'"""
+        self._reset_transfer(direction)
+        if not self.enabled:
+            self.chunk_size = self.max_chunk
+            return
+        self.probing = True
+        self.chunk_size = max(self.min_chunk, min(PROBE_CHUNK_SIZE, self.max_chunk))
+
+    def observe(self, done):
+        """一个分片完成后调用，done 为本次传输累计的字节数；探测期满时调整参数"""
+        if not self.probing:
+            return
+        elapsed = time.perf_counter() - self.started
+        if elapsed < PROBE_SECONDS and done < PROBE_BYTES:
+            return
+        self.probing = False
+        self.throughput = done / max(elapsed, 1e-6)
+        self._choose_chunk()
+        self._choose_buffer()
+
+    def _measure_rtt(self):
+        # 内核测得的是到第一跳（直连时即服务器，经代理时为代理）的往返；控制消息的往返是端到端的，两者取大
+        kernel = kernel_rtt(self.sock)
+        candidates = [(kernel, 'TCP_INFO'), (self.app_rtt, '控制消息往返')]
+        candidates = [item for item in candidates if item[0] is not None]
+        if candidates:
+            self.rtt, self.rtt_source = max(candidates)
+
+    def _choose_chunk(self):
+        target = self.throughput * CHUNK_SECONDS
+        self.chunk_size = max(self.min_chunk, min(_round_chunk(target), self.max_chunk))
+        if target >= self.max_chunk:
+            self.reasons.append(f"吞吐很高，分片取上限 {self.max_chunk // 1024} KB")
+        elif target <= self.min_chunk:
+            self.reasons.append(f"吞吐较低，分片取下限 {self.min_chunk // 1024} KB")
+        else:
+            self.reasons.append(f"分片 ≈ 吞吐 × {CHUNK_SECONDS * 1000:.0f} ms")
+
+    def _choose_buffer(self):
+        if not tcp_socket(self.sock):
+            self.reasons.append("非TCP连接，不调整内核缓冲区")
+            return
+        self._measure_rtt()
+        option = socket.SO_SNDBUF if self.direction == 'send' else socket.SO_RCVBUF
+        try:
+            self.buffer_before = self.buffer_after = self.sock.getsockopt(socket.SOL_SOCKET, option)
+        except OSError:
+            return
+        if self.rtt is None:
+            self.reasons.append("无法测得往返时间，保持内核缓冲区")
+            return
+
+        bdp = self.throughput * self.rtt
+        if not self.tune_buffers:
+            self.reasons.append(f"带宽时延积 {bdp / 1024:.0f} KB，未开启缓冲区调整，保持内核自动调整")
+            return
+        target = int(min(max(bdp * BDP_FACTOR, self.min_buffer), self.max_buffer))
+        if target <= self.buffer_before:
+            self.reasons.append(f"带宽时延积 {bdp / 1024:.0f} KB 小于当前缓冲区，保持内核自动调整")
+            return
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, option, target)
+            self.buffer_after = self.sock.getsockopt(socket.SOL_SOCKET, option)
+        except OSError as e:
+            self.reasons.append(f"调大缓冲区失败: {e}")
+            return
+        self.reasons.append(f"带宽时延积 {bdp / 1024:.0f} KB 超过缓冲区，调大到 {target // 1024} KB")
+        if self.buffer_after < target:
+            limit = 'net.core.wmem_max' if self.direction == 'send' else 'net.core.rmem_max'
+            self.reasons.append(f"受系统上限（Linux上为 {limit}）限制，实际 {self.buffer_after // 1024} KB")
+
+    @contextlib.contextmanager
+    def bulk(self):
+        """发送文件数据期间开启 TCP_CORK（Linux），结束时取消，尾部数据立即发出"""
+        cork = self.enabled and tcp_socket(self.sock) and hasattr(socket, 'TCP_CORK')
+        if cork:
+            try:
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1)
+            except OSError:
+                cork = False
+        try:
+            yield
+        finally:
+            if cork:
+                try:
+                    self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 0)
+                except OSError:
+                    pass
+
+    def snapshot(self):
+        """最近一次传输选定的参数（可写入基准测试结果）"""
+        return {
+            'direction': self.direction,
+            'chunk_size': self.chunk_size,
+            'throughput': self.throughput,
+            'rtt_ms': self.rtt * 1000 if self.rtt is not None else None,
+            'rtt_source': self.rtt_source,
+            'buffer_before': self.buffer_before,
+            'buffer_after': self.buffer_after,
+            'reasons': list(self.reasons),
+        }
+
+    def summary(self):
+        if not self.enabled:
+            return "⚙️ 传输参数: 未启用自适应"
+        if self.throughput is None:
+            return f"⚙️ 传输参数: 数据量不足以完成探测，使用探测分片 {self.chunk_size // 1024} KB"
+        text = f"⚙️ 传输参数: 探测吞吐 {format_rate(self.throughput)}"
+        if self.rtt is not None:
+            text += f", 往返 {self.rtt * 1000:.2f} ms ({self.rtt_source})"
+        text += f", 分片 {self.chunk_size // 1024} KB"
+        if self.buffer_after is not None:
+            name = '发送' if self.direction == 'send' else '接收'
+            if self.buffer_after != self.buffer_before:
+                text += f", {name}缓冲区 {self.buffer_before // 1024} → {self.buffer_after // 1024} KB"
+            else:
+                text += f", {name}缓冲区 {self.buffer_after // 1024} KB"
+        if self.reasons:
+            text += "\n⚙️ 依据: " + "；".join(self.reasons)
+        return text
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+vrc代理的Python实现
+按 include/vrc_proxy.h 的协议工作：客户端连上后发送 ProxyRequest（目标IP 16字节 + 端口u16），
+代理连接目标并回复 ProxyResponse（状态u16 + 消息100字节），之后在两条连接之间原样转发数据。
+- Linux上用 os.splice 经内核管道转发，数据不进入用户态；其他平台复用一块缓冲区 recv_into + sendall
+- 每个会话两个线程（每个方向一个），可同时服务大量会话
+- 统计转发吞吐和代理握手（连接目标）耗时，代理带来的开销可以直接量出来
+"""
+
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+
+# 与 include/vrc_proxy.h 中 #pragma pack(1) 的结构一致（不按对齐补齐）
+PROXY_REQUEST = struct.Struct('=16sH')
+PROXY_RESPONSE = struct.Struct('=H100s')
+
+VRC_PROXY_STATUS_OK = 0
+VRC_PROXY_STATUS_CONNECT_ERR = 1
+
+# 连接目标服务器的超时
+CONNECT_TIMEOUT = 10
+
+# splice 每次最多搬运的字节数，以及内核管道的容量（默认只有64KB）
+SPLICE_SIZE = 1024 * 1024
+PIPE_SIZE = 1024 * 1024
+F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)  # Linux专有，旧版Python未导出
+
+# 不支持 splice 时每个方向复用的转发缓冲区
+RELAY_BUFFER_SIZE = 256 * 1024
+
+# 命令行运行时输出统计的间隔
+REPORT_INTERVAL = 5.0
+
+
+def splice_supported():
+    return hasattr(os, 'splice') and sys.platform.startswith('linux')
+
+
+def recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        data += chunk
+    return bytes(data)
+
+
+class ProxyStats:
+    """代理统计：会话数、各方向转发字节数、代理握手耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions = 0
+        self.active = 0
+        self.failed = 0
+        self.bytes_up = 0        # 客户端 -> 目标
+        self.bytes_down = 0      # 目标 -> 客户端
+        self.handshakes = 0
+        self.handshake_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def session_opened(self, handshake_seconds):
+        with self._lock:
+            self.sessions += 1
+            self.active += 1
+            self.handshakes += 1
+            self.handshake_seconds += handshake_seconds
+
+    def session_failed(self):
+        with self._lock:
+            self.failed += 1
+
+    def session_closed(self):
+        with self._lock:
+            self.active -= 1
+
+    def add(self, upstream, n):
+        with self._lock:
+            if upstream:
+                self.bytes_up += n
+            else:
+                self.bytes_down += n
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'sessions': self.sessions,
+                'active': self.active,
+                'failed': self.failed,
+                'bytes_up': self.bytes_up,
+                'bytes_down': self.bytes_down,
+                'handshake_ms': self.handshake_seconds / self.handshakes * 1000 if self.handshakes else 0.0,
+                'seconds': time.perf_counter() - self.started,
+            }
+
+    def summary(self, previous=None):
+        """与上一次快照比较得到这段时间的转发吞吐"""
+        current = self.snapshot()
+        base = previous or {'bytes_up': 0, 'bytes_down': 0, 'seconds': 0.0}
+        seconds = max(current['seconds'] - base['seconds'], 1e-6)
+        up = (current['bytes_up'] - base['bytes_up']) / seconds
+        down = (current['bytes_down'] - base['bytes_down']) / seconds
+        text = f"🔁 会话 {current['active']} 个活动 / {current['sessions']} 个累计"
+        if current['failed']:
+            text += f" / {current['failed']} 个失败"
+        text += (f", 上行 {up / 1e6:.1f} MB/s, 下行 {down / 1e6:.1f} MB/s, "
+                 f"平均握手 {current['handshake_ms']:.2f} ms")
+        return text, current
+
+
+class VrcProxy:
+    """vrc代理服务器，start() 后在后台线程接受连接"""
+
+    def __init__(self, host='0.0.0.0', port=9999, use_splice=None, stats=None):
+        self.host = host
+        self.port = port
+        self.use_splice = splice_supported() if use_splice is None else use_splice and splice_supported()
+        self.stats = stats or ProxyStats()
+        self._listener = None
+        self._thread = None
+        self._running = False
+
+    @property
+    def address(self):
+        """实际监听的地址（端口为0时由系统分配）"""
+        return self._listener.getsockname()
+
+    def start(self):
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((self.host, self.port))
+        self._listener.listen(socket.SOMAXCONN)
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, name='vrc-proxy', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._listener is not None:
+            try:
+                self._listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._listener.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle_session, args=(client,), daemon=True).start()
+
+    def _handle_session(self, client):
+        target = None
+        try:
+            target_ip, target_port = PROXY_REQUEST.unpack(recv_exactly(client, PROXY_REQUEST.size))
+            target_ip = target_ip.rstrip(b'\0').decode('utf-8', errors='replace')
+
+            # 代理握手耗时：收到请求到回复之间，主要是连接目标的往返
+            started = time.perf_counter()
+            try:
+                target = socket.create_connection((target_ip, target_port), timeout=CONNECT_TIMEOUT)
+            except OSError as e:
+                client.sendall(PROXY_RESPONSE.pack(VRC_PROXY_STATUS_CONNECT_ERR,
+                                                   f"connect {target_ip}:{target_port} failed: {e}".encode()[:100]))
+                self.stats.session_failed()
+                client.close()
+                return
+            target.settimeout(None)
+            for sock in (client, target):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.sendall(PROXY_RESPONSE.pack(VRC_PROXY_STATUS_OK, f"connected to {target_ip}:{target_port}".encode()))
+            self.stats.session_opened(time.perf_counter() - started)
+        except (OSError, struct.error):
+            self.stats.session_failed()
+            client.close()
+            if target is not None:
+                target.close()
+            return
+
+        # 两个方向各用一个线程转发，任一方向结束只关闭对应的写端，另一方向照常传完
+        downstream = threading.Thread(target=self._relay, args=(target, client, False), daemon=True)
+        downstream.start()
+        self._relay(client, target, True)
+        downstream.join()
+        client.close()
+        target.close()
+        self.stats.session_closed()
+
+    def _relay(self, src, dst, upstream):
+        try:
+            if self.use_splice:
+                self._relay_splice(src, dst, upstream)
+            else:
+                self._relay_buffer(src, dst, upstream)
+            dst.shutdown(socket.SHUT_WR)
+        except OSError:
+            # 一端出错时整条会话都不可用，关闭两端让另一个方向的线程也退出
+            for sock in (src, dst):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _relay_splice(self, src, dst, upstream):
+        """socket -> 管道 -> socket，数据只在内核中移动"""
+        read_fd, write_fd = os.pipe()
+        try:
+            try:
+                fcntl.fcntl(write_fd, F_SETPIPE_SZ, PIPE_SIZE)
+            except OSError:
+                pass  # 超过系统允许的管道容量时使用默认大小
+            src_fd, dst_fd = src.fileno(), dst.fileno()
+            while True:
+                n = os.splice(src_fd, write_fd, SPLICE_SIZE, flags=os.SPLICE_F_MOVE)
+                if n == 0:
+                    break
+                remaining = n
+                while remaining:
+                    remaining -= os.splice(read_fd, dst_fd, remaining, flags=os.SPLICE_F_MOVE)
+                self.stats.add(upstream, n)
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+    def _relay_buffer(self, src, dst, upstream):
+        """复用一块缓冲区：recv_into 后直接发送缓冲区视图，不为每次接收分配新对象"""
+        buffer = bytearray(RELAY_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while True:
+            n = src.recv_into(buffer)
+            if n == 0:
+                break
+            dst.sendall(view[:n])
+            self.stats.add(upstream, n)
+
+
+def main():
+    print("🚀 vrc代理")
+    print("=" * 40)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print("使用方法:")
+        print("  python vrc_proxy.py [监听端口] [--no-splice]")
+        print("")
+        print("客户端通过代理连接:")
+        print("  python file_transfer_client.py <目标主机> <目标端口> <代理主机> <代理端口>")
+        return
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    port = int(args[0]) if args else 9999
+    proxy = VrcProxy(port=port, use_splice='--no-splice' not in sys.argv).start()
+    print(f"✅ 监听 {proxy.host}:{port}，转发方式: {'splice零拷贝' if proxy.use_splice else '缓冲区复用'}")
+
+    previous = None
+    try:
+        while True:
+            time.sleep(REPORT_INTERVAL)
+            text, current = proxy.stats.summary(previous)
+            # 没有新流量也没有活动会话时不刷屏
+            if previous is None or current['active'] or current['sessions'] != previous['sessions']:
+                print(text)
+            previous = current
+    except KeyboardInterrupt:
+        print("\n👋 正在退出...")
+    finally:
+        proxy.stop()
+
+
+if __name__ == "__main__":
+    main()
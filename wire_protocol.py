@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+控制消息的分帧协议
+每条命令和回复前加一个定长帧头（魔数、类型、标志、长度），接收方按长度切分消息，
+不再依赖一次recv恰好收到一条完整消息；帧之后紧跟的文件数据留在缓冲区里交给数据读取方。
+服务器在 FILE:CAPS 中声明 frame=1 后客户端才切换到分帧，旧服务器继续使用文本协议
+"""
+
+import struct
+
+# 帧头: 魔数(u8) + 类型(u8) + 标志(u16) + 负载长度(u32)，小端序，与服务器 socket_server.cpp 保持一致
+# 魔数0xF7不可能出现在UTF-8文本的开头，服务器据此区分分帧消息和旧的文本命令
+FRAME_HEADER = struct.Struct('<BBHI')
+FRAME_MAGIC = 0xF7
+
+# 帧类型：目前只有文本消息（命令和回复），标志位保留为0
+FRAME_TEXT = 1
+
+# 单条消息的负载上限，超过视为协议错误
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+# 接收缓冲区初始大小
+DECODER_BUFFER_SIZE = 64 * 1024
+
+
+class ProtocolError(IOError):
+    """收到的数据不符合分帧协议"""
+
+
+def encode_frame(payload, frame_type=FRAME_TEXT, flags=0):
+    """把一条消息编码为帧，payload 为 str 或 bytes"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    if len(payload) > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"消息过长: {len(payload)} bytes")
+    return FRAME_HEADER.pack(FRAME_MAGIC, frame_type, flags, len(payload)) + payload
+
+
+class FrameDecoder:
+    """增量解析帧
+
+    数据直接 recv_into 到内部缓冲区的空闲部分（writable + commit），完整的帧以指向缓冲区的
+    memoryview 返回，不做复制；返回的视图在下一次调用 writable 之前有效。
+    帧之后多收到的字节（例如紧跟在回复后面的文件数据）通过 pending / consume 取走
+    """
+
+    def __init__(self, size=DECODER_BUFFER_SIZE):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+    def writable(self, min_size=1):
+        """返回缓冲区末尾至少 min_size 字节的空闲空间，必要时把未消费的数据移到开头或扩容"""
+        if len(self._buffer) - self._end >= min_size:
+            return self._view[self._end:]
+        remaining = self._end - self._start
+        if len(self._buffer) - remaining < min_size:
+            # 当前缓冲区放不下，换一个更大的
+            buffer = bytearray(max(len(self._buffer) * 2, remaining + min_size))
+            buffer[:remaining] = self._view[self._start:self._end]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        elif remaining:
+            self._view[:remaining] = bytes(self._view[self._start:self._end])
+        self._start = 0
+        self._end = remaining
+        return self._view[self._end:]
+
+    def commit(self, n):
+        """记录 writable 返回的空间中新写入了 n 字节"""
+        self._end += n
+
+    def feed(self, data):
+        """追加一段已经收到的数据"""
+        self.writable(len(data))[:len(data)] = data
+        self.commit(len(data))
+
+    def next_frame(self):
+        """解析下一帧，返回 (类型, 标志, 负载memoryview)；数据不足一帧时返回None"""
+        available = self._end - self._start
+        if available < FRAME_HEADER.size:
+            return None
+        magic, frame_type, flags, length = FRAME_HEADER.unpack_from(self._buffer, self._start)
+        if magic != FRAME_MAGIC:
+            raise ProtocolError(f"帧头魔数错误: 0x{magic:02x}")
+        if length > MAX_MESSAGE_SIZE:
+            raise ProtocolError(f"消息过长: {length} bytes")
+        if available < FRAME_HEADER.size + length:
+            return None
+        begin = self._start + FRAME_HEADER.size
+        self._start = begin + length
+        return frame_type, flags, self._view[begin:self._start]
+
+    def needed(self):
+        """凑齐当前这一帧还需要的字节数（至少1）"""
+        available = self._end - self._start
+        if available < FRAME_HEADER.size:
+            return FRAME_HEADER.size - available
+        length = FRAME_HEADER.unpack_from(self._buffer, self._start)[3]
+        return max(FRAME_HEADER.size + length - available, 1)
+
+    def pending(self):
+        """已收到但尚未解析的数据"""
+        return self._view[self._start:self._end]
+
+    def consume(self, n):
+        self._start += n
+        if self._start == self._end:
+            self._start = self._end = 0
+
+
+class MessageChannel:
+    """包装一条socket连接上的控制消息收发，分帧和旧文本协议对调用方透明
+
+    - send_message / recv_message: 一条命令 / 一条回复
+    - recv_chunk: 回复数据流中的下一段（文件列表、签名表这类可能分多次发送的长回复）
+    - recv_into: 回复之后的原始文件数据，先交出解析帧时多收到的部分，与socket.recv_into用法相同，
+      可以直接传给 transfer_engine / transfer_compression 的接收函数
+    """
+
+    def __init__(self, sock, framed=False):
+        self.sock = sock
+        self.framed = framed
+        self._decoder = FrameDecoder()
+
+    def send_message(self, message):
+        if self.framed:
+            self.sock.sendall(encode_frame(message))
+        else:
+            self.sock.sendall(message.encode('utf-8') if isinstance(message, str) else message)
+
+    def send_messages(self, messages):
+        """一次发出多条命令（流水线），之后按顺序用 recv_message 读取各自的回复；只能在分帧模式下使用"""
+        if not self.framed:
+            raise ProtocolError("文本协议下不能流水线发送命令")
+        self.sock.sendall(b''.join(encode_frame(message) for message in messages))
+
+    def recv_frame(self):
+        """接收下一帧的负载（memoryview，下一次接收前有效）"""
+        while True:
+            frame = self._decoder.next_frame()
+            if frame is not None:
+                return frame[2]
+            buffer = self._decoder.writable(self._decoder.needed())
+            n = self.sock.recv_into(buffer)
+            if not n:
+                raise ConnectionError("连接已关闭")
+            self._decoder.commit(n)
+
+    def recv_message(self, bufsize=1024):
+        """接收一条回复并解码为文本；文本协议下等同于一次 recv(bufsize)"""
+        if self.framed:
+            return str(self.recv_frame(), 'utf-8', errors='replace')
+        return self.sock.recv(bufsize).decode('utf-8')
+
+    def recv_chunk(self, bufsize=65536):
+        """接收回复数据流中的下一段，连接关闭时返回空"""
+        if self.framed:
+            try:
+                return self.recv_frame()
+            except ConnectionError:
+                return b''
+        # 文本协议下复用解码缓冲区接收，不为每段数据分配新的bytes
+        buffer = self._decoder.writable(bufsize)
+        n = self.sock.recv_into(buffer, bufsize)
+        return buffer[:n]
+
+    def pending_bytes(self):
+        """解析帧时多收到、还没有被读走的字节数；空闲连接上应为0"""
+        return len(self._decoder.pending())
+
+    def recv_into(self, buffer, nbytes=0):
+        """接收原始数据（文件内容），语义与 socket.recv_into 相同"""
+        pending = self._decoder.pending()
+        if pending:
+            n = min(len(pending), nbytes or len(buffer))
+            buffer[:n] = pending[:n]
+            self._decoder.consume(n)
+            return n
+        return self.sock.recv_into(buffer, nbytes)
+
+
+# 多路复用（FILE:MUX 之后整条连接只承载通道帧），与服务器 mux_session.h 保持一致
+# 帧头: 类型(u8) + 标志(u8，保留为0) + 通道号(u16) + 负载长度(u32)，小端序
+MUX_HEADER = struct.Struct('<BBHI')
+MUX_OPEN = 1     # 打开通道
+MUX_DATA = 2     # 通道数据
+MUX_WINDOW = 3   # 流控窗口增量，负载为u32
+MUX_CLOSE = 4    # 发送方不再在该通道上发送数据
+MUX_WINDOW_UPDATE = struct.Struct('<I')
+
+# 单个数据帧的负载上限，以及每个通道每个方向上未被对端消费的数据上限
+MUX_MAX_CHUNK = 64 * 1024
+MUX_INITIAL_WINDOW = 1024 * 1024